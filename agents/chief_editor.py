@@ -1,6 +1,6 @@
 import sys
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.agent import BaseAgent
@@ -45,3 +45,35 @@ class ChiefEditorAgent(BaseAgent):
         else:
             print(f"❌ [{self.name}] 写作失败")
             return None
+
+    def write_articles(self, items: List[Dict]) -> List[Optional[Dict]]:
+        """
+        [High-Level Action] 并发撰写一批文章
+
+        Args:
+            items: [{"topic": str, "category": str, "source_trend": str}, ...]
+
+        Returns:
+            与 items 顺序一致的文章列表 (失败项为 None)
+        """
+        print(f"🤖 [{self.name}] 正在并发撰写 {len(items)} 篇文章...")
+
+        inputs = [{
+            "topic": item.get("topic", ""),
+            "category": item.get("category", ""),
+            "source_trend": item.get("source_trend", ""),
+            "rag_context": ""
+        } for item in items]
+
+        try:
+            articles = self.skills["deep_write"].execute_batch(inputs)
+        except Exception as e:
+            print(f"❌ 技能 deep_write 批量施放失败: {e}")
+            return [None] * len(items)
+
+        for item, article in zip(items, articles):
+            if article:
+                print(f"✅ [{self.name}] 写作完成: {article.get('title')}")
+            else:
+                print(f"❌ [{self.name}] 写作失败: {item.get('topic')}")
+        return articles
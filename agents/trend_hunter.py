@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.agent import BaseAgent
 from skills.trend_searcher import TrendSearchSkill
 from skills.topic_analyst import TopicAnalysisSkill
+from shared.trend_history import get_trend_history
 
 class TrendHunterAgent(BaseAgent):
     """
@@ -35,13 +36,25 @@ class TrendHunterAgent(BaseAgent):
             print(f"❌ [{self.name}] 未找到任何热点")
             return []
             
-        print(f"🤖 [{self.name}] 已收集 {len(trends)} 个热点，开始分析...")
+        # 2. 增量筛选: 只分析新出现 / 重新上榜的热点
+        history = get_trend_history()
+        fresh_trends = history.select_fresh(trends)
+        if not fresh_trends:
+            print(f"⏭️ [{self.name}] 没有新热点，跳过本轮分析")
+            return []
+        
+        print(f"🤖 [{self.name}] 已收集 {len(trends)} 个热点 (新热点 {len(fresh_trends)} 个)，开始分析...")
         
-        # 2. 分析
+        # 3. 分析
         generated_topics = self.use_skill("topic_analysis", {
-            "trends": trends, 
+            "trends": fresh_trends, 
             "config": config_data
         })
+        # 只有热点筛选 LLM 调用成功才记为已分析: 失败时选题来自随机补全，下一轮需重新分析
+        if generated_topics and self.skills["topic_analysis"].analysis_succeeded:
+            history.mark_analyzed(fresh_trends)
+        elif generated_topics:
+            print(f"⚠️ [{self.name}] 热点筛选未成功，本轮热点保留待下一轮重新分析")
         
         print(f"✅ [{self.name}] 选题完成，共产出 {len(generated_topics)} 个标题")
         return generated_topics
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+补写记录 ID：为 cms 及各平台表追加 Record_ID 列，并给没有 ID 的行写入 UUID
+之后的 update_record 按 ID 定位行，不再依赖会随插入/删除而变化的行号
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.google_client import GoogleSheetClient, RECORD_ID_COLUMN
+from shared import config
+
+def main():
+    client = GoogleSheetClient()
+    tables = ["cms"] + [p["sheet_name"] for p in config.SOCIAL_PLATFORMS.values()]
+    
+    for table in tables:
+        print(f"🔧 正在检查 {table} 表的 {RECORD_ID_COLUMN} 列...")
+        count = client.ensure_record_ids(table)
+        print(f"✅ {table}: 补写 {count} 行")
+
+if __name__ == "__main__":
+    main()
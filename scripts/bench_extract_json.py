@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+extract_json 微基准
+对比旧版 (正则 + 反复 json.loads) 与单遍扫描版的耗时，并校验两者结果是否一致
+
+语料:
+1. 内置样本: 仿 DeepWriteSkill / SocialWriter 输出 (代码块、含 CSS / JSON-LD 的 HTML、
+   前后带括号的说明文字、截断输出、非法转义)
+2. --cache: 读取本地 LLM 缓存 (config.LLM_CACHE_FILE) 中的真实响应
+3. --corpus DIR: 读取目录下的 *.txt / *.json 文件
+
+用法:
+    python scripts/bench_extract_json.py
+    python scripts/bench_extract_json.py --cache --repeat 200
+"""
+import os
+import re
+import sys
+import json
+import time
+import glob
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import config, llm_utils
+
+
+# ---------- 旧版实现 (仅用于对比) ----------
+
+def legacy_extract_json(content):
+    if not content:
+        return None
+    content = llm_utils.sanitize_json(content)
+    try:
+        return json.loads(content, strict=False)
+    except json.JSONDecodeError:
+        pass
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        try:
+            return json.loads(json_match.group(), strict=False)
+        except json.JSONDecodeError:
+            pass
+    depth, start_idx = 0, -1
+    for i, char in enumerate(content):
+        if char == '{':
+            if depth == 0:
+                start_idx = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0 and start_idx != -1:
+                try:
+                    return json.loads(content[start_idx:i + 1], strict=False)
+                except json.JSONDecodeError:
+                    start_idx = -1
+    return None
+
+
+# ---------- 语料 ----------
+
+def _article_html(paragraphs: int) -> str:
+    style = "<style>.faq{margin:0 auto}.faq h3{color:#333}@media(max-width:600px){.faq{padding:8px}}</style>"
+    ld = '<script type="application/ld+json">{"@context": "https://schema.org", "@type": "FAQPage"}</script>'
+    body = "".join(f"<h2>第{i}节 {{规格}}</h2><p>纸箱尺寸 30×20×10cm，承重 {i * 5}kg。</p>" for i in range(paragraphs))
+    return style + body + ld
+
+
+def builtin_corpus():
+    """内置样本 (名称, 文本)"""
+    article = {
+        "title": "快递纸箱选购指南",
+        "html_content": _article_html(40),
+        "category": "行业资讯",
+        "tags": ["纸箱", "包装"],
+    }
+    article_json = json.dumps(article, ensure_ascii=False)
+    social = {"title": "纸箱别乱买！", "content": "姐妹们 {重点} 来了～\n1. 看楞型", "tags": ["#包装"]}
+    social_json = json.dumps(social, ensure_ascii=False)
+
+    return [
+        ("deep_write_plain", article_json),
+        ("deep_write_fenced", f"```json\n{article_json}\n```"),
+        ("deep_write_prose", f"好的，以下是文章 (格式 {{title, html_content}}):\n{article_json}\n希望对你有帮助 {{:}}"),
+        ("deep_write_truncated", article_json[: len(article_json) * 2 // 3]),
+        ("deep_write_bad_escape", article_json.replace("30×20×10cm", r"30\20\10cm")),
+        ("social_fenced", f"```json\n{social_json}\n```"),
+        ("social_prose", f"下面是改写结果：{social_json} 以上 {{完}}"),
+        ("titles_wrapped", json.dumps({"titles": [{"title": f"标题{i}"} for i in range(20)]}, ensure_ascii=False)),
+    ]
+
+
+def cache_corpus():
+    """本地 LLM 缓存中的真实响应"""
+    path = config.LLM_CACHE_FILE
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT key, response FROM llm_cache").fetchall()
+    finally:
+        conn.close()
+    return [(f"cache:{key[:8]}", response) for key, response in rows]
+
+
+def dir_corpus(directory: str):
+    """目录下的 *.txt / *.json 文件"""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt")) + glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+
+# ---------- 基准 ----------
+
+def _time(func, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="extract_json 微基准")
+    parser.add_argument("--repeat", type=int, default=100, help="每个样本的重复次数")
+    parser.add_argument("--cache", action="store_true", help="加入本地 LLM 缓存中的真实响应")
+    parser.add_argument("--corpus", help="额外语料目录 (*.txt / *.json)")
+    args = parser.parse_args()
+
+    samples = builtin_corpus()
+    if args.cache:
+        samples += cache_corpus()
+    if args.corpus:
+        samples += dir_corpus(args.corpus)
+
+    print(f"📊 extract_json 基准: {len(samples)} 个样本 × {args.repeat} 次")
+    print(f"   {'样本':<24}{'长度':>8}{'旧版(µs)':>12}{'新版(µs)':>12}{'加速':>8}  结果")
+
+    total_old = total_new = 0.0
+    mismatches = 0
+    for name, text in samples:
+        old_result = legacy_extract_json(text)
+        new_result = llm_utils.extract_json(text)
+        same = old_result == new_result
+        mismatches += not same
+
+        old_us = _time(legacy_extract_json, text, args.repeat)
+        new_us = _time(llm_utils.extract_json, text, args.repeat)
+        total_old += old_us
+        total_new += new_us
+
+        if same:
+            verdict = "✅ 一致" if new_result is not None else "✅ 均失败"
+        else:
+            verdict = f"⚠️ 不同 (旧版 {'失败' if old_result is None else '成功'} / 新版 {'失败' if new_result is None else '成功'})"
+        print(f"   {name:<24}{len(text):>8}{old_us:>12.1f}{new_us:>12.1f}{old_us / max(new_us, 1e-9):>7.1f}x  {verdict}")
+
+    print(f"   合计: 旧版 {total_old:.1f}µs / 新版 {total_new:.1f}µs ({total_old / max(total_new, 1e-9):.1f}x)，"
+          f"结果不同 {mismatches} 个")
+
+
+if __name__ == "__main__":
+    main()
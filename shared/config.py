@@ -3,10 +3,31 @@
 共享配置模块
 """
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_json(name: str, default):
+    """
+    读取 JSON 格式的环境变量 (数组 / 对象)
+
+    格式错误或类型与 default 不一致时打印警告并返回 default，避免所有入口在 import 时崩溃
+    """
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️ 环境变量 {name} 不是合法的 JSON，已忽略: {e}")
+        return default
+    if not isinstance(value, type(default)):
+        print(f"⚠️ 环境变量 {name} 应为 JSON {type(default).__name__}，已忽略")
+        return default
+    return value
+
 # 项目根目录
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -25,12 +46,86 @@ else:
     LLM_API_URL = "https://api.deepseek.com/v1/chat/completions"
     LLM_MODEL = "deepseek-chat"  # DeepSeek 原生模型名称
 
+# 自定义 OpenAI 兼容端点 (例如本地 Mock 服务: python -m shared.mock_llm_server)
+if os.getenv("LLM_API_URL"):
+    LLM_API_URL = os.getenv("LLM_API_URL")
+    LLM_API_KEY = LLM_API_KEY or "mock-key"
+
+# LLM 多服务商路由 (shared/llm_router.py)
+# 所有配置了 Key 的服务商都参与路由，按延迟与错误率自动选择；列表第一个为默认服务商
+LLM_PROVIDERS = []
+if OPENROUTER_API_KEY:
+    LLM_PROVIDERS.append({"name": "openrouter", "api_url": "https://openrouter.ai/api/v1/chat/completions",
+                          "api_key": OPENROUTER_API_KEY, "model": "deepseek/deepseek-chat"})
+if DEEPSEEK_API_KEY:
+    LLM_PROVIDERS.append({"name": "deepseek", "api_url": "https://api.deepseek.com/v1/chat/completions",
+                          "api_key": DEEPSEEK_API_KEY, "model": "deepseek-chat"})
+# 额外服务商 (JSON 数组，元素格式同上)，例如自建 OpenAI 兼容网关
+LLM_PROVIDERS.extend(_env_json("LLM_EXTRA_PROVIDERS", []))
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))            # 延迟/错误率统计的滚动窗口
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5"))   # 统计生效所需的最少样本
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("true", "1", "yes")  # 超过 p95 时向次优服务商发对冲请求
+
+# LLM 连接池配置 (shared/llm_transport.py)
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "4"))   # 缓存的 host 连接池数量
+LLM_POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "16"))          # 每个 host 的最大 Keep-Alive 连接数
+LLM_POOL_BLOCK = os.getenv("LLM_POOL_BLOCK", "false").lower() in ("true", "1", "yes")  # 连接池耗尽时是否阻塞等待
+
+# LLM 并发调度配置 (shared/llm_scheduler.py)
+LLM_MAX_CONCURRENCY_PER_PROVIDER = int(os.getenv("LLM_MAX_CONCURRENCY_PER_PROVIDER", "8"))  # 每个服务商最大在途请求数
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "4"))        # 每个模型最大在途请求数
+
+# LLM 自适应限流配置 (shared/rate_limiter.py)
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "2"))            # 初始速率 (请求/秒)
+LLM_RATE_LIMIT_BURST = float(os.getenv("LLM_RATE_LIMIT_BURST", "4"))        # 令牌桶容量 (允许的突发请求数)
+LLM_RATE_LIMIT_MIN_RPS = float(os.getenv("LLM_RATE_LIMIT_MIN_RPS", "0.1"))  # 429 降速下限
+LLM_RATE_LIMIT_MAX_RPS = float(os.getenv("LLM_RATE_LIMIT_MAX_RPS", "10"))   # 成功提速上限
+LLM_RATE_LIMIT_INCREASE = float(os.getenv("LLM_RATE_LIMIT_INCREASE", "0.1"))  # 每次成功的提速步长
+
+# LLM 流式生成配置 (shared/llm_stream.py)
+LLM_STREAM_ENABLED = os.getenv("LLM_STREAM_ENABLED", "true").lower() in ("true", "1", "yes")  # 长文章是否使用 SSE 流式生成
+LLM_STREAM_CONNECT_TIMEOUT = float(os.getenv("LLM_STREAM_CONNECT_TIMEOUT", "10"))  # 建立连接超时 (秒)
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))        # 两次内容增量之间的最长间隔 (秒)
+LLM_STREAM_MAX_TTFB = float(os.getenv("LLM_STREAM_MAX_TTFB", "60"))                # 首个内容增量的最长等待 (秒)
+
+# LLM 响应缓存配置 (shared/llm_cache.py)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", os.path.join(PROJECT_ROOT, ".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "24"))  # 过期时间
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))       # 总体积上限，超出后按 LRU 淘汰
+
+# LLM 调用计量配置 (shared/llm_metrics.py)
+LLM_METRICS_EXPORT = os.getenv("LLM_METRICS_EXPORT", "true").lower() in ("true", "1", "yes")  # Runner 结束时导出 JSON / CSV
+LLM_METRICS_DIR = os.getenv("LLM_METRICS_DIR", os.path.join(PROJECT_ROOT, ".cache", "llm_metrics"))
+# 模型单价 (美元 / 百万 Token): {模型名: [输入单价, 输出单价]}，用于费用估算，可用 LLM_PRICING 环境变量 (JSON) 覆盖
+LLM_PRICING = {
+    "deepseek-chat": [0.27, 1.10],
+    "deepseek/deepseek-chat": [0.27, 1.10],
+}
+LLM_PRICING.update(_env_json("LLM_PRICING", {}))
+
+# 本地 Mock LLM 服务配置 (shared/mock_llm_server.py，离线压测用)
+MOCK_LLM_HOST = os.getenv("MOCK_LLM_HOST", "127.0.0.1")
+MOCK_LLM_PORT = int(os.getenv("MOCK_LLM_PORT", "8765"))
+MOCK_LLM_LATENCY = os.getenv("MOCK_LLM_LATENCY", "lognormal:0.8,0.5")  # 延迟分布: fixed:s / uniform:a,b / normal:mu,sigma / lognormal:median,sigma
+MOCK_LLM_429_RATE = float(os.getenv("MOCK_LLM_429_RATE", "0"))          # 429 注入比例
+MOCK_LLM_5XX_RATE = float(os.getenv("MOCK_LLM_5XX_RATE", "0"))          # 5xx 注入比例
+MOCK_LLM_RETRY_AFTER = float(os.getenv("MOCK_LLM_RETRY_AFTER", "1"))    # 429 响应的 Retry-After (秒)
+MOCK_LLM_SEED = int(os.getenv("MOCK_LLM_SEED", "42"))                   # 随机种子 (相同种子 + 相同请求 = 相同结果)
+MOCK_LLM_STREAM_CHUNK_CHARS = int(os.getenv("MOCK_LLM_STREAM_CHUNK_CHARS", "40"))     # 流式每个增量的字符数
+MOCK_LLM_STREAM_CHUNK_DELAY = float(os.getenv("MOCK_LLM_STREAM_CHUNK_DELAY", "0.02"))  # 流式增量间隔 (秒)
+
 # 飞书配置
 FEISHU_APP_ID = os.getenv("FEISHU_APP_ID", "")
 FEISHU_APP_SECRET = os.getenv("FEISHU_APP_SECRET", "")
 FEISHU_BASE_ID = os.getenv("FEISHU_BASE_ID", "ROVGbzfTfaEGjosDkxHck65Cnmx")
 FEISHU_TABLE_ID = "cms" # Mapped to Google Worksheet Name
 FEISHU_WEBHOOK_URL = os.getenv("FEISHU_WEBHOOK_URL", "https://open.feishu.cn/open-apis/bot/v2/hook/009c15b4-fb99-4eaa-82a7-f1a190083bfc")
+# tenant_access_token 跨进程缓存 (并发 worker / 相继运行的 Step 复用同一令牌)
+FEISHU_TOKEN_CACHE_FILE = os.getenv("FEISHU_TOKEN_CACHE_FILE", os.path.join(PROJECT_ROOT, ".cache", "feishu_token.json"))
+FEISHU_TOKEN_REFRESH_MARGIN = float(os.getenv("FEISHU_TOKEN_REFRESH_MARGIN", "300"))  # 距过期多少秒内开始后台刷新
 
 # Google Sheets Configuration
 GOOGLE_CREDENTIALS_FILE = os.path.join(PROJECT_ROOT, "service_account.json")
@@ -128,11 +223,91 @@ CATEGORY_MAP = {
 STATUS_READY = "Ready"         # 节点1完成: 标题已生成，等待文章生成
 STATUS_PENDING = "Pending"     # 节点2完成: 文章已生成，等待发布
 STATUS_PUBLISHED = "Published" # 节点3完成: 已发布
+STATUS_DUPLICATE = "Duplicate" # 节点2: 与已写作的文章近似，不再生成 (终态)
 # STATUS_GENERATED 已废弃，合并入 STATUS_PENDING
 
 # 每分类最大处理数量
 MAX_GENERATE_PER_CATEGORY = int(os.getenv("MAX_GENERATE_PER_CATEGORY", "100"))  # 节点2: 文章生成 (默认全部)
 MAX_PUBLISH_PER_CATEGORY = int(os.getenv("MAX_PUBLISH_PER_CATEGORY", "2"))      # 节点3: RPA 发布
+ARTICLE_BATCH_SIZE = int(os.getenv("ARTICLE_BATCH_SIZE", "4"))                  # 节点2: 每批并发生成的文章数
+TITLE_BATCH_SIZE = int(os.getenv("TITLE_BATCH_SIZE", "5"))                      # 节点1: 每次请求打包生成标题的热点数 (1 = 逐个请求)
+
+# Google Sheets API 配额调度 (shared/sheets_quota.py): 按每用户每分钟读 / 写上限提前排队
+SHEETS_QUOTA_ENABLED = os.getenv("SHEETS_QUOTA_ENABLED", "true").lower() in ("true", "1", "yes")
+SHEETS_QUOTA_READ_PER_MIN = int(os.getenv("SHEETS_QUOTA_READ_PER_MIN", "60"))    # 读请求上限 (Sheets 默认 60/分钟/用户)
+SHEETS_QUOTA_WRITE_PER_MIN = int(os.getenv("SHEETS_QUOTA_WRITE_PER_MIN", "60"))  # 写请求上限 (Sheets 默认 60/分钟/用户)
+
+# 表格写回配置 (shared/write_behind.py): 状态更新先入队，按条数 / 时间批量写回
+SHEET_WRITE_BEHIND_ENABLED = os.getenv("SHEET_WRITE_BEHIND_ENABLED", "true").lower() in ("true", "1", "yes")
+SHEET_FLUSH_MAX_RECORDS = int(os.getenv("SHEET_FLUSH_MAX_RECORDS", "20"))   # 累计多少条记录触发写回
+SHEET_FLUSH_INTERVAL = float(os.getenv("SHEET_FLUSH_INTERVAL", "10"))       # 定时写回间隔 (秒)
+SHEET_WRITE_BEHIND_DIR = os.getenv("SHEET_WRITE_BEHIND_DIR", os.path.join(PROJECT_ROOT, ".cache", "write_behind"))  # 未写回更新的本地日志
+SHEET_APPEND_BATCH_SIZE = int(os.getenv("SHEET_APPEND_BATCH_SIZE", "50"))  # 新增行攒满多少条执行一次 append_rows
+
+# 表格本地镜像配置 (shared/sheet_mirror.py): 按状态查询 / 今日计数走本地 SQLite
+SHEET_MIRROR_ENABLED = os.getenv("SHEET_MIRROR_ENABLED", "true").lower() in ("true", "1", "yes")
+SHEET_MIRROR_FILE = os.getenv("SHEET_MIRROR_FILE", os.path.join(PROJECT_ROOT, ".cache", "sheet_mirror.sqlite3"))
+SHEET_MIRROR_FULL_SYNC_HOURS = float(os.getenv("SHEET_MIRROR_FULL_SYNC_HOURS", "6"))  # 全量重建间隔 (兜底手工修改)
+
+# 热点多源抓取配置 (shared/trend_fetch.py): 各来源并行，按 host 限制并发 (请求间隔由 shared/crawler.py 控制)
+TREND_FETCH_DEADLINE = float(os.getenv("TREND_FETCH_DEADLINE", "90"))     # 全部来源的总时限 (秒)，超时保留已完成的结果
+TREND_FETCH_MAX_WORKERS = int(os.getenv("TREND_FETCH_MAX_WORKERS", "16"))  # 抓取线程数上限
+TREND_HOST_CONCURRENCY = int(os.getenv("TREND_HOST_CONCURRENCY", "2"))     # 每个 host 默认最大在途请求数
+# 按 host 覆盖: {host: {"concurrency": 并发数}}，可用 TREND_HOST_LIMITS 环境变量 (JSON) 覆盖
+TREND_HOST_LIMITS = {
+    "www.zhihu.com": {"concurrency": 1},  # 知乎反爬严格
+}
+TREND_HOST_LIMITS.update(_env_json("TREND_HOST_LIMITS", {}))
+
+# 热点抓取结果缓存 (shared/trend_cache.py): 按 (来源, 种子词) 缓存，TTL 内重跑 Step 1 不再重复请求
+TREND_CACHE_ENABLED = os.getenv("TREND_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+TREND_CACHE_FILE = os.getenv("TREND_CACHE_FILE", os.path.join(PROJECT_ROOT, ".cache", "trend_cache.sqlite3"))
+TREND_CACHE_DEFAULT_TTL_HOURS = float(os.getenv("TREND_CACHE_DEFAULT_TTL_HOURS", "4"))  # 未单独配置的来源
+# 按来源设置 TTL (小时): 下拉推荐词变化慢，平台热榜变化快；可用 TREND_CACHE_TTL_HOURS 环境变量 (JSON) 覆盖
+TREND_CACHE_TTL_HOURS = {
+    "搜索需求": 24,
+    "1688采购": 24,
+    "淘宝热搜": 24,
+    "谷歌趋势": 24,
+    "知乎问答": 12,
+    "百度": 0.5,
+    "微博": 0.5,
+    "头条": 0.5,
+    "36氪": 1,
+}
+TREND_CACHE_TTL_HOURS.update(_env_json("TREND_CACHE_TTL_HOURS", {}))
+
+# 热点历史 (shared/trend_history.py): 记录每个热点的首次 / 最近出现时间，只把新出现或重新上榜的热点交给 LLM 分析
+TREND_HISTORY_ENABLED = os.getenv("TREND_HISTORY_ENABLED", "true").lower() in ("true", "1", "yes")
+TREND_HISTORY_FILE = os.getenv("TREND_HISTORY_FILE", os.path.join(PROJECT_ROOT, ".cache", "trend_history.sqlite3"))
+TREND_RESURGE_HOURS = float(os.getenv("TREND_RESURGE_HOURS", "24"))       # 消失超过多少小时后再次出现视为重新上榜
+TREND_REANALYZE_HOURS = float(os.getenv("TREND_REANALYZE_HOURS", "168"))  # 一直在榜的热点多久后允许重新分析
+TREND_HISTORY_RETENTION_DAYS = float(os.getenv("TREND_HISTORY_RETENTION_DAYS", "30"))  # 超过多少天未出现的记录被清理
+
+# 标题近似去重索引 (shared/title_index.py): MinHash + LSH，Step 1 生成标题与 Step 2 写作前共用
+TITLE_INDEX_FILE = os.getenv("TITLE_INDEX_FILE", os.path.join(PROJECT_ROOT, ".cache", "title_index.sqlite3"))
+TITLE_DEDUP_THRESHOLD = float(os.getenv("TITLE_DEDUP_THRESHOLD", "0.5"))   # 字符二元组 Jaccard 相似度超过此值视为重复
+TITLE_DEDUP_PREFIX_CHARS = int(os.getenv("TITLE_DEDUP_PREFIX_CHARS", "5"))  # 与本次运行生成的标题前 N 个字完全相同也视为重复 (0 表示关闭)
+TITLE_INDEX_BANDS = int(os.getenv("TITLE_INDEX_BANDS", "16"))  # LSH 分段数
+TITLE_INDEX_ROWS = int(os.getenv("TITLE_INDEX_ROWS", "3"))     # 每段的 MinHash 个数 (签名长度 = 分段数 x 每段个数)
+
+# 爬虫请求调度配置 (shared/crawler.py): 每个 host 一个连接池 + 令牌桶，403/429 时抖动退避
+CRAWLER_DEFAULT_RPS = float(os.getenv("CRAWLER_DEFAULT_RPS", "2"))     # 未单独配置的 host 每秒请求上限
+CRAWLER_BURST = float(os.getenv("CRAWLER_BURST", "2"))                 # 令牌桶容量 (允许的突发请求数)
+CRAWLER_RATE_INCREASE = float(os.getenv("CRAWLER_RATE_INCREASE", "0.1"))  # 限流后每次成功请求的提速步长 (与 LLM_RATE_LIMIT_INCREASE 独立)
+CRAWLER_MAX_RETRIES = int(os.getenv("CRAWLER_MAX_RETRIES", "2"))       # 403/429 后的最大重试次数
+CRAWLER_BACKOFF_BASE = float(os.getenv("CRAWLER_BACKOFF_BASE", "1"))   # 退避基数 (秒)，按 2^n 增长并加 ±50% 抖动
+CRAWLER_BACKOFF_MAX = float(os.getenv("CRAWLER_BACKOFF_MAX", "30"))    # 单次退避上限 (秒)
+CRAWLER_POOL_MAXSIZE = int(os.getenv("CRAWLER_POOL_MAXSIZE", "4"))     # 每个 host 的最大 Keep-Alive 连接数
+# 按 host 设置每秒请求上限 (收到 403/429 后减半，之后逐步恢复到此上限)，可用 CRAWLER_HOST_RPS 环境变量 (JSON) 覆盖
+CRAWLER_HOST_RPS = {
+    "suggestion.baidu.com": 4,
+    "suggest.1688.com": 2,
+    "suggest.taobao.com": 2,
+    "www.zhihu.com": 1.25,      # 知乎反爬严格 (原固定间隔 0.8s)
+    "trends.google.com": 3,
+}
+CRAWLER_HOST_RPS.update(_env_json("CRAWLER_HOST_RPS", {}))
 
 # 发布配置文件路径
 PUBLISH_CONFIG_FILE = os.path.join(PROJECT_ROOT, "publish_config.json")
@@ -0,0 +1,235 @@
+"""
+爬虫请求调度
+替代抓取函数里各自写死的 requests.get + time.sleep:
+- 每个 host 一个 requests.Session (Keep-Alive 连接池)
+- 每个 host 一个令牌桶 (CRAWLER_HOST_RPS 为上限)，不同 host 互不影响
+- 收到 403/429 时该 host 速率减半并抖动退避后重试，之后随成功请求逐步恢复 (步长 CRAWLER_RATE_INCREASE)
+- 按 host 统计成功率与延迟
+"""
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared import config
+from shared.rate_limiter import TokenBucket, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# 403 / 429 视为触发反爬或限流
+THROTTLE_STATUS = (403, 429)
+
+_local = threading.local()
+
+
+class CrawlDeadlineExceeded(Exception):
+    """等待请求配额会超过调用方设置的截止时间"""
+
+
+@contextmanager
+def crawl_deadline(deadline: float):
+    """
+    为当前线程的爬虫请求设置截止时间 (time.monotonic 时间点)
+
+    截止前轮不到配额的请求直接抛出 CrawlDeadlineExceeded，而不是排队到截止之后
+    """
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+class HostStats:
+    """单个 host 的请求统计"""
+
+    def __init__(self, window: int = 200):
+        self.requests = 0
+        self.ok = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latencies: deque = deque(maxlen=window)
+
+    def snapshot(self) -> Dict:
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        return {
+            "requests": self.requests,
+            "ok": self.ok,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "success_rate": round(self.ok / self.requests, 3) if self.requests else 0.0,
+            "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p95_latency": round(p95, 3),
+        }
+
+
+class CrawlScheduler:
+    """
+    按 host 调度的爬虫请求器 (线程安全)
+
+    用法:
+        crawler = get_crawler()
+        resp = crawler.get("https://suggest.taobao.com/sug?q=礼盒", headers=HEADERS, timeout=5)
+        crawler.print_stats()
+    """
+
+    def __init__(self, host_rps: Dict[str, float] = None, default_rps: float = None,
+                 burst: float = None, max_retries: int = None):
+        """
+        Args:
+            host_rps: 各 host 每秒请求上限 (默认 config.CRAWLER_HOST_RPS)
+            default_rps: 未配置 host 的每秒请求上限 (默认 config.CRAWLER_DEFAULT_RPS)
+            burst: 令牌桶容量 (默认 config.CRAWLER_BURST)
+            max_retries: 403/429 后的最大重试次数 (默认 config.CRAWLER_MAX_RETRIES)
+        """
+        self.host_rps = config.CRAWLER_HOST_RPS if host_rps is None else host_rps
+        self.default_rps = default_rps or config.CRAWLER_DEFAULT_RPS
+        self.burst = burst or config.CRAWLER_BURST
+        self.max_retries = config.CRAWLER_MAX_RETRIES if max_retries is None else max_retries
+        self._sessions: Dict[str, requests.Session] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.CRAWLER_POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                rps = float(self.host_rps.get(host, self.default_rps))
+                self._sessions[host] = session
+                # 配置的 rps 是上限: 从上限起步，被限流后减半，成功后线性恢复
+                self._buckets[host] = TokenBucket(
+                    rps, max(1.0, self.burst), rps / 8, rps, increase=config.CRAWLER_RATE_INCREASE
+                )
+                self._stats[host] = HostStats()
+            return self._sessions[host], self._buckets[host], self._stats[host]
+
+    def _wait_turn(self, bucket: TokenBucket, host: str):
+        # 先按截止时间判断再消耗令牌: 被跳过的任务不占用该 host 的配额
+        deadline = getattr(_local, "deadline", None)
+        max_wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+        wait = bucket.reserve(max_wait)
+        if max_wait is not None and wait > max_wait:
+            raise CrawlDeadlineExceeded(f"{host} 需等待 {wait:.1f}s，超过截止时间")
+        if wait > 0:
+            time.sleep(wait)
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """第 attempt 次重试前的退避秒数 (指数增长 + ±50% 抖动，避免多个线程同时重试)"""
+        delay = min(config.CRAWLER_BACKOFF_MAX, config.CRAWLER_BACKOFF_BASE * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求 (按 host 限速；403/429 时退避重试)
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: 透传给 requests.Session.request (headers / timeout / params ...)
+
+        Returns:
+            最后一次响应 (重试用尽时可能仍是 403/429，由调用方按状态码处理)
+        """
+        host = self.host_of(url)
+        session, bucket, stats = self._host_state(host)
+
+        attempt = 0
+        while True:
+            self._wait_turn(bucket, host)
+            started = time.monotonic()
+            try:
+                resp = session.request(method, url, **kwargs)
+            except requests.RequestException:
+                with self._lock:
+                    stats.requests += 1
+                    stats.errors += 1
+                raise
+
+            with self._lock:
+                stats.requests += 1
+                stats.latencies.append(time.monotonic() - started)
+                if resp.status_code in THROTTLE_STATUS:
+                    stats.throttled += 1
+                elif resp.status_code < 400:
+                    stats.ok += 1
+                else:
+                    stats.errors += 1
+
+            if resp.status_code not in THROTTLE_STATUS:
+                if resp.status_code < 400:
+                    bucket.on_success()
+                return resp
+
+            delay = parse_retry_after(resp.headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff_delay(attempt)
+            bucket.on_throttle(delay)
+            logger.debug(f"[Crawler] {host} 返回 {resp.status_code}，降速至 {bucket.rate:.2f} req/s，{delay:.1f}s 后重试")
+            if attempt >= self.max_retries:
+                return resp
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET 请求 (参数同 request)"""
+        return self.request("GET", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        获取各 host 的请求统计
+
+        Returns:
+            {host: {"requests", "ok", "errors", "throttled", "success_rate",
+                    "avg_latency", "p95_latency", "rate": 当前速率}}
+        """
+        with self._lock:
+            return {
+                host: {**stats.snapshot(), "rate": round(self._buckets[host].rate, 2)}
+                for host, stats in self._stats.items()
+            }
+
+    def print_stats(self):
+        """打印各 host 的请求统计"""
+        for host, stats in self.get_stats().items():
+            print(
+                f"   🌐 [{host}] {stats['requests']} 次请求，成功率 {stats['success_rate'] * 100:.0f}%，"
+                f"403/429 {stats['throttled']} 次，平均 {stats['avg_latency']:.2f}s / p95 {stats['p95_latency']:.2f}s，"
+                f"当前 {stats['rate']} req/s"
+            )
+
+
+# 全局爬虫调度器
+_global_crawler: Optional[CrawlScheduler] = None
+
+
+def get_crawler() -> CrawlScheduler:
+    """获取全局爬虫调度器（单例）"""
+    global _global_crawler
+
+    if _global_crawler is None:
+        _global_crawler = CrawlScheduler()
+
+    return _global_crawler
+
+
+def set_crawler(crawler: Optional[CrawlScheduler]):
+    """替换全局爬虫调度器 (用于测试)"""
+    global _global_crawler
+    _global_crawler = crawler
@@ -5,15 +5,24 @@
 """
 import requests
 import time
-from typing import List, Dict, Optional
+import threading
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Iterator, Optional
 from . import config
+from .write_behind import WriteBehindQueue
+from .pagination import iter_pages
+from .token_cache import get_token_cache
 
 
 class FeishuClient:
     """飞书多维表格客户端"""
     
-    # Token 有效期 2 小时，提前 5 分钟刷新
-    TOKEN_REFRESH_INTERVAL = 2 * 60 * 60 - 5 * 60  # 1小时55分钟
+    # batch_create / batch_update 单次请求最多 500 条记录
+    BATCH_LIMIT = 500
+    
+    # 所有 FeishuClient 实例共享的连接池 (Keep-Alive，避免每次请求重新握手)
+    _session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
     
     def __init__(self):
         self.app_id = config.FEISHU_APP_ID
@@ -21,38 +30,85 @@ class FeishuClient:
         self.base_id = config.FEISHU_BASE_ID
         self.table_id = config.FEISHU_TABLE_ID
         self.token = None
-        self.token_acquired_at = 0
-        self._refresh_token()
+        self.token_expires_at = 0
+        # 优先复用 .cache 中其他进程 / 上一个 Step 获取的 Token
+        self._load_token()
+        # 读取任何记录前先写回上次进程未写回的更新
+        self._replay_pending_updates()
     
-    def _refresh_token(self) -> bool:
-        """刷新 Token"""
-        token = self._get_tenant_access_token()
-        if token:
-            self.token = token
-            self.token_acquired_at = time.time()
+    @classmethod
+    def _http(cls) -> requests.Session:
+        """获取共享的 requests.Session (线程安全，连接池大小同 LLM_POOL_*)"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=config.LLM_POOL_CONNECTIONS,
+                        pool_maxsize=config.LLM_POOL_MAXSIZE
+                    )
+                    session.mount("https://", adapter)
+                    cls._session = session
+        return cls._session
+    
+    def _post_json(self, url: str, payload: Dict, retry: bool = True) -> Dict:
+        """
+        POST 并解析响应 JSON；Token 失效时刷新后重试一次
+        
+        网络异常直接抛出，由调用方决定如何处理
+        """
+        data = self._http().post(url, headers=self._headers(), json=payload, timeout=30).json()
+        if retry and data.get("code") != 0 and "token" in str(data.get("msg", "")).lower():
+            print("   🔄 Token 失效，尝试刷新后重试...")
+            if self._refresh_token():
+                return self._post_json(url, payload, retry=False)
+        return data
+    
+    def _load_token(self, stale_token: str = None) -> bool:
+        """
+        从跨进程 Token 缓存获取 Token
+        
+        缓存中的 Token 有效时不发请求 (临近过期由缓存在后台刷新)；
+        只有没有可用 Token 时才同步请求飞书鉴权接口。
+        
+        Args:
+            stale_token: 已被服务端判定失效的 Token (强制换新)
+        """
+        entry = get_token_cache().get_or_fetch(
+            f"feishu:{self.app_id}", self._get_tenant_access_token, stale_token=stale_token
+        )
+        if entry:
+            self.token, self.token_expires_at = entry
             return True
         return False
     
+    def _refresh_token(self) -> bool:
+        """刷新 Token (当前 Token 被服务端拒绝时调用)"""
+        return self._load_token(stale_token=self.token)
+    
     def _ensure_valid_token(self) -> bool:
-        """确保 Token 有效，必要时自动刷新"""
-        elapsed = time.time() - self.token_acquired_at
-        if not self.token or elapsed >= self.TOKEN_REFRESH_INTERVAL:
-            print("🔄 Token 即将过期，正在刷新...")
-            return self._refresh_token()
-        return True
+        """确保 Token 有效: 进入刷新窗口后从缓存取最新 Token，只有已过期时才会阻塞等待鉴权"""
+        if self.token and time.time() < self.token_expires_at - config.FEISHU_TOKEN_REFRESH_MARGIN:
+            return True
+        return self._load_token()
     
-    def _get_tenant_access_token(self) -> Optional[str]:
-        """获取租户访问令牌"""
+    def _get_tenant_access_token(self) -> Optional[tuple]:
+        """
+        获取租户访问令牌
+        
+        Returns:
+            (tenant_access_token, 有效秒数)，失败返回 None
+        """
         url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
         try:
-            resp = requests.post(url, json={
+            resp = self._http().post(url, json={
                 "app_id": self.app_id,
                 "app_secret": self.app_secret
             }, timeout=30)
             data = resp.json()
             if data.get("code") == 0:
                 print("✅ 飞书鉴权成功")
-                return data.get("tenant_access_token")
+                return data.get("tenant_access_token"), data.get("expire", 7200)
             else:
                 print(f"❌ 飞书鉴权失败: {data}")
                 return None
@@ -66,7 +122,91 @@ class FeishuClient:
             "Content-Type": "application/json; charset=utf-8"
         }
     
-    def fetch_records_by_status(self, status: str, category: str = None, limit: int = 2) -> List[Dict]:
+    @staticmethod
+    def _parse_field_value(field_value) -> str:
+        """处理飞书富文本/单选字段"""
+        if not field_value:
+            return ""
+        if isinstance(field_value, str):
+            return field_value
+        if isinstance(field_value, list) and len(field_value) > 0:
+            first = field_value[0]
+            if isinstance(first, dict):
+                return first.get("text", "")
+            return str(first)
+        if isinstance(field_value, dict):
+            return field_value.get("text", str(field_value))
+        return str(field_value)
+    
+    def _parse_record(self, item: Dict) -> Dict:
+        """search 接口返回的 item -> 业务记录"""
+        parse_field_value = self._parse_field_value
+        fields = item.get("fields", {})
+        topic_field = fields.get("Topic", [])
+        
+        if isinstance(topic_field, list) and len(topic_field) > 0:
+            topic = topic_field[0].get("text", "") if isinstance(topic_field[0], dict) else str(topic_field[0])
+        else:
+            topic = str(topic_field) if topic_field else ""
+        
+        # 处理分类字段
+        category_raw = fields.get("大项分类", "行业资讯")
+        category = parse_field_value(category_raw)
+        return {
+            "record_id": item.get("record_id"),
+            "topic": topic,
+            "category": category,
+            "title": parse_field_value(fields.get("Title", "")),
+            "html_content": parse_field_value(fields.get("HTML_Content", "")),
+            "summary": parse_field_value(fields.get("摘要", "")),
+            "keywords": parse_field_value(fields.get("关键词", "")),
+            "description": parse_field_value(fields.get("描述", "")),
+            "tags": parse_field_value(fields.get("Tags", "")),
+            # 新增字段 (GEO 优化) - 文本类型，存储 JSON 字符串
+            "schema_faq": parse_field_value(fields.get("Schema_FAQ", "")),
+            "one_line_summary": parse_field_value(fields.get("One_Line_Summary", "")),
+            "key_points": parse_field_value(fields.get("Key_Points", "")),
+            "url": parse_field_value(fields.get("URL", "")),
+            "published_at": parse_field_value(fields.get("发布时间", "")),
+            "xhs_status": parse_field_value(fields.get("XHS_Status", "")), # 新增状态字段
+        }
+    
+    def _search_page(self, status: str, category: str = None, page_size: int = 100,
+                     columns: List[str] = None, page_token: str = None) -> tuple:
+        """
+        调用 records/search 拉取一页
+        
+        Returns:
+            (items, 下一页 page_token (没有更多时为 None), total)
+        
+        Raises:
+            RuntimeError: 接口返回错误码
+        """
+        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{self.table_id}/records/search"
+        
+        conditions = [{"field_name": "Status", "operator": "is", "value": [status]}]
+        if category:
+            conditions.append({"field_name": "大项分类", "operator": "is", "value": [category]})
+        
+        payload = {"filter": {"conjunction": "and", "conditions": conditions}}
+        if columns:
+            payload["field_names"] = list(columns)
+        # page_size / page_token 是查询参数 (单页最多 500 条)
+        params = {"page_size": max(1, min(page_size, 500))}
+        if page_token:
+            params["page_token"] = page_token
+        
+        resp = self._http().post(url, headers=self._headers(), params=params, json=payload, timeout=30)
+        data = resp.json()
+        if data.get("code") != 0:
+            raise RuntimeError(data.get("msg"))
+        
+        body = data.get("data", {})
+        next_token = body.get("page_token") if body.get("has_more") else None
+        return body.get("items") or [], next_token, body.get("total", 0)
+    
+    def fetch_records_by_status(self, status: str, category: str = None, limit: int = 2,
+                                columns: List[str] = None) -> List[Dict]:
         """
         获取指定状态的记录
         
@@ -74,86 +214,66 @@ class FeishuClient:
             status: 状态 (Pending/Ready/Published)
             category: 可选分类筛选
             limit: 最大条数
+            columns: 只返回指定字段 (field_names)，None 表示全部字段
         """
         if not self._ensure_valid_token():
             return []
         
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{self.table_id}/records/search"
+        results, page_token, total = [], None, 0
+        try:
+            while len(results) < limit:
+                items, page_token, total = self._search_page(
+                    status, category, limit - len(results), columns, page_token
+                )
+                results.extend(self._parse_record(item) for item in items[:limit - len(results)])
+                if not page_token:
+                    break
+        except RuntimeError as e:
+            print(f"⚠️ 获取记录失败: {e}")
+            return []
+        except Exception as e:
+            print(f"⚠️ 获取记录网络错误: {e}")
+            return []
         
-        conditions = [{"field_name": "Status", "operator": "is", "value": [status]}]
-        if category:
-            conditions.append({"field_name": "大项分类", "operator": "is", "value": [category]})
+        filter_desc = f"{category or '全部'}"
+        print(f"   📋 [{filter_desc}] 获取 {len(results)} 条 {status} 记录 (共 {total} 条)")
+        return results
+    
+    def iter_records_by_status(self, status: str, category: str = None, page_size: int = 100,
+                               limit: int = None, columns: List[str] = None, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        逐页产出指定状态的记录 (按 page_token 翻页，调用方处理当前页时后台预取下一页)
         
-        payload = {
-            "filter": {"conjunction": "and", "conditions": conditions},
-            "page_size": limit
-        }
+        注意: 迭代过程中修改了筛选字段 (如 Status) 的记录会让服务端分页发生偏移，
+        边迭代边改状态时建议配合 queue_update (批量写回) 或先取完再处理。
+        
+        Args:
+            status: 状态
+            category: 可选分类筛选
+            page_size: 每页条数 (最多 500)
+            limit: 最大条数，None 表示全部
+            columns: 只返回指定字段
+            prefetch: 是否后台预取下一页
         
+        Yields:
+            记录 (格式同 fetch_records_by_status)
+        """
+        if not self._ensure_valid_token():
+            return
+        
+        def fetch_page(page_token):
+            items, next_token, _ = self._search_page(status, category, page_size, columns, page_token)
+            return [self._parse_record(item) for item in items], next_token
+        
+        count = 0
         try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=30)
-            data = resp.json()
-            
-            if data.get("code") != 0:
-                print(f"⚠️ 获取记录失败: {data.get('msg')}")
-                return []
-            
-            items = data.get("data", {}).get("items", [])[:limit]
-            results = []
-            
-            for item in items:
-                fields = item.get("fields", {})
-                topic_field = fields.get("Topic", [])
-                
-                if isinstance(topic_field, list) and len(topic_field) > 0:
-                    topic = topic_field[0].get("text", "") if isinstance(topic_field[0], dict) else str(topic_field[0])
-                else:
-                    topic = str(topic_field) if topic_field else ""
-                
-                # 定义辅助函数：处理飞书富文本/单选字段
-                def parse_field_value(field_value):
-                    if not field_value:
-                        return ""
-                    if isinstance(field_value, str):
-                        return field_value
-                    if isinstance(field_value, list) and len(field_value) > 0:
-                        first = field_value[0]
-                        if isinstance(first, dict):
-                            return first.get("text", "")
-                        return str(first)
-                    if isinstance(field_value, dict):
-                        return field_value.get("text", str(field_value))
-                    return str(field_value)
-
-                # 处理分类字段
-                category_raw = fields.get("大项分类", "行业资讯")
-                category = parse_field_value(category_raw)
-                results.append({
-                    "record_id": item.get("record_id"),
-                    "topic": topic,
-                    "category": category,
-                    "title": parse_field_value(fields.get("Title", "")),
-                    "html_content": parse_field_value(fields.get("HTML_Content", "")),
-                    "summary": parse_field_value(fields.get("摘要", "")),
-                    "keywords": parse_field_value(fields.get("关键词", "")),
-                    "description": parse_field_value(fields.get("描述", "")),
-                    "tags": parse_field_value(fields.get("Tags", "")),
-                    # 新增字段 (GEO 优化) - 文本类型，存储 JSON 字符串
-                    "schema_faq": parse_field_value(fields.get("Schema_FAQ", "")),
-                    "one_line_summary": parse_field_value(fields.get("One_Line_Summary", "")),
-                    "key_points": parse_field_value(fields.get("Key_Points", "")),
-                    "url": parse_field_value(fields.get("URL", "")),
-                    "published_at": parse_field_value(fields.get("发布时间", "")),
-                    "xhs_status": parse_field_value(fields.get("XHS_Status", "")), # 新增状态字段
-                })
-            
-            total = data.get("data", {}).get("total", 0)
-            filter_desc = f"{category or '全部'}"
-            print(f"   📋 [{filter_desc}] 获取 {len(results)} 条 {status} 记录 (共 {total} 条)")
-            return results
-            
+            for record in iter_pages(fetch_page, None, prefetch=prefetch):
+                yield record
+                count += 1
+                if limit is not None and count >= limit:
+                    return
         except Exception as e:
-            print(f"⚠️ 获取记录网络错误: {e}")
-            return []
+            print(f"⚠️ 分页获取记录失败 (已获取 {count} 条): {e}")
     
     def update_record(self, record_id: str, fields: Dict, retry: bool = True) -> bool:
         """
@@ -170,7 +290,7 @@ class FeishuClient:
         url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{self.table_id}/records/{record_id}"
         
         try:
-            resp = requests.put(url, headers=self._headers(), json={"fields": fields}, timeout=30)
+            resp = self._http().put(url, headers=self._headers(), json={"fields": fields}, timeout=30)
             data = resp.json()
             
             if data.get("code") == 0:
@@ -191,6 +311,88 @@ class FeishuClient:
             print(f"   ⚠️ 更新网络错误: {e}")
             return False
     
+    # ---------- Write-Behind 批量写回 ----------
+    
+    def _get_write_queue(self) -> WriteBehindQueue:
+        queue = getattr(self, "_write_queue", None)
+        if queue is None:
+            queue = self._write_queue = WriteBehindQueue(f"feishu_{self.table_id}", flush_func=self._flush_updates)
+        return queue
+    
+    def _replay_pending_updates(self):
+        """
+        立即写回上次进程崩溃 / 被杀时留在日志中的更新
+
+        必须在读取记录之前完成: 否则已发布但未写回 "Published" 的记录仍是 Pending，会被重复发布
+        """
+        if not config.SHEET_WRITE_BEHIND_ENABLED:
+            return
+        queue = self._get_write_queue()
+        if len(queue):
+            queue.flush()
+
+    def queue_update(self, record_id: str, fields: Dict) -> bool:
+        """
+        异步更新记录: 加入 Write-Behind 队列，同一记录的多次更新合并后批量写回
+        
+        未开启 SHEET_WRITE_BEHIND_ENABLED 时等同于 update_record
+        """
+        if not config.SHEET_WRITE_BEHIND_ENABLED:
+            return self.update_record(record_id, fields)
+        self._get_write_queue().put(record_id, fields)
+        return True
+    
+    def flush_updates(self) -> int:
+        """立即写回队列中的所有更新，返回成功写回的记录数"""
+        queue = getattr(self, "_write_queue", None)
+        return queue.flush() if queue is not None else 0
+    
+    def _flush_updates(self, updates: Dict[str, Dict]) -> List[str]:
+        """WriteBehindQueue 的写回函数 (网络异常直接抛出: 队列保留整批更新，下次重试)"""
+        if not self._ensure_valid_token():
+            raise RuntimeError("飞书 Token 不可用")
+        return self.batch_update_records(updates, raise_on_error=True)
+    
+    def batch_update_records(self, updates: Dict[str, Dict], table_id: str = None,
+                             raise_on_error: bool = False) -> List[str]:
+        """
+        批量更新记录: 按 500 条一批调用 records/batch_update
+        
+        批量请求被拒绝 (如某条记录字段类型不符) 时逐条回退到 update_record，定位失败的记录。
+        
+        Args:
+            updates: {record_id: fields}
+            table_id: 数据表 ID (默认 config.FEISHU_TABLE_ID)
+            raise_on_error: 网络异常时抛出 (默认视为该批全部失败)
+        
+        Returns:
+            更新失败的 record_id 列表
+        """
+        target_table_id = table_id if table_id else self.table_id
+        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{target_table_id}/records/batch_update"
+        items = list(updates.items())
+        failed = []
+        for i in range(0, len(items), self.BATCH_LIMIT):
+            chunk = items[i:i + self.BATCH_LIMIT]
+            payload = {"records": [{"record_id": rid, "fields": fields} for rid, fields in chunk]}
+            try:
+                data = self._post_json(url, payload)
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                print(f"   ⚠️ 批量更新网络错误: {e}")
+                failed.extend(rid for rid, _ in chunk)
+                continue
+            if data.get("code") == 0:
+                continue
+            
+            print(f"   ⚠️ 批量更新失败: {data.get('msg')}，逐条重试...")
+            if target_table_id != self.table_id:
+                failed.extend(rid for rid, _ in chunk)
+                continue
+            failed.extend(rid for rid, fields in chunk if not self.update_record(rid, fields))
+        return failed
+    
     def create_record(self, fields: Dict, table_id: str = None) -> Optional[str]:
         """创建单条记录"""
         target_table_id = table_id if table_id else self.table_id
@@ -198,7 +400,7 @@ class FeishuClient:
         url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{target_table_id}/records"
         
         try:
-            resp = requests.post(url, headers=self._headers(), json={"fields": fields}, timeout=30)
+            resp = self._http().post(url, headers=self._headers(), json={"fields": fields}, timeout=30)
             data = resp.json()
             if data.get("code") == 0:
                 return data.get("data", {}).get("record", {}).get("record_id")
@@ -209,26 +411,51 @@ class FeishuClient:
             return None
 
     def batch_create_records(self, records: List[Dict], table_id: str = None) -> bool:
-        """批量创建记录"""
-        if not self.token or not records:
+        """
+        批量创建记录 (按 500 条一批调用 records/batch_create)
+        
+        Returns:
+            全部批次成功返回 True (需要重试部分失败时使用 batch_create_partial)
+        """
+        if not records:
             return False
+        return not self.batch_create_partial(records, table_id)
+    
+    def batch_create_partial(self, records: List[Dict], table_id: str = None) -> List[Dict]:
+        """
+        批量创建记录，返回创建失败的记录
+        
+        某一批失败不影响其余批次；调用方只需重试返回的记录，已成功的批次不会被重复创建。
+        
+        Returns:
+            创建失败的记录列表 (全部成功为空列表)
+        """
+        if not records:
+            return []
+        if not self._ensure_valid_token():
+            return list(records)
         
         target_table_id = table_id if table_id else self.table_id
         url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{self.base_id}/tables/{target_table_id}/records/batch_create"
         
-        payload_records = [{"fields": r} for r in records]
+        failed = []
         
-        try:
-            resp = requests.post(url, headers=self._headers(), json={"records": payload_records[:50]}, timeout=30)
-            if resp.json().get("code") == 0:
-                print(f"   ✅ 成功上传 {len(payload_records[:50])} 条记录")
-                return True
-            else:
-                print(f"   ❌ 上传失败: {resp.text}")
-                return False
-        except Exception as e:
-            print(f"   ⚠️ 上传网络错误: {e}")
-            return False
+        for i in range(0, len(records), self.BATCH_LIMIT):
+            chunk = records[i:i + self.BATCH_LIMIT]
+            try:
+                data = self._post_json(url, {"records": [{"fields": r} for r in chunk]})
+            except Exception as e:
+                print(f"   ⚠️ 上传网络错误: {e}")
+                failed.extend(chunk)
+                continue
+            if data.get("code") != 0:
+                print(f"   ❌ 上传失败 (第 {i // self.BATCH_LIMIT + 1} 批): {data.get('msg')}")
+                failed.extend(chunk)
+        
+        created = len(records) - len(failed)
+        if created:
+            print(f"   ✅ 成功上传 {created}/{len(records)} 条记录")
+        return failed
     
     def send_notification(self, title: str, content: str) -> bool:
         """
@@ -256,7 +483,7 @@ class FeishuClient:
                     ]
                 }
             }
-            resp = requests.post(webhook_url, json=payload, timeout=10)
+            resp = self._http().post(webhook_url, json=payload, timeout=10)
             if resp.status_code == 200:
                 print(f"   📨 飞书通知已发送: {title}")
                 return True
@@ -5,13 +5,24 @@ Google Sheets 客户端
 支持多工作表 (cms, xhs) 动态切换
 """
 import os
+import re
 import json
 import time
 import uuid
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterator, Optional, Any
 from . import config
+from .write_behind import WriteBehindQueue
+from .sheets_quota import get_sheets_quota, READ, WRITE
+from .pagination import iter_pages
+
+# 单次 batch_get 请求包含的最大区间数 (ranges 以查询参数传递，过多会超出 URL 长度限制)
+BATCH_GET_CHUNK = 100
+
+# 持久化的记录 ID 列: 创建时写入 UUID，之后不再变化 (行号会因插入/删除行而改变)
+RECORD_ID_COLUMN = "Record_ID"
+
 
 class GoogleSheetClient:
     """Google Sheets 客户端"""
@@ -26,9 +37,12 @@ class GoogleSheetClient:
         
         self.client = None
         self.spreadsheet = None
+        self.refresh_schema()
         
         # 总是尝试连接（_connect 内部会优先检查环境变量，再检查文件）
         self._connect()
+        # 读取任何记录前先写回上次进程未写回的更新
+        self._replay_pending_updates()
 
     def _connect(self):
         """连接到 Google Spreadsheet"""
@@ -65,9 +79,13 @@ class GoogleSheetClient:
 
             # print("🔐 正在进行 gspread 认证...")
             self.client = gspread.authorize(creds)
+            # Sheets API 配额按用户 (服务账号) 计算
+            self.quota_user = getattr(creds, "service_account_email", None) or "default"
             
             if self.sheet_id:
+                self._throttle(READ)
                 self.spreadsheet = self.client.open_by_key(self.sheet_id)
+                self.refresh_schema()
                 print(f"✅ Google Spreadsheet 连接成功: {self.spreadsheet.title}")
             
         except Exception as e:
@@ -77,6 +95,10 @@ class GoogleSheetClient:
             traceback.print_exc()
             self.client = None
 
+    def _throttle(self, kind: str):
+        """发起 Sheets API 请求前占用配额 (窗口已满时排队等待，见 shared/sheets_quota.py)"""
+        get_sheets_quota().acquire(kind, getattr(self, "quota_user", "default"))
+
     def _get_sheet(self, table_id: str = None):
         """
         根据 table_id (即 worksheet name) 获取 Worksheet 对象
@@ -85,32 +107,97 @@ class GoogleSheetClient:
         if not self.spreadsheet: return None
         
         target_name = table_id if table_id else "cms"
+        if target_name in self._sheets:
+            return self._sheets[target_name]
         
         try:
-            return self.spreadsheet.worksheet(target_name)
+            self._throttle(READ)
+            sheet = self.spreadsheet.worksheet(target_name)
+            self._sheets[target_name] = sheet
+            return sheet
         except gspread.WorksheetNotFound:
             print(f"⚠️ 工作表 '{target_name}' 不存在，尝试创建...")
             try:
                 # 创建新表
+                self._throttle(WRITE)
                 new_sheet = self.spreadsheet.add_worksheet(title=target_name, rows=100, cols=20)
                 # 初始化表头 (根据不同表结构)
                 if target_name == "xhs":
                     # Aligned with step4_social/agent_runner.py
-                    headers = ["Title", "Content", "Keywords", "Source", "Status", "Cover", "生成时间", "XHS_Link", "Post_Date"]
+                    headers = ["Title", "Content", "Keywords", "Source", "Status", "Cover", "生成时间", "XHS_Link", "Post_Date",
+                               RECORD_ID_COLUMN]
                 else:
                     # Aligned with all steps
                     headers = [
                         "Topic", "Status", "大项分类", "Source_Trend", "Title", "HTML_Content", 
                         "摘要", "关键词", "描述", "Tags", "Schema_FAQ", "One_Line_Summary",
-                        "Key_Points", "URL", "发布时间", "XHS_Status", "选题生成时间", "生成时间"
+                        "Key_Points", "URL", "发布时间", "XHS_Status", "选题生成时间", "生成时间",
+                        RECORD_ID_COLUMN
                     ]
+                self._throttle(WRITE)
                 new_sheet.append_row(headers)
                 print(f"✅ 已创建并初始化工作表: {target_name}")
+                self._sheets[target_name] = new_sheet
+                self._headers[new_sheet.title] = (headers, self._index_headers(headers))
                 return new_sheet
             except Exception as e:
                 print(f"❌ 创建工作表失败: {e}")
                 return None
 
+    def refresh_schema(self, table_id: str = None):
+        """
+        清除工作表对象、表头与记录 ID 索引缓存 (表结构变更 / 手工插入删除行后调用)
+
+        Args:
+            table_id: 只清除指定工作表，None 表示全部
+        """
+        if table_id is None:
+            self._sheets: Dict[str, Any] = {}
+            self._headers: Dict[str, tuple] = {}
+            self._unknown_fields: Dict[str, set] = {}
+            self._record_index: Dict[str, Dict[str, int]] = {}
+            return
+        sheet = self._sheets.pop(table_id, None)
+        title = sheet.title if sheet else table_id
+        self._headers.pop(title, None)
+        self._unknown_fields.pop(title, None)
+        self._record_index.pop(title, None)
+
+    def _get_header_map(self, sheet, refresh: bool = False) -> tuple:
+        """
+        获取表头 (带缓存)
+
+        Returns:
+            (表头列表, {列名: 列号 (从 1 开始)})
+        """
+        if refresh or sheet.title not in self._headers:
+            self._throttle(READ)
+            headers = sheet.row_values(1)
+            self._headers[sheet.title] = (headers, self._index_headers(headers))
+        return self._headers[sheet.title]
+
+    @staticmethod
+    def _index_headers(headers: List[str]) -> Dict[str, int]:
+        """{列名: 列号}，重名列取第一个"""
+        return {h: i + 1 for i, h in reversed(list(enumerate(headers))) if h}
+
+    def _get_headers(self, sheet, fields=None) -> List[str]:
+        """
+        获取表头列表
+
+        fields 中出现缓存表头里没有的字段时重新读取一次表头 (可能刚新增了列)；
+        同一字段只复查一次，避免 created_at 之类本就不在表中的字段每次都触发读取。
+        """
+        cached = sheet.title in self._headers
+        headers, index = self._get_header_map(sheet)
+        checked = self._unknown_fields.setdefault(sheet.title, set())
+        unknown = {k for k in (fields or ()) if k not in index and k not in checked}
+        if unknown:
+            checked.update(unknown)
+            if cached:
+                headers, index = self._get_header_map(sheet, refresh=True)
+        return headers
+
     def _retry_on_api_error(func):
         """
         装饰器：API 调用失败自动重试
@@ -139,9 +226,17 @@ class GoogleSheetClient:
                     elif "104" in error_str or "Connection reset" in error_str: # Connection errors
                         is_retryable = True
                         
+                    # 表结构相关错误 (区间越界 / 工作表不存在): 清除缓存，下次重新读取表头
+                    if "exceeds grid limits" in error_str or "Unable to parse range" in error_str \
+                            or isinstance(e, gspread.WorksheetNotFound):
+                        self.refresh_schema()
+
                     if is_retryable:
                         if attempt < max_retries - 1:
                             sleep_time = base_delay * (2 ** attempt) # 指数退避: 2, 4, 8, 16...
+                            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
+                                # 配额已耗尽: 同一用户的其他调用也一起暂停，而不是各自撞限流
+                                get_sheets_quota().on_throttle(sleep_time, getattr(self, "quota_user", "default"))
                             print(f"   ⚠️ Google API 临时错误 ({e})，将在 {sleep_time}秒 后重试 ({attempt + 1}/{max_retries})...")
                             time.sleep(sleep_time)
                             
@@ -153,7 +248,9 @@ class GoogleSheetClient:
                     
                     # 不可重试或重试耗尽，抛出异常或返回默认值避免崩溃
                     print(f"❌ Google API 调用失败 (已重试 {attempt} 次): {e}")
-                    if "fetch" in func.__name__:
+                    if "count" in func.__name__:
+                        return 0
+                    elif "fetch" in func.__name__:
                         return []
                     elif "update" in func.__name__ or "create" in func.__name__:
                         return False
@@ -161,42 +258,294 @@ class GoogleSheetClient:
             return None
         return wrapper
 
+    @staticmethod
+    def _column_letter(col: int) -> str:
+        """列号 (从 1 开始) -> 列字母 (A, B, ..., AA)"""
+        return gspread.utils.rowcol_to_a1(1, col)[:-1]
+
+    @staticmethod
+    def _runs(numbers: List[int]) -> List[tuple]:
+        """把有序整数列表合并为连续区间 [(start, end), ...]"""
+        runs = []
+        for n in numbers:
+            if runs and n == runs[-1][1] + 1:
+                runs[-1] = (runs[-1][0], n)
+            else:
+                runs.append((n, n))
+        return runs
+
+    def _batch_get(self, sheet, ranges: List[str], **kwargs) -> list:
+        """分批执行 batch_get (避免请求 URL 过长)，返回与 ranges 对齐的结果"""
+        results = []
+        for i in range(0, len(ranges), BATCH_GET_CHUNK):
+            self._throttle(READ)
+            results.extend(sheet.batch_get(ranges[i:i + BATCH_GET_CHUNK], **kwargs))
+        return results
+
+    def _read_columns(self, sheet, headers: List[str], names: List[str]) -> Dict[str, List[str]]:
+        """只读取指定列 (不含表头)，返回 {列名: [第2行起的值]}"""
+        ranges = []
+        for name in names:
+            letter = self._column_letter(headers.index(name) + 1)
+            ranges.append(f"{letter}2:{letter}")
+        values = self._batch_get(sheet, ranges, major_dimension="COLUMNS")
+        return {name: (vr[0] if vr else []) for name, vr in zip(names, values)}
+
+    def _read_rows(self, sheet, headers: List[str], row_nums: List[int], columns: List[str] = None) -> Dict[int, Dict]:
+        """
+        只读取指定行 (及指定列)
+
+        Args:
+            row_nums: 行号列表 (升序)
+            columns: 列投影，None 表示全部列
+
+        Returns:
+            {行号: {列名: 值}}
+        """
+        if columns:
+            col_nums = sorted(headers.index(c) + 1 for c in set(columns) if c in headers)
+        else:
+            col_nums = list(range(1, len(headers) + 1))
+        if not col_nums or not row_nums:
+            return {}
+
+        blocks = [
+            (r1, r2, c1, c2)
+            for r1, r2 in self._runs(row_nums)
+            for c1, c2 in self._runs(col_nums)
+        ]
+        ranges = [f"{self._column_letter(c1)}{r1}:{self._column_letter(c2)}{r2}" for r1, r2, c1, c2 in blocks]
+        values = self._batch_get(sheet, ranges)
+
+        rows: Dict[int, Dict] = {}
+        for (r1, r2, c1, c2), block in zip(blocks, values):
+            for offset, row_num in enumerate(range(r1, r2 + 1)):
+                cells = block[offset] if offset < len(block) else []
+                cells = gspread.utils.numericise_all(list(cells), default_blank="")
+                record = rows.setdefault(row_num, {})
+                for c in range(c1, c2 + 1):
+                    idx = c - c1
+                    record[headers[c - 1]] = cells[idx] if idx < len(cells) else ""
+        return rows
+
+    def _match_rows(self, sheet, status: str, category: str = None, limit: int = None) -> List[int]:
+        """只读取 Status (及分类) 列，返回命中的行号 (升序，最多 limit 个)"""
+        headers = self._get_headers(sheet, ["Status"])
+        if "Status" not in headers:
+            print(f"   ⚠️ [GoogleSheet:{sheet.title}] 表头缺少 Status 列")
+            return []
+
+        filter_cols = ["Status"] + (["大项分类"] if category and "大项分类" in headers else [])
+        filter_values = self._read_columns(sheet, headers, filter_cols)
+        statuses = filter_values["Status"]
+        categories = filter_values.get("大项分类", [])
+
+        row_nums = []
+        for i, value in enumerate(statuses):
+            if str(value) != status:
+                continue
+            if category and (categories[i] if i < len(categories) else "") != category:
+                continue
+            row_nums.append(i + 2)
+            if limit is not None and len(row_nums) >= limit:
+                break
+        return row_nums
+
+    def _build_records(self, sheet, row_nums: List[int], columns: List[str] = None) -> List[Dict]:
+        """只拉取指定行 (及投影列，始终带上记录 ID 列)，按 row_nums 顺序返回记录"""
+        headers, _ = self._get_header_map(sheet)
+        has_id = RECORD_ID_COLUMN in headers
+        read_cols = list(columns) + [RECORD_ID_COLUMN] if columns and has_id else columns
+        rows = self._read_rows(sheet, headers, row_nums, read_cols)
+        index = self._record_index.get(sheet.title)
+        results = []
+        for row_num in row_nums:
+            row = rows.get(row_num, {})
+            record_key = str(row.get(RECORD_ID_COLUMN, "")) if has_id else ""
+            if columns and RECORD_ID_COLUMN not in columns:
+                row.pop(RECORD_ID_COLUMN, None)
+            if record_key:
+                row["record_id"] = record_key
+                if index is not None:
+                    index[record_key] = row_num
+            else:
+                # 旧数据没有记录 ID: 退回行号 (插入/删除行后会失效)
+                row["record_id"] = f"row:{row_num}"
+            results.append(row)
+        return results
+
     @_retry_on_api_error
-    def fetch_records_by_status(self, status: str, category: str = None, limit: int = 50) -> List[Dict]:
+    def fetch_records_by_status(self, status: str, category: str = None, limit: int = 50,
+                                columns: List[str] = None) -> List[Dict]:
         """
         获取指定状态的记录
         兼容 FeishuClient 接口
+
+        服务端筛选: 先只读取 Status (及分类) 列算出命中行号，再只拉取这些行，
+        避免每次下载整张表 (尤其是体积很大的 HTML_Content 列)。
+
+        Args:
+            status: 状态 (Ready/Pending/Published)
+            category: 可选分类筛选
+            limit: 最大条数
+            columns: 列投影 (如 ["Topic", "大项分类"])，None 表示返回全部列
         """
         # 注意：此方法默认针对 CMS 主表
         sheet = self._get_sheet("cms")
         if not sheet: return []
         
         # 不要在这里 try-except 掩盖错误，交给装饰器处理
-        all_records = sheet.get_all_records()
-        results = []
-        
-        for i, row in enumerate(all_records):
-            # 没有 record_id 列了，直接使用 row_index
-            row_num = i + 2
-            rec_id = f"row:{row_num}"
-            
-            # 注入临时 record_id 用于更新
-            row["record_id"] = rec_id
-            
-            # 筛选逻辑
-            if str(row.get("Status")) == status:
-                if category:
-                    if str(row.get("大项分类")) == category:
-                        results.append(row)
-                else:
-                    results.append(row)
-                    
-            if len(results) >= limit:
-                break
+        row_nums = self._match_rows(sheet, status, category, limit)
+        results = self._build_records(sheet, row_nums, columns)
                 
         print(f"   📋 [GoogleSheet:cms] 获取 {len(results)} 条 {status} 记录")
         return results
 
+    @_retry_on_api_error
+    def _fetch_matching_rows(self, sheet, status: str, category: str = None, limit: int = None) -> List[int]:
+        return self._match_rows(sheet, status, category, limit)
+
+    @_retry_on_api_error
+    def _fetch_records_page(self, sheet, row_nums: List[int], columns: List[str] = None) -> List[Dict]:
+        return self._build_records(sheet, row_nums, columns)
+
+    def iter_records_by_status(self, status: str, category: str = None, page_size: int = 50,
+                               limit: int = None, columns: List[str] = None, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        逐页产出指定状态的记录 (兼容 FeishuClient 接口)
+
+        先读取一次 Status 列确定命中行，再按 page_size 行一页拉取；
+        调用方处理当前页时后台预取下一页，内存中最多两页。
+
+        Args:
+            status: 状态
+            category: 可选分类筛选
+            page_size: 每页行数
+            limit: 最大条数，None 表示全部
+            columns: 列投影
+            prefetch: 是否后台预取下一页
+
+        Yields:
+            记录 (格式同 fetch_records_by_status)
+        """
+        sheet = self._get_sheet("cms")
+        if not sheet: return
+        row_nums = self._fetch_matching_rows(sheet, status, category, limit)
+        pages = [row_nums[i:i + page_size] for i in range(0, len(row_nums), max(1, page_size))]
+        if not pages: return
+
+        def fetch_page(i):
+            return self._fetch_records_page(sheet, pages[i], columns), (i + 1 if i + 1 < len(pages) else None)
+
+        yield from iter_pages(fetch_page, 0, prefetch=prefetch)
+
+    def _get_record_index(self, sheet, refresh: bool = False) -> Dict[str, int]:
+        """
+        记录 ID -> 行号 索引 (一次读取 Record_ID 列构建，追加行时增量维护)
+        """
+        if refresh or sheet.title not in self._record_index:
+            headers = self._get_headers(sheet, [RECORD_ID_COLUMN])
+            index = {}
+            if RECORD_ID_COLUMN in headers:
+                ids = self._read_columns(sheet, headers, [RECORD_ID_COLUMN])[RECORD_ID_COLUMN]
+                index = {str(v): i + 2 for i, v in enumerate(ids) if v}
+            self._record_index[sheet.title] = index
+        return self._record_index[sheet.title]
+
+    def _index_appended(self, sheet, response, record_ids: List[str]) -> List[int]:
+        """
+        根据 append 接口返回的 updatedRange 得到新行号，并写入记录 ID 索引
+
+        Returns:
+            新行号列表 (无法解析时为空)
+        """
+        try:
+            updated = response["updates"]["updatedRange"].split("!")[-1]
+            start = gspread.utils.a1_range_to_grid_range(updated)["startRowIndex"] + 1
+        except (TypeError, KeyError):
+            return []
+        rows = list(range(start, start + len(record_ids)))
+        index = self._record_index.get(sheet.title)
+        if index is not None and RECORD_ID_COLUMN in self._get_header_map(sheet)[1]:
+            index.update({rid: row for rid, row in zip(record_ids, rows) if rid})
+        return rows
+
+    def ensure_record_ids(self, table_id: str = "cms") -> int:
+        """
+        为缺少记录 ID 的行补写 UUID (表头没有 Record_ID 列时先在末尾追加该列)
+
+        Returns:
+            补写的行数
+        """
+        sheet = self._get_sheet(table_id)
+        if not sheet: return 0
+        headers = self._get_headers(sheet, [RECORD_ID_COLUMN])
+        if RECORD_ID_COLUMN not in headers:
+            col = len(headers) + 1
+            col_count = getattr(sheet, "col_count", None)
+            if col_count is not None and col > col_count:
+                self._throttle(WRITE)
+                sheet.add_cols(col - col_count)
+            if not self._batch_update_values(sheet, [{"range": f"{self._column_letter(col)}1", "values": [[RECORD_ID_COLUMN]]}]):
+                return 0
+            headers, _ = self._get_header_map(sheet, refresh=True)
+            print(f"   ➕ [GoogleSheet:{sheet.title}] 已追加 {RECORD_ID_COLUMN} 列")
+
+        columns = self._read_columns(sheet, headers, [headers[0], RECORD_ID_COLUMN])
+        row_count = max(len(v) for v in columns.values())
+        ids = columns[RECORD_ID_COLUMN]
+        missing = [i + 2 for i in range(row_count) if i >= len(ids) or not ids[i]]
+        if not missing:
+            return 0
+
+        letter = self._column_letter(headers.index(RECORD_ID_COLUMN) + 1)
+        data = [
+            {"range": f"{letter}{r1}:{letter}{r2}", "values": [[str(uuid.uuid4())] for _ in range(r1, r2 + 1)]}
+            for r1, r2 in self._runs(missing)
+        ]
+        if not self._batch_update_values(sheet, data):
+            return 0
+        self._record_index.pop(sheet.title, None)
+        print(f"   🆔 [GoogleSheet:{sheet.title}] 已为 {len(missing)} 行补写记录 ID")
+        return len(missing)
+
+    def _resolve_row(self, sheet, record_id: str) -> int:
+        """record_id -> 行号，找不到返回 -1"""
+        # 旧数据: 行号 ID
+        if record_id.startswith("row:"):
+            try:
+                return int(record_id.split(":")[1])
+            except ValueError:
+                return -1
+        
+        # 记录 ID: 查索引 O(1)；未命中说明可能是其他进程刚追加的行，重建一次索引
+        row_num = self._get_record_index(sheet).get(record_id)
+        if row_num is None:
+            row_num = self._get_record_index(sheet, refresh=True).get(record_id)
+        return row_num if row_num is not None else -1
+
+    @staticmethod
+    def _format_value(value) -> str:
+        """单元格写入格式: list/dict 序列化为 JSON，其余转字符串"""
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
+
+    @_retry_on_api_error
+    def count_by_date(self, table_id: str, date_str: str) -> int:
+        """
+        统计指定工作表中 "生成时间" 以 date_str (YYYY-MM-DD) 开头的记录数 (只读取生成时间列)
+
+        读取失败 (重试耗尽) 时返回 0
+        """
+        sheet = self._get_sheet(table_id)
+        if not sheet: return 0
+        headers = self._get_headers(sheet, ["生成时间"])
+        if "生成时间" not in headers:
+            return 0
+        values = self._read_columns(sheet, headers, ["生成时间"])["生成时间"]
+        return sum(1 for v in values if str(v).startswith(date_str))
+
     @_retry_on_api_error
     def update_record(self, record_id: str, fields: Dict, retry: bool = True) -> bool:
         """
@@ -206,57 +555,117 @@ class GoogleSheetClient:
         sheet = self._get_sheet("cms")
         if not sheet: return False
         
-        row_num = -1
-        
-        # 策略 1: 解析 Row ID
-        if record_id.startswith("row:"):
-            try:
-                row_num = int(record_id.split(":")[1])
-            except:
-                pass
-        
-        # 策略 2: 如果不是 Row ID，或者是 UUID，需要扫描查找
-        if row_num == -1:
-            cell = sheet.find(record_id)
-            if cell:
-                row_num = cell.row
-        
+        row_num = self._resolve_row(sheet, record_id)
         if row_num == -1:
             print(f"❌ 未找到记录 ID: {record_id}")
             return False
             
-        # 执行更新
-        headers = sheet.row_values(1)
+        # 执行更新 (表头来自缓存，不再额外读取第一行)
+        self._get_headers(sheet, fields)
+        _, header_index = self._get_header_map(sheet)
         cells_to_update = []
         
         for key, value in fields.items():
-            if key in headers:
-                col_index = headers.index(key) + 1
-                # 格式处理
-                if isinstance(value, (list, dict)):
-                    val_str = json.dumps(value, ensure_ascii=False)
-                else:
-                    val_str = str(value)
-                    
+            if key in header_index:
                 # 创建 Cell 对象并加入列表
-                cells_to_update.append(gspread.Cell(row_num, col_index, val_str))
+                cells_to_update.append(gspread.Cell(row_num, header_index[key], self._format_value(value)))
             else:
                 pass
                 # print(f"⚠️ 警告: 字段 '{key}' 不在 Sheet 表头中，已忽略")
         
         if cells_to_update:
+            self._throttle(WRITE)
             sheet.update_cells(cells_to_update)
         
         return True
 
+    # ---------- Write-Behind 批量写回 ----------
+
+    def _get_write_queue(self) -> WriteBehindQueue:
+        queue = getattr(self, "_write_queue", None)
+        if queue is None:
+            name = re.sub(r"[^\w-]", "_", f"google_{getattr(self, 'sheet_id', '') or 'default'}")
+            queue = self._write_queue = WriteBehindQueue(name, flush_func=self._flush_updates)
+        return queue
+
+    def _replay_pending_updates(self):
+        """
+        立即写回上次进程崩溃 / 被杀时留在日志中的更新
+
+        必须在读取记录之前完成: 否则已发布但未写回 "Published" 的记录仍是 Pending，会被重复发布
+        """
+        if not config.SHEET_WRITE_BEHIND_ENABLED:
+            return
+        queue = self._get_write_queue()
+        if len(queue):
+            queue.flush()
+
+    def queue_update(self, record_id: str, fields: Dict) -> bool:
+        """
+        异步更新记录: 加入 Write-Behind 队列，同一行的多次更新合并，
+        满 config.SHEET_FLUSH_MAX_RECORDS 条或每隔 config.SHEET_FLUSH_INTERVAL 秒批量写回
+
+        未开启 SHEET_WRITE_BEHIND_ENABLED 时等同于 update_record
+        """
+        if not config.SHEET_WRITE_BEHIND_ENABLED:
+            return self.update_record(record_id, fields)
+        self._get_write_queue().put(record_id, fields)
+        return True
+
+    def flush_updates(self) -> int:
+        """立即写回队列中的所有更新，返回成功写回的记录数"""
+        queue = getattr(self, "_write_queue", None)
+        return queue.flush() if queue is not None else 0
+
+    @_retry_on_api_error
+    def _batch_update_values(self, sheet, data: List[Dict]) -> bool:
+        self._throttle(WRITE)
+        sheet.batch_update(data)
+        return True
+
+    def _flush_updates(self, updates: Dict[str, Dict]) -> List[str]:
+        """
+        WriteBehindQueue 的写回函数: 所有行的更新合并为一次 values.batchUpdate
+        (每行按连续列拆成区间，如 B5:D5 + N5:O5)
+
+        Returns:
+            写回失败的 record_id 列表
+        """
+        sheet = self._get_sheet("cms")
+        if not sheet:
+            raise RuntimeError("工作表 cms 不可用")
+
+        self._get_headers(sheet, {k for fields in updates.values() for k in fields})
+        _, header_index = self._get_header_map(sheet)
+
+        data, failed, written = [], [], []
+        for record_id, fields in updates.items():
+            row_num = self._resolve_row(sheet, record_id)
+            if row_num == -1:
+                print(f"❌ 未找到记录 ID: {record_id}")
+                failed.append(record_id)
+                continue
+            values = {header_index[k]: self._format_value(v) for k, v in fields.items() if k in header_index}
+            for c1, c2 in self._runs(sorted(values)):
+                data.append({
+                    "range": f"{self._column_letter(c1)}{row_num}:{self._column_letter(c2)}{row_num}",
+                    "values": [[values[c] for c in range(c1, c2 + 1)]]
+                })
+            written.append(record_id)
+
+        if data and not self._batch_update_values(sheet, data):
+            # 重试耗尽仍失败: 视为临时错误，整批保留到下一次写回
+            raise RuntimeError(f"values.batchUpdate 失败 ({len(written)} 条记录)")
+        return failed
+
     def create_record(self, fields: Dict, table_id: str = None) -> Optional[str]:
         """创建记录 (支持指定 table_id/worksheet)"""
         sheet = self._get_sheet(table_id)
         if not sheet: return None
         
         try:
-            # 移除 record_id 生成逻辑 (用户不需要)
             now_str = time.strftime("%Y-%m-%d %H:%M:%S")
+            record_key = fields.setdefault(RECORD_ID_COLUMN, str(uuid.uuid4()))
             fields["created_at"] = now_str
             
             # 自动填充 "生成时间" (System Created Time)
@@ -264,7 +673,7 @@ class GoogleSheetClient:
                 fields["生成时间"] = now_str
             
             # 对齐表头
-            headers = sheet.row_values(1)
+            headers = self._get_headers(sheet, fields)
             row_data = []
             
             for h in headers:
@@ -273,26 +682,42 @@ class GoogleSheetClient:
                     val = json.dumps(val, ensure_ascii=False)
                 row_data.append(val)
                 
-            sheet.append_row(row_data)
-            return "row:new" # 无法立即知道 row number，除非再查一次
+            self._throttle(WRITE)
+            response = sheet.append_row(row_data)
+            rows = self._index_appended(sheet, response, [record_key])
+            if RECORD_ID_COLUMN in headers:
+                return record_key
+            return f"row:{rows[0]}" if rows else "row:new"
             
         except Exception as e:
             print(f"❌ 创建失败: {e}")
             return None
 
-    def batch_create_records(self, records: List[Dict], table_id: str = None) -> bool:
-        """批量创建"""
+    def batch_create_records(self, records: List[Dict], table_id: str = None, skip_existing: bool = False) -> bool:
+        """
+        批量创建 (一次 append_rows)
+
+        Args:
+            records: 记录列表
+            table_id: 工作表名
+            skip_existing: 跳过 Record_ID 已在表中的记录 (崩溃后重放本地缓冲时避免重复追加)
+        """
         sheet = self._get_sheet(table_id)
         if not sheet or not records: return False
         
         try:
-            headers = sheet.row_values(1)
+            headers = self._get_headers(sheet, {k for r in records for k in r})
+            if skip_existing and RECORD_ID_COLUMN in headers:
+                existing = self._get_record_index(sheet)
+                records = [r for r in records if str(r.get(RECORD_ID_COLUMN, "")) not in existing]
+                if not records:
+                    return True
+
             rows_to_append = []
             
             for r in records:
-                # 生成 ID
-                if "record_id" not in r:
-                    r["record_id"] = str(uuid.uuid4())
+                # 生成 ID (写入 Record_ID 列，表中没有该列时忽略)
+                r.setdefault(RECORD_ID_COLUMN, r.get("record_id") or str(uuid.uuid4()))
                 
                 row_data = []
                 for h in headers:
@@ -302,7 +727,9 @@ class GoogleSheetClient:
                     row_data.append(val)
                 rows_to_append.append(row_data)
                 
-            sheet.append_rows(rows_to_append)
+            self._throttle(WRITE)
+            response = sheet.append_rows(rows_to_append)
+            self._index_appended(sheet, response, [r[RECORD_ID_COLUMN] for r in records])
             print(f"   ✅ Google Sheet [{sheet.title}]: 批量插入 {len(rows_to_append)} 条")
             return True
             
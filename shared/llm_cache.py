@@ -0,0 +1,250 @@
+"""
+LLM 响应缓存
+基于 SQLite 的内容寻址缓存，支持 TTL 过期与按体积的 LRU 淘汰
+
+缓存键 = sha256(api_url, model, messages, temperature, max_tokens)，
+相同 Prompt 的重复调用（崩溃后重跑、CI 重试、测试）直接命中本地结果。
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(payload: Dict, api_url: str = None) -> str:
+    """
+    根据请求参数计算缓存键
+
+    Args:
+        payload: chat-completions 请求体 (需包含 model / messages / temperature / max_tokens)
+        api_url: 请求的接口地址 (不同服务端的响应互不复用，如 mock_llm_server 的假响应不会被真实运行命中)
+
+    Returns:
+        sha256 十六进制字符串
+    """
+    material = {
+        "api_url": api_url,
+        "model": payload.get("model"),
+        "messages": payload.get("messages"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+    }
+    raw = json.dumps(material, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM 响应缓存
+
+    功能:
+    1. 按请求内容寻址 (make_key)
+    2. TTL 过期 (读取时校验，写入时顺带清理)
+    3. 总体积超过上限时按最近访问时间 (LRU) 淘汰
+    4. 统计命中/未命中次数
+
+    用法:
+        cache = get_cache()
+        key = make_key(payload)
+        content = cache.get(key)
+        if content is None:
+            content = call_api(...)
+            cache.set(key, content)
+        print(cache.get_stats())
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_bytes: int = None, enabled: bool = None):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite 文件路径 (默认 config.LLM_CACHE_FILE)
+            ttl_seconds: 过期时间 (默认 config.LLM_CACHE_TTL_HOURS 小时)
+            max_bytes: 缓存总体积上限 (默认 config.LLM_CACHE_MAX_MB MB)
+            enabled: 是否启用 (默认 config.LLM_CACHE_ENABLED)
+        """
+        self.path = path or config.LLM_CACHE_FILE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.LLM_CACHE_TTL_HOURS * 3600
+        self.max_bytes = max_bytes if max_bytes is not None else config.LLM_CACHE_MAX_MB * 1024 * 1024
+        self.enabled = config.LLM_CACHE_ENABLED if enabled is None else enabled
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（首次读写时创建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的响应内容，未命中或已过期返回 None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and now - row[1] < self.ttl_seconds:
+                    conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    self.hits += 1
+                    return row[0]
+
+                if row:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ LLM 缓存读取失败: {e}")
+            self.misses += 1
+            return None
+
+    def set(self, key: str, response: str):
+        """写入缓存，并清理过期项、按 LRU 控制总体积"""
+        if not self.enabled or not response:
+            return
+
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_access, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, response, now, now, size)
+                )
+                conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._evict(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ LLM 缓存写入失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """总体积超限时，从最久未访问的条目开始删除"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+        logger.debug(f"🧹 LLM 缓存淘汰 {len(to_delete)} 条")
+
+    def invalidate(self, key: str):
+        """删除指定缓存项"""
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ LLM 缓存删除失败: {e}")
+
+    def clear(self):
+        """清空缓存与统计"""
+        with self._lock:
+            if self.enabled:
+                conn = self._connect()
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict:
+        """
+        获取命中统计
+
+        Returns:
+            {"hits": int, "misses": int, "hit_rate": float, "enabled": bool}
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "enabled": self.enabled,
+        }
+
+    def print_stats(self):
+        """打印命中统计"""
+        stats = self.get_stats()
+        if not stats["enabled"]:
+            return
+        print(
+            f"📦 LLM 缓存: 命中 {stats['hits']} 次 / 未命中 {stats['misses']} 次 "
+            f"(命中率 {stats['hit_rate'] * 100:.1f}%)"
+        )
+
+
+# 全局缓存实例
+_global_cache: Optional[LLMResponseCache] = None
+
+
+def get_cache() -> LLMResponseCache:
+    """获取全局 LLM 响应缓存（单例）"""
+    global _global_cache
+
+    if _global_cache is None:
+        _global_cache = LLMResponseCache()
+
+    return _global_cache
+
+
+def set_cache(cache: Optional[LLMResponseCache]):
+    """替换全局缓存实例 (用于测试或自定义路径)"""
+    global _global_cache
+
+    if _global_cache is not None and _global_cache is not cache:
+        _global_cache.close()
+    _global_cache = cache
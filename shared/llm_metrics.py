@@ -0,0 +1,267 @@
+"""
+LLM 调用计量
+记录每次 LLM 调用的 Token 用量、耗时、模型、调用方 Skill 与重试次数，
+按调用方 / 模型汇总并估算费用，支持导出 JSON / CSV。
+
+调用方识别:
+1. caller_scope("deep_write") 显式指定 (ContextVar，可传递到 asyncio 任务)
+2. 否则沿调用栈查找第一个 Skill 实例 (带 name 与 execute 属性的 self)，再退化为模块名
+"""
+import os
+import sys
+import csv
+import json
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from shared import config
+
+_current_caller: contextvars.ContextVar = contextvars.ContextVar("llm_caller", default="")
+
+# 识别调用方时跳过的模块前缀 (基础设施层)
+_INFRA_PREFIXES = ("shared.", "asyncio", "concurrent.", "threading", "contextlib")
+
+CSV_FIELDS = [
+    "timestamp", "caller", "model", "provider", "status", "prompt_tokens", "completion_tokens",
+    "total_tokens", "latency", "retries", "cached", "stream", "cost",
+]
+
+
+@contextmanager
+def caller_scope(name: str):
+    """
+    在代码块内把 LLM 调用归属到指定调用方
+
+    示例:
+        with caller_scope("social_writing"):
+            utils.call_llm(...)
+    """
+    token = _current_caller.set(name)
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+def current_caller() -> str:
+    """返回当前调用方 (显式指定优先，其次沿调用栈推断)"""
+    return _current_caller.get() or _infer_caller()
+
+
+def _infer_caller() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_INFRA_PREFIXES) and module != __name__:
+            owner = frame.f_locals.get("self")
+            if owner is not None and hasattr(owner, "execute") and isinstance(getattr(owner, "name", None), str):
+                return owner.name
+            if owner is not None:
+                return type(owner).__name__
+            return module
+        frame = frame.f_back
+    return "unknown"
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    按 config.LLM_PRICING (每百万 Token 美元单价) 估算费用
+
+    Returns:
+        美元金额，未配置单价的模型返回 0
+    """
+    price = config.LLM_PRICING.get(model)
+    if not price:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+class LLMMetrics:
+    """
+    LLM 调用计量汇总
+
+    用法:
+        metrics = get_metrics()
+        metrics.record_call(caller="deep_write", model="deepseek-chat",
+                            usage=data.get("usage"), latency=12.3, retries=1)
+        metrics.print_summary()
+        metrics.export_json()
+        metrics.export_csv()
+    """
+
+    def __init__(self):
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record_call(
+        self,
+        caller: str = None,
+        model: str = "",
+        usage: Optional[Dict] = None,
+        latency: float = 0.0,
+        retries: int = 0,
+        status: str = "ok",
+        cached: bool = False,
+        stream: bool = False,
+        provider: str = None
+    ) -> Dict:
+        """
+        记录一次 LLM 调用
+
+        Args:
+            caller: 调用方 (默认 current_caller())
+            model: 模型名称
+            usage: chat-completions 响应中的 usage 字段
+            latency: 总耗时 (秒，含重试)
+            retries: 重试次数
+            status: ok / failed / cache
+            cached: 是否命中本地缓存
+            stream: 是否流式调用
+            provider: 实际响应的服务商 (LLMRouter 路由后；未路由时为空)
+
+        Returns:
+            记录字典
+        """
+        usage = usage if isinstance(usage, dict) else {}
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        record = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "caller": caller or current_caller(),
+            "model": model or "",
+            "provider": provider or "",
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": int(usage.get("total_tokens") or prompt_tokens + completion_tokens),
+            "latency": round(latency, 3),
+            "retries": retries,
+            "cached": cached,
+            "stream": stream,
+            "cost": round(estimate_cost(model, prompt_tokens, completion_tokens), 6),
+        }
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def summary(self, group_by: str = "caller") -> Dict[str, Dict]:
+        """
+        按调用方 (或模型) 汇总
+
+        Args:
+            group_by: "caller" / "model" / "provider"
+
+        Returns:
+            {key: {"calls", "failed", "cache_hits", "prompt_tokens", "completion_tokens",
+                   "total_latency", "avg_latency", "retries", "cost"}}
+        """
+        with self._lock:
+            records = list(self.records)
+
+        result: Dict[str, Dict] = {}
+        for r in records:
+            s = result.setdefault(r[group_by], {
+                "calls": 0, "failed": 0, "cache_hits": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "total_latency": 0.0, "retries": 0, "cost": 0.0,
+            })
+            s["calls"] += 1
+            s["failed"] += r["status"] == "failed"
+            s["cache_hits"] += r["cached"]
+            s["prompt_tokens"] += r["prompt_tokens"]
+            s["completion_tokens"] += r["completion_tokens"]
+            s["total_latency"] += r["latency"]
+            s["retries"] += r["retries"]
+            s["cost"] += r["cost"]
+
+        for s in result.values():
+            s["total_latency"] = round(s["total_latency"], 3)
+            s["avg_latency"] = round(s["total_latency"] / s["calls"], 3)
+            s["cost"] = round(s["cost"], 6)
+        return result
+
+    def print_summary(self):
+        """打印按调用方汇总的用量"""
+        summary = self.summary()
+        if not summary:
+            return
+        print("📈 LLM 用量汇总:")
+        for caller, s in sorted(summary.items(), key=lambda kv: -kv[1]["total_latency"]):
+            print(
+                f"   - {caller}: {s['calls']} 次 (失败 {s['failed']}, 缓存 {s['cache_hits']}, 重试 {s['retries']}) | "
+                f"Token {s['prompt_tokens']}+{s['completion_tokens']} | "
+                f"耗时 {s['total_latency']:.1f}s (均 {s['avg_latency']:.1f}s) | ≈${s['cost']:.4f}"
+            )
+
+    def _default_path(self, ext: str) -> str:
+        os.makedirs(config.LLM_METRICS_DIR, exist_ok=True)
+        return os.path.join(config.LLM_METRICS_DIR, f"llm_metrics_{self.run_id}.{ext}")
+
+    def export_json(self, path: str = None) -> str:
+        """
+        导出明细与汇总为 JSON
+
+        Returns:
+            文件路径
+        """
+        path = path or self._default_path("json")
+        with self._lock:
+            records = list(self.records)
+        data = {
+            "run_id": self.run_id,
+            "by_caller": self.summary("caller"),
+            "by_model": self.summary("model"),
+            "records": records,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+    def export_csv(self, path: str = None) -> str:
+        """
+        导出明细为 CSV (每次调用一行)
+
+        Returns:
+            文件路径
+        """
+        path = path or self._default_path("csv")
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        return path
+
+    def reset(self):
+        """清空记录"""
+        with self._lock:
+            self.records.clear()
+
+
+# 全局计量实例
+_global_metrics: Optional[LLMMetrics] = None
+
+
+def get_metrics() -> LLMMetrics:
+    """获取全局 LLM 计量实例（单例）"""
+    global _global_metrics
+
+    if _global_metrics is None:
+        _global_metrics = LLMMetrics()
+
+    return _global_metrics
+
+
+def finish_run():
+    """Runner 结束时调用: 打印汇总并导出 JSON / CSV"""
+    metrics = get_metrics()
+    if not metrics.records:
+        return
+    metrics.print_summary()
+    if config.LLM_METRICS_EXPORT:
+        json_path = metrics.export_json()
+        metrics.export_csv(json_path[:-len(".json")] + ".csv")
+        print(f"   📁 明细已导出: {json_path}")
@@ -0,0 +1,343 @@
+"""
+LLM 多服务商路由
+按滚动窗口内的延迟 (p50/p95) 与错误率为每次调用选择最健康的服务商，
+可选在主请求超过 p95 仍未返回时向次优服务商发出对冲 (hedged) 请求，取最先成功的响应。
+
+服务商列表来自 config.LLM_PROVIDERS；只配置了一个服务商时退化为直连。
+调用方 (llm_utils.call_llm_* / 各 Skill) 的函数签名不需要任何改动。
+"""
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Tuple
+from shared import config, llm_transport, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Provider:
+    """一个可路由的 chat-completions 端点"""
+
+    def __init__(self, name: str, api_url: str, api_key: str, model: str):
+        self.name = name
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+
+    def __repr__(self):
+        return f"Provider({self.name})"
+
+
+class ProviderHealth:
+    """
+    服务商健康度 (滚动窗口)
+
+    记录最近 window 次调用的 (耗时, 是否成功)，计算 p50 / p95 延迟与错误率。
+    """
+
+    def __init__(self, window: int = None):
+        self._samples = deque(maxlen=window or config.LLM_ROUTER_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def _percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(lat for lat, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def p50(self) -> Optional[float]:
+        return self._percentile(0.5)
+
+    def p95(self) -> Optional[float]:
+        return self._percentile(0.95)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def score(self, min_samples: int) -> float:
+        """
+        路由评分 (越小越健康)
+
+        样本不足时返回 0，使新服务商先获得少量流量用于探测；
+        之后按 p50 / 成功率 估算期望耗时。
+        """
+        if self.count < min_samples:
+            return 0.0
+        p50 = self.p50()
+        if p50 is None:
+            return float("inf")
+        return p50 / max(0.05, 1.0 - self.error_rate())
+
+    def to_dict(self) -> Dict:
+        return {
+            "samples": self.count,
+            "p50": self.p50(),
+            "p95": self.p95(),
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+class LLMRouter:
+    """
+    LLM 多服务商路由器
+
+    功能:
+    1. 维护每个服务商的 p50 / p95 延迟与错误率
+    2. 每次调用选择评分最优的服务商 (失败会拉低评分，重试时自动切换)
+    3. 可选对冲请求: 主请求超过其 p95 仍未返回时，向次优服务商发出副本，取先成功者
+
+    用法:
+        router = get_router()
+        resp = router.post(api_url, headers, payload, timeout=90)
+        resp = await router.apost(api_url, headers, payload, timeout=90)
+    """
+
+    def __init__(self, providers: List[Dict] = None, hedge: bool = None, min_samples: int = None):
+        """
+        初始化路由器
+
+        Args:
+            providers: [{"name", "api_url", "api_key", "model"}, ...] (默认 config.LLM_PROVIDERS)
+            hedge: 是否启用对冲请求 (默认 config.LLM_HEDGE_ENABLED)
+            min_samples: 统计生效所需的最少样本数 (默认 config.LLM_ROUTER_MIN_SAMPLES)
+        """
+        providers = config.LLM_PROVIDERS if providers is None else providers
+        self.providers = [Provider(**p) for p in providers]
+        self.hedge = config.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self.min_samples = min_samples or config.LLM_ROUTER_MIN_SAMPLES
+        self.health: Dict[str, ProviderHealth] = {p.name: ProviderHealth() for p in self.providers}
+        self.hedged_count = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # ---------- 选择 ----------
+
+    def _provider_for_url(self, api_url: str) -> Optional[Provider]:
+        for p in self.providers:
+            if p.api_url == api_url:
+                return p
+        return None
+
+    def candidates(self, api_url: str, model: str) -> List[Provider]:
+        """
+        返回可服务本次请求的服务商 (按健康度排序)
+
+        - 请求地址不在服务商列表中 (自定义端点) 时不参与路由
+        - 指定了非默认模型时，只有默认模型相同的服务商可以互换
+        """
+        primary = self._provider_for_url(api_url)
+        if primary is None or not config.LLM_ROUTER_ENABLED:
+            return []
+
+        if model == primary.model:
+            pool = list(self.providers)
+        else:
+            pool = [p for p in self.providers if p is primary or p.model == model]
+
+        # sorted 稳定: 评分相同时保持配置顺序 (默认服务商优先)
+        return sorted(pool, key=lambda p: self.health[p.name].score(self.min_samples))
+
+    def route(self, api_url: str, headers: Dict, payload: Dict) -> Tuple[Optional[Provider], str, Dict, Dict]:
+        """
+        为一次请求选出服务商，返回 (provider, api_url, headers, payload)
+
+        未参与路由时原样返回，provider 为 None
+        """
+        ranked = self.candidates(api_url, payload.get("model"))
+        if not ranked:
+            return None, api_url, headers, payload
+        return self._rewrite(ranked[0], api_url, headers, payload)
+
+    @staticmethod
+    def _rewrite(provider: Provider, api_url: str, headers: Dict, payload: Dict):
+        """把请求改写到目标服务商 (地址 / Key / 模型名)"""
+        if provider.api_url == api_url:
+            return provider, api_url, headers, payload
+        headers = llm_transport.build_headers(provider.api_url, provider.api_key)
+        payload = {**payload, "model": provider.model}
+        return provider, provider.api_url, headers, payload
+
+    def record(self, provider: Optional[Provider], latency: float, ok: bool):
+        """记录一次调用结果"""
+        if provider is not None:
+            self.health[provider.name].record(latency, ok)
+
+    def _hedge_deadline(self, ranked: List[Provider]) -> Optional[float]:
+        """主服务商的 p95 (样本不足或无备选时不对冲)"""
+        if not self.hedge or len(ranked) < 2:
+            return None
+        health = self.health[ranked[0].name]
+        if health.count < self.min_samples:
+            return None
+        return health.p95()
+
+    # ---------- 同步 ----------
+
+    @staticmethod
+    def _tag(resp, provider: Optional[Provider], payload: Dict):
+        """在响应上标记实际响应的服务商与模型 (路由 / 对冲后调用方据此计量成本)"""
+        resp.llm_provider = provider.name if provider is not None else None
+        resp.llm_model = payload.get("model")
+        return resp
+
+    def _post_one(self, provider: Optional[Provider], api_url: str, headers: Dict, payload: Dict, timeout: float):
+        start = time.monotonic()
+        try:
+            resp = llm_transport.post(api_url, headers=headers, json=payload, timeout=timeout)
+        except Exception:
+            self.record(provider, time.monotonic() - start, False)
+            raise
+        self.record(provider, time.monotonic() - start, resp.status_code == 200)
+        return self._tag(resp, provider, payload)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=config.LLM_POOL_MAXSIZE, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def post(self, api_url: str, headers: Dict, payload: Dict, timeout: float = 90):
+        """
+        路由并发送一次同步请求
+
+        Returns:
+            requests.Response (对冲时为最先成功的响应)
+        """
+        ranked = self.candidates(api_url, payload.get("model"))
+        if not ranked:
+            return self._tag(llm_transport.post(api_url, headers=headers, json=payload, timeout=timeout), None, payload)
+
+        deadline = self._hedge_deadline(ranked)
+        if deadline is None:
+            return self._post_one(*self._rewrite(ranked[0], api_url, headers, payload), timeout)
+
+        executor = self._get_executor()
+        primary = executor.submit(self._post_one, *self._rewrite(ranked[0], api_url, headers, payload), timeout)
+        done, _ = wait([primary], timeout=deadline)
+        if done:
+            return primary.result()
+
+        self.hedged_count += 1
+        logger.info(f"🪁 [Router] {ranked[0].name} 超过 p95 ({deadline:.1f}s)，对冲请求 {ranked[1].name}")
+        backup = executor.submit(self._post_one, *self._rewrite(ranked[1], api_url, headers, payload), timeout)
+        return self._first_success([primary, backup])
+
+    @staticmethod
+    def _first_success(futures):
+        """返回最先成功 (200) 的响应；都失败时返回最后一个响应或抛出最后的异常"""
+        pending = set(futures)
+        last_resp, last_error = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    resp = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if resp.status_code == 200:
+                    return resp
+                last_resp = resp
+        if last_resp is not None:
+            return last_resp
+        raise last_error
+
+    # ---------- 异步 ----------
+
+    async def _apost_one(self, provider: Optional[Provider], api_url: str, headers: Dict, payload: Dict, timeout: float):
+        scheduler = llm_scheduler.get_scheduler()
+        async with scheduler.slot(api_url, payload["model"]):
+            start = time.monotonic()
+            try:
+                resp = await llm_transport.apost(api_url, headers=headers, json=payload, timeout=timeout)
+            except Exception:
+                self.record(provider, time.monotonic() - start, False)
+                raise
+        self.record(provider, time.monotonic() - start, resp.status_code == 200)
+        return self._tag(resp, provider, payload)
+
+    async def apost(self, api_url: str, headers: Dict, payload: Dict, timeout: float = 90):
+        """
+        post 的异步版本 (占用目标服务商的 LLMScheduler 槽位)
+
+        对冲时落后的请求会被取消
+        """
+        ranked = self.candidates(api_url, payload.get("model"))
+        if not ranked:
+            return await self._apost_one(None, api_url, headers, payload, timeout)
+
+        deadline = self._hedge_deadline(ranked)
+        primary = asyncio.ensure_future(self._apost_one(*self._rewrite(ranked[0], api_url, headers, payload), timeout))
+        if deadline is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=deadline)
+        if done:
+            return primary.result()
+
+        self.hedged_count += 1
+        logger.info(f"🪁 [Router] {ranked[0].name} 超过 p95 ({deadline:.1f}s)，对冲请求 {ranked[1].name}")
+        backup = asyncio.ensure_future(self._apost_one(*self._rewrite(ranked[1], api_url, headers, payload), timeout))
+
+        pending = {primary, backup}
+        last_resp, last_error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    if task.result().status_code == 200:
+                        return task.result()
+                    last_resp = task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        if last_resp is not None:
+            return last_resp
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        获取各服务商健康度
+
+        Returns:
+            {name: {"samples", "p50", "p95", "error_rate"}}
+        """
+        return {name: health.to_dict() for name, health in self.health.items()}
+
+
+# 全局路由器
+_global_router: Optional[LLMRouter] = None
+
+
+def get_router() -> LLMRouter:
+    """获取全局 LLM 路由器（单例）"""
+    global _global_router
+
+    if _global_router is None:
+        _global_router = LLMRouter()
+
+    return _global_router
+
+
+def set_router(router: Optional[LLMRouter]):
+    """替换全局路由器 (用于测试)"""
+    global _global_router
+    _global_router = router
@@ -0,0 +1,102 @@
+"""
+LLM 并发调度器
+按服务商 (host) 和模型两级信号量限制在途请求数
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from shared import config
+
+
+class LLMScheduler:
+    """
+    LLM 并发调度器
+
+    功能:
+    1. 每个服务商 (按 API host 区分) 最多 max_per_provider 个在途请求
+    2. 每个模型最多 max_per_model 个在途请求
+    3. 统计在途请求数与峰值
+
+    注意: asyncio.Semaphore 绑定事件循环，请通过 get_scheduler() 获取
+    当前事件循环对应的实例，不要跨 asyncio.run 复用。
+
+    用法:
+        scheduler = get_scheduler()
+        async with scheduler.slot(api_url, model):
+            resp = await llm_transport.apost(...)
+    """
+
+    def __init__(self, max_per_provider: int = None, max_per_model: int = None):
+        """
+        初始化调度器
+
+        Args:
+            max_per_provider: 每个服务商的最大并发 (默认 config.LLM_MAX_CONCURRENCY_PER_PROVIDER)
+            max_per_model: 每个模型的最大并发 (默认 config.LLM_MAX_CONCURRENCY_PER_MODEL)
+        """
+        self.max_per_provider = max_per_provider or config.LLM_MAX_CONCURRENCY_PER_PROVIDER
+        self.max_per_model = max_per_model or config.LLM_MAX_CONCURRENCY_PER_MODEL
+        self._provider_sems: Dict[str, asyncio.Semaphore] = {}
+        self._model_sems: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._peak: Dict[str, int] = {}
+
+    @staticmethod
+    def provider_of(api_url: str) -> str:
+        """从 API 地址提取服务商标识 (host)"""
+        return urlparse(api_url).netloc or api_url
+
+    def _semaphore(self, table: Dict[str, asyncio.Semaphore], key: str, limit: int) -> asyncio.Semaphore:
+        if key not in table:
+            table[key] = asyncio.Semaphore(limit)
+        return table[key]
+
+    @asynccontextmanager
+    async def slot(self, api_url: str, model: str):
+        """
+        占用一个请求槽位（先服务商后模型，固定顺序避免死锁）
+
+        Args:
+            api_url: 接口地址
+            model: 模型名称
+        """
+        provider = self.provider_of(api_url)
+        provider_sem = self._semaphore(self._provider_sems, provider, self.max_per_provider)
+        model_sem = self._semaphore(self._model_sems, f"{provider}/{model}", self.max_per_model)
+
+        async with provider_sem:
+            async with model_sem:
+                self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+                self._peak[provider] = max(self._peak.get(provider, 0), self._in_flight[provider])
+                try:
+                    yield
+                finally:
+                    self._in_flight[provider] -= 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取各服务商的并发统计
+
+        Returns:
+            {provider: {"in_flight": 当前在途数, "peak": 峰值}}
+        """
+        return {
+            provider: {"in_flight": self._in_flight.get(provider, 0), "peak": peak}
+            for provider, peak in self._peak.items()
+        }
+
+
+# {event_loop: LLMScheduler}
+_schedulers = weakref.WeakKeyDictionary()
+
+
+def get_scheduler() -> LLMScheduler:
+    """获取当前事件循环对应的调度器（每个事件循环一个单例）"""
+    loop = asyncio.get_running_loop()
+    scheduler: Optional[LLMScheduler] = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = LLMScheduler()
+        _schedulers[loop] = scheduler
+    return scheduler
@@ -0,0 +1,364 @@
+"""
+LLM 流式响应处理
+解析 SSE (text/event-stream) 数据行，增量追踪 JSON 字段完成情况，并统计首字节时间 / 进度
+
+长文章生成时，只要服务端持续输出就不会因总超时丢失结果；
+长时间无新内容 (空闲超时) 或首字节过慢时提前中止，交给上层重试。
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class StreamAborted(Exception):
+    """流式生成被提前中止 (空闲超时 / 首字节超时 / 调用方中止)"""
+
+
+def parse_sse_event(line: str):
+    """
+    解析一行 SSE 数据为事件对象
+
+    Args:
+        line: 形如 'data: {...}' 的一行 (注释行 ': keep-alive' 与空行会被忽略)
+
+    Returns:
+        (event, done)
+        - event: 解析后的 JSON 事件 (没有则为 None)
+        - done: 是否收到 [DONE]
+
+    Raises:
+        StreamAborted: 流中返回了 error 对象
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    line = line.strip()
+    if not line.startswith("data:"):
+        return None, False
+
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None, True
+
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        return None, False
+
+    if event.get("error"):
+        raise StreamAborted(f"流中返回错误: {event['error']}")
+    return event, False
+
+
+def _delta_of(event: Optional[Dict]) -> Optional[str]:
+    choices = (event or {}).get("choices") or []
+    if not choices:
+        return None
+    delta = choices[0].get("delta") or {}
+    return delta.get("content")
+
+
+def parse_sse_line(line: str):
+    """
+    解析一行 SSE 数据
+
+    Returns:
+        (content_delta, done)
+        - content_delta: 本行携带的文本增量 (没有则为 None)
+        - done: 是否收到 [DONE]
+    """
+    event, done = parse_sse_event(line)
+    return _delta_of(event), done
+
+
+class IncrementalJsonParser:
+    """
+    增量 JSON 字段追踪器
+
+    逐字符扫描流式到达的文本，记录顶层对象中哪些字段的值已经完整输出，
+    以及正在输出的字段已写了多少字符。不做完整解析，最终结果仍交给 extract_json。
+
+    用法:
+        parser = IncrementalJsonParser()
+        parser.feed('{"title": "纸箱')
+        parser.feed('选购指南", "html_content": "<p>...')
+        parser.completed_fields   # ['title']
+        parser.field_sizes        # {'title': 6, 'html_content': 6}
+    """
+
+    def __init__(self):
+        self.completed_fields: List[str] = []
+        self.field_sizes: Dict[str, int] = {}
+        self.done = False
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "key"          # key -> colon -> value -> after
+        self._key_chars: List[str] = []
+        self._pending_key: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._value_started = False
+
+    def feed(self, text: str):
+        """追加一段文本"""
+        for ch in text:
+            if self.done:
+                return
+            self._step(ch)
+
+    def has_fields(self, fields) -> bool:
+        """指定字段是否都已完整输出"""
+        return all(f in self.completed_fields for f in fields)
+
+    def _complete(self):
+        if self._current_key is not None and self._current_key not in self.completed_fields:
+            self.completed_fields.append(self._current_key)
+        self._state = "after"
+        self._value_started = False
+
+    def _step(self, ch: str):
+        top = self._depth == 1
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if top and self._state == "key":
+                    self._pending_key = "".join(self._key_chars)
+                    self._state = "colon"
+                elif top and self._state == "value":
+                    self._complete()
+                return
+
+            if top and self._state == "key":
+                self._key_chars.append(ch)
+            elif self._state == "value" and self._current_key is not None:
+                self.field_sizes[self._current_key] = self.field_sizes.get(self._current_key, 0) + 1
+            return
+
+        if self._depth == 0:
+            # 跳过 ```json 之类的前缀
+            if ch == "{":
+                self._depth = 1
+                self._state = "key"
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if top and self._state == "key":
+                self._key_chars = []
+            elif top and self._state == "value":
+                self._value_started = True
+                self.field_sizes.setdefault(self._current_key, 0)
+            return
+
+        if ch in "{[":
+            if top and self._state == "value":
+                self._value_started = True
+            self._depth += 1
+            return
+
+        if ch in "}]":
+            self._depth -= 1
+            if self._depth == 1 and self._state == "value":
+                self._complete()
+            elif self._depth == 0:
+                if self._state == "value" and self._value_started:
+                    self._complete()
+                self.done = True
+            return
+
+        if top:
+            if ch == ":" and self._state == "colon":
+                self._current_key = self._pending_key
+                self._state = "value"
+                self._value_started = False
+            elif ch == ",":
+                if self._state == "value" and self._value_started:
+                    self._complete()
+                self._state = "key"
+            elif not ch.isspace() and self._state == "value":
+                # 数字 / true / false / null
+                self._value_started = True
+
+
+class StreamStats:
+    """
+    单次流式调用的进度统计
+
+    Attributes:
+        ttfb: 首个内容增量到达耗时 (秒)，尚未到达为 None
+        chars: 已收到的字符数
+        chunks: 已收到的内容增量数
+        completed_fields: 已完整输出的 JSON 字段
+        field_sizes: 各字段已输出字符数
+        aborted: 中止原因 (正常结束为 None)
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.ttfb: Optional[float] = None
+        self.chars = 0
+        self.chunks = 0
+        self.completed_fields: List[str] = []
+        self.field_sizes: Dict[str, int] = {}
+        self.aborted: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "ttfb": self.ttfb,
+            "elapsed": round(self.elapsed, 3),
+            "chars": self.chars,
+            "chunks": self.chunks,
+            "completed_fields": list(self.completed_fields),
+            "field_sizes": dict(self.field_sizes),
+            "aborted": self.aborted,
+        }
+
+
+class StreamAccumulator:
+    """
+    流式响应累加器 (同步 / 异步调用共用)
+
+    逐行喂入 SSE 数据，拼接内容、更新 StreamStats 与 IncrementalJsonParser，
+    并执行空闲超时 / 首字节超时 / 回调中止检查。
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = None,
+        max_ttfb: float = None,
+        on_progress: Callable[[StreamStats], Optional[bool]] = None
+    ):
+        """
+        Args:
+            idle_timeout: 两次内容增量之间的最大间隔 (秒)，超出则中止
+            max_ttfb: 首个内容增量的最长等待时间 (秒)，超出则中止
+            on_progress: 每收到内容增量时回调，返回 False 表示中止生成
+        """
+        self.idle_timeout = idle_timeout
+        self.max_ttfb = max_ttfb
+        self.on_progress = on_progress
+        self.stats = StreamStats()
+        self.parser = IncrementalJsonParser()
+        self.usage: Optional[Dict] = None  # 末尾事件携带的 Token 用量 (stream_options.include_usage)
+        self._parts: List[str] = []
+        self._last_content_at = self.stats.started_at
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    def _abort(self, reason: str):
+        self.stats.aborted = reason
+        self.stats.finished_at = time.monotonic()
+        raise StreamAborted(reason)
+
+    def feed_line(self, line) -> bool:
+        """
+        处理一行 SSE 数据
+
+        Returns:
+            True 表示流已结束 ([DONE])
+
+        Raises:
+            StreamAborted: 触发中止条件
+        """
+        event, done = parse_sse_event(line)
+        delta = _delta_of(event)
+        if event and event.get("usage"):
+            self.usage = event["usage"]
+        now = time.monotonic()
+
+        if delta:
+            if self.stats.ttfb is None:
+                self.stats.ttfb = now - self.stats.started_at
+            self._last_content_at = now
+            self._parts.append(delta)
+            self.parser.feed(delta)
+
+            self.stats.chunks += 1
+            self.stats.chars += len(delta)
+            self.stats.completed_fields = self.parser.completed_fields
+            self.stats.field_sizes = self.parser.field_sizes
+
+            if self.on_progress and self.on_progress(self.stats) is False:
+                self._abort("调用方中止")
+        elif not done:
+            # keep-alive 注释行: 连接仍在，但没有新内容
+            self.check_deadline()
+
+        if done:
+            self.stats.finished_at = now
+        return done
+
+    def remaining(self) -> Optional[float]:
+        """
+        距当前截止时间 (首字节 / 空闲) 的剩余秒数
+
+        Returns:
+            剩余秒数 (已超时为 0)，未设置对应超时返回 None
+        """
+        if self.stats.ttfb is None:
+            if not self.max_ttfb:
+                return None
+            deadline = self.stats.started_at + self.max_ttfb
+        else:
+            if not self.idle_timeout:
+                return None
+            deadline = self._last_content_at + self.idle_timeout
+        return max(0.0, deadline - time.monotonic())
+
+    def check_deadline(self):
+        """
+        已超过首字节 / 空闲截止时间则中止
+
+        Raises:
+            StreamAborted: 已超时
+        """
+        if self.remaining() != 0:
+            return
+        if self.stats.ttfb is None:
+            self._abort(f"首字节超时 (>{self.max_ttfb}s)")
+        self._abort(f"空闲超时 (>{self.idle_timeout}s)")
+
+    def finish(self) -> str:
+        """流结束 (连接关闭) 时调用，返回完整内容"""
+        if self.stats.finished_at is None:
+            self.stats.finished_at = time.monotonic()
+        return self.content
+
+
+async def aiter_lines_with_deadline(lines, acc: StreamAccumulator):
+    """
+    逐行读取异步流，单次等待不超过累加器的剩余时间
+
+    服务端既不发内容也不发 keep-alive 时，feed_line 不会被调用，
+    由这里在首字节 / 空闲截止时间到达时中止，而不是等到 socket 读取超时。
+
+    Args:
+        lines: 异步行迭代器 (如 httpx.Response.aiter_lines())
+        acc: 当前调用的 StreamAccumulator
+
+    Raises:
+        StreamAborted: 等待下一行超过截止时间
+    """
+    iterator = lines.__aiter__()
+    while True:
+        try:
+            line = await asyncio.wait_for(iterator.__anext__(), acc.remaining())
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            acc.check_deadline()
+            raise
+        yield line
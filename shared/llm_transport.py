@@ -0,0 +1,236 @@
+"""
+LLM HTTP 传输层
+进程级共享的 requests.Session，提供连接池与 Keep-Alive
+
+所有 LLM 调用 (llm_utils / utils.call_llm / 各 Skill 私有 _call_llm)
+统一经由本模块发出，TCP + TLS 握手每个进程只需支付一次。
+
+异步调用 (llm_utils.acall_*) 使用按事件循环共享的 httpx.AsyncClient。
+
+post / apost 在发送前向自适应限流器 (shared/rate_limiter.py) 申请令牌，
+并用响应的状态码与 Retry-After / x-ratelimit-* 头反馈调整速率。
+"""
+import asyncio
+import atexit
+import threading
+import weakref
+import requests
+from contextlib import contextmanager, asynccontextmanager
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
+from shared import config, rate_limiter
+
+try:
+    import httpx
+except ImportError:  # 仅异步接口需要
+    httpx = None
+
+# 异步请求超时异常 (供调用方 except 使用)
+ASYNC_TIMEOUT_ERRORS = (httpx.TimeoutException, asyncio.TimeoutError) if httpx else (asyncio.TimeoutError,)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# {event_loop: httpx.AsyncClient}，AsyncClient 不能跨事件循环复用
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """
+    获取全局共享的 Session（单例，线程安全）
+
+    连接池大小由 config.LLM_POOL_CONNECTIONS / LLM_POOL_MAXSIZE 控制:
+    - pool_connections: 缓存的 host 连接池数量 (OpenRouter / DeepSeek ...)
+    - pool_maxsize: 每个 host 保持的最大 Keep-Alive 连接数 (并发上限)
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.LLM_POOL_CONNECTIONS,
+                    pool_maxsize=config.LLM_POOL_MAXSIZE,
+                    pool_block=config.LLM_POOL_BLOCK
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+
+    return _session
+
+
+def close_session():
+    """关闭全局 Session（进程退出时自动调用）"""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+atexit.register(close_session)
+
+
+def build_headers(api_url: str, api_key: str) -> Dict[str, str]:
+    """
+    构造 chat-completions 请求头
+
+    Args:
+        api_url: 接口地址
+        api_key: API Key
+
+    Returns:
+        请求头字典
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    # 针对 OpenRouter/DeepSeek 的特殊头
+    if "openrouter" in api_url or "deepseek" in api_url:
+        headers["HTTP-Referer"] = "https://github.com/jememouse/deepseek-feisu-cms"
+        headers["X-Title"] = "DeepSeek CMS Agent"
+
+    return headers
+
+
+def build_messages(prompt: str, system_prompt: str = None) -> List[Dict[str, str]]:
+    """构造 messages 列表 (可选 system + user)"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def _api_key_of(headers: Optional[Dict]) -> str:
+    """从 Authorization 头提取 API Key (用于限流分桶)"""
+    auth = (headers or {}).get("Authorization", "")
+    return auth[7:] if auth.startswith("Bearer ") else auth
+
+
+def post(url: str, headers: Dict = None, json: Dict = None, timeout: float = 90, **kwargs) -> requests.Response:
+    """
+    通过共享 Session 发送 POST 请求（经自适应限流）
+
+    签名与 requests.post 保持一致，便于直接替换
+    """
+    limiter = rate_limiter.get_rate_limiter()
+    api_key = _api_key_of(headers)
+    limiter.acquire(url, api_key)
+    resp = get_session().post(url, headers=headers, json=json, timeout=timeout, **kwargs)
+    limiter.update_from_response(url, api_key, resp.status_code, resp.headers)
+    return resp
+
+
+@contextmanager
+def stream_post(url: str, headers: Dict = None, json: Dict = None, connect_timeout: float = 10, read_timeout: float = 60):
+    """
+    通过共享 Session 发送流式 POST 请求 (SSE)
+
+    read_timeout 是两次 socket 读取之间的最长间隔，而不是总耗时，
+    服务端持续输出时长文章不会因总超时被截断。
+
+    用法:
+        with llm_transport.stream_post(url, headers, payload, read_timeout=30) as resp:
+            for line in resp.iter_lines():
+                ...
+    """
+    limiter = rate_limiter.get_rate_limiter()
+    api_key = _api_key_of(headers)
+    limiter.acquire(url, api_key)
+    resp = get_session().post(url, headers=headers, json=json, timeout=(connect_timeout, read_timeout), stream=True)
+    limiter.update_from_response(url, api_key, resp.status_code, resp.headers)
+    try:
+        yield resp
+    finally:
+        resp.close()
+
+
+def set_read_timeout(resp: requests.Response, timeout: Optional[float]):
+    """
+    调整流式响应后续 socket 读取的超时
+
+    stream_post 的 read_timeout 只在建立请求时生效；流式读取过程中按剩余时间收紧，
+    服务端静默 (连 keep-alive 也不发) 时才能在空闲超时到达时中断读取。
+    拿不到底层 socket 时 (如测试替身) 保持原超时。
+
+    Args:
+        resp: stream_post 返回的响应
+        timeout: 新的读取超时 (秒)，None 或 0 表示不调整
+    """
+    # urllib3 HTTPResponse -> http.client.HTTPResponse -> BufferedReader -> SocketIO -> socket
+    fp = getattr(getattr(getattr(resp, "raw", None), "_fp", None), "fp", None)
+    sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is not None and timeout:
+        sock.settimeout(timeout)
+
+
+def get_async_client() -> "httpx.AsyncClient":
+    """
+    获取当前事件循环共享的 httpx.AsyncClient
+
+    连接池上限与同步 Session 保持一致 (config.LLM_POOL_MAXSIZE)
+
+    Raises:
+        RuntimeError: 未安装 httpx 或不在事件循环中调用
+    """
+    if httpx is None:
+        raise RuntimeError("异步 LLM 接口需要 httpx，请先执行: pip install httpx")
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=config.LLM_POOL_MAXSIZE,
+            max_keepalive_connections=config.LLM_POOL_MAXSIZE
+        )
+        client = httpx.AsyncClient(limits=limits)
+        _async_clients[loop] = client
+
+    return client
+
+
+async def aclose_async_client():
+    """关闭当前事件循环的 AsyncClient（在 asyncio.run 结束前调用）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def apost(url: str, headers: Dict = None, json: Dict = None, timeout: float = 90) -> "httpx.Response":
+    """
+    通过当前事件循环的 AsyncClient 发送 POST 请求
+
+    返回的 httpx.Response 与 requests.Response 一样提供 status_code / json() / text
+    """
+    limiter = rate_limiter.get_rate_limiter()
+    api_key = _api_key_of(headers)
+    await limiter.aacquire(url, api_key)
+    resp = await get_async_client().post(url, headers=headers, json=json, timeout=timeout)
+    limiter.update_from_response(url, api_key, resp.status_code, resp.headers)
+    return resp
+
+
+@asynccontextmanager
+async def astream_post(url: str, headers: Dict = None, json: Dict = None, connect_timeout: float = 10, read_timeout: float = 60):
+    """
+    stream_post 的异步版本
+
+    用法:
+        async with llm_transport.astream_post(url, headers, payload, read_timeout=30) as resp:
+            async for line in resp.aiter_lines():
+                ...
+    """
+    limiter = rate_limiter.get_rate_limiter()
+    api_key = _api_key_of(headers)
+    await limiter.aacquire(url, api_key)
+    timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=connect_timeout, pool=None)
+    async with get_async_client().stream("POST", url, headers=headers, json=json, timeout=timeout) as resp:
+        limiter.update_from_response(url, api_key, resp.status_code, resp.headers)
+        yield resp
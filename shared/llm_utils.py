@@ -1,69 +1,135 @@
 """
 统一的 LLM 工具类
 提供 JSON 解析、清洗和健壮性处理
+同时提供异步接口 (acall_*) 与并发批量调用的同步封装 (call_*_batch)
+以及 SSE 流式接口 (call_llm_stream / call_llm_json_stream)，以空闲超时代替总超时
+请求经 llm_router 在已配置的多个服务商之间按延迟与错误率路由
 """
+import asyncio
 import json
 import re
 import time
 import requests
-from typing import Optional, Dict, Any
-from shared import config
+from typing import Optional, Dict, Any, List, Callable
+from shared import config, llm_transport, llm_scheduler, llm_cache, llm_stream, llm_router, llm_metrics
+from shared.performance import get_monitor
+
+
+# sanitize_json 要处理的两类字符: 非法反斜杠转义 / 控制字符 (先检测，命中才替换)
+_BAD_ESCAPE = re.compile(r'\\(?![\\"/bfnrtu])')
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 扫描器只关心的字符，其余字符由正则引擎在 C 层跳过
+_SCAN_TOKENS = re.compile(r'[\\"{}\[\]]')
+
+
+def _strip_code_fence(content: str) -> str:
+    """去除首尾的 Markdown 代码块标记 (```json ... ```)"""
+    text = content.strip()
+    if not text.startswith("```"):
+        return content
+    newline = text.find("\n")
+    text = text[newline + 1:] if newline != -1 else text[3:]
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    return text
 
 
-def extract_json(content: str) -> Optional[Dict]:
+def _prepare_json_text(content: str) -> str:
+    """去除首尾代码块标记，必要时清洗非法转义与控制字符"""
+    content = _strip_code_fence(content)
+    if ("\\" in content and _BAD_ESCAPE.search(content)) or _CONTROL_CHARS.search(content):
+        content = sanitize_json(content)
+    return content
+
+
+def _scan_json_spans(text: str, open_ch: str, close_ch: str):
     """
-    从 LLM 响应中提取 JSON (支持多种格式)
+    单遍扫描，按顺序产出顶层 open_ch ... close_ch 片段的 (start, end)
 
-    使用三重解析策略:
-    1. 直接解析整个内容
-    2. 正则匹配最外层 JSON 对象
-    3. 括号深度追踪找出完整 JSON
+    感知字符串与转义: HTML 中的 CSS 规则、JSON-LD 等位于字符串内的括号不会干扰配对；
+    候选片段互不重叠，每个只交给 json.loads 解析一次，整体为线性复杂度。
+    """
+    depth, start, in_string, skip_before = 0, -1, False, -1
+    for match in _SCAN_TOKENS.finditer(text):
+        i = match.start()
+        if i < skip_before:
+            continue  # 被反斜杠转义的字符
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                skip_before = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # 候选片段之外的引号属于正文，不追踪
+            in_string = depth > 0
+        elif ch == open_ch:
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == close_ch and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield start, i + 1
 
-    Args:
-        content: LLM 响应文本
 
-    Returns:
-        解析后的字典，如果失败返回 None
+def _extract_json_value(content: str, open_ch: str, close_ch: str, expected_type):
     """
-    if not content:
-        return None
+    extract_json / extract_json_array 的公共实现
 
-    # 清洗内容
-    content = sanitize_json(content)
+    1. 快速路径: 整段直接解析
+    2. 扫描顶层片段，逐个解析 (每个片段只解析一次)
+    3. 兜底: 第一个 open_ch 到最后一个 close_ch (字符串内有未转义引号、扫描失配时)
+    """
+    content = _prepare_json_text(content)
 
-    # 方法1: 直接解析
     try:
-        return json.loads(content, strict=False)
+        result = json.loads(content, strict=False)
+        if expected_type is None or isinstance(result, expected_type):
+            return result
     except json.JSONDecodeError:
         pass
 
-    # 方法2: 正则匹配最外层 JSON 对象
-    json_match = re.search(r'\{[\s\S]*\}', content)
-    if json_match:
+    for start, end in _scan_json_spans(content, open_ch, close_ch):
         try:
-            return json.loads(json_match.group(), strict=False)
+            result = json.loads(content[start:end], strict=False)
         except json.JSONDecodeError:
-            pass
+            continue
+        if isinstance(result, expected_type or object):
+            return result
 
-    # 方法3: 括号深度追踪
-    depth, start_idx = 0, -1
-    for i, char in enumerate(content):
-        if char == '{':
-            if depth == 0:
-                start_idx = i
-            depth += 1
-        elif char == '}':
-            depth -= 1
-            if depth == 0 and start_idx != -1:
-                try:
-                    json_str = content[start_idx:i+1]
-                    return json.loads(json_str, strict=False)
-                except json.JSONDecodeError:
-                    start_idx = -1
+    first, last = content.find(open_ch), content.rfind(close_ch)
+    if 0 <= first < last:
+        try:
+            result = json.loads(content[first:last + 1], strict=False)
+            if isinstance(result, expected_type or object):
+                return result
+        except json.JSONDecodeError:
+            pass
 
     return None
 
 
+def extract_json(content: str) -> Optional[Dict]:
+    """
+    从 LLM 响应中提取 JSON (支持多种格式)
+
+    单遍扫描策略:
+    1. 去除代码块标记后直接解析整个内容
+    2. 感知字符串的括号配对，找出顶层 JSON 对象逐个解析
+    3. 兜底解析第一个 { 到最后一个 } 之间的内容
+
+    Args:
+        content: LLM 响应文本
+
+    Returns:
+        解析后的字典，如果失败返回 None
+    """
+    if not content:
+        return None
+    return _extract_json_value(content, "{", "}", None)
+
+
 def sanitize_json(text: str) -> str:
     """
     修复 LLM 生成的非法转义字符
@@ -99,28 +165,114 @@ def extract_json_array(content: str) -> Optional[list]:
     """
     if not content:
         return None
+    return _extract_json_value(content, "[", "]", list)
 
-    content = sanitize_json(content)
 
-    # 方法1: 直接解析
-    try:
-        result = json.loads(content, strict=False)
-        if isinstance(result, list):
-            return result
-    except json.JSONDecodeError:
-        pass
+def _build_chat_request(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0
+):
+    """
+    构造 chat-completions 请求 (同步/异步共用)
 
-    # 方法2: 正则匹配数组
-    array_match = re.search(r'\[[\s\S]*\]', content)
-    if array_match:
-        try:
-            result = json.loads(array_match.group(), strict=False)
-            if isinstance(result, list):
-                return result
-        except json.JSONDecodeError:
-            pass
+    Returns:
+        (api_url, headers, payload)
+    """
+    api_key = config.LLM_API_KEY
+    api_url = config.LLM_API_URL
+    model = model or config.LLM_MODEL
 
-    return None
+    headers = llm_transport.build_headers(api_url, api_key)
+
+    payload = {
+        "model": model,
+        "messages": llm_transport.build_messages(prompt, system_prompt),
+        "temperature": temperature,
+        "max_tokens": 8192
+    }
+
+    return api_url, headers, payload
+
+
+def _parse_chat_response(resp):
+    """
+    解析 chat-completions 响应 (兼容 requests / httpx Response)
+
+    Returns:
+        (content, usage)；状态码或格式异常时 content 为 None (调用方决定是否重试)
+    """
+    if resp.status_code == 200:
+        data = resp.json()
+        if 'choices' in data:
+            return data['choices'][0]['message']['content'], data.get('usage')
+        print(f"   ⚠️ LLM 响应格式异常: {data}")
+        return None, None
+
+    print(f"   ⚠️ LLM 错误 [{resp.status_code}]: {resp.text[:200]}")
+    return None, None
+
+
+def _record_call(payload: Dict, started: float, retries: int, status: str, usage: Dict = None, stream: bool = False,
+                 provider: str = None):
+    """
+    写入 LLM 计量 (shared/llm_metrics.py)，调用方 Skill 由调用栈 / caller_scope 识别
+
+    payload 应为路由后实际发送的请求体: 不同服务商的模型名 (及单价) 可能不同
+    """
+    llm_metrics.get_metrics().record_call(
+        model=payload.get("model"),
+        provider=provider,
+        usage=usage,
+        latency=time.monotonic() - started,
+        retries=retries,
+        status=status,
+        cached=status == "cache",
+        stream=stream
+    )
+
+
+def _served_by(resp, payload: Dict):
+    """LLMRouter 标记的实际响应 (请求体, 服务商名)；未标记时为原请求"""
+    model, provider = getattr(resp, "llm_model", None), getattr(resp, "llm_provider", None)
+    if not isinstance(model, str):
+        return payload, None
+    return {**payload, "model": model}, provider if isinstance(provider, str) else None
+
+
+def _cache_lookup(api_url: str, payload: Dict, use_cache: bool):
+    """
+    查询响应缓存
+
+    Returns:
+        (cache_key, cached_content)；未启用缓存时 cache_key 为 None
+    """
+    if not use_cache:
+        return None, None
+    cache_key = llm_cache.make_key(payload, api_url)
+    return cache_key, llm_cache.get_cache().get(cache_key)
+
+
+def _cache_store(cache_key: Optional[str], content: str, cache_validator: Callable[[str], bool] = None):
+    """写入响应缓存 (空响应或未通过校验的响应不缓存，避免重跑时复用坏结果)"""
+    if not cache_key or not content:
+        return
+    if cache_validator and not cache_validator(content):
+        return
+    llm_cache.get_cache().set(cache_key, content)
+
+
+def _json_cache_validator(required_fields=None, validator: Callable[[Dict], bool] = None) -> Callable[[str], bool]:
+    """JSON 响应的缓存校验: 可解析、必填字段非空，且通过调用方的业务校验"""
+    def check(content: str) -> bool:
+        data = extract_json(content)
+        return _has_fields(data, required_fields) and (validator is None or bool(validator(data)))
+    return check
+
+
+def _is_json_array(content: str) -> bool:
+    return extract_json_array(content) is not None
 
 
 def call_llm_with_retry(
@@ -129,7 +281,9 @@ def call_llm_with_retry(
     model: str = None,
     temperature: float = 1.0,
     max_retries: int = 2,
-    retry_delay: float = 1.0
+    retry_delay: float = 1.0,
+    use_cache: bool = True,
+    cache_validator: Callable[[str], bool] = None
 ) -> str:
     """
     带重试机制的 LLM 调用
@@ -140,72 +294,44 @@ def call_llm_with_retry(
         model: 模型名称 (默认使用 config.LLM_MODEL)
         temperature: 温度参数
         max_retries: 最大重试次数
-        retry_delay: 重试延迟（秒）
+        retry_delay: 非限流错误 (5xx/超时) 的重试延迟（秒），429 由限流器按 Retry-After 等待
+        use_cache: 是否使用响应缓存 (追求多样性的高温度创作可传 False)
+        cache_validator: 可选校验函数，仅当返回 True 时写入缓存
 
     Returns:
         LLM 响应内容
     """
-    api_key = config.LLM_API_KEY
-    api_url = config.LLM_API_URL
-    model = model or config.LLM_MODEL
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    api_url, headers, payload = _build_chat_request(prompt, system_prompt, model, temperature)
 
-    # 针对 OpenRouter/DeepSeek 的特殊头
-    if "openrouter" in api_url or "deepseek" in api_url:
-        headers["HTTP-Referer"] = "https://github.com/jememouse/deepseek-feisu-cms"
-        headers["X-Title"] = "DeepSeek CMS Agent"
-
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": 8192
-    }
+    started = time.monotonic()
+    cache_key, cached = _cache_lookup(api_url, payload, use_cache)
+    if cached is not None:
+        _record_call(payload, started, 0, "cache")
+        return cached
 
     for attempt in range(max_retries + 1):
+        throttled = False
         try:
-            resp = requests.post(api_url, headers=headers, json=payload, timeout=90)
-
-            if resp.status_code == 200:
-                data = resp.json()
-                if 'choices' in data:
-                    return data['choices'][0]['message']['content']
-                else:
-                    print(f"   ⚠️ LLM 响应格式异常: {data}")
-                    if attempt < max_retries:
-                        time.sleep(retry_delay * (attempt + 1))
-                        continue
-                    return ""
-            else:
-                print(f"   ⚠️ LLM 错误 [{resp.status_code}]: {resp.text[:200]}")
-                if attempt < max_retries:
-                    time.sleep(retry_delay * (attempt + 1))
-                    continue
-                return ""
+            resp = llm_router.get_router().post(api_url, headers, payload, timeout=90)
+            throttled = resp.status_code == 429
+            content, usage = _parse_chat_response(resp)
+            if content is not None:
+                _cache_store(cache_key, content, cache_validator)
+                served_payload, served_provider = _served_by(resp, payload)
+                _record_call(served_payload, started, attempt, "ok", usage, provider=served_provider)
+                return content
 
         except requests.exceptions.Timeout:
             print(f"   ⚠️ LLM 请求超时 (尝试 {attempt + 1}/{max_retries + 1})")
-            if attempt < max_retries:
-                time.sleep(retry_delay * (attempt + 1))
-                continue
-            return ""
 
         except Exception as e:
             print(f"   ❌ LLM 请求异常: {e}")
-            if attempt < max_retries:
-                time.sleep(retry_delay * (attempt + 1))
-                continue
-            return ""
 
+        # 429 的等待由限流器按 Retry-After 在下次发送前完成，此处只对其他错误退避
+        if attempt < max_retries and not throttled:
+            time.sleep(retry_delay * (attempt + 1))
+
+    _record_call(payload, started, max_retries, "failed", stream=payload.get("stream", False))
     return ""
 
 
@@ -214,7 +340,9 @@ def call_llm_json(
     system_prompt: str = None,
     model: str = None,
     temperature: float = 1.0,
-    max_retries: int = 2
+    max_retries: int = 2,
+    use_cache: bool = True,
+    validator: Callable[[Dict], bool] = None
 ) -> Optional[Dict]:
     """
     调用 LLM 并自动解析 JSON 响应
@@ -225,6 +353,8 @@ def call_llm_json(
         model: 模型名称
         temperature: 温度参数
         max_retries: 最大重试次数
+        use_cache: 是否使用响应缓存
+        validator: 可选的结果校验函数 (参数为解析后的 JSON)，未通过时不写入缓存，重跑会重新生成
 
     Returns:
         解析后的 JSON 字典，失败返回 None
@@ -234,7 +364,9 @@ def call_llm_json(
         system_prompt=system_prompt,
         model=model,
         temperature=temperature,
-        max_retries=max_retries
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_json_cache_validator(validator=validator)
     )
 
     if not content:
@@ -248,7 +380,8 @@ def call_llm_json_array(
     system_prompt: str = None,
     model: str = None,
     temperature: float = 1.0,
-    max_retries: int = 2
+    max_retries: int = 2,
+    use_cache: bool = True
 ) -> Optional[list]:
     """
     调用 LLM 并自动解析 JSON 数组响应
@@ -259,6 +392,7 @@ def call_llm_json_array(
         model: 模型名称
         temperature: 温度参数
         max_retries: 最大重试次数
+        use_cache: 是否使用响应缓存
 
     Returns:
         解析后的 JSON 列表，失败返回 None
@@ -268,10 +402,513 @@ def call_llm_json_array(
         system_prompt=system_prompt,
         model=model,
         temperature=temperature,
-        max_retries=max_retries
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_is_json_array
+    )
+
+    if not content:
+        return None
+
+    return extract_json_array(content)
+
+
+# ==================== 流式接口 ====================
+
+def _has_fields(data: Optional[Dict], required_fields) -> bool:
+    """JSON 对象是否包含全部必填字段 (且非空)"""
+    return isinstance(data, dict) and all(data.get(f) for f in (required_fields or ()))
+
+
+def _stream_options(idle_timeout: float = None, max_ttfb: float = None):
+    """
+    返回 (idle_timeout, max_ttfb, 首个 socket 读取超时)
+
+    首个内容到达前按 max_ttfb 等待；之后每读一行由 llm_transport.set_read_timeout
+    收紧为距空闲截止时间的剩余秒数
+    """
+    idle_timeout = idle_timeout or config.LLM_STREAM_IDLE_TIMEOUT
+    max_ttfb = max_ttfb or config.LLM_STREAM_MAX_TTFB
+    return idle_timeout, max_ttfb, max_ttfb
+
+
+def _finish_stream(acc: "llm_stream.StreamAccumulator", cache_key: Optional[str], cache_validator,
+                   payload: Dict, started: float, attempt: int, provider=None) -> str:
+    """
+    结束一次流式调用: 记录 TTFB / 总耗时 / Token 用量并写入缓存
+
+    payload / provider 为路由后实际发送的请求体与服务商
+    """
+    content = acc.finish()
+    monitor = get_monitor()
+    if acc.stats.ttfb is not None:
+        monitor.record("llm.stream.ttfb", acc.stats.ttfb)
+    monitor.record("llm.stream.total", acc.stats.elapsed)
+    if content:
+        _cache_store(cache_key, content, cache_validator)
+        _record_call(payload, started, attempt, "ok", acc.usage, stream=True,
+                     provider=provider.name if provider is not None else None)
+    return content
+
+
+def call_llm_stream(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    retry_delay: float = 1.0,
+    use_cache: bool = True,
+    cache_validator: Callable[[str], bool] = None,
+    idle_timeout: float = None,
+    max_ttfb: float = None,
+    on_progress: Callable[["llm_stream.StreamStats"], Optional[bool]] = None
+) -> str:
+    """
+    流式 (SSE) LLM 调用，适合长文章生成
+
+    与 call_llm_with_retry 的区别:
+    - 不设总超时，只要服务端持续输出就一直接收
+    - 超过 idle_timeout 秒没有新内容、或 max_ttfb 秒内没有首个内容则中止并重试
+    - 连接中途断开但 JSON 对象已完整输出时，直接使用已收到的内容
+
+    Args:
+        同 call_llm_with_retry，另外:
+        idle_timeout: 空闲超时（秒，默认 config.LLM_STREAM_IDLE_TIMEOUT）
+        max_ttfb: 首字节超时（秒，默认 config.LLM_STREAM_MAX_TTFB）
+        on_progress: 进度回调，参数为 StreamStats (ttfb / chars / completed_fields ...)，
+                     返回 False 可提前中止本次生成
+
+    Returns:
+        LLM 响应内容，失败返回空字符串
+    """
+    api_url, headers, payload = _build_chat_request(prompt, system_prompt, model, temperature)
+
+    started = time.monotonic()
+    cache_key, cached = _cache_lookup(api_url, payload, use_cache)
+    if cached is not None:
+        _record_call(payload, started, 0, "cache")
+        return cached
+
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    idle_timeout, max_ttfb, read_timeout = _stream_options(idle_timeout, max_ttfb)
+
+    router = llm_router.get_router()
+
+    for attempt in range(max_retries + 1):
+        throttled = ok = False
+        acc = llm_stream.StreamAccumulator(idle_timeout, max_ttfb, on_progress)
+        provider, url, req_headers, req_payload = router.route(api_url, headers, payload)
+        try:
+            with llm_transport.stream_post(
+                url, headers=req_headers, json=req_payload,
+                connect_timeout=config.LLM_STREAM_CONNECT_TIMEOUT, read_timeout=read_timeout
+            ) as resp:
+                throttled = resp.status_code == 429
+                if resp.status_code != 200:
+                    print(f"   ⚠️ LLM 错误 [{resp.status_code}]: {resp.text[:200]}")
+                else:
+                    for line in resp.iter_lines():
+                        if acc.feed_line(line):
+                            break
+                        llm_transport.set_read_timeout(resp, acc.remaining())
+                    content = _finish_stream(acc, cache_key, cache_validator, req_payload, started, attempt, provider)
+                    if content:
+                        ok = True
+                        return content
+
+        except llm_stream.StreamAborted as e:
+            print(f"   ⚠️ LLM 流式生成中止: {e} (尝试 {attempt + 1}/{max_retries + 1}, 已收到 {acc.stats.chars} 字)")
+
+        except requests.exceptions.RequestException as e:
+            # 读取间隔超过 read_timeout (即首字节 / 空闲截止时间) 时 requests 以 ConnectionError 抛出
+            if acc.parser.done:
+                ok = True
+                return _finish_stream(acc, cache_key, cache_validator, req_payload, started, attempt, provider)
+            try:
+                acc.check_deadline()
+                print(f"   ⚠️ LLM 流式读取中断 (尝试 {attempt + 1}/{max_retries + 1}): {e}")
+            except llm_stream.StreamAborted as aborted:
+                print(f"   ⚠️ LLM 流式生成中止: {aborted} (尝试 {attempt + 1}/{max_retries + 1}, 已收到 {acc.stats.chars} 字)")
+
+        except Exception as e:
+            print(f"   ❌ LLM 请求异常: {e}")
+
+        finally:
+            router.record(provider, acc.stats.elapsed, ok)
+
+        if attempt < max_retries and not throttled:
+            time.sleep(retry_delay * (attempt + 1))
+
+    _record_call(payload, started, max_retries, "failed", stream=payload.get("stream", False))
+    return ""
+
+
+def call_llm_json_stream(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    use_cache: bool = True,
+    required_fields: List[str] = None,
+    validator: Callable[[Dict], bool] = None,
+    **stream_options
+) -> Optional[Dict]:
+    """
+    流式调用 LLM 并解析 JSON 对象
+
+    Args:
+        required_fields: 必填字段 (如 ["title", "html_content"])，缺失时返回 None 且不写入缓存
+        validator: 可选的结果校验函数 (参数为解析后的 JSON)，未通过时不写入缓存
+        **stream_options: idle_timeout / max_ttfb / on_progress，见 call_llm_stream
+
+    Returns:
+        解析后的 JSON 字典，失败返回 None
+    """
+    content = call_llm_stream(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        model=model,
+        temperature=temperature,
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_json_cache_validator(required_fields, validator),
+        **stream_options
+    )
+
+    if not content:
+        return None
+
+    data = extract_json(content)
+    if not _has_fields(data, required_fields):
+        print(f"   ⚠️ LLM 响应缺少必填字段: {required_fields}")
+        return None
+    return data
+
+
+# ==================== 异步接口 ====================
+
+async def acall_llm_with_retry(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    retry_delay: float = 1.0,
+    use_cache: bool = True,
+    cache_validator: Callable[[str], bool] = None
+) -> str:
+    """
+    call_llm_with_retry 的异步版本
+
+    每次请求都会占用目标服务商的 LLMScheduler 槽位 (按服务商/模型限流)，
+    重试等待期间释放槽位，不阻塞其他请求。
+
+    Args:
+        同 call_llm_with_retry
+
+    Returns:
+        LLM 响应内容，失败返回空字符串
+    """
+    api_url, headers, payload = _build_chat_request(prompt, system_prompt, model, temperature)
+
+    started = time.monotonic()
+    cache_key, cached = _cache_lookup(api_url, payload, use_cache)
+    if cached is not None:
+        _record_call(payload, started, 0, "cache")
+        return cached
+
+    for attempt in range(max_retries + 1):
+        throttled = False
+        try:
+            resp = await llm_router.get_router().apost(api_url, headers, payload, timeout=90)
+            throttled = resp.status_code == 429
+            content, usage = _parse_chat_response(resp)
+            if content is not None:
+                _cache_store(cache_key, content, cache_validator)
+                served_payload, served_provider = _served_by(resp, payload)
+                _record_call(served_payload, started, attempt, "ok", usage, provider=served_provider)
+                return content
+
+        except llm_transport.ASYNC_TIMEOUT_ERRORS:
+            print(f"   ⚠️ LLM 请求超时 (尝试 {attempt + 1}/{max_retries + 1})")
+
+        except Exception as e:
+            print(f"   ❌ LLM 请求异常: {e}")
+
+        if attempt < max_retries and not throttled:
+            await asyncio.sleep(retry_delay * (attempt + 1))
+
+    _record_call(payload, started, max_retries, "failed", stream=payload.get("stream", False))
+    return ""
+
+
+async def acall_llm_json(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    use_cache: bool = True,
+    validator: Callable[[Dict], bool] = None
+) -> Optional[Dict]:
+    """call_llm_json 的异步版本"""
+    content = await acall_llm_with_retry(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        model=model,
+        temperature=temperature,
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_json_cache_validator(validator=validator)
+    )
+
+    if not content:
+        return None
+
+    return extract_json(content)
+
+
+async def acall_llm_json_array(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    use_cache: bool = True
+) -> Optional[list]:
+    """call_llm_json_array 的异步版本"""
+    content = await acall_llm_with_retry(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        model=model,
+        temperature=temperature,
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_is_json_array
     )
 
     if not content:
         return None
 
     return extract_json_array(content)
+
+
+async def acall_llm_stream(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    retry_delay: float = 1.0,
+    use_cache: bool = True,
+    cache_validator: Callable[[str], bool] = None,
+    idle_timeout: float = None,
+    max_ttfb: float = None,
+    on_progress: Callable[["llm_stream.StreamStats"], Optional[bool]] = None
+) -> str:
+    """
+    call_llm_stream 的异步版本 (占用 LLMScheduler 槽位直到流结束)
+
+    Args:
+        同 call_llm_stream
+
+    Returns:
+        LLM 响应内容，失败返回空字符串
+    """
+    api_url, headers, payload = _build_chat_request(prompt, system_prompt, model, temperature)
+
+    started = time.monotonic()
+    cache_key, cached = _cache_lookup(api_url, payload, use_cache)
+    if cached is not None:
+        _record_call(payload, started, 0, "cache")
+        return cached
+
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    idle_timeout, max_ttfb, read_timeout = _stream_options(idle_timeout, max_ttfb)
+    scheduler = llm_scheduler.get_scheduler()
+    router = llm_router.get_router()
+
+    for attempt in range(max_retries + 1):
+        throttled = ok = False
+        acc = llm_stream.StreamAccumulator(idle_timeout, max_ttfb, on_progress)
+        provider, url, req_headers, req_payload = router.route(api_url, headers, payload)
+        try:
+            async with scheduler.slot(url, req_payload["model"]):
+                async with llm_transport.astream_post(
+                    url, headers=req_headers, json=req_payload,
+                    connect_timeout=config.LLM_STREAM_CONNECT_TIMEOUT, read_timeout=read_timeout
+                ) as resp:
+                    throttled = resp.status_code == 429
+                    if resp.status_code != 200:
+                        await resp.aread()
+                        print(f"   ⚠️ LLM 错误 [{resp.status_code}]: {resp.text[:200]}")
+                    else:
+                        async for line in llm_stream.aiter_lines_with_deadline(resp.aiter_lines(), acc):
+                            if acc.feed_line(line):
+                                break
+                        content = _finish_stream(acc, cache_key, cache_validator, req_payload, started, attempt, provider)
+                        if content:
+                            ok = True
+                            return content
+
+        except llm_stream.StreamAborted as e:
+            print(f"   ⚠️ LLM 流式生成中止: {e} (尝试 {attempt + 1}/{max_retries + 1}, 已收到 {acc.stats.chars} 字)")
+
+        except Exception as e:
+            if acc.parser.done:
+                ok = True
+                return _finish_stream(acc, cache_key, cache_validator, req_payload, started, attempt, provider)
+            print(f"   ⚠️ LLM 流式读取中断 (尝试 {attempt + 1}/{max_retries + 1}): {e!r}")
+
+        finally:
+            router.record(provider, acc.stats.elapsed, ok)
+
+        if attempt < max_retries and not throttled:
+            await asyncio.sleep(retry_delay * (attempt + 1))
+
+    _record_call(payload, started, max_retries, "failed", stream=payload.get("stream", False))
+    return ""
+
+
+async def acall_llm_json_stream(
+    prompt: str,
+    system_prompt: str = None,
+    model: str = None,
+    temperature: float = 1.0,
+    max_retries: int = 2,
+    use_cache: bool = True,
+    required_fields: List[str] = None,
+    validator: Callable[[Dict], bool] = None,
+    **stream_options
+) -> Optional[Dict]:
+    """call_llm_json_stream 的异步版本"""
+    content = await acall_llm_stream(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        model=model,
+        temperature=temperature,
+        max_retries=max_retries,
+        use_cache=use_cache,
+        cache_validator=_json_cache_validator(required_fields, validator),
+        **stream_options
+    )
+
+    if not content:
+        return None
+
+    data = extract_json(content)
+    if not _has_fields(data, required_fields):
+        print(f"   ⚠️ LLM 响应缺少必填字段: {required_fields}")
+        return None
+    return data
+
+
+def _run_batch(async_func, calls: List[Dict], common: Dict) -> list:
+    """
+    在新的事件循环中并发执行一批异步调用，结果顺序与 calls 一致
+
+    Args:
+        async_func: acall_llm_json / acall_llm_json_array / acall_llm_with_retry
+        calls: 每个元素是一次调用的参数字典 (至少包含 prompt)
+        common: 所有调用共用的默认参数 (被 calls 中的同名参数覆盖)
+    """
+    if not calls:
+        return []
+
+    # 事件循环中的任务看不到同步调用栈，先在此识别调用方 Skill，经 ContextVar 传入各任务
+    caller = llm_metrics.current_caller()
+
+    async def _gather():
+        try:
+            return await asyncio.gather(*[async_func(**{**common, **c}) for c in calls])
+        finally:
+            await llm_transport.aclose_async_client()
+
+    with llm_metrics.caller_scope(caller):
+        return list(asyncio.run(_gather()))
+
+
+def call_llm_batch(calls: List[Dict], **common) -> List[str]:
+    """
+    同步接口: 并发执行 N 次 LLM 调用 (供现有同步 Runner 使用)
+
+    Args:
+        calls: 参数字典列表，例如 [{"prompt": "..."}, {"prompt": "...", "temperature": 0.3}]
+        **common: 公共参数，例如 system_prompt="...", max_retries=2
+
+    Returns:
+        响应内容列表 (与 calls 顺序一致，失败项为空字符串)
+
+    示例:
+        results = call_llm_batch(
+            [{"prompt": p} for p in prompts],
+            temperature=0.7
+        )
+    """
+    return _run_batch(acall_llm_with_retry, calls, common)
+
+
+def call_llm_json_batch(calls: List[Dict], **common) -> List[Optional[Dict]]:
+    """同步接口: 并发执行 N 次 call_llm_json，失败项为 None"""
+    return _run_batch(acall_llm_json, calls, common)
+
+
+def call_llm_json_array_batch(calls: List[Dict], **common) -> List[Optional[list]]:
+    """同步接口: 并发执行 N 次 call_llm_json_array，失败项为 None"""
+    return _run_batch(acall_llm_json_array, calls, common)
+
+
+def call_llm_json_stream_batch(calls: List[Dict], **common) -> List[Optional[Dict]]:
+    """同步接口: 并发执行 N 次 call_llm_json_stream，失败项为 None"""
+    return _run_batch(acall_llm_json_stream, calls, common)
+
+
+def map_in_batches(items: list, batch_size: int, run_batches: Callable[[List[list]], List[Optional[list]]]) -> list:
+    """
+    把 items 按 batch_size 打包成多项 Prompt 调用，单项解析失败时拆分重试
+
+    每一轮把所有待处理分组交给 run_batches (可在内部并发)；
+    组内失败的条目拆成两半进入下一轮，直到单条仍失败为止。
+
+    Args:
+        items: 待处理条目
+        batch_size: 每组条目数 (<=1 时逐条调用)
+        run_batches: 接收分组列表，返回与分组对齐的结果列表；
+                     每组结果是与组内条目对齐的列表 (失败项为 None)，整组失败可返回 None
+
+    Returns:
+        与 items 对齐的结果列表 (最终失败项为 None)
+
+    示例:
+        titles = map_in_batches(trends, 5, lambda groups: [gen(g) for g in groups])
+    """
+    results = [None] * len(items)
+    size = max(1, batch_size or 1)
+    pending = [list(range(i, min(i + size, len(items)))) for i in range(0, len(items), size)]
+
+    while pending:
+        outputs = run_batches([[items[i] for i in group] for group in pending])
+        next_round = []
+        for group, output in zip(pending, outputs):
+            output = output if output and len(output) == len(group) else [None] * len(group)
+            failed = []
+            for idx, value in zip(group, output):
+                if value is None:
+                    failed.append(idx)
+                else:
+                    results[idx] = value
+            if not failed or len(group) == 1:
+                continue
+            if len(failed) == 1:
+                next_round.append(failed)
+            else:
+                half = (len(failed) + 1) // 2
+                next_round.extend([failed[:half], failed[half:]])
+            print(f"   ✂️ [Batch] {len(failed)}/{len(group)} 项解析失败，拆分重试")
+        pending = next_round
+
+    return results
@@ -0,0 +1,461 @@
+"""
+本地 Mock LLM 服务 (OpenAI 兼容 /v1/chat/completions)
+离线压测用: 按 Prompt 识别调用方 Skill，返回格式合法的固定内容，可配置延迟分布、429 / 5xx 注入与 SSE 流式输出
+
+相同种子 + 相同请求 (同一 Prompt 的第 N 次请求) 得到相同的内容、延迟与故障，结果可复现。
+
+用法:
+    python -m shared.mock_llm_server --port 8765 --latency uniform:0.2,1.5 --rate-429 0.05
+    export LLM_API_URL=http://127.0.0.1:8765/v1/chat/completions
+    python step2_article/agent_runner.py
+
+    # 测试中
+    with MockLLMServer(port=0, latency="fixed:0") as server:
+        config.LLM_API_URL = server.url
+"""
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from shared import config
+
+CATEGORIES = ["专业知识", "行业资讯", "产品介绍"]
+INTENTS = ["信息型", "商业型", "导航型"]
+PRODUCTS = ["飞机盒", "礼盒", "瓦楞纸箱", "天地盖", "手提袋", "抽屉盒"]
+TITLE_TEMPLATES = [
+    "{product}怎么选？{topic}带火的{n}个新需求",
+    "{topic}之后，{product}定制价格揭秘",
+    "{n}种{product}工艺对比：从{topic}说起",
+    "源头厂解读{topic}：{product}避坑清单",
+    "为什么{topic}让{product}订单翻倍？",
+]
+
+
+# ---------- 延迟分布 ----------
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布配置
+
+    Args:
+        spec: "0.5" / "fixed:0.5" / "uniform:0.2,1.5" / "normal:1.0,0.3" / "lognormal:0.8,0.5"
+              (lognormal 的参数为中位数秒数与对数标准差)
+
+    Returns:
+        rng -> 延迟秒数 (非负)
+    """
+    kind, _, args = (spec or "0").partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    params = [float(x) for x in args.split(",") if x.strip()]
+
+    if kind == "fixed":
+        return lambda rng: max(0.0, params[0])
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(max(params[0], 1e-6)), params[1])
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+# ---------- 各 Skill 的固定响应 ----------
+
+def _find(pattern: str, text: str, default=None):
+    match = re.search(pattern, text)
+    return match.group(1) if match else default
+
+
+def _titles(rng: random.Random, topic: str, count: int, with_intent: bool) -> List[Dict]:
+    titles = []
+    for i in range(count):
+        item = {
+            "title": rng.choice(TITLE_TEMPLATES).format(topic=topic[:10], product=rng.choice(PRODUCTS), n=rng.randint(3, 9)),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        }
+        if with_intent:
+            item["intent"] = INTENTS[i % len(INTENTS)]
+        titles.append(item)
+    return titles
+
+
+def _article(prompt: str, rng: random.Random) -> str:
+    """DeepWriteSkill: 文章 JSON"""
+    title = _find(r'直接使用输入的 "(.+?)" 作为 H1', prompt, "Mock 包装行业文章")
+    sections = "".join(
+        f"<h2>第{i + 1}部分: {rng.choice(PRODUCTS)}的选材与工艺</h2>"
+        f"<p>{'这是用于压测的固定段落内容，长度接近真实文章。' * 8}</p>"
+        for i in range(rng.randint(6, 10))
+    )
+    article = {
+        "title": title,
+        "html_content": f"<h1>{title}</h1>{sections}",
+        "category_id": _find(r'"category_id": "(\w+)"', prompt, "1"),
+        "summary": f"{title} 的要点总结。",
+        "keywords": ",".join(rng.sample(PRODUCTS, 3)),
+        "description": f"{title} - Mock 描述",
+        "tags": ",".join(rng.sample(PRODUCTS, 2)),
+        "one_line_summary": f"{title} 一句话总结",
+        "key_points": ["核心观点1", "核心观点2", "核心观点3"],
+        "schema_faq": [{"question": f"Q{i}?", "answer": f"A{i}."} for i in range(1, 4)],
+        "article_schema": {"@type": "Article", "headline": title},
+        "og_tags": {"og:title": title},
+        "url_slug": f"mock-article-{rng.randint(1000, 9999)}",
+        "reading_time_minutes": 5,
+    }
+    return json.dumps(article, ensure_ascii=False)
+
+
+def _trend_selection(prompt: str, rng: random.Random) -> str:
+    """TopicAnalysisSkill._analyze_trends: 热点筛选列表"""
+    count = int(_find(r"务必挑选出 (\d+) 个", prompt, "5"))
+    trends = re.findall(r"^\s*- (.+)$", prompt.split("热搜列表", 1)[-1], re.M)
+    picked = [re.sub(r"\[.*?\]\s*", "", t).strip() for t in trends[:count]]
+    return json.dumps([
+        {"topic": t, "angle": f"结合{rng.choice(PRODUCTS)}场景", "priority": rng.choice("SAB")}
+        for t in picked
+    ], ensure_ascii=False)
+
+
+def _title_batch(prompt: str, rng: random.Random) -> str:
+    """批量标题: {"1": [...], "2": [...]}"""
+    count = int(_find(r"生成 (\d+) 个", prompt, "3"))
+    topics = re.findall(r"^\s*\[(\d+)\] (.+?) \(", prompt, re.M)
+    with_intent = '"intent"' in prompt
+    return json.dumps(
+        {n: _titles(rng, topic, count, with_intent) for n, topic in topics},
+        ensure_ascii=False
+    )
+
+
+def _title_list(prompt: str, rng: random.Random) -> str:
+    """单个热点标题列表"""
+    count = int(_find(r"生成 (\d+) 个", prompt, "3"))
+    topic = _find(r"热点：(.+?) \(", prompt) or _find(r'热点话题"(.+?)"', prompt, "包装")
+    return json.dumps(_titles(rng, topic, count, '"intent"' in prompt), ensure_ascii=False)
+
+
+def _social_note(prompt: str, rng: random.Random) -> str:
+    """SocialWriterSkill / XHSRewriterSkill: 笔记 JSON"""
+    limit = int(_find(r"标题必须≤(\d+)字", prompt, "18"))
+    note = {
+        "title": f"{rng.choice(PRODUCTS)}避坑指南"[:limit],
+        "content": "姐妹们！今天分享包装定制的小技巧～\n" + "1. 选对材质很重要\n" * 5,
+        "keywords": rng.sample(PRODUCTS, 3),
+    }
+    return json.dumps(note, ensure_ascii=False)
+
+
+def _compressed_title(prompt: str, rng: random.Random) -> str:
+    """SocialManagerAgent._compress_title: 纯文本短标题"""
+    max_len = int(_find(r"压缩到 (\d+) 字以内", prompt, "20"))
+    original = _find(r"【原标题】：(.+?)（", prompt, "包装标题")
+    return original[:max_len]
+
+
+# (名称, 识别条件, 生成函数)，按顺序匹配
+RESPONDERS: List[Tuple[str, Callable[[str], bool], Callable[[str, random.Random], str]]] = [
+    ("compress_title", lambda p: "标题压缩专家" in p, _compressed_title),
+    ("deep_write", lambda p: '"html_content"' in p, _article),
+    ("trend_selection", lambda p: "务必挑选出" in p, _trend_selection),
+    ("title_batch", lambda p: "键为热点编号" in p, _title_batch),
+    ("title_list", lambda p: '"title": "标题1"' in p, _title_list),
+    ("social_note", lambda p: "content" in p and "keywords" in p, _social_note),
+]
+
+
+def render_response(prompt: str, rng: random.Random) -> Tuple[str, str]:
+    """
+    按 Prompt 识别调用方并生成响应内容
+
+    Returns:
+        (调用方名称, 响应文本)
+    """
+    for name, match, render in RESPONDERS:
+        if match(prompt):
+            return name, render(prompt, rng)
+    return "default", "这是 Mock LLM 的固定回复。"
+
+
+# ---------- HTTP 服务 ----------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_HTTPServer"
+
+    def log_message(self, format, *args):
+        if self.server.mock.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.mock.get_stats())
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": config.LLM_MODEL, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+        self.server.mock.handle(self, payload)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockLLMServer"
+
+
+class MockLLMServer:
+    """
+    OpenAI 兼容的本地 Mock 服务
+
+    用法:
+        server = MockLLMServer(port=0, latency="fixed:0.1", rate_429=0.1).start()
+        print(server.url)          # http://127.0.0.1:xxxxx/v1/chat/completions
+        server.get_stats()
+        server.stop()
+    """
+
+    def __init__(
+        self,
+        host: str = None,
+        port: int = None,
+        latency: str = None,
+        rate_429: float = None,
+        rate_5xx: float = None,
+        retry_after: float = None,
+        seed: int = None,
+        chunk_chars: int = None,
+        chunk_delay: float = None,
+        verbose: bool = False
+    ):
+        """
+        初始化 Mock 服务 (参数默认取 config.MOCK_LLM_*)
+
+        Args:
+            host / port: 监听地址 (port=0 时自动分配)
+            latency: 延迟分布，见 parse_latency
+            rate_429: 429 注入比例
+            rate_5xx: 5xx 注入比例
+            retry_after: 429 响应的 Retry-After 秒数
+            seed: 随机种子
+            chunk_chars: 流式每个增量的字符数
+            chunk_delay: 流式增量间隔 (秒)
+            verbose: 是否打印访问日志
+        """
+        self.host = host or config.MOCK_LLM_HOST
+        self.port = config.MOCK_LLM_PORT if port is None else port
+        self.latency = parse_latency(latency or config.MOCK_LLM_LATENCY)
+        self.rate_429 = config.MOCK_LLM_429_RATE if rate_429 is None else rate_429
+        self.rate_5xx = config.MOCK_LLM_5XX_RATE if rate_5xx is None else rate_5xx
+        self.retry_after = config.MOCK_LLM_RETRY_AFTER if retry_after is None else retry_after
+        self.seed = config.MOCK_LLM_SEED if seed is None else seed
+        self.chunk_chars = chunk_chars or config.MOCK_LLM_STREAM_CHUNK_CHARS
+        self.chunk_delay = config.MOCK_LLM_STREAM_CHUNK_DELAY if chunk_delay is None else chunk_delay
+        self.verbose = verbose
+
+        self._httpd: Optional[_HTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._attempts: Dict[str, int] = {}
+        self._stats = {"requests": 0, "ok": 0, "stream": 0, "429": 0, "5xx": 0, "by_skill": {}}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2] if self._httpd else (self.host, self.port)
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    # ---------- 生命周期 ----------
+
+    def _bind(self):
+        if self._httpd is None:
+            self._httpd = _HTTPServer((self.host, self.port), _Handler)
+            self._httpd.mock = self
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程启动"""
+        self._bind()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程运行 (命令行模式)"""
+        self._bind()
+        self._httpd.serve_forever()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- 请求处理 ----------
+
+    def _rng_for(self, prompt: str) -> random.Random:
+        """同一 Prompt 的第 N 次请求使用固定的随机序列 (与并发顺序无关)"""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def _count(self, key: str, skill: str = None):
+        with self._lock:
+            self._stats[key] += 1
+            if skill:
+                self._stats["by_skill"][skill] = self._stats["by_skill"].get(skill, 0) + 1
+
+    def handle(self, handler: _Handler, payload: Dict):
+        messages = payload.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        model = payload.get("model") or config.LLM_MODEL
+        rng = self._rng_for(prompt)
+        self._count("requests")
+
+        time.sleep(self.latency(rng))
+
+        roll = rng.random()
+        if roll < self.rate_429:
+            self._count("429")
+            handler._send_json(
+                429,
+                {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit"}},
+                {"Retry-After": f"{self.retry_after:g}", "x-ratelimit-remaining-requests": "0"},
+            )
+            return
+        if roll < self.rate_429 + self.rate_5xx:
+            self._count("5xx")
+            handler._send_json(rng.choice([500, 502, 503]), {"error": {"message": "Upstream error (mock)"}})
+            return
+
+        skill, content = render_response(prompt, rng)
+        usage = {
+            "prompt_tokens": len(prompt) // 2,
+            "completion_tokens": len(content) // 2,
+            "total_tokens": len(prompt) // 2 + len(content) // 2,
+        }
+        completion_id = f"chatcmpl-mock-{rng.getrandbits(48):012x}"
+
+        if payload.get("stream"):
+            self._count("stream", skill)
+            self._stream(handler, completion_id, model, content, usage, payload.get("stream_options") or {})
+            return
+
+        self._count("ok", skill)
+        handler._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, handler: _Handler, completion_id: str, model: str, content: str, usage: Dict, options: Dict):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def event(delta: Dict, finish_reason=None, extra: Dict = None) -> bytes:
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            body.update(extra or {})
+            return f"data: {json.dumps(body, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        try:
+            handler._write_chunk(event({"role": "assistant", "content": ""}))
+            for i in range(0, len(content), self.chunk_chars):
+                if self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                handler._write_chunk(event({"content": content[i:i + self.chunk_chars]}))
+            handler._write_chunk(event({}, "stop"))
+            if options.get("include_usage"):
+                handler._write_chunk(
+                    f"data: {json.dumps({'id': completion_id, 'choices': [], 'usage': usage})}\n\n".encode("utf-8")
+                )
+            handler._write_chunk(b"data: [DONE]\n\n")
+            handler._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端中止 (空闲超时 / 调用方中止)
+
+    def get_stats(self) -> Dict:
+        """
+        获取请求统计
+
+        Returns:
+            {"requests", "ok", "stream", "429", "5xx", "by_skill": {skill: 次数}}
+        """
+        with self._lock:
+            return {**self._stats, "by_skill": dict(self._stats["by_skill"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Mock LLM 服务 (OpenAI 兼容)")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--latency", default=None, help="延迟分布，例如 fixed:0.5 / uniform:0.2,1.5 / lognormal:0.8,0.5")
+    parser.add_argument("--rate-429", type=float, default=None, help="429 注入比例")
+    parser.add_argument("--rate-5xx", type=float, default=None, help="5xx 注入比例")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="打印访问日志")
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        host=args.host, port=args.port, latency=args.latency,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, seed=args.seed, verbose=args.verbose
+    )
+    server._bind()
+    print(f"🧪 Mock LLM 服务已启动: {server.url}")
+    print(f"   export LLM_API_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 请求统计: {server.get_stats()}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+分页迭代工具
+把 "按页拉取" 的接口包装为逐条产出的迭代器，调用方处理当前页时后台预取下一页，
+第一页到达即可开始处理，内存中最多同时保留两页。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+def iter_pages(
+    fetch_page: Callable[[Any], Tuple[List, Optional[Any]]],
+    cursor: Any = None,
+    prefetch: bool = True
+) -> Iterator:
+    """
+    逐条产出分页接口的结果
+
+    Args:
+        fetch_page: fetch_page(cursor) -> (本页记录, 下一页游标)，下一页游标为 None 表示最后一页
+        cursor: 第一页游标
+        prefetch: 是否在调用方处理当前页时后台加载下一页
+
+    Yields:
+        单条记录
+    """
+    if not prefetch:
+        while True:
+            items, cursor = fetch_page(cursor)
+            yield from items
+            if cursor is None:
+                return
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+    try:
+        future = executor.submit(fetch_page, cursor)
+        while future is not None:
+            items, cursor = future.result()
+            future = executor.submit(fetch_page, cursor) if cursor is not None else None
+            yield from items
+    finally:
+        # 调用方提前结束迭代时不等待正在预取的页
+        executor.shutdown(wait=False)
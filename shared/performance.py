@@ -110,6 +110,17 @@ class PerformanceMonitor:
             self._record(block_name, duration)
             logger.debug(f"⏱️ [{block_name}] 耗时: {duration:.3f}s")
 
+    def record(self, name: str, duration: float):
+        """
+        手动记录一次耗时 (用于无法用装饰器包裹的指标，如流式首字节时间)
+
+        Args:
+            name: 指标名称
+            duration: 耗时（秒）
+        """
+        if self.enable:
+            self._record(name, duration)
+
     def _record(self, name: str, duration: float):
         """记录执行时间"""
         if name not in self._stats:
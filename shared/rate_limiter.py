@@ -0,0 +1,317 @@
+"""
+自适应限流器
+按 (API host, API Key) 维护令牌桶，根据 429 / Retry-After / x-ratelimit-* 响应头动态调整速率
+
+替代各处固定的 time.sleep：服务商空闲时全速请求，收到限流信号后自动降速。
+"""
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlparse
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+
+def _header(headers: Mapping, name: str) -> Optional[str]:
+    """读取响应头 (大小写不敏感，仅接受字符串值)"""
+    if headers is None:
+        return None
+    try:
+        value = headers.get(name)
+        if value is None:
+            value = headers.get(name.lower())
+    except Exception:
+        return None
+    return value if isinstance(value, str) and value.strip() else None
+
+
+def parse_retry_after(value: Optional[str], now: float = None) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 秒数 ("30") 或 HTTP 日期 ("Wed, 21 Oct 2015 07:28:00 GMT")
+
+    Returns:
+        需要等待的秒数，无法解析返回 None
+    """
+    if not value:
+        return None
+    now = now or time.time()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value: Optional[str], now: float = None) -> Optional[float]:
+    """
+    解析 x-ratelimit-reset* 响应头
+
+    支持的格式:
+    - 时长: "1s" / "6m0s" / "20ms" (OpenAI / DeepSeek 风格)
+    - Unix 时间戳: 秒 (1.7e9) 或毫秒 (1.7e12，OpenRouter 风格)
+    - 纯数字秒数: "12"
+
+    Returns:
+        距离重置的秒数，无法解析返回 None
+    """
+    if not value:
+        return None
+    now = now or time.time()
+    value = value.strip()
+
+    try:
+        number = float(value)
+        if number > 1e12:      # 毫秒时间戳
+            return max(0.0, number / 1000 - now)
+        if number > 1e9:       # 秒时间戳
+            return max(0.0, number - now)
+        return max(0.0, number)
+    except ValueError:
+        pass
+
+    total, num = 0.0, ""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            num += ch
+            i += 1
+            continue
+        unit = "ms" if value[i:i + 2] == "ms" else ch
+        if unit not in units or not num:
+            return None
+        total += float(num) * units[unit]
+        num = ""
+        i += len(unit)
+    return total if not num else None
+
+
+class TokenBucket:
+    """
+    自适应令牌桶 (AIMD)
+
+    - 每次请求消耗 1 个令牌，令牌按 rate 个/秒 恢复，最多积累 capacity 个
+    - 连续成功: 速率线性增加 (additive increase)，上限 max_rate
+    - 收到 429: 速率减半 (multiplicative decrease)，并暂停到 Retry-After 指定时间
+    - x-ratelimit-remaining 为 0 时暂停到 x-ratelimit-reset
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, max_rate: float, increase: float = None):
+        """
+        Args:
+            increase: 每次成功的提速步长 (默认 config.LLM_RATE_LIMIT_INCREASE)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled_count = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self, max_wait: float = None) -> float:
+        """
+        预订一个令牌
+
+        Args:
+            max_wait: 需要等待超过该秒数时不预订 (不消耗令牌)，只返回等待时长
+
+        Returns:
+            调用方在发送请求前需要等待的秒数 (0 表示立即发送)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+            wait = max(wait, self.blocked_until - now)
+            if max_wait is None or wait <= max_wait:
+                self.tokens -= 1
+            return wait
+
+    def on_success(self):
+        """成功响应: 线性提速"""
+        with self._lock:
+            step = config.LLM_RATE_LIMIT_INCREASE if self.increase is None else self.increase
+            self.rate = min(self.max_rate, self.rate + step)
+
+    def on_throttle(self, retry_after: Optional[float]):
+        """
+        限流响应: 速率减半，并在 retry_after 秒内阻止新请求
+
+        Args:
+            retry_after: 服务端建议的等待秒数 (None 时按当前速率估算)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttled_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            delay = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.tokens = min(self.tokens, 0)
+
+    def block_for(self, seconds: float):
+        """配额耗尽 (remaining=0): 暂停到重置时间，不调整速率"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应限流器 (按 API host + API Key 分桶)
+
+    用法:
+        limiter = get_rate_limiter()
+
+        limiter.acquire(api_url, api_key)              # 同步等待令牌
+        await limiter.aacquire(api_url, api_key)       # 异步等待令牌
+
+        resp = session.post(...)
+        limiter.update_from_response(api_url, api_key, resp.status_code, resp.headers)
+    """
+
+    def __init__(self, rate: float = None, burst: float = None, min_rate: float = None,
+                 max_rate: float = None, enabled: bool = None):
+        """
+        初始化限流器
+
+        Args:
+            rate: 初始速率 (请求/秒，默认 config.LLM_RATE_LIMIT_RPS)
+            burst: 令牌桶容量 (默认 config.LLM_RATE_LIMIT_BURST)
+            min_rate: 最低速率 (默认 config.LLM_RATE_LIMIT_MIN_RPS)
+            max_rate: 最高速率 (默认 config.LLM_RATE_LIMIT_MAX_RPS)
+            enabled: 是否启用 (默认 config.LLM_RATE_LIMIT_ENABLED)
+        """
+        self.rate = rate or config.LLM_RATE_LIMIT_RPS
+        self.burst = burst or config.LLM_RATE_LIMIT_BURST
+        self.min_rate = min_rate or config.LLM_RATE_LIMIT_MIN_RPS
+        self.max_rate = max_rate or config.LLM_RATE_LIMIT_MAX_RPS
+        self.enabled = config.LLM_RATE_LIMIT_ENABLED if enabled is None else enabled
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_key(api_url: str, api_key: str = "") -> str:
+        """桶标识: host + API Key 指纹 (不保存明文 Key)"""
+        host = urlparse(api_url).netloc or api_url
+        fingerprint = hashlib.sha1((api_key or "").encode("utf-8")).hexdigest()[:8]
+        return f"{host}#{fingerprint}"
+
+    def bucket_for(self, api_url: str, api_key: str = "") -> TokenBucket:
+        key = self.bucket_key(api_url, api_key)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rate, self.burst, self.min_rate, self.max_rate)
+            return self._buckets[key]
+
+    def acquire(self, api_url: str, api_key: str = ""):
+        """同步获取令牌 (必要时阻塞等待)"""
+        if not self.enabled:
+            return
+        wait = self.bucket_for(api_url, api_key).reserve()
+        if wait > 0:
+            logger.debug(f"⏳ [RateLimit] {self.bucket_key(api_url, api_key)} 等待 {wait:.2f}s")
+            time.sleep(wait)
+
+    async def aacquire(self, api_url: str, api_key: str = ""):
+        """异步获取令牌 (必要时 await 等待，不阻塞事件循环)"""
+        if not self.enabled:
+            return
+        wait = self.bucket_for(api_url, api_key).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update_from_response(self, api_url: str, api_key: str, status_code: int, headers: Mapping = None) -> Optional[float]:
+        """
+        根据响应状态码与响应头调整速率
+
+        Args:
+            api_url: 接口地址
+            api_key: API Key
+            status_code: HTTP 状态码
+            headers: 响应头
+
+        Returns:
+            429 时返回建议等待秒数 (可能为 None)，其他情况返回 None
+        """
+        if not self.enabled or not isinstance(status_code, int):
+            return None
+
+        bucket = self.bucket_for(api_url, api_key)
+
+        if status_code == 429:
+            retry_after = parse_retry_after(_header(headers, "Retry-After"))
+            if retry_after is None:
+                retry_after = parse_reset(
+                    _header(headers, "x-ratelimit-reset-requests") or _header(headers, "X-RateLimit-Reset")
+                )
+            bucket.on_throttle(retry_after)
+            print(f"   ⏳ [RateLimit] 触发限流，降速至 {bucket.rate:.2f} req/s"
+                  + (f"，{retry_after:.1f}s 后恢复" if retry_after else ""))
+            return retry_after
+
+        if status_code < 400:
+            bucket.on_success()
+            remaining = _header(headers, "x-ratelimit-remaining-requests") or _header(headers, "X-RateLimit-Remaining")
+            if remaining is not None and remaining.strip() in ("0", "0.0"):
+                reset = parse_reset(
+                    _header(headers, "x-ratelimit-reset-requests") or _header(headers, "X-RateLimit-Reset")
+                )
+                if reset:
+                    bucket.block_for(reset)
+        return None
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        获取各桶状态
+
+        Returns:
+            {bucket_key: {"rate": 当前速率, "throttled": 429 次数}}
+        """
+        with self._lock:
+            return {
+                key: {"rate": round(bucket.rate, 3), "throttled": bucket.throttled_count}
+                for key, bucket in self._buckets.items()
+            }
+
+
+# 全局限流器
+_global_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """获取全局限流器（单例）"""
+    global _global_limiter
+
+    if _global_limiter is None:
+        _global_limiter = AdaptiveRateLimiter()
+
+    return _global_limiter
+
+
+def set_rate_limiter(limiter: Optional[AdaptiveRateLimiter]):
+    """替换全局限流器 (用于测试)"""
+    global _global_limiter
+    _global_limiter = limiter
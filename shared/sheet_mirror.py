@@ -0,0 +1,340 @@
+"""
+Google Sheets 本地镜像
+把 cms 及各平台工作表复制到本地 SQLite (按 Status / 大项分类 / 生成时间 建索引)，
+fetch_records_by_status 与今日计数直接查本地，读取耗时不再随表格行数增长。
+
+增量同步:
+1. 水位线: 表格的 Drive modifiedTime 未变化时不发起任何 Sheets 读取
+2. 有变化时只读取指纹列 (Status / 生成时间 / 发布时间 + 首列)，
+   与本地指纹不一致的行 (含新增行) 才拉取整行，多出的本地行删除
+3. 每隔 SHEET_MIRROR_FULL_SYNC_HOURS 小时或表头变化时全量重建，兜底手工修改非指纹列的情况
+
+写入仍通过 GoogleSheetClient 写回表格，同时更新本地副本。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import gspread
+from typing import Dict, Iterator, List, Optional
+from shared import config
+from shared.google_client import RECORD_ID_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# 增量同步时用于判断行是否变化的列 (状态流转时都会改写其中之一；Record_ID 可能在建行后才补写)
+FINGERPRINT_COLUMNS = ["Status", "生成时间", "发布时间", RECORD_ID_COLUMN]
+
+
+class SheetMirror:
+    """
+    工作表本地镜像 (包装 GoogleSheetClient，未实现的方法透传给 client)
+
+    用法:
+        client = SheetMirror(GoogleSheetClient())
+        records = client.fetch_records_by_status("Pending", limit=20)   # 查本地
+        client.queue_update(records[0]["record_id"], {"Status": "Published"})
+        today = client.count_by_date("xhs", "2024-01-01")
+    """
+
+    def __init__(self, client, path: str = None, full_sync_hours: float = None):
+        """
+        Args:
+            client: GoogleSheetClient 实例
+            path: SQLite 文件路径 (默认 config.SHEET_MIRROR_FILE)
+            full_sync_hours: 全量重建间隔 (默认 config.SHEET_MIRROR_FULL_SYNC_HOURS)
+        """
+        self.client = client
+        self.path = path or config.SHEET_MIRROR_FILE
+        hours = config.SHEET_MIRROR_FULL_SYNC_HOURS if full_sync_hours is None else full_sync_hours
+        self.full_sync_seconds = hours * 3600
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __getattr__(self, name):
+        # send_notification / flush_updates / create_record 等直接使用原 client
+        return getattr(self.client, name)
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（首次读写时创建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sheet_rows (
+                    sheet TEXT NOT NULL,
+                    row_num INTEGER NOT NULL,
+                    status TEXT,
+                    category TEXT,
+                    gen_time TEXT,
+                    fingerprint TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (sheet, row_num)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sheet_state (
+                    sheet TEXT PRIMARY KEY,
+                    headers TEXT NOT NULL,
+                    watermark TEXT,
+                    full_synced_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sheet_rows_status ON sheet_rows(sheet, status, category)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sheet_rows_gen_time ON sheet_rows(sheet, gen_time)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- 同步 ----------
+
+    def _watermark(self) -> Optional[str]:
+        """表格最后修改时间 (Drive API)，获取失败返回 None (视为已变化)"""
+        try:
+            return str(self.client.spreadsheet.get_lastUpdateTime())
+        except Exception as e:
+            logger.warning(f"⚠️ 获取表格修改时间失败: {e}")
+            return None
+
+    @staticmethod
+    def _fingerprint(values: List[str]) -> str:
+        return json.dumps([str(v) for v in values], ensure_ascii=False)
+
+    @staticmethod
+    def _row_params(sheet_title: str, row_num: int, record: Dict, fingerprint: str) -> tuple:
+        return (
+            sheet_title, row_num,
+            str(record.get("Status", "")), str(record.get("大项分类", "")), str(record.get("生成时间", "")),
+            fingerprint, json.dumps(record, ensure_ascii=False)
+        )
+
+    def sync(self, table_id: str = "cms", force: bool = False) -> int:
+        """
+        同步指定工作表到本地
+
+        Args:
+            table_id: 工作表名
+            force: 强制全量重建
+
+        Returns:
+            本次刷新的行数 (表格未变化时为 0)
+        """
+        client = self.client
+        sheet = client._get_sheet(table_id)
+        if not sheet:
+            raise RuntimeError(f"工作表 {table_id} 不可用")
+
+        with self._lock:
+            conn = self._connect()
+            state = conn.execute(
+                "SELECT headers, watermark, full_synced_at FROM sheet_state WHERE sheet = ?", (sheet.title,)
+            ).fetchone()
+            watermark = self._watermark()
+            now = time.time()
+            full = force or state is None or now - state[2] >= self.full_sync_seconds
+            if not full and watermark is not None and watermark == state[1]:
+                return 0
+
+            headers, _ = client._get_header_map(sheet, refresh=True)
+            if state is not None and json.loads(state[0]) != headers:
+                full = True
+            if not headers:
+                return 0
+
+            fp_cols = [headers[0]] + [c for c in FINGERPRINT_COLUMNS if c in headers and c != headers[0]]
+            fp_idx = [headers.index(c) for c in fp_cols]
+
+            if full:
+                last = client._column_letter(len(headers))
+                values = client._batch_get(sheet, [f"A2:{last}"])[0]
+                params = []
+                for offset, cells in enumerate(values):
+                    cells = list(cells) + [""] * (len(headers) - len(cells))
+                    fingerprint = self._fingerprint([cells[i] for i in fp_idx])
+                    cells = gspread.utils.numericise_all(cells[:len(headers)], default_blank="")
+                    record = {h: cells[i] for i, h in enumerate(headers) if h}
+                    params.append(self._row_params(sheet.title, offset + 2, record, fingerprint))
+                conn.execute("DELETE FROM sheet_rows WHERE sheet = ?", (sheet.title,))
+                row_count = len(values)
+                full_synced_at = now
+            else:
+                columns = client._read_columns(sheet, headers, fp_cols)
+                row_count = max((len(v) for v in columns.values()), default=0)
+                remote = {
+                    i + 2: self._fingerprint([col[i] if i < len(col) else "" for col in columns.values()])
+                    for i in range(row_count)
+                }
+                local = dict(conn.execute(
+                    "SELECT row_num, fingerprint FROM sheet_rows WHERE sheet = ?", (sheet.title,)
+                ).fetchall())
+                changed = [r for r in sorted(remote) if local.get(r) != remote[r]]
+                rows = client._read_rows(sheet, headers, changed)
+                params = [self._row_params(sheet.title, r, rows.get(r, {}), remote[r]) for r in changed]
+                full_synced_at = state[2]
+
+            conn.execute("DELETE FROM sheet_rows WHERE sheet = ? AND row_num > ?", (sheet.title, row_count + 1))
+            conn.executemany("INSERT OR REPLACE INTO sheet_rows VALUES (?, ?, ?, ?, ?, ?, ?)", params)
+            conn.execute(
+                "INSERT OR REPLACE INTO sheet_state VALUES (?, ?, ?, ?)",
+                (sheet.title, json.dumps(headers, ensure_ascii=False), watermark, full_synced_at)
+            )
+            conn.commit()
+
+        mode = "全量" if full else "增量"
+        print(f"   🔄 [Mirror:{sheet.title}] {mode}同步 {len(params)} 行 (共 {row_count} 行)")
+        return len(params)
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def _to_record(row_num: int, data: str, columns: List[str] = None) -> Dict:
+        record = json.loads(data)
+        record_key = str(record.get(RECORD_ID_COLUMN, ""))
+        if columns:
+            record = {c: record.get(c, "") for c in columns}
+        record["record_id"] = record_key or f"row:{row_num}"
+        return record
+
+    def fetch_records_by_status(self, status: str, category: str = None, limit: int = 50,
+                                columns: List[str] = None) -> List[Dict]:
+        """
+        获取指定状态的记录 (接口同 GoogleSheetClient.fetch_records_by_status，查询本地镜像)
+
+        同步失败时回退为直接读取表格。
+        """
+        try:
+            self.sync("cms")
+            sql = "SELECT row_num, data FROM sheet_rows WHERE sheet = ? AND status = ?"
+            params = [self.client._get_sheet("cms").title, status]
+            if category:
+                sql += " AND category = ?"
+                params.append(category)
+            sql += " ORDER BY row_num LIMIT ?"
+            params.append(limit)
+            with self._lock:
+                rows = self._connect().execute(sql, params).fetchall()
+        except Exception as e:
+            print(f"   ⚠️ [Mirror:cms] 本地镜像不可用，直接读取表格: {e}")
+            return self.client.fetch_records_by_status(status, category=category, limit=limit, columns=columns)
+
+        results = [self._to_record(row_num, data, columns) for row_num, data in rows]
+
+        print(f"   📋 [Mirror:cms] 获取 {len(results)} 条 {status} 记录")
+        return results
+
+    def iter_records_by_status(self, status: str, category: str = None, page_size: int = 50,
+                               limit: int = None, columns: List[str] = None, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        逐页产出指定状态的记录 (接口同 GoogleSheetClient.iter_records_by_status)
+
+        同步一次后按行号 keyset 分页查询本地镜像；同步失败时回退为直接分页读取表格。
+        """
+        try:
+            self.sync("cms")
+            title = self.client._get_sheet("cms").title
+        except Exception as e:
+            print(f"   ⚠️ [Mirror:cms] 本地镜像不可用，直接读取表格: {e}")
+            yield from self.client.iter_records_by_status(
+                status, category=category, page_size=page_size, limit=limit, columns=columns, prefetch=prefetch
+            )
+            return
+
+        sql = "SELECT row_num, data FROM sheet_rows WHERE sheet = ? AND status = ? AND row_num > ?"
+        if category:
+            sql += " AND category = ?"
+        sql += " ORDER BY row_num LIMIT ?"
+
+        last_row, count = 0, 0
+        while limit is None or count < limit:
+            size = page_size if limit is None else min(page_size, limit - count)
+            params = [title, status, last_row] + ([category] if category else []) + [size]
+            with self._lock:
+                rows = self._connect().execute(sql, params).fetchall()
+            for row_num, data in rows:
+                yield self._to_record(row_num, data, columns)
+            count += len(rows)
+            if len(rows) < size:
+                return
+            last_row = rows[-1][0]
+
+    def count_by_date(self, table_id: str, date_str: str) -> int:
+        """
+        统计 "生成时间" 以 date_str (YYYY-MM-DD) 开头的记录数 (接口同 GoogleSheetClient.count_by_date)
+
+        同步失败时回退为直接读取表格。
+        """
+        try:
+            self.sync(table_id)
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT COUNT(*) FROM sheet_rows WHERE sheet = ? AND gen_time LIKE ?",
+                    (self.client._get_sheet(table_id).title, f"{date_str}%")
+                ).fetchone()
+            return row[0]
+        except Exception as e:
+            print(f"   ⚠️ [Mirror:{table_id}] 本地镜像不可用，直接读取表格: {e}")
+            return self.client.count_by_date(table_id, date_str)
+
+    # ---------- 写入 (写回表格 + 更新本地副本) ----------
+
+    def _apply_local(self, record_id: str, fields: Dict):
+        """把更新写入本地副本 (找不到对应行时等下次同步)"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                title = self.client._get_sheet("cms").title
+                if record_id.startswith("row:"):
+                    row = conn.execute(
+                        "SELECT row_num, data FROM sheet_rows WHERE sheet = ? AND row_num = ?",
+                        (title, int(record_id.split(":")[1]))
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT row_num, data FROM sheet_rows WHERE sheet = ? AND json_extract(data, ?) = ?",
+                        (title, f'$."{RECORD_ID_COLUMN}"', record_id)
+                    ).fetchone()
+                state = conn.execute("SELECT headers FROM sheet_state WHERE sheet = ?", (title,)).fetchone()
+                if not row or not state:
+                    return
+                headers = json.loads(state[0])
+                row_num, record = row[0], json.loads(row[1])
+                record.update({k: self.client._format_value(v) for k, v in fields.items() if k in headers})
+                fp_cols = [headers[0]] + [c for c in FINGERPRINT_COLUMNS if c in headers and c != headers[0]]
+                fingerprint = self._fingerprint([record.get(c, "") for c in fp_cols])
+                conn.execute(
+                    "INSERT OR REPLACE INTO sheet_rows VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._row_params(title, row_num, record, fingerprint)
+                )
+                conn.commit()
+        except (ValueError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ 本地镜像更新失败: {e}")
+
+    def update_record(self, record_id: str, fields: Dict, retry: bool = True) -> bool:
+        success = self.client.update_record(record_id, fields, retry=retry)
+        if success:
+            self._apply_local(record_id, fields)
+        return success
+
+    def queue_update(self, record_id: str, fields: Dict) -> bool:
+        success = self.client.queue_update(record_id, fields)
+        if success:
+            self._apply_local(record_id, fields)
+        return success
+
+
+def with_mirror(client):
+    """开启 config.SHEET_MIRROR_ENABLED 时返回包装了本地镜像的 client，否则原样返回"""
+    return SheetMirror(client) if config.SHEET_MIRROR_ENABLED else client
@@ -0,0 +1,185 @@
+"""
+Google Sheets API 配额调度
+Sheets API 按 "每用户每分钟" 分别限制读 / 写请求数 (默认各 60 次)。
+在客户端按滑动窗口记账，窗口内用满后让后续调用排队到最早一次请求滑出窗口，
+把突发请求平滑到配额以内，而不是等服务端返回 429 再指数退避。
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+
+class SlidingWindowQuota:
+    """
+    滑动窗口配额 (窗口内最多 limit 次请求)
+
+    reserve() 为每次请求预订一个发送时间点: 窗口未满立即发送，
+    否则排在第 limit 个前序请求之后 window 秒，多个线程同时排队时依次错开。
+    """
+
+    def __init__(self, limit: int, window: float = 60.0):
+        self.limit = max(1, int(limit))
+        self.window = window
+        self.requests = 0
+        self.delayed = 0
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self.blocked_until = 0.0
+        self._times: deque = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._times and self._times[0] <= now - self.window:
+            self._times.popleft()
+
+    def reserve(self) -> float:
+        """
+        预订一次请求
+
+        Returns:
+            调用方在发送请求前需要等待的秒数 (0 表示立即发送)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            at = max(now, self.blocked_until)
+            if len(self._times) >= self.limit:
+                at = max(at, self._times[-self.limit] + self.window)
+            self._times.append(at)
+
+            wait = at - now
+            self.requests += 1
+            if wait > 0:
+                self.delayed += 1
+                self.waited_seconds += wait
+            return wait
+
+    def block_for(self, seconds: float):
+        """服务端仍返回 429 时: 在 seconds 秒内暂停所有新请求"""
+        with self._lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def utilization(self) -> float:
+        """当前窗口内已用 (含已排队) 请求数 / limit"""
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._times) / self.limit
+
+
+class SheetsQuotaGovernor:
+    """
+    Sheets API 配额调度器 (按 用户 + 读/写 分别记账)
+
+    用法:
+        governor = get_sheets_quota()
+        governor.acquire("read", user)      # 必要时阻塞等待
+        values = sheet.batch_get(...)
+        print(governor.get_stats())
+    """
+
+    def __init__(self, read_per_minute: int = None, write_per_minute: int = None,
+                 window: float = 60.0, enabled: bool = None):
+        """
+        Args:
+            read_per_minute: 每用户每分钟读请求上限 (默认 config.SHEETS_QUOTA_READ_PER_MIN)
+            write_per_minute: 每用户每分钟写请求上限 (默认 config.SHEETS_QUOTA_WRITE_PER_MIN)
+            window: 窗口长度 (秒)
+            enabled: 是否启用 (默认 config.SHEETS_QUOTA_ENABLED)
+        """
+        self.limits = {
+            READ: read_per_minute or config.SHEETS_QUOTA_READ_PER_MIN,
+            WRITE: write_per_minute or config.SHEETS_QUOTA_WRITE_PER_MIN,
+        }
+        self.window = window
+        self.enabled = config.SHEETS_QUOTA_ENABLED if enabled is None else enabled
+        self._quotas: Dict[tuple, SlidingWindowQuota] = {}
+        self._lock = threading.Lock()
+
+    def quota_for(self, kind: str, user: str = "default") -> SlidingWindowQuota:
+        key = (user, kind)
+        with self._lock:
+            if key not in self._quotas:
+                self._quotas[key] = SlidingWindowQuota(self.limits[kind], self.window)
+            return self._quotas[key]
+
+    def acquire(self, kind: str, user: str = "default"):
+        """
+        获取一次请求配额 (必要时阻塞等待)
+
+        Args:
+            kind: "read" / "write"
+            user: 配额归属用户 (服务账号邮箱)
+        """
+        if not self.enabled:
+            return
+        wait = self.quota_for(kind, user).reserve()
+        if wait > 0:
+            if wait >= 1:
+                print(f"   ⏳ [SheetsQuota] {kind} 配额已满，排队 {wait:.1f}s")
+            time.sleep(wait)
+
+    def on_throttle(self, seconds: float, user: str = "default"):
+        """收到 429: 该用户的读写请求都暂停 seconds 秒 (避免其他线程继续撞限流)"""
+        if not self.enabled:
+            return
+        for kind in (READ, WRITE):
+            self.quota_for(kind, user).block_for(seconds)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        获取各配额的使用情况
+
+        Returns:
+            {"user/read": {"utilization": 当前窗口占用率, "requests": 总请求数,
+                           "delayed": 排队次数, "waited": 累计排队秒数, "throttled": 429 次数}}
+        """
+        with self._lock:
+            items = list(self._quotas.items())
+        return {
+            f"{user}/{kind}": {
+                "utilization": round(quota.utilization(), 3),
+                "requests": quota.requests,
+                "delayed": quota.delayed,
+                "waited": round(quota.waited_seconds, 2),
+                "throttled": quota.throttled,
+            }
+            for (user, kind), quota in items
+        }
+
+    def print_stats(self):
+        """打印配额使用情况"""
+        for key, stats in self.get_stats().items():
+            print(
+                f"📊 Sheets 配额 [{key}]: {stats['requests']} 次请求，"
+                f"排队 {stats['delayed']} 次 / {stats['waited']}s，"
+                f"429 {stats['throttled']} 次，当前占用 {stats['utilization'] * 100:.0f}%"
+            )
+
+
+# 全局配额调度器
+_global_governor: Optional[SheetsQuotaGovernor] = None
+
+
+def get_sheets_quota() -> SheetsQuotaGovernor:
+    """获取全局配额调度器（单例）"""
+    global _global_governor
+
+    if _global_governor is None:
+        _global_governor = SheetsQuotaGovernor()
+
+    return _global_governor
+
+
+def set_sheets_quota(governor: Optional[SheetsQuotaGovernor]):
+    """替换全局配额调度器 (用于测试)"""
+    global _global_governor
+    _global_governor = governor
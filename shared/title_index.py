@@ -0,0 +1,323 @@
+"""
+标题近似去重索引
+用 MinHash + LSH 替代 "新标题与每条历史标题逐一计算 Jaccard" 的 O(n²) 去重:
+
+- 标题归一化后切成字符二元组，计算 bands x rows 个 MinHash 组成签名
+- 签名按 bands 分段，每段哈希为一个桶；只有至少一个桶相同的历史标题才是候选
+- 候选再用精确 Jaccard 复核
+- "前 N 个字相同" 规则只在本次运行写入的标题之间生效 (与历史标题比较会让 "2026年…" 这类常见开头永久互相拦截)
+
+索引保存在 SQLite 中，新增标题增量写入；Step 1 生成标题与 Step 2 写作前检查共用同一个索引。
+"""
+import os
+import re
+import time
+import random
+import hashlib
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+# 标题被哪个阶段写入索引
+STAGE_TOPIC = "topic"      # Step 1: 已生成的选题
+STAGE_ARTICLE = "article"  # Step 2: 已写作并保存的文章
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: str) -> str:
+    """标题归一化: 全角转半角、小写、去掉空白与标点"""
+    text = unicodedata.normalize('NFKC', title or '').lower()
+    return _NON_WORD.sub('', text)
+
+
+def shingles(text: str, n: int = 2) -> Set[str]:
+    """字符 n 元组集合 (短于 n 的文本整体作为一个元组)"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def _hash64(data: str) -> int:
+    """稳定的 64 位哈希 (不受 PYTHONHASHSEED 影响，SQLite INTEGER 为有符号 64 位)"""
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class TitleIndex:
+    """
+    标题近似去重索引
+
+    用法:
+        index = get_title_index()
+        similar = index.check_and_add("2026 春节礼盒定制价格揭秘")   # 无近似标题时写入并返回 None
+        if similar:
+            print(f"与已有标题重复: {similar}")
+
+        # 只与已写作的标题比较；同一选题重试时不算重复
+        index.find_similar(topic, stage=STAGE_ARTICLE, exclude_self=True)
+        index.add(topic, STAGE_ARTICLE)                               # 文章保存后记为已写作
+    """
+
+    def __init__(self, path: str = None, threshold: float = None, prefix_chars: int = None,
+                 bands: int = None, rows: int = None):
+        """
+        Args:
+            path: SQLite 文件路径 (默认 config.TITLE_INDEX_FILE)
+            threshold: Jaccard 相似度阈值 (默认 config.TITLE_DEDUP_THRESHOLD)
+            prefix_chars: 与本次运行写入的标题前 N 个字相同视为重复 (默认 config.TITLE_DEDUP_PREFIX_CHARS，0 关闭)
+            bands: LSH 分段数 (默认 config.TITLE_INDEX_BANDS)
+            rows: 每段 MinHash 个数 (默认 config.TITLE_INDEX_ROWS)
+        """
+        self.path = path or config.TITLE_INDEX_FILE
+        self.threshold = config.TITLE_DEDUP_THRESHOLD if threshold is None else threshold
+        self.prefix_chars = config.TITLE_DEDUP_PREFIX_CHARS if prefix_chars is None else prefix_chars
+        self.bands = bands or config.TITLE_INDEX_BANDS
+        self.rows = rows or config.TITLE_INDEX_ROWS
+
+        # 固定种子: 同一组参数在不同进程中得到相同签名，持久化的桶才能复用
+        rng = random.Random(20260101)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # 本次运行写入的标题: 前缀 -> (归一化标题, 原标题, 阶段)
+        self._run_prefixes: Dict[str, Tuple[str, str, str]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（首次读写时建表；LSH 参数变化时重建桶）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS titles (
+                    id INTEGER PRIMARY KEY,
+                    norm TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    title_id INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets(band, bucket);
+                CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                """
+            )
+            self._conn = conn
+            self._check_params(conn)
+        return self._conn
+
+    def _check_params(self, conn: sqlite3.Connection):
+        params = f"{self.bands}x{self.rows}"
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'params'").fetchone()
+        if row and row[0] == params:
+            return
+        if row:
+            logger.info(f"🔄 [TitleIndex] LSH 参数变化 ({row[0]} -> {params})，重建索引桶")
+            conn.execute("DELETE FROM lsh_buckets")
+            for title_id, norm in conn.execute("SELECT id, norm FROM titles").fetchall():
+                self._insert_buckets(conn, title_id, norm)
+        conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('params', ?)", (params,))
+        conn.commit()
+
+    # ---------- 签名 ----------
+
+    def signature(self, norm: str) -> List[int]:
+        """归一化标题的 MinHash 签名 (bands x rows 个值)"""
+        hashes = [_hash64(s) & 0xFFFFFFFFFFFFFFF for s in shingles(norm)] or [0]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _buckets(self, norm: str) -> List[tuple]:
+        """(band, bucket) 列表: 每个 MinHash 分段一个桶"""
+        sig = self.signature(norm)
+        return [
+            (band, _hash64(",".join(map(str, sig[band * self.rows:(band + 1) * self.rows]))))
+            for band in range(self.bands)
+        ]
+
+    def _insert_buckets(self, conn: sqlite3.Connection, title_id: int, norm: str):
+        conn.executemany(
+            "INSERT INTO lsh_buckets (band, bucket, title_id) VALUES (?, ?, ?)",
+            [(band, bucket, title_id) for band, bucket in self._buckets(norm)]
+        )
+
+    # ---------- 查询 / 写入 ----------
+
+    def _prefix(self, norm: str) -> Optional[str]:
+        return norm[:self.prefix_chars] if self.prefix_chars > 0 and len(norm) >= self.prefix_chars else None
+
+    def _find_run_prefix(self, norm: str, stage: Optional[str], exclude_self: bool) -> Optional[str]:
+        """本次运行写入的标题中前 N 个字相同的标题"""
+        prefix = self._prefix(norm)
+        hit = self._run_prefixes.get(prefix) if prefix else None
+        if hit is None:
+            return None
+        other_norm, other_title, other_stage = hit
+        if (stage and other_stage != stage) or (exclude_self and other_norm == norm):
+            return None
+        return other_title
+
+    def _find(self, conn: sqlite3.Connection, norm: str, stage: Optional[str], exclude_self: bool,
+              match_prefix: bool = True) -> Optional[str]:
+        if match_prefix:
+            similar = self._find_run_prefix(norm, stage, exclude_self)
+            if similar is not None:
+                return similar
+
+        buckets = self._buckets(norm)
+        where = " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets))
+        params = [value for pair in buckets for value in pair]
+        sql = f"SELECT t.norm, t.title FROM titles t WHERE t.id IN (SELECT title_id FROM lsh_buckets WHERE {where})"
+        if exclude_self:
+            sql += " AND t.norm != ?"
+            params.append(norm)
+        if stage:
+            sql += " AND t.stage = ?"
+            params.append(stage)
+
+        grams = shingles(norm)
+        for other_norm, other_title in conn.execute(sql, params):
+            if jaccard(grams, shingles(other_norm)) > self.threshold:
+                return other_title
+        return None
+
+    def find_similar(self, title: str, stage: str = None, exclude_self: bool = False,
+                     match_prefix: bool = True) -> Optional[str]:
+        """
+        查找近似的已有标题
+
+        Args:
+            title: 待检查标题
+            stage: 只与该阶段写入的标题比较 (None 表示全部)
+            exclude_self: 忽略归一化后完全相同的标题 (同一选题重试时不视为重复)
+            match_prefix: 是否应用本次运行内的前缀规则
+
+        Returns:
+            第一个近似的已有标题，没有返回 None
+        """
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        with self._lock:
+            return self._find(self._connect(), norm, stage, exclude_self, match_prefix)
+
+    def add(self, title: str, stage: str = STAGE_TOPIC):
+        """写入标题 (已存在时只更新阶段)"""
+        norm = normalize_title(title)
+        if not norm:
+            return
+        with self._lock:
+            conn = self._connect()
+            self._add(conn, norm, title, stage)
+            conn.commit()
+
+    def _add(self, conn: sqlite3.Connection, norm: str, title: str, stage: str, this_run: bool = True):
+        prefix = self._prefix(norm) if this_run else None
+        if prefix and self._run_prefixes.get(prefix, (norm,))[0] == norm:
+            self._run_prefixes[prefix] = (norm, title, stage)
+        row = conn.execute("SELECT id FROM titles WHERE norm = ?", (norm,)).fetchone()
+        if row:
+            conn.execute("UPDATE titles SET stage = ? WHERE id = ?", (stage, row[0]))
+            return
+        cursor = conn.execute(
+            "INSERT INTO titles (norm, title, stage, added_at) VALUES (?, ?, ?, ?)",
+            (norm, title, stage, time.time())
+        )
+        self._insert_buckets(conn, cursor.lastrowid, norm)
+
+    def check_and_add(self, title: str, stage: str = STAGE_TOPIC, compare_stage: str = None,
+                      exclude_self: bool = False, match_prefix: bool = True) -> Optional[str]:
+        """
+        查重并写入 (原子操作，并发调用不会同时放行两条近似标题)
+
+        Args:
+            title: 新标题
+            stage: 写入时记录的阶段
+            compare_stage: 只与该阶段的标题比较 (None 表示全部)
+            exclude_self: 忽略归一化后完全相同的标题
+            match_prefix: 是否应用本次运行内的前缀规则
+
+        Returns:
+            近似的已有标题 (此时不写入)；没有近似标题时写入并返回 None
+        """
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        with self._lock:
+            conn = self._connect()
+            similar = self._find(conn, norm, compare_stage, exclude_self, match_prefix)
+            if similar is None:
+                self._add(conn, norm, title, stage)
+                conn.commit()
+            return similar
+
+    def bootstrap(self, titles: Iterable[str], stage: str = STAGE_TOPIC) -> int:
+        """
+        索引为空时批量导入历史标题 (如 generated_seo_data.json)
+
+        Returns:
+            导入的标题数 (索引非空时为 0)
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("SELECT 1 FROM titles LIMIT 1").fetchone():
+                return 0
+            count = 0
+            for title in titles:
+                norm = normalize_title(title)
+                if norm:
+                    self._add(conn, norm, title, stage, this_run=False)
+                    count += 1
+            conn.commit()
+            return count
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局索引
+_global_index: Optional[TitleIndex] = None
+
+
+def get_title_index() -> TitleIndex:
+    """获取全局标题索引（单例）"""
+    global _global_index
+
+    if _global_index is None:
+        _global_index = TitleIndex()
+
+    return _global_index
+
+
+def set_title_index(index: Optional[TitleIndex]):
+    """替换全局标题索引 (用于测试或自定义路径)"""
+    global _global_index
+
+    if _global_index is not None and _global_index is not index:
+        _global_index.close()
+    _global_index = index
@@ -0,0 +1,169 @@
+"""
+跨进程共享的访问令牌缓存
+把 tenant_access_token 等短期令牌连同过期时间保存到 .cache 目录 (JSON + 文件锁)，
+同一台机器上的并发 worker 与前后相继的 Step 复用同一个有效令牌，不必每个进程都先鉴权一次。
+
+- 令牌有效且距过期超过 refresh_margin: 直接返回，不发请求
+- 进入 refresh_margin 窗口: 返回当前令牌，同时在后台线程刷新 (不阻塞调用方)
+- 已过期 / 不存在: 加锁后再读一次 (可能已被其他进程刷新)，仍无效才同步获取
+"""
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from shared import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: 退化为仅进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# fetch() -> (token, 有效秒数)，失败返回 None
+TokenFetcher = Callable[[], Optional[Tuple[str, float]]]
+
+
+class TokenCache:
+    """
+    令牌文件缓存
+
+    用法:
+        cache = get_token_cache()
+        token, expires_at = cache.get_or_fetch("feishu:cli_xxx", fetch)
+        token, expires_at = cache.get_or_fetch("feishu:cli_xxx", fetch, stale_token=token)  # 服务端判定失效时
+    """
+
+    def __init__(self, path: str = None, refresh_margin: float = None):
+        """
+        Args:
+            path: 缓存文件路径 (默认 config.FEISHU_TOKEN_CACHE_FILE)
+            refresh_margin: 距过期多少秒内开始后台刷新 (默认 config.FEISHU_TOKEN_REFRESH_MARGIN)
+        """
+        self.path = path or config.FEISHU_TOKEN_CACHE_FILE
+        self.refresh_margin = config.FEISHU_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self.fetch_count = 0
+        self._thread_lock = threading.Lock()
+        self._refreshing = set()
+
+    @contextmanager
+    def _locked(self):
+        """进程内 + 跨进程互斥 (flock 锁文件)"""
+        with self._thread_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_all(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_all(self, data: Dict[str, Dict]):
+        """原子写入 (令牌属于敏感信息，文件仅当前用户可读写)"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        读取未过期的令牌
+
+        Returns:
+            (token, expires_at)，不存在或已过期返回 None
+        """
+        entry = self._read_all().get(key)
+        if entry and entry.get("token") and time.time() < entry.get("expires_at", 0):
+            return entry["token"], entry["expires_at"]
+        return None
+
+    def _fetch_and_store(self, key: str, fetch: TokenFetcher, stale_token: str = None) -> Optional[Tuple[str, float]]:
+        """加锁后再读一次，仍需要刷新时才调用 fetch 并写回"""
+        with self._locked():
+            entry = self.get(key)
+            if entry and entry[0] != stale_token and time.time() < entry[1] - self.refresh_margin:
+                return entry  # 其他进程 / 线程刚刷新过
+
+            result = fetch()
+            self.fetch_count += 1
+            if not result:
+                return entry if entry and entry[0] != stale_token else None
+            token, ttl = result
+            expires_at = time.time() + float(ttl)
+            data = self._read_all()
+            data[key] = {"token": token, "expires_at": expires_at}
+            try:
+                self._write_all(data)
+            except OSError as e:
+                logger.warning(f"⚠️ 令牌缓存写入失败: {e}")
+            return token, expires_at
+
+    def _refresh_in_background(self, key: str, fetch: TokenFetcher):
+        with self._thread_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch_and_store(key, fetch)
+            except Exception as e:
+                logger.warning(f"⚠️ 后台刷新令牌失败: {e}")
+            finally:
+                with self._thread_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"token-refresh-{key}", daemon=True).start()
+
+    def get_or_fetch(self, key: str, fetch: TokenFetcher, stale_token: str = None) -> Optional[Tuple[str, float]]:
+        """
+        获取有效令牌
+
+        Args:
+            key: 缓存键 (如 "feishu:<app_id>")
+            fetch: 获取新令牌的函数
+            stale_token: 已被服务端判定失效的令牌 (强制刷新，除非缓存中已是其他令牌)
+
+        Returns:
+            (token, expires_at)，获取失败返回 None
+        """
+        entry = self.get(key)
+        if entry and entry[0] != stale_token:
+            if time.time() >= entry[1] - self.refresh_margin:
+                self._refresh_in_background(key, fetch)
+            return entry
+        return self._fetch_and_store(key, fetch, stale_token=stale_token)
+
+
+# 全局令牌缓存
+_global_token_cache: Optional[TokenCache] = None
+
+
+def get_token_cache() -> TokenCache:
+    """获取全局令牌缓存（单例）"""
+    global _global_token_cache
+
+    if _global_token_cache is None:
+        _global_token_cache = TokenCache()
+
+    return _global_token_cache
+
+
+def set_token_cache(cache: Optional[TokenCache]):
+    """替换全局令牌缓存 (用于测试)"""
+    global _global_token_cache
+    _global_token_cache = cache
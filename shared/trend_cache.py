@@ -0,0 +1,186 @@
+"""
+热点抓取结果缓存
+基于 SQLite 按 (来源, 种子词) 缓存抓取结果，每个来源单独设置 TTL:
+下拉推荐词一天内变化很小，平台热榜半小时就会刷新。
+
+每个键的写入是一条独立的 INSERT OR REPLACE 事务 (WAL 模式)，
+多个线程 / 进程同时写入不同键互不覆盖；读取时跳过并删除过期条目，打开时批量清理。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+
+class TrendCache:
+    """
+    热点抓取结果缓存
+
+    用法:
+        cache = get_trend_cache()
+        items = cache.get("搜索需求", "礼盒定制")
+        if items is None:
+            items = fetch(...)
+            cache.set("搜索需求", "礼盒定制", items)
+    """
+
+    def __init__(self, path: str = None, ttl_hours: Dict[str, float] = None,
+                 default_ttl_hours: float = None, enabled: bool = None):
+        """
+        Args:
+            path: SQLite 文件路径 (默认 config.TREND_CACHE_FILE)
+            ttl_hours: 按来源的 TTL (默认 config.TREND_CACHE_TTL_HOURS)
+            default_ttl_hours: 未配置来源的 TTL (默认 config.TREND_CACHE_DEFAULT_TTL_HOURS)
+            enabled: 是否启用 (默认 config.TREND_CACHE_ENABLED)
+        """
+        self.path = path or config.TREND_CACHE_FILE
+        self.ttl_hours = config.TREND_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.default_ttl_hours = config.TREND_CACHE_DEFAULT_TTL_HOURS if default_ttl_hours is None else default_ttl_hours
+        self.enabled = config.TREND_CACHE_ENABLED if enabled is None else enabled
+
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（首次读写时建表并清理过期条目）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS trend_cache (
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    items TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (source, key)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trend_cache_expires ON trend_cache(expires_at)")
+            conn.execute("DELETE FROM trend_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def ttl_for(self, source: str) -> float:
+        """来源的 TTL (秒)"""
+        return float(self.ttl_hours.get(source, self.default_ttl_hours)) * 3600
+
+    def get(self, source: str, key: str) -> Optional[List]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的结果列表，未命中或已过期返回 None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT items, expires_at FROM trend_cache WHERE source = ? AND key = ?", (source, key)
+                ).fetchone()
+                if row and row[1] > now:
+                    self.hits[source] = self.hits.get(source, 0) + 1
+                    return json.loads(row[0])
+                if row:
+                    conn.execute("DELETE FROM trend_cache WHERE source = ? AND key = ?", (source, key))
+                    conn.commit()
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"⚠️ 热点缓存读取失败: {e}")
+            return None
+
+    def set(self, source: str, key: str, items: List, ttl_seconds: float = None):
+        """
+        写入缓存
+
+        Args:
+            source: 来源名
+            key: 种子词 (热榜等无参数来源用固定键)
+            items: 抓取结果
+            ttl_seconds: 过期时间 (默认按来源取 ttl_for)
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        ttl = self.ttl_for(source) if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO trend_cache (source, key, items, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (source, key, json.dumps(items, ensure_ascii=False), now, now + ttl)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 热点缓存写入失败: {e}")
+
+    def purge_expired(self) -> int:
+        """删除所有过期条目，返回删除数量"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM trend_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            conn.commit()
+            return deleted
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取各来源的命中统计
+
+        Returns:
+            {来源: {"hits": 命中次数, "misses": 未命中次数}}
+        """
+        with self._lock:
+            sources = list(dict.fromkeys(list(self.hits) + list(self.misses)))
+            return {s: {"hits": self.hits.get(s, 0), "misses": self.misses.get(s, 0)} for s in sources}
+
+
+# 全局缓存实例
+_global_trend_cache: Optional[TrendCache] = None
+
+
+def get_trend_cache() -> TrendCache:
+    """获取全局热点缓存（单例）"""
+    global _global_trend_cache
+
+    if _global_trend_cache is None:
+        _global_trend_cache = TrendCache()
+
+    return _global_trend_cache
+
+
+def set_trend_cache(cache: Optional[TrendCache]):
+    """替换全局热点缓存 (用于测试或自定义路径)"""
+    global _global_trend_cache
+
+    if _global_trend_cache is not None and _global_trend_cache is not cache:
+        _global_trend_cache.close()
+    _global_trend_cache = cache
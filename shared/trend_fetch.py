@@ -0,0 +1,189 @@
+"""
+热点多源并发抓取
+把每个来源 (或每个 来源 + 种子词) 拆成独立任务并行执行:
+- 按 host 限制在途请求数 (不同 host 互不影响)；请求速率由 shared/crawler.py 按 host 控制
+- 全部任务共享一个总时限，超时后直接返回已完成任务的结果，慢来源不会拖住整个 Step 1
+- 指定 cache_key 的任务先查 shared/trend_cache.py，TTL 内命中则不再请求
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List
+from shared import config
+from shared.crawler import CrawlDeadlineExceeded, crawl_deadline
+from shared.trend_cache import TrendCache, get_trend_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TrendFetchEngine:
+    """
+    多源抓取引擎 (单次使用)
+
+    用法:
+        engine = TrendFetchEngine(deadline=60)
+        engine.add_each("搜索需求", "suggestion.baidu.com", fetch_baidu_suggestion, seeds, cache=True)  # 按种子词缓存
+        engine.add("百度", "top.baidu.com", fetch_baidu_hot, cache_key="hot")
+        results = engine.run()          # {来源: [热点, ...]}，按 add 的顺序
+        engine.print_stats()
+
+    任务函数返回热点列表；抛出异常计为失败，不影响其他任务。
+    只缓存非空结果，避免被反爬拦截时把空结果缓存一整个 TTL。
+    """
+
+    def __init__(self, deadline: float = None, max_workers: int = None, host_limits: Dict[str, Dict] = None,
+                 cache: TrendCache = None):
+        """
+        Args:
+            deadline: 总时限秒数 (默认 config.TREND_FETCH_DEADLINE)
+            max_workers: 抓取线程数上限 (默认 config.TREND_FETCH_MAX_WORKERS)
+            host_limits: 按 host 覆盖并发数 (默认 config.TREND_HOST_LIMITS)
+            cache: 抓取结果缓存 (默认全局 TrendCache)
+        """
+        self.deadline = config.TREND_FETCH_DEADLINE if deadline is None else deadline
+        self.max_workers = max_workers or config.TREND_FETCH_MAX_WORKERS
+        self.host_limits = config.TREND_HOST_LIMITS if host_limits is None else host_limits
+        self.cache = cache
+        self.elapsed = 0.0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._results: "OrderedDict[str, List]" = OrderedDict()
+        self._stats: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def concurrency_for(self, host: str) -> int:
+        """返回 host 的最大在途请求数"""
+        limits = self.host_limits.get(host, {})
+        return max(1, int(limits.get("concurrency", config.TREND_HOST_CONCURRENCY)))
+
+    def add(self, source: str, host: str, func: Callable[..., List[str]], *args, cache_key: str = None):
+        """
+        添加一个抓取任务
+
+        Args:
+            source: 来源名 (结果按来源汇总，同时作为缓存分区)
+            host: 请求的目标 host (用于并发控制)
+            func: 抓取函数，返回热点列表
+            *args: 传给 func 的参数
+            cache_key: 缓存键 (None 表示不缓存)；TTL 内命中时直接使用缓存结果
+        """
+        self._results.setdefault(source, [])
+        stats = self._stats.setdefault(
+            source, {"tasks": 0, "done": 0, "failed": 0, "cached": 0, "items": 0, "seconds": 0.0}
+        )
+        stats["tasks"] += 1
+
+        if cache_key is not None:
+            if self.cache is None:
+                self.cache = get_trend_cache()
+            cached = self.cache.get(source, cache_key)
+            if cached is not None:
+                stats["cached"] += 1
+                stats["items"] += len(cached)
+                self._results[source].extend(cached)
+                return
+        self._queues.setdefault(host, deque()).append((source, func, args, cache_key))
+
+    def add_each(self, source: str, host: str, func: Callable[..., List[str]], items: Iterable, cache: bool = False):
+        """
+        为 items 中的每一项添加一个任务 (如每个种子词一次请求)
+
+        Args:
+            cache: 是否以 str(item) 为缓存键
+        """
+        for item in items:
+            self.add(source, host, func, item, cache_key=str(item) if cache else None)
+
+    def _run_lane(self, host: str, deadline: float):
+        """一个 host 的抓取线程: 依次取出该 host 的任务执行，直到队列为空或超时"""
+        queue = self._queues[host]
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            try:
+                source, func, args, cache_key = queue.popleft()
+            except IndexError:
+                return
+
+            started = time.monotonic()
+            try:
+                with crawl_deadline(deadline):
+                    items, failed = list(func(*args) or []), False
+            except CrawlDeadlineExceeded:
+                return  # 截止前轮不到请求配额，剩余任务计为超时跳过
+            except Exception as e:
+                logger.debug(f"[{source}] {args} 抓取失败: {e}")
+                items, failed = [], True
+
+            with self._lock:
+                if self._stop.is_set():
+                    return  # 已超过总时限，结果已返回给调用方
+                stats = self._stats[source]
+                stats["failed" if failed else "done"] += 1
+                stats["items"] += len(items)
+                stats["seconds"] += time.monotonic() - started
+                self._results[source].extend(items)
+            if cache_key is not None and items:
+                self.cache.set(source, cache_key, items)
+
+    def run(self) -> Dict[str, List[str]]:
+        """
+        并发执行所有任务
+
+        Returns:
+            {来源: 热点列表}，超时的来源只包含已完成任务的结果
+        """
+        started = time.monotonic()
+        deadline = started + self.deadline
+
+        # 每个 host 分配 "并发数" 个抓取线程；按轮次交错提交，线程不足时每个 host 先各得一个
+        lanes = [(host, min(self.concurrency_for(host), len(queue))) for host, queue in self._queues.items()]
+        ordered = [host for rank in range(max((n for _, n in lanes), default=0))
+                   for host, n in lanes if rank < n]
+        if not ordered:
+            return {}
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(ordered)), thread_name_prefix="trend-fetch")
+        try:
+            futures = [executor.submit(self._run_lane, host, deadline) for host in ordered]
+            _, pending = wait(futures, timeout=self.deadline)
+            if pending:
+                print(f"   ⏱️ [TrendFetch] 达到总时限 {self.deadline:.0f}s，保留已完成的结果")
+        finally:
+            with self._lock:
+                self._stop.set()
+                results = OrderedDict((source, list(items)) for source, items in self._results.items())
+            # 不等待仍在进行中的请求 (各自有请求超时)
+            executor.shutdown(wait=False)
+
+        self.elapsed = time.monotonic() - started
+        return results
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        获取各来源的抓取统计
+
+        Returns:
+            {来源: {"tasks": 任务数, "done": 成功数, "failed": 失败数, "cached": 命中缓存数,
+                    "skipped": 超时未完成数, "items": 结果条数, "seconds": 累计请求耗时}}
+        """
+        with self._lock:
+            return {
+                source: {
+                    **stats,
+                    "skipped": stats["tasks"] - stats["done"] - stats["failed"] - stats["cached"],
+                    "seconds": round(stats["seconds"], 2),
+                }
+                for source, stats in self._stats.items()
+            }
+
+    def print_stats(self):
+        """打印各来源抓取情况"""
+        for source, stats in self.get_stats().items():
+            cached = f"，缓存 {stats['cached']}" if stats["cached"] else ""
+            skipped = f"，超时跳过 {stats['skipped']}" if stats["skipped"] else ""
+            print(
+                f"   -> [{source}] {stats['items']} 条 "
+                f"(成功 {stats['done']}/{stats['tasks']}{cached}，失败 {stats['failed']}{skipped})"
+            )
+        print(f"⏱️ [TrendFetch] 抓取耗时 {self.elapsed:.1f}s")
@@ -0,0 +1,190 @@
+"""
+热点历史与增量筛选
+Step 1 每次都会抓到大量与上一轮重复的热点 (热榜一小时内变化不大，下拉推荐词几乎不变)。
+按归一化后的热点文本记录首次 / 最近出现时间与最近一次分析时间，
+只把 新出现 / 重新上榜 / 长期未分析 的热点交给 LLM，缩短 Prompt 并避免为旧热点重复生成选题。
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Iterable, List, Optional
+from shared import config
+
+logger = logging.getLogger(__name__)
+
+# 开头的来源标记，如 "[百度] "、"[搜索需求] "
+_SOURCE_TAGS = re.compile(r'^\s*(?:\[[^\]]*\]\s*)+')
+# 空白与标点 (\W 在 Unicode 模式下保留中文字符)
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_trend(text: str) -> str:
+    """
+    热点归一化键: 去掉来源标记、全角转半角、小写、去掉空白与标点
+
+    "[百度] 春节礼盒 定制！" 与 "[微博]春节礼盒定制" 得到同一个键
+    """
+    text = _SOURCE_TAGS.sub('', text or '')
+    text = unicodedata.normalize('NFKC', text).lower()
+    return _NON_WORD.sub('', text)
+
+
+class TrendHistory:
+    """
+    热点历史
+
+    用法:
+        history = get_trend_history()
+        fresh = history.select_fresh(trends)     # 记录本轮出现的热点，返回需要分析的部分
+        analyzed = analyze(fresh)
+        if analyzed:
+            history.mark_analyzed(fresh)         # 分析失败时不标记，下一轮仍会重新分析
+    """
+
+    def __init__(self, path: str = None, resurge_hours: float = None, reanalyze_hours: float = None,
+                 retention_days: float = None, enabled: bool = None):
+        """
+        Args:
+            path: SQLite 文件路径 (默认 config.TREND_HISTORY_FILE)
+            resurge_hours: 消失超过多少小时后再次出现视为重新上榜 (默认 config.TREND_RESURGE_HOURS)
+            reanalyze_hours: 持续在榜的热点多久后允许重新分析 (默认 config.TREND_REANALYZE_HOURS)
+            retention_days: 超过多少天未出现的记录被清理 (默认 config.TREND_HISTORY_RETENTION_DAYS)
+            enabled: 是否启用 (默认 config.TREND_HISTORY_ENABLED，关闭时全部热点视为新热点)
+        """
+        self.path = path or config.TREND_HISTORY_FILE
+        self.resurge_seconds = (config.TREND_RESURGE_HOURS if resurge_hours is None else resurge_hours) * 3600
+        self.reanalyze_seconds = (config.TREND_REANALYZE_HOURS if reanalyze_hours is None else reanalyze_hours) * 3600
+        self.retention_seconds = (config.TREND_HISTORY_RETENTION_DAYS if retention_days is None else retention_days) * 86400
+        self.enabled = config.TREND_HISTORY_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（首次读写时建表并清理过期记录）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS trend_history (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    seen_count INTEGER NOT NULL DEFAULT 1,
+                    analyzed_at REAL
+                )
+                """
+            )
+            conn.execute("DELETE FROM trend_history WHERE last_seen < ?", (time.time() - self.retention_seconds,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _is_fresh(self, row, now: float) -> bool:
+        """row = (last_seen, analyzed_at)；无记录 / 从未分析 / 重新上榜 / 分析已过期 均需要分析"""
+        if row is None:
+            return True
+        last_seen, analyzed_at = row
+        if analyzed_at is None:
+            return True
+        if now - last_seen >= self.resurge_seconds:
+            return True
+        return now - analyzed_at >= self.reanalyze_seconds
+
+    def select_fresh(self, trends: Iterable[str], now: float = None) -> List[str]:
+        """
+        记录本轮出现的热点，并返回需要分析的热点
+
+        同一归一化键只保留第一次出现的原文 (跨平台的同一热点只分析一次)。
+
+        Args:
+            trends: 本轮抓取到的热点 (带来源标记)
+            now: 当前时间戳 (默认 time.time())
+
+        Returns:
+            新出现或重新上榜的热点原文列表 (保持输入顺序)
+        """
+        now = time.time() if now is None else now
+        unique = {}
+        for text in trends:
+            key = normalize_trend(text)
+            if key and key not in unique:
+                unique[key] = text
+        if not self.enabled:
+            return list(unique.values())
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                fresh = []
+                for key, text in unique.items():
+                    row = conn.execute(
+                        "SELECT last_seen, analyzed_at FROM trend_history WHERE key = ?", (key,)
+                    ).fetchone()
+                    if self._is_fresh(row, now):
+                        fresh.append(text)
+                    conn.execute(
+                        """
+                        INSERT INTO trend_history (key, text, first_seen, last_seen) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET text = excluded.text, last_seen = excluded.last_seen,
+                            seen_count = seen_count + 1
+                        """,
+                        (key, text, now, now)
+                    )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 热点历史读写失败，本轮分析全部热点: {e}")
+            return list(unique.values())
+
+        print(f"🆕 [TrendHistory] {len(unique)} 个热点中 {len(fresh)} 个为新出现 / 重新上榜")
+        return fresh
+
+    def mark_analyzed(self, trends: Iterable[str], now: float = None):
+        """记录这些热点已交给 LLM 分析"""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        keys = [(now, key) for key in {normalize_trend(t) for t in trends} if key]
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("UPDATE trend_history SET analyzed_at = ? WHERE key = ?", keys)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 热点历史写入失败: {e}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局热点历史
+_global_history: Optional[TrendHistory] = None
+
+
+def get_trend_history() -> TrendHistory:
+    """获取全局热点历史（单例）"""
+    global _global_history
+
+    if _global_history is None:
+        _global_history = TrendHistory()
+
+    return _global_history
+
+
+def set_trend_history(history: Optional[TrendHistory]):
+    """替换全局热点历史 (用于测试或自定义路径)"""
+    global _global_history
+
+    if _global_history is not None and _global_history is not history:
+        _global_history.close()
+    _global_history = history
@@ -1,10 +1,10 @@
-import requests
 import sys
 import os
+import time
 from typing import Dict, Any, List
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from shared import config
+from shared import config, llm_transport, llm_router, llm_metrics, llm_utils
 
 def call_llm(prompt: str, system_prompt: str = None, model: str = None, temperature: float = 1.0) -> str:
     """
@@ -14,39 +14,35 @@ def call_llm(prompt: str, system_prompt: str = None, model: str = None, temperat
     api_url = config.LLM_API_URL
     model = model or config.LLM_MODEL
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # 针对 OpenRouter/DeepSeek 的特殊头
-    if "openrouter" in api_url or "deepseek" in api_url:
-        headers["HTTP-Referer"] = "https://github.com/jememouse/deepseek-feisu-cms"
-        headers["X-Title"] = "DeepSeek CMS Agent"
-
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
+    headers = llm_transport.build_headers(api_url, api_key)
 
     payload = {
         "model": model,
-        "messages": messages,
+        "messages": llm_transport.build_messages(prompt, system_prompt),
         "temperature": temperature
     }
     
+    started = time.monotonic()
+    served, provider = payload, None  # 路由 / 对冲后实际响应的模型与服务商 (用于计费)
     try:
-        resp = requests.post(api_url, headers=headers, json=payload, timeout=90)
+        resp = llm_router.get_router().post(api_url, headers, payload, timeout=90)
+        served, provider = llm_utils._served_by(resp, payload)
         if resp.status_code == 200:
             data = resp.json()
             if 'choices' in data:
+                llm_metrics.get_metrics().record_call(
+                    model=served["model"], provider=provider, usage=data.get('usage'),
+                    latency=time.monotonic() - started
+                )
                 return data['choices'][0]['message']['content']
             else:
                 print(f"   ❌ LLM Unexpected Response: {data}")
-                return ""
         else:
             print(f"   ❌ LLM Error: {resp.status_code} - {resp.text}")
-            return ""
     except Exception as e:
         print(f"   ❌ Request Error: {e}")
-        return ""
+
+    llm_metrics.get_metrics().record_call(
+        model=served["model"], provider=provider, latency=time.monotonic() - started, status="failed"
+    )
+    return ""
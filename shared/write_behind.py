@@ -0,0 +1,353 @@
+"""
+表格写入缓冲
+- WriteBehindQueue: 把逐条的 update_record 合并为批量写入: 同一记录的多次更新按字段合并，
+  满 N 条或每隔 T 秒由 flush 函数一次性写回 (Google Sheets values.batchUpdate / 飞书 batch_update)。
+- AppendSpool: 把逐条的 create_record 攒成一次 append_rows。
+
+持久化: 每次入队先追加到本地日志 (JSONL + fsync)，写回成功后重写日志；
+进程异常退出后，下次创建同名队列时自动重放未写回的数据。进程正常退出 / 收到 SIGTERM 时会先 flush。
+"""
+import os
+import sys
+import json
+import atexit
+import signal
+import uuid
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from shared import config
+
+# flush_func 明确报告某条记录写回失败的次数上限，超过后丢弃 (避免无效 ID 无限重试)
+MAX_FLUSH_ATTEMPTS = 3
+
+_live_queues: "weakref.WeakSet" = weakref.WeakSet()
+_hooks_installed = False
+
+
+def _flush_all():
+    for queue in list(_live_queues):
+        queue.close()
+
+
+def _on_sigterm(signum, frame):
+    _flush_all()
+    sys.exit(128 + signum)
+
+
+def _read_journal(path: Optional[str]) -> List[Dict]:
+    """读取 JSONL 日志，跳过崩溃时写了一半的行"""
+    if not path or not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def _append_journal(path: Optional[str], entry: Dict):
+    """追加一行并 fsync"""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _rewrite_journal(path: Optional[str], entries: List[Dict]):
+    """用 entries 重写日志 (原子替换)，为空时删除日志"""
+    if not path:
+        return
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _install_exit_hooks():
+    """进程退出 (含 SIGTERM) 前 flush 所有队列；只在主线程且未自定义 SIGTERM 处理时接管信号"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+    atexit.register(_flush_all)
+    try:
+        if threading.current_thread() is threading.main_thread() \
+                and signal.getsignal(signal.SIGTERM) in (signal.SIG_DFL, None):
+            signal.signal(signal.SIGTERM, _on_sigterm)
+    except (ValueError, AttributeError):
+        pass
+
+
+class WriteBehindQueue:
+    """
+    按记录合并字段更新的写回队列
+
+    用法:
+        queue = WriteBehindQueue("google_cms", flush_func=client._flush_updates)
+        queue.put("row:5", {"Status": "Published"})
+        queue.put("row:5", {"URL": "https://..."})     # 与上一条合并为一次写入
+        queue.flush()                                   # 或等待满 N 条 / T 秒自动写回
+
+    flush_func(updates) 接收 {record_id: fields}，返回写回失败的 record_id 列表 (全部成功返回空列表)；
+    抛出异常视为全部失败，失败的更新保留到下一次 flush。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[Dict[str, Dict]], Iterable[str]],
+        max_records: int = None,
+        interval: float = None,
+        journal_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            name: 队列名 (同时作为日志文件名，重启后据此重放)
+            flush_func: 批量写回函数
+            max_records: 累计多少条记录触发写回 (默认 config.SHEET_FLUSH_MAX_RECORDS)
+            interval: 定时写回间隔秒数 (默认 config.SHEET_FLUSH_INTERVAL，0 表示不定时)
+            journal_dir: 日志目录 (默认 config.SHEET_WRITE_BEHIND_DIR，空字符串表示不落盘)
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.max_records = max_records or config.SHEET_FLUSH_MAX_RECORDS
+        self.interval = config.SHEET_FLUSH_INTERVAL if interval is None else interval
+        journal_dir = config.SHEET_WRITE_BEHIND_DIR if journal_dir is None else journal_dir
+        self.journal_path = os.path.join(journal_dir, f"{name}.jsonl") if journal_dir else None
+
+        self.flushed_count = 0
+        self._pending: "OrderedDict[str, Dict]" = OrderedDict()
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._replay()
+        _live_queues.add(self)
+        _install_exit_hooks()
+        if self._pending:
+            print(f"   ♻️ [WriteBehind:{name}] 重放 {len(self._pending)} 条未写回的更新")
+            self._ensure_timer()
+
+    def __len__(self):
+        return len(self._pending)
+
+    # ---------- 日志 ----------
+
+    def _replay(self):
+        for entry in _read_journal(self.journal_path):
+            self._merge(entry["id"], entry["fields"])
+
+    def _rewrite_journal(self):
+        """用当前待写回的更新重写日志；调用方需持有 _lock"""
+        _rewrite_journal(self.journal_path, [
+            {"id": record_id, "fields": fields} for record_id, fields in self._pending.items()
+        ])
+
+    # ---------- 入队 / 写回 ----------
+
+    def _merge(self, record_id: str, fields: Dict):
+        if record_id in self._pending:
+            self._pending[record_id].update(fields)
+        else:
+            self._pending[record_id] = dict(fields)
+
+    def put(self, record_id: str, fields: Dict):
+        """加入一条字段更新 (同一记录的字段合并，后写入的值覆盖先写入的)"""
+        if self._closed:
+            raise RuntimeError(f"WriteBehindQueue '{self.name}' 已关闭")
+        with self._lock:
+            self._merge(record_id, fields)
+            _append_journal(self.journal_path, {"id": record_id, "fields": fields})
+            full = len(self._pending) >= self.max_records
+        if full:
+            self.flush()
+        else:
+            self._ensure_timer()
+
+    def flush(self) -> int:
+        """
+        立即写回所有待处理更新
+
+        Returns:
+            成功写回的记录数
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, OrderedDict()
+            if not batch:
+                return 0
+
+            transient = False
+            try:
+                failed = set(self.flush_func(dict(batch)) or ())
+            except Exception as e:
+                # 网络 / 配额等临时错误: 全部保留，不计入失败次数
+                print(f"   ⚠️ [WriteBehind:{self.name}] 批量写回失败，稍后重试: {e}")
+                failed, transient = set(batch), True
+
+            with self._lock:
+                # 失败的更新放回队列，期间新入队的同一记录字段优先
+                for record_id in failed:
+                    attempts = self._attempts.get(record_id, 0) + (0 if transient else 1)
+                    if attempts >= MAX_FLUSH_ATTEMPTS:
+                        print(f"   ❌ [WriteBehind:{self.name}] 记录 {record_id} 连续 {attempts} 次写回失败，已丢弃")
+                        self._attempts.pop(record_id, None)
+                        continue
+                    self._attempts[record_id] = attempts
+                    newer = self._pending.pop(record_id, {})
+                    self._pending[record_id] = {**batch[record_id], **newer}
+                for record_id in set(batch) - failed:
+                    self._attempts.pop(record_id, None)
+                self._rewrite_journal()
+
+            written = len(batch) - len(failed)
+            self.flushed_count += written
+            if written:
+                print(f"   💾 [WriteBehind:{self.name}] 批量写回 {written} 条记录")
+            return written
+
+    def _ensure_timer(self):
+        if self.interval <= 0 or (self._timer and self._timer.is_alive()):
+            return
+        self._timer = threading.Thread(target=self._run_timer, name=f"write-behind-{self.name}", daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        while not self._stop.wait(self.interval):
+            if self._pending:
+                self.flush()
+
+    def close(self):
+        """停止定时器并写回剩余更新 (进程退出时自动调用)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self.flush()
+        _live_queues.discard(self)
+
+
+class AppendSpool:
+    """
+    待追加行的本地缓冲
+
+    用法:
+        spool = AppendSpool("social_xhs", flush_func=lambda rows: client.batch_create_records(rows, "xhs"),
+                            id_field="Record_ID")
+        spool.put({"Title": "...", "Content": "..."})   # 先落盘，满 max_records 条自动 flush
+        spool.close()                                   # 写入剩余记录
+
+    flush_func(records) 返回 True 表示整批写入成功；失败或抛出异常时记录保留在缓冲与日志中，下次 flush 重试。
+    flush_func 也可以返回写入失败的记录列表 (如 FeishuClient.batch_create_partial)，只保留这些记录重试。
+    进程在 "写入成功" 与 "清空日志" 之间崩溃会导致重放时重复写入，
+    因此建议指定 id_field (入队时写入 UUID)，由 flush_func 跳过表中已存在的 ID。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[List[Dict]], Union[bool, List[Dict]]],
+        max_records: int = None,
+        id_field: Optional[str] = None,
+        journal_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            name: 缓冲名 (同时作为日志文件名，重启后据此重放)
+            flush_func: 批量追加函数
+            max_records: 累计多少条触发写入 (默认 config.SHEET_APPEND_BATCH_SIZE)
+            id_field: 入队时自动生成 UUID 的字段 (用于重放去重)
+            journal_dir: 日志目录 (默认 config.SHEET_WRITE_BEHIND_DIR，空字符串表示不落盘)
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.max_records = max_records or config.SHEET_APPEND_BATCH_SIZE
+        self.id_field = id_field
+        journal_dir = config.SHEET_WRITE_BEHIND_DIR if journal_dir is None else journal_dir
+        self.journal_path = os.path.join(journal_dir, f"{name}.append.jsonl") if journal_dir else None
+
+        self.flushed_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._pending: List[Dict] = _read_journal(self.journal_path)
+
+        _live_queues.add(self)
+        _install_exit_hooks()
+        if self._pending:
+            print(f"   ♻️ [AppendSpool:{name}] 重放 {len(self._pending)} 条未写入的记录")
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, record: Dict):
+        """加入一条待追加的记录 (先写日志再入队)"""
+        if self._closed:
+            raise RuntimeError(f"AppendSpool '{self.name}' 已关闭")
+        if self.id_field:
+            record.setdefault(self.id_field, str(uuid.uuid4()))
+        with self._lock:
+            _append_journal(self.journal_path, record)
+            self._pending.append(record)
+            full = len(self._pending) >= self.max_records
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        立即写入所有缓冲的记录
+
+        Returns:
+            成功写入的记录数
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+            try:
+                result = self.flush_func(batch)
+            except Exception as e:
+                print(f"   ⚠️ [AppendSpool:{self.name}] 批量写入失败: {e}")
+                result = False
+            # 返回列表时为写入失败的记录，其余视为已写入
+            failed = list(result) if isinstance(result, list) else ([] if result else batch)
+            if len(failed) == len(batch):
+                print(f"   ⚠️ [AppendSpool:{self.name}] {len(batch)} 条记录保留在本地，下次重试")
+                return 0
+
+            with self._lock:
+                # 写入期间新入队的记录保留
+                self._pending[:len(batch)] = failed
+                _rewrite_journal(self.journal_path, self._pending)
+            if failed:
+                print(f"   ⚠️ [AppendSpool:{self.name}] {len(failed)} 条记录写入失败，保留在本地下次重试")
+            written = len(batch) - len(failed)
+            self.flushed_count += written
+            return written
+
+    def close(self):
+        """写入剩余记录 (进程退出时自动调用)"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        _live_queues.discard(self)
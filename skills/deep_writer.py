@@ -4,7 +4,7 @@ import json
 import random
 import logging
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.skill import BaseSkill
@@ -17,6 +17,11 @@ class DeepWriteSkill(BaseSkill):
     """
     技能: 深度文章写作 (基于 PAS 模型和 GEO 优化)
     """
+    # 文章 JSON 必须包含的字段 (流式生成时据此校验)
+    REQUIRED_FIELDS = ("title", "html_content")
+    # 正文最少字符数 (Step 2 低于此值不保存)
+    MIN_CONTENT_CHARS = 50
+
     def __init__(self):
         super().__init__(
             name="deep_write",
@@ -35,6 +40,45 @@ class DeepWriteSkill(BaseSkill):
         Input: {"topic": str, "category": str, "rag_context": str (optional)}
         Output: Article JSON
         """
+        prompt = self._prepare_prompt(input_data)
+        if config.LLM_STREAM_ENABLED:
+            # 长文章走流式生成: 空闲超时代替总超时，缺少 title / html_content 视为失败
+            return llm_utils.call_llm_json_stream(
+                prompt, temperature=0.7, max_retries=2, required_fields=self.REQUIRED_FIELDS,
+                validator=self.is_valid_article
+            )
+        return llm_utils.call_llm_json(prompt, temperature=0.7, max_retries=2, validator=self.is_valid_article)
+
+    def execute_batch(self, inputs: List[Dict]) -> List[Optional[Dict]]:
+        """
+        并发撰写多篇文章 (受 LLMScheduler 并发上限约束)
+
+        Input: [execute 的 input_data, ...]
+        Output: [Article JSON 或 None, ...] (顺序与输入一致)
+        """
+        calls = [{"prompt": self._prepare_prompt(item)} for item in inputs]
+        if config.LLM_STREAM_ENABLED:
+            return llm_utils.call_llm_json_stream_batch(
+                calls, temperature=0.7, max_retries=2, required_fields=self.REQUIRED_FIELDS,
+                validator=self.is_valid_article
+            )
+        return llm_utils.call_llm_json_batch(calls, temperature=0.7, max_retries=2, validator=self.is_valid_article)
+
+    @classmethod
+    def is_valid_article(cls, article: Optional[Dict]) -> bool:
+        """
+        文章是否可用 (与 Step 2 保存时的校验一致: 有标题且正文不少于 MIN_CONTENT_CHARS 字)
+
+        不可用的结果不写入 LLM 缓存: Prompt 对同一选题是确定的，缓存坏结果会导致重跑时一直复用
+        """
+        if not isinstance(article, dict):
+            return False
+        title = str(article.get('title') or '').strip()
+        content = str(article.get('html_content') or '').strip()
+        return bool(title) and len(content) >= cls.MIN_CONTENT_CHARS
+
+    def _prepare_prompt(self, input_data: Dict) -> str:
+        """根据输入构建完整的写作 Prompt"""
         topic = input_data.get("topic", "")
         category = input_data.get("category", "行业资讯")
         source_trend = input_data.get("source_trend", "")
@@ -45,14 +89,17 @@ class DeepWriteSkill(BaseSkill):
         brand = self.brand_config.get('brand', {})
         brand_name = brand.get('name', '盒艺家')
         
+        # 同一选题使用固定随机种子，保证重跑时 Prompt 一致 (可命中 LLM 响应缓存)
+        rng = random.Random(f"{topic}|{category}|{source_trend}")
+        
         # 2. GEO 策略选择 (根据分类调整权重)
-        selected_city, geo_context, industry_focus = self._get_geo_strategy(category)
+        selected_city, geo_context, industry_focus = self._get_geo_strategy(category, rng)
         
         # 3. 构建分类特定的指令 (传入 topic 以便识别案例词)
-        category_instruction = self._get_category_instruction(category, brand_name, topic)
+        category_instruction = self._get_category_instruction(category, brand_name, topic, rng)
         
         # 4. 构建 Prompt
-        prompt = self._build_prompt(
+        return self._build_prompt(
             topic=topic,
             category=category,
             category_id=category_id,
@@ -65,12 +112,11 @@ class DeepWriteSkill(BaseSkill):
             source_trend=source_trend
         )
 
-        return llm_utils.call_llm_json(prompt, temperature=0.7, max_retries=2)
-
-    def _get_geo_strategy(self, category: str):
+    def _get_geo_strategy(self, category: str, rng: random.Random = None):
         """
         根据分类决定 GEO 注入的强度和策略
         """
+        rng = rng or random
         # 基础城市库
         GEO_TIERS = {
             "core": {  # 核心工业带
@@ -116,9 +162,9 @@ class DeepWriteSkill(BaseSkill):
 
         # 加权随机选择城市
         tier_weights = [("core", 0.6), ("radiation", 0.3), ("growth", 0.1)]
-        selected_tier = random.choices([t[0] for t in tier_weights], weights=[t[1] for t in tier_weights])[0]
+        selected_tier = rng.choices([t[0] for t in tier_weights], weights=[t[1] for t in tier_weights])[0]
         tier_data = GEO_TIERS[selected_tier]
-        selected_city = random.choice(tier_data["cities"])
+        selected_city = rng.choice(tier_data["cities"])
         
         # 获取该城市的产业特色 (Fallback to General)
         industry_focus = CITY_INDUSTRIES.get(selected_city, "通用行业/电商产品")
@@ -128,7 +174,7 @@ class DeepWriteSkill(BaseSkill):
             
         return selected_city, geo_context, industry_focus
 
-    def _get_category_instruction(self, category: str, brand_name: str, topic: str = "") -> str:
+    def _get_category_instruction(self, category: str, brand_name: str, topic: str = "", rng: random.Random = None) -> str:
         """
         生成分类特定的写作指导 (Core Logic)
         支持关键词触发 "案例模式"
@@ -153,7 +199,7 @@ class DeepWriteSkill(BaseSkill):
                     "gain": "3天交付、ISO品控、供应链稳定"
                 }
             ]
-            scenario = random.choice(scenarios)
+            scenario = (rng or random).choice(scenarios)
             
             return f"""
             【当前模式：深度案例复盘 (Professional Case Analysis) - {scenario['type']}】
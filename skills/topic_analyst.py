@@ -7,7 +7,8 @@ from typing import List, Dict
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.skill import BaseSkill
-from shared import llm_utils
+from shared import llm_utils, config
+from shared.title_index import TitleIndex, get_title_index
 
 # 配置 logger
 logger = logging.getLogger(__name__)
@@ -21,12 +22,15 @@ class TopicAnalysisSkill(BaseSkill):
             name="topic_analysis",
             description="分析热点列表，挑选最有价值的 25 个，并为每个生成 4 个 SEO 标题"
         )
+        # 最近一次执行中热点筛选 LLM 调用是否成功 (失败时结果来自随机补全)
+        self.analysis_succeeded = False
 
     def execute(self, input_data: Dict) -> List[Dict]:
         """
         Input: {"trends": [], "config": {}}
         Output: [{"Topic": "...", "大项分类": "...", ...}]
         """
+        self.analysis_succeeded = False
         trends = input_data.get("trends", [])
         if not trends: return []
 
@@ -34,23 +38,26 @@ class TopicAnalysisSkill(BaseSkill):
         analyzed_trends = self._analyze_trends(trends, input_data)
         
         results = []
-        generated_texts = [] # 用于去重检查
+        # 与历史标题只查重不写入: 上传成功后由 Step 1 runner 写入索引，上传失败的标题下轮仍可生成
+        title_index = get_title_index()
+        run_index = TitleIndex(":memory:")  # 本轮标题之间查重
 
-        # 2. 第二步：为每个热点生成标题
+        # 2. 第二步：为每个热点并发生成标题
+        brand_config = input_data.get("config", {})
         for idx, trend in enumerate(analyzed_trends):
             print(f"   🧠 [Analyst] 生成标题 ({idx+1}/{len(analyzed_trends)}): {trend['topic']}")
-            titles = self._generate_titles(trend, input_data.get("config", {}))
-            
+        all_titles = self._generate_titles_batch(analyzed_trends, brand_config)
+
+        for trend, titles in zip(analyzed_trends, all_titles):
             for t in titles:
                 raw_title = t['title'].strip()
                 
-                # [Deduplication] 查重
-                if self._is_text_similar(raw_title, generated_texts):
-                    print(f"   🗑️ [Dedupe] 丢弃高相似度标题: {raw_title}")
+                # [Deduplication] 查重 (MinHash/LSH 索引)
+                similar = title_index.find_similar(raw_title) or run_index.check_and_add(raw_title)
+                if similar:
+                    print(f"   🗑️ [Dedupe] 丢弃高相似度标题: {raw_title} (≈ {similar})")
                     continue
                 
-                generated_texts.append(raw_title)
-                
                 results.append({
                     "Topic": raw_title,
                     "大项分类": self._clean_category(t['category']),
@@ -58,38 +65,17 @@ class TopicAnalysisSkill(BaseSkill):
                     "Source_Trend": trend['topic'],
                     "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 })
+        run_index.close()
         
         return results
 
-    def _is_text_similar(self, new_text: str, existing_texts: List[str], threshold: float = 0.6) -> bool:
-        """
-        简单的文本相似度去重 (Jaccard Similarity on chars)
-        """
-        if not existing_texts: return False
-        
-        s1 = set(new_text)
-        for t in existing_texts:
-            s2 = set(t)
-            intersection = len(s1.intersection(s2))
-            union = len(s1.union(s2))
-            if union == 0: continue
-            
-            sim = intersection / union
-            # 如果前 5 个字完全一样，也视为重复
-            if new_text[:5] == t[:5]:
-                return True
-                
-            if sim > threshold:
-                return True
-        return False
-
     def _analyze_trends(self, trends, input_data: Dict):
         import re
-        trends_str = "\n".join([f"- {t}" for t in trends])
+        trends_str = "\n".join([f"- {t}" for t in sorted(trends)])
 
-        # 动态选择城市 (GEO 策略)
+        # 动态选择城市 (GEO 策略)；以热点列表为种子，重跑同一批热点时 Prompt 一致 (可命中 LLM 响应缓存)
         GEO_CITIES = ["东莞", "深圳", "广州", "上海", "杭州", "苏州", "义乌", "佛山"]
-        selected_city = random.choice(GEO_CITIES)
+        selected_city = random.Random(trends_str).choice(GEO_CITIES)
         
         trend_settings = input_data.get("config", {}).get("trend_settings", {})
         target_count = trend_settings.get("max_trends_to_analyze", 5)
@@ -122,6 +108,7 @@ class TopicAnalysisSkill(BaseSkill):
         """
         res = llm_utils.call_llm_json_array(prompt, temperature=0.7, max_retries=2)
         analyzed_trends = res if res else []
+        self.analysis_succeeded = bool(res)
         
         # === Fallback: 确保数量达标 ===
         trend_settings = input_data.get("config", {}).get("trend_settings", {})
@@ -156,6 +143,59 @@ class TopicAnalysisSkill(BaseSkill):
         return analyzed_trends[:target_count]
 
     def _generate_titles(self, trend, brand_config):
+        prompt, count = self._build_title_prompt(trend, brand_config)
+        res = llm_utils.call_llm_json_array(prompt, temperature=0.7, max_retries=2)
+        return res[:count] if res else []
+
+    def _generate_titles_batch(self, trends, brand_config) -> List[List[Dict]]:
+        """
+        为多个热点生成标题，返回值与 trends 顺序一致
+
+        每 title_batch_size 个热点打包成一次请求 (共用同一段品牌/规则说明)，各组并发执行；
+        组内某个热点的结果缺失或格式错误时，由 map_in_batches 拆分重试，最终单个热点退回单独 Prompt。
+        """
+        count = brand_config.get('trend_settings', {}).get('titles_per_trend', 3)
+        batch_size = brand_config.get('trend_settings', {}).get('title_batch_size', config.TITLE_BATCH_SIZE)
+
+        def run_batches(groups):
+            outputs = [None] * len(groups)
+            singles = [i for i, g in enumerate(groups) if len(g) == 1]
+            multis = [i for i, g in enumerate(groups) if len(g) > 1]
+
+            if multis:
+                responses = llm_utils.call_llm_json_batch(
+                    [{"prompt": self._build_batch_title_prompt(groups[i], brand_config)} for i in multis],
+                    temperature=0.7,
+                    max_retries=2
+                )
+                for i, data in zip(multis, responses):
+                    outputs[i] = [self._pick_batch_titles(data, n, count) for n in range(1, len(groups[i]) + 1)]
+
+            if singles:
+                responses = llm_utils.call_llm_json_array_batch(
+                    [{"prompt": self._build_title_prompt(groups[i][0], brand_config)[0]} for i in singles],
+                    temperature=0.7,
+                    max_retries=2
+                )
+                for i, res in zip(singles, responses):
+                    outputs[i] = [res[:count] if res else None]
+            return outputs
+
+        results = llm_utils.map_in_batches(trends, batch_size, run_batches)
+        return [titles or [] for titles in results]
+
+    @staticmethod
+    def _pick_batch_titles(data, number: int, count: int):
+        """从批量响应 {"1": [...], "2": [...]} 中取出第 number 个热点的标题，格式不对返回 None"""
+        if not isinstance(data, dict):
+            return None
+        titles = data.get(str(number))
+        if not isinstance(titles, list):
+            return None
+        titles = [t for t in titles if isinstance(t, dict) and t.get('title') and t.get('category')]
+        return titles[:count] or None
+
+    def _build_title_prompt(self, trend, brand_config):
         brand_name = brand_config.get('brand', {}).get('name', '盒艺家')
         topic = trend.get('topic', '')
         angle = trend.get('angle', '')
@@ -173,7 +213,48 @@ class TopicAnalysisSkill(BaseSkill):
         当前年份：{current_year}年
 
         任务：生成 {count} 个标题。
-        要求：
+        {self._title_requirements(count)}
+
+        返回 JSON:
+        [
+            {{"title": "标题1", "category": "专业知识"}},
+            ... (共{count}个)
+        ]
+        """
+        return prompt, count
+
+    def _build_batch_title_prompt(self, trends, brand_config):
+        """多个热点共用一段品牌/规则说明，要求按编号返回各自的标题"""
+        brand_name = brand_config.get('brand', {}).get('name', '盒艺家')
+        count = brand_config.get('trend_settings', {}).get('titles_per_trend', 3)
+        current_year = datetime.now().year
+
+        trend_lines = "\n".join(
+            f"        [{n}] {t.get('topic', '')} (角度: {t.get('angle', '')})"
+            for n, t in enumerate(trends, 1)
+        )
+
+        return f"""
+        背景：{brand_name} (既接B2B大单，也接B2C小单，**1个起订**)
+        当前年份：{current_year}年
+
+        热点列表 (共 {len(trends)} 个)：
+{trend_lines}
+
+        任务：为**每个热点分别**生成 {count} 个标题，各热点之间互不相同。
+        {self._title_requirements(count)}
+
+        返回 JSON 对象，键为热点编号 (必须包含全部 {len(trends)} 个编号):
+        {{
+            "1": [{{"title": "标题1", "category": "专业知识"}}, ... (共{count}个)],
+            "2": [...]
+        }}
+        """
+
+    @staticmethod
+    def _title_requirements(count):
+        """标题生成规则 (单个 / 批量 Prompt 共用)"""
+        return f"""要求：
         1. **多样化句式（拒绝公式化 - 严厉执行）**：
            - **绝对违禁词** (出现即判定为劣质)：
              - 严禁使用 "高级感(礼盒)的秘密"、"还在为...发愁"、"告别(买家秀)"
@@ -190,16 +271,7 @@ class TopicAnalysisSkill(BaseSkill):
         3. **字数控制**：30个字符以内（允许更完整的长标题）。
         4. **内容分布** ({count}个总数)：
            - 确保覆盖 **专业知识**、**行业资讯**、**产品介绍** 中至少两个分类。
-           **注意**：不要返回独立的"客户案例"分类，归入以上三类。
-
-        返回 JSON:
-        [
-            {{"title": "标题1", "category": "专业知识"}},
-            ... (共{count}个)
-        ]
-        """
-        res = llm_utils.call_llm_json_array(prompt, temperature=0.7, max_retries=2)
-        return res[:count] if res else []
+           **注意**：不要返回独立的"客户案例"分类，归入以上三类。"""
 
     def _clean_category(self, cat):
         valid_cats = ["专业知识", "行业资讯", "产品介绍"]
@@ -1,9 +1,8 @@
 import sys
 import os
-import requests
 import re
 import json
-import time
+import random
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -11,6 +10,8 @@ from dotenv import load_dotenv
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.skill import BaseSkill
 from shared import config
+from shared.crawler import get_crawler
+from shared.trend_fetch import TrendFetchEngine
 
 # 加载 .env 环境变量
 load_dotenv()
@@ -22,6 +23,9 @@ class TrendSearchSkill(BaseSkill):
     """
     技能: 全网热点挖掘 (Baidu, Weibo, Toutiao, etc.)
     """
+    # 谷歌趋势海外关键词
+    GOOGLE_KEYWORDS = ["custom packaging", "gift box wholesale", "mailer box"]
+
     def __init__(self):
         super().__init__(
             name="trend_search",
@@ -46,24 +50,12 @@ class TrendSearchSkill(BaseSkill):
         if mining_seeds:
             mining_seeds = self._rotate_seeds(mining_seeds)
         
-        # 1. 挖掘长尾需求
-        if mining_seeds:
-            all_trends.extend(self._fetch_baidu_suggestions(mining_seeds))
-            all_trends.extend(self._fetch_1688_suggestions(mining_seeds))
-            all_trends.extend(self._fetch_taobao_suggestions(mining_seeds))
-            all_trends.extend(self._fetch_zhihu_hot_questions(mining_seeds))
-            all_trends.extend(self._fetch_xiaohongshu_trends(mining_seeds))
-            all_trends.extend(self._fetch_google_trends(mining_seeds))
-
-        # 2. 抓取平台热榜
-        for t in self._fetch_baidu_hot():
-            all_trends.append(f"[百度] {t}")
-        for t in self._fetch_weibo_hot():
-            all_trends.append(f"[微博] {t}")
-        for t in self._fetch_toutiao_hot():
-            all_trends.append(f"[头条] {t}")
-        for t in self._fetch_36kr_hot():
-            all_trends.append(f"[36氪] {t}")
+        # 各来源并行抓取 (按 host 限制并发与请求速率，超过总时限保留已完成的结果)
+        engine = self._build_fetch_engine(mining_seeds)
+        for trends in engine.run().values():
+            all_trends.extend(trends)
+        engine.print_stats()
+        get_crawler().print_stats()
 
         # 去重
         unique_trends = list(set(all_trends))
@@ -77,9 +69,6 @@ class TrendSearchSkill(BaseSkill):
         基于日期的种子词轮换，保持话题多样性
         每天使用不同的种子词组合，避免内容同质化
         """
-        import random
-        from datetime import datetime
-        
         # 定义种子词分类 (基于关键词匹配)
         SEED_GROUPS = {
             "产品类": ["礼盒", "纸箱", "飞机盒", "手提袋", "包装盒", "纸盒", "彩盒", "内托", "内衬"],
@@ -130,158 +119,140 @@ class TrendSearchSkill(BaseSkill):
         print(f"🔄 [SeedRotation] 今日主力: {primary_group} | 种子数: {len(result)} (原{len(seeds)})")
         return result
 
+    def _build_fetch_engine(self, seeds: list) -> TrendFetchEngine:
+        """把长尾需求 (每个种子词一个任务) 与平台热榜注册为并发抓取任务 (按 来源 + 种子词 缓存)"""
+        engine = TrendFetchEngine()
+
+        # 1. 挖掘长尾需求
+        if seeds:
+            engine.add_each("搜索需求", "suggestion.baidu.com", self._fetch_baidu_suggestion, seeds, cache=True)
+            engine.add_each("1688采购", "suggest.1688.com", self._fetch_1688_suggestion,
+                            random.sample(seeds, min(10, len(seeds))), cache=True)
+            engine.add_each("淘宝热搜", "suggest.taobao.com", self._fetch_taobao_suggestion,
+                            random.sample(seeds, min(10, len(seeds))), cache=True)
+            engine.add_each("知乎问答", "www.zhihu.com", self._fetch_zhihu_questions,
+                            random.sample(seeds, min(8, len(seeds))), cache=True)
+            engine.add("小红书", "edith.xiaohongshu.com", self._fetch_xiaohongshu_trends, seeds)
+            engine.add_each("谷歌趋势", "trends.google.com", self._fetch_google_autocomplete,
+                            self.GOOGLE_KEYWORDS, cache=True)
+
+        # 2. 抓取平台热榜
+        engine.add("百度", "top.baidu.com", self._tagged, "百度", self._fetch_baidu_hot, cache_key="hot")
+        engine.add("微博", "s.weibo.com", self._tagged, "微博", self._fetch_weibo_hot, cache_key="hot")
+        engine.add("头条", "www.toutiao.com", self._tagged, "头条", self._fetch_toutiao_hot, cache_key="hot")
+        engine.add("36氪", "36kr.com", self._tagged, "36氪", self._fetch_36kr_hot, cache_key="hot")
+        return engine
+
+    @staticmethod
+    def _tagged(tag: str, fetch) -> list:
+        """热榜结果加上 [来源] 标记"""
+        return [f"[{tag}] {t}" for t in fetch() if t]
+
+    # --- 热榜抓取函数 (失败直接抛出，由 TrendFetchEngine 计入该来源的失败数) ---
+
     def _fetch_baidu_hot(self):
-        try:
-            resp = requests.get("https://top.baidu.com/board?tab=realtime", headers=self.headers, timeout=10)
-            resp.encoding = 'utf-8'
-            titles = re.findall(r'<div class="c-single-text-ellipsis">\s*(.*?)\s*</div>', resp.text)
-            return [t.strip() for t in titles if t.strip() and "置顶" not in t][:15]
-        except Exception as e:
-            print(f"   ❌ [Baidu] 失败: {e}")
-            return []
+        resp = get_crawler().get("https://top.baidu.com/board?tab=realtime", headers=self.headers, timeout=10)
+        resp.raise_for_status()
+        resp.encoding = 'utf-8'
+        titles = re.findall(r'<div class="c-single-text-ellipsis">\s*(.*?)\s*</div>', resp.text)
+        return [t.strip() for t in titles if t.strip() and "置顶" not in t][:15]
 
     def _fetch_weibo_hot(self):
-        try:
-            resp = requests.get("https://s.weibo.com/top/summary", headers=self.headers, timeout=10)
-            titles = re.findall(r'<a href="/weibo\?q=[^"]+" target="_blank">([^<]+)</a>', resp.text)
-            return [t.strip() for t in titles if t.strip()][:15]
-        except Exception as e:
-            print(f"   ❌ [Weibo] 失败: {e}")
-            return []
+        resp = get_crawler().get("https://s.weibo.com/top/summary", headers=self.headers, timeout=10)
+        resp.raise_for_status()
+        titles = re.findall(r'<a href="/weibo\?q=[^"]+" target="_blank">([^<]+)</a>', resp.text)
+        return [t.strip() for t in titles if t.strip()][:15]
 
     def _fetch_toutiao_hot(self):
-        try:
-            resp = requests.get("https://www.toutiao.com/hot-event/hot-board/?origin=toutiao_pc", headers=self.headers, timeout=10)
-            data = resp.json()
+        resp = get_crawler().get("https://www.toutiao.com/hot-event/hot-board/?origin=toutiao_pc", headers=self.headers, timeout=10)
+        resp.raise_for_status()
+        data = resp.json()
+        titles = []
+        if "fixed_top_data" in data:
+            titles.extend([i.get("Title") for i in data["fixed_top_data"]])
+        if "data" in data:
+            titles.extend([i.get("Title") for i in data["data"]])
+        return titles[:15]
+
+    def _fetch_36kr_hot(self):
+        resp = get_crawler().get("https://36kr.com/newsflashes", headers=self.headers, timeout=10)
+        resp.raise_for_status()
+        html = resp.text
+        start_marker = "window.initialState="
+        if start_marker in html:
+            start_idx = html.find(start_marker) + len(start_marker)
+            end_idx = html.find("</script>", start_idx)
+            json_str = html[start_idx:end_idx].strip().rstrip(";")
+            data = json.loads(json_str)
+            items = data.get("newsflashCatalogData", {}).get("data", {}).get("newsflashList", {}).get("data", {}).get("itemList", [])
             titles = []
-            if "fixed_top_data" in data:
-                titles.extend([i.get("Title") for i in data["fixed_top_data"]])
-            if "data" in data:
-                titles.extend([i.get("Title") for i in data["data"]])
+            for item in items:
+                t = item.get("templateMaterial", {}).get("widgetTitle")
+                if t: titles.append(t)
             return titles[:15]
-        except Exception as e:
-            print(f"   ❌ [Toutiao] 失败: {e}")
-            return []
+        return []
 
-    def _fetch_36kr_hot(self):
-        try:
-            resp = requests.get("https://36kr.com/newsflashes", headers=self.headers, timeout=10)
-            html = resp.text
-            start_marker = "window.initialState="
-            if start_marker in html:
-                start_idx = html.find(start_marker) + len(start_marker)
-                end_idx = html.find("</script>", start_idx)
-                json_str = html[start_idx:end_idx].strip().rstrip(";")
-                data = json.loads(json_str)
-                items = data.get("newsflashCatalogData", {}).get("data", {}).get("newsflashList", {}).get("data", {}).get("itemList", [])
-                titles = []
-                for item in items:
-                    t = item.get("templateMaterial", {}).get("widgetTitle")
-                    if t: titles.append(t)
-                return titles[:15]
-            return []
-        except Exception as e:
-            print(f"   ❌ [36Kr] 失败: {e}")
+    # --- 单次请求的抓取函数 (失败直接抛出，由 TrendFetchEngine 记录) ---
+
+    def _fetch_baidu_suggestion(self, seed):
+        url = f"http://suggestion.baidu.com/su?wd={seed}&p=3&cb=window.bdsug.sug"
+        resp = get_crawler().get(url, headers=self.headers, timeout=5)
+        match = re.search(r's:(\[.*?\])', resp.text)
+        if not match:
             return []
+        words = json.loads(match.group(1).replace("'", '"'))[:5]
+        return [f"[搜索需求] {w}" for w in words]
 
-    def _fetch_baidu_suggestions(self, seeds):
-        suggestions = []
-        for seed in seeds:
-            try:
-                url = f"http://suggestion.baidu.com/su?wd={seed}&p=3&cb=window.bdsug.sug"
-                resp = requests.get(url, headers=self.headers, timeout=5)
-                match = re.search(r's:(\[.*?\])', resp.text)
-                if match:
-                    words = json.loads(match.group(1).replace("'", '"'))[:5]
-                    suggestions.extend([f"[搜索需求] {w}" for w in words])
-            except Exception as e:
-                logger.debug(f"[百度建议] {seed} 抓取失败: {e}")
-        return suggestions
+    def _fetch_1688_suggestion(self, seed):
+        url = f"https://suggest.1688.com/bin/suggest?code=utf-8&q={seed}"
+        data = get_crawler().get(url, headers=self.headers, timeout=5).json()
+        return [f"[1688采购] {i['q']}" for i in data.get("result", [])[:5]]
 
-    def _fetch_1688_suggestions(self, seeds):
-        suggestions = []
-        import random
-        for seed in random.sample(seeds, min(10, len(seeds))):
-             try:
-                url = f"https://suggest.1688.com/bin/suggest?code=utf-8&q={seed}"
-                resp = requests.get(url, headers=self.headers, timeout=5)
-                data = resp.json()
-                if "result" in data:
-                    suggestions.extend([f"[1688采购] {i['q']}" for i in data['result'][:5]])
-             except Exception as e:
-                logger.debug(f"[1688建议] {seed} 抓取失败: {e}")
-        return suggestions
+    def _fetch_taobao_suggestion(self, seed):
+        url = f"https://suggest.taobao.com/sug?code=utf-8&q={seed}&k=1&area=c2c"
+        data = get_crawler().get(url, headers=self.headers, timeout=5).json()
+        return [f"[淘宝热搜] {i[0]}" for i in data.get("result", [])[:5]]
 
-    def _fetch_taobao_suggestions(self, seeds):
-        suggestions = []
-        import random
-        for seed in random.sample(seeds, min(10, len(seeds))):
-            try:
-                url = f"https://suggest.taobao.com/sug?code=utf-8&q={seed}&k=1&area=c2c"
-                resp = requests.get(url, headers=self.headers, timeout=5)
-                data = resp.json()
-                if "result" in data:
-                    suggestions.extend([f"[淘宝热搜] {i[0]}" for i in data['result'][:5]])
-            except Exception as e:
-                logger.debug(f"[淘宝建议] {seed} 抓取失败: {e}")
-        return suggestions
-    
-    def _fetch_zhihu_hot_questions(self, seeds):
+    def _fetch_zhihu_questions(self, seed):
         questions = []
-        import random
-        for seed in random.sample(seeds, min(8, len(seeds))):
-            try:
-                url = f"https://www.zhihu.com/api/v4/search_v3?t=general&q={seed}&offset=0&limit=5"
-                headers = {**self.headers, "Referer": "https://www.zhihu.com/search"}
-                resp = requests.get(url, headers=headers, timeout=8)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    for item in data.get("data", [])[:3]:
-                        if item.get("type") == "search_result":
-                            obj = item.get("object", {})
-                            title = obj.get("title", "") or obj.get("question", {}).get("title", "")
-                            if title:
-                                clean = re.sub(r'<[^>]+>', '', title)
-                                questions.append(f"[知乎问答] {clean}")
-            except Exception as e:
-                logger.debug(f"[知乎问答] {seed} 抓取失败: {e}")
+        url = f"https://www.zhihu.com/api/v4/search_v3?t=general&q={seed}&offset=0&limit=5"
+        headers = {**self.headers, "Referer": "https://www.zhihu.com/search"}
+        resp = get_crawler().get(url, headers=headers, timeout=8)
+        if resp.status_code == 200:
+            for item in resp.json().get("data", [])[:3]:
+                if item.get("type") == "search_result":
+                    obj = item.get("object", {})
+                    title = obj.get("title", "") or obj.get("question", {}).get("title", "")
+                    if title:
+                        clean = re.sub(r'<[^>]+>', '', title)
+                        questions.append(f"[知乎问答] {clean}")
         return list(set(questions))
 
     def _fetch_xiaohongshu_trends(self, seeds):
+        # 热榜与种子词无关，请求一次即可
         trends = []
-        import random
-        for seed in random.sample(seeds, min(6, len(seeds))):
-            try:
-                url = f"https://edith.xiaohongshu.com/api/sns/web/v1/search/hot_list"
-                headers = {**self.headers, "Referer": "https://www.xiaohongshu.com/"}
-                resp = requests.get(url, headers=headers, timeout=8)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data.get("success"):
-                        for item in data["data"].get("list", [])[:10]:
-                            if any(k in item.get("title", "") for k in ["包装","礼盒","送礼"]):
-                                trends.append(f"[小红书] {item['title']}")
-                        break
-            except Exception as e:
-                logger.debug(f"[小红书] {seed} 抓取失败: {e}")
-        
+        try:
+            url = "https://edith.xiaohongshu.com/api/sns/web/v1/search/hot_list"
+            headers = {**self.headers, "Referer": "https://www.xiaohongshu.com/"}
+            resp = get_crawler().get(url, headers=headers, timeout=8)
+            if resp.status_code == 200:
+                data = resp.json()
+                if data.get("success"):
+                    for item in data["data"].get("list", [])[:10]:
+                        if any(k in item.get("title", "") for k in ["包装","礼盒","送礼"]):
+                            trends.append(f"[小红书] {item['title']}")
+        except Exception as e:
+            logger.debug(f"[小红书] 热榜抓取失败: {e}")
+
         scenes = ["开箱体验","送礼推荐","高级感包装"]
         for seed in random.sample(seeds, min(3, len(seeds))):
             for s in random.sample(scenes, 2):
                 trends.append(f"[小红书] {seed}{s}")
         return list(set(trends))
 
-    def _fetch_google_trends(self, seeds):
-        trends = []
-        keywords = ["custom packaging", "gift box wholesale", "mailer box"]
-        for kw in keywords:
-            try:
-                url = f"https://trends.google.com/trends/api/autocomplete/{kw.replace(' ', '%20')}?hl=en-US"
-                resp = requests.get(url, headers={"User-Agent": self.headers["User-Agent"]}, timeout=8)
-                text = resp.text[5:] if resp.text.startswith(")]}'") else resp.text
-                data = json.loads(text)
-                for t in data.get("default", {}).get("topics", [])[:3]:
-                    trends.append(f"[谷歌趋势] {t['title']}")
-            except Exception as e:
-                logger.debug(f"[谷歌趋势] {kw} 抓取失败: {e}")
-        return list(set(trends))
+    def _fetch_google_autocomplete(self, kw):
+        url = f"https://trends.google.com/trends/api/autocomplete/{kw.replace(' ', '%20')}?hl=en-US"
+        resp = get_crawler().get(url, headers={"User-Agent": self.headers["User-Agent"]}, timeout=8)
+        text = resp.text[5:] if resp.text.startswith(")]}'") else resp.text
+        data = json.loads(text)
+        return [f"[谷歌趋势] {t['title']}" for t in data.get("default", {}).get("topics", [])[:3]]
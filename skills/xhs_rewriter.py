@@ -1,11 +1,12 @@
 import sys
 import os
 import json
-import requests
+import time
+from typing import Dict
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.skill import BaseSkill
-from shared import config
+from shared import config, llm_transport, llm_router, llm_metrics, llm_utils
 
 class XHSRewriterSkill(BaseSkill):
     """
@@ -37,33 +38,36 @@ class XHSRewriterSkill(BaseSkill):
 """
 
     def _call_llm(self, prompt: str) -> str:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        if "openrouter" in self.api_url:
-            headers["HTTP-Referer"] = "https://github.com/jememouse/deepseek-feisu-cms"
-            headers["X-Title"] = "DeepSeek CMS Agent"
+        headers = llm_transport.build_headers(self.api_url, self.api_key)
 
         payload = {
             "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": llm_transport.build_messages(prompt, self.SYSTEM_PROMPT),
             "temperature": 1.3 
         }
         
+        started = time.monotonic()
+        served, provider = payload, None  # 路由 / 对冲后实际响应的模型与服务商 (用于计费)
         try:
-            resp = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
+            resp = llm_router.get_router().post(self.api_url, headers, payload, timeout=60)
+            served, provider = llm_utils._served_by(resp, payload)
             if resp.status_code == 200:
-                return resp.json()['choices'][0]['message']['content']
+                data = resp.json()
+                llm_metrics.get_metrics().record_call(
+                    caller=self.name, model=served["model"], provider=provider,
+                    usage=data.get('usage'), latency=time.monotonic() - started
+                )
+                return data['choices'][0]['message']['content']
             else:
                 print(f"   ❌ LLM Error: {resp.status_code} - {resp.text}")
-                return ""
         except Exception as e:
             print(f"   ❌ Request Error: {e}")
-            return ""
+
+        llm_metrics.get_metrics().record_call(
+            caller=self.name, model=served["model"], provider=provider,
+            latency=time.monotonic() - started, status="failed"
+        )
+        return ""
 
     def execute(self, input_data: Dict) -> Dict:
         """
@@ -5,6 +5,8 @@ import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.trend_hunter import TrendHunterAgent
+from shared import llm_cache, llm_metrics
+from shared.title_index import get_title_index, STAGE_TOPIC
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE = os.path.join(BASE_DIR, 'box_artist_config.json')
@@ -23,6 +25,8 @@ def run():
         args = {"mining_seeds": ["包装", "礼盒"]}
     hunter = TrendHunterAgent()
     topics = hunter.hunt_and_analyze(args)
+    llm_cache.get_cache().print_stats()
+    llm_metrics.finish_run()
     
     if topics:
         # 根据项目要求，将所有挖掘到的主题状态统一设置为 "Ready"
@@ -89,11 +93,20 @@ def run():
                     success = client.batch_create_records(upload_list)
                     if success:
                         print(f"✅ 已同步 {len(upload_list)} 条记录到飞书")
+                        _index_uploaded(upload_list)
                 else:
                     print("⚠️ 没有新选题需要同步")
                     
             except Exception as e:
                 print(f"❌ 飞书同步失败: {e}")
 
+
+def _index_uploaded(records):
+    """上传成功后才把标题写入查重索引 (上传失败的标题不会被误判为重复)"""
+    title_index = get_title_index()
+    for record in records:
+        title_index.add(record['Topic'], STAGE_TOPIC)
+
+
 if __name__ == "__main__":
     run()
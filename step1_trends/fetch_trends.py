@@ -5,17 +5,22 @@
 import requests
 import json
 import os
+import sys
 import re
-import time
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.crawler import get_crawler
+from shared.trend_fetch import TrendFetchEngine
+from shared.trend_history import get_trend_history
+
 # 加载 .env 环境变量
 load_dotenv()
 
 # 配置 DeepSeek API
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-your-key-here")
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_URL = os.getenv("LLM_API_URL") or "https://api.deepseek.com/v1/chat/completions"
 
 # URLs
 BAIDU_HOT_URL = "https://top.baidu.com/board?tab=realtime"
@@ -28,40 +33,6 @@ KR36_HOT_URL = "https://36kr.com/newsflashes"
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TRENDS_FILE = os.path.join(BASE_DIR, "trends_data.json")
 CONFIG_FILE = os.path.join(BASE_DIR, "box_artist_config.json")
-CACHE_FILE = os.path.join(BASE_DIR, ".cache", "trends_cache.json")
-CACHE_EXPIRY_HOURS = 4  # 缓存有效期
-
-def _load_cache():
-    """加载缓存数据"""
-    if not os.path.exists(CACHE_FILE):
-        return {}
-    try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {}
-
-def _save_cache(cache_data):
-    """保存缓存数据"""
-    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(cache_data, f, ensure_ascii=False, indent=2)
-
-def _get_cached(key):
-    """获取缓存，检查是否过期"""
-    cache = _load_cache()
-    if key in cache:
-        cached_time = datetime.fromisoformat(cache[key].get("time", "2000-01-01"))
-        if (datetime.now() - cached_time).total_seconds() < CACHE_EXPIRY_HOURS * 3600:
-            print(f"   📦 使用缓存: {key}")
-            return cache[key].get("data", [])
-    return None
-
-def _set_cached(key, data):
-    """设置缓存"""
-    cache = _load_cache()
-    cache[key] = {"time": datetime.now().isoformat(), "data": data}
-    _save_cache(cache)
 
 # 通用 Header
 HEADERS = {
@@ -73,7 +44,7 @@ def fetch_baidu_hot():
     """抓取百度热搜榜"""
     print("📡 [Baidu] 正在抓取...")
     try:
-        resp = requests.get(BAIDU_HOT_URL, headers=HEADERS, timeout=10)
+        resp = get_crawler().get(BAIDU_HOT_URL, headers=HEADERS, timeout=10)
         resp.encoding = 'utf-8'
         html = resp.text
         titles = re.findall(r'<div class="c-single-text-ellipsis">\s*(.*?)\s*</div>', html)
@@ -88,7 +59,7 @@ def fetch_weibo_hot():
     """抓取微博热搜"""
     print("📡 [Weibo] 正在抓取...")
     try:
-        resp = requests.get(WEIBO_HOT_URL, headers=HEADERS, timeout=10)
+        resp = get_crawler().get(WEIBO_HOT_URL, headers=HEADERS, timeout=10)
         html = resp.text
         # 微博格式: <a href="/weibo?q=xxx" target="_blank">xxx</a>
         # 排除 "javascript:void(0)" 等置顶广告
@@ -104,7 +75,7 @@ def fetch_toutiao_hot():
     """抓取头条热榜 (抖音/字节系数据)"""
     print("📡 [Toutiao] 正在抓取...")
     try:
-        resp = requests.get(TOUTIAO_HOT_URL, headers=HEADERS, timeout=10)
+        resp = get_crawler().get(TOUTIAO_HOT_URL, headers=HEADERS, timeout=10)
         data = resp.json()
         
         # 解析头条 JSON 结构
@@ -134,7 +105,7 @@ def fetch_bilibili_hot():
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
-        resp = requests.get(BILIBILI_HOT_URL, headers=headers, timeout=10)
+        resp = get_crawler().get(BILIBILI_HOT_URL, headers=headers, timeout=10)
         data = resp.json()
         
         clean_titles = []
@@ -153,7 +124,7 @@ def fetch_36kr_hot():
     """抓取36氪快讯 (行业/商业)"""
     print("📡 [36Kr] 正在抓取...")
     try:
-        resp = requests.get(KR36_HOT_URL, headers=HEADERS, timeout=10)
+        resp = get_crawler().get(KR36_HOT_URL, headers=HEADERS, timeout=10)
         html = resp.text
         
         # 优化提取逻辑，不用简单的正则防止提前截断
@@ -194,247 +165,182 @@ def fetch_36kr_hot():
         print(f"   ❌ 失败: {e}")
         return []
 
-def fetch_zhihu_hot_questions(seed_words):
+# ===== 单次请求的长尾挖掘函数 (由 TrendFetchEngine 按 host 并发调度，请求经 CrawlScheduler 限速；失败直接抛出) =====
+
+def fetch_zhihu_questions(seed):
     """抓取知乎热门问答 (高意图问答，适合 GEO 优化)"""
-    if not seed_words:
-        return []
-        
-    print(f"❓ 开始挖掘知乎问答（高意图需求）...")
+    # 知乎搜索 API (简化版，通过网页接口)
+    url = f"https://www.zhihu.com/api/v4/search_v3?t=general&q={seed}&offset=0&limit=5"
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+        "Referer": "https://www.zhihu.com/search"
+    }
     questions = []
-    import random
-    # 随机选取 8 个种子词进行挖掘
-    target_seeds = random.sample(seed_words, min(8, len(seed_words)))
-    
-    for seed in target_seeds:
-        try:
-            # 知乎搜索 API (简化版，通过网页接口)
-            url = f"https://www.zhihu.com/api/v4/search_v3?t=general&q={seed}&offset=0&limit=5"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-                "Referer": "https://www.zhihu.com/search"
-            }
-            resp = requests.get(url, headers=headers, timeout=8)
-            if resp.status_code == 200:
-                data = resp.json()
-                if "data" in data:
-                    for item in data["data"][:3]:  # 每个种子词取前3条
-                        obj = item.get("object", {})
-                        # 优先获取问题标题
-                        if item.get("type") == "search_result":
-                            title = obj.get("title", "") or obj.get("question", {}).get("title", "")
-                            if title and len(title) > 5:
-                                # 清理 HTML 标签
-                                clean_title = re.sub(r'<[^>]+>', '', title)
-                                questions.append(f"[知乎问答] {clean_title}")
-                    print(f"   -> '{seed}' 挖到: {min(3, len(data.get('data', [])))} 条")
-            
-            time.sleep(0.8)  # 知乎反爬严格，增加间隔
-        except Exception as e:
-            print(f"   ⚠️ 知乎挖掘 '{seed}' 失败: {e}")
-            
-    # 去重
-    questions = list(set(questions))
-    print(f"   -> 总计获取 {len(questions)} 个知乎高意图问答")
-    return questions
+    resp = get_crawler().get(url, headers=headers, timeout=8)
+    if resp.status_code == 200:
+        data = resp.json()
+        if "data" in data:
+            for item in data["data"][:3]:  # 每个种子词取前3条
+                obj = item.get("object", {})
+                # 优先获取问题标题
+                if item.get("type") == "search_result":
+                    title = obj.get("title", "") or obj.get("question", {}).get("title", "")
+                    if title and len(title) > 5:
+                        # 清理 HTML 标签
+                        clean_title = re.sub(r'<[^>]+>', '', title)
+                        questions.append(f"[知乎问答] {clean_title}")
+            print(f"   -> 知乎 '{seed}' 挖到: {min(3, len(data.get('data', [])))} 条")
+    return list(set(questions))
 
 def fetch_xiaohongshu_trends(seed_words):
     """抓取小红书热门话题 (C端消费趋势，年轻群体偏好)"""
     if not seed_words:
         return []
         
-    print(f"📕 开始挖掘小红书消费趋势...")
     trends = []
     import random
-    # 随机选取 6 个种子词
-    target_seeds = random.sample(seed_words, min(6, len(seed_words)))
-    
-    for seed in target_seeds:
-        try:
-            # 小红书搜索建议 API (公开接口)
-            url = f"https://edith.xiaohongshu.com/api/sns/web/v1/search/hot_list"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-                "Referer": "https://www.xiaohongshu.com/"
-            }
-            resp = requests.get(url, headers=headers, timeout=8)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get("success") and "data" in data:
-                    hot_list = data["data"].get("list", [])[:10]
-                    for item in hot_list:
-                        title = item.get("title", "")
-                        if title and any(kw in title for kw in ["包装", "礼盒", "送礼", "开箱", "好物"]):
-                            trends.append(f"[小红书] {title}")
-                    print(f"   -> 获取到 {len(hot_list)} 个热门话题")
-                    break  # 热榜只需请求一次
-            
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"   ⚠️ 小红书抓取失败: {e}")
+    try:
+        # 小红书热榜 (与种子词无关，请求一次即可)
+        url = f"https://edith.xiaohongshu.com/api/sns/web/v1/search/hot_list"
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+            "Referer": "https://www.xiaohongshu.com/"
+        }
+        resp = get_crawler().get(url, headers=headers, timeout=8)
+        
+        if resp.status_code == 200:
+            data = resp.json()
+            if data.get("success") and "data" in data:
+                hot_list = data["data"].get("list", [])[:10]
+                for item in hot_list:
+                    title = item.get("title", "")
+                    if title and any(kw in title for kw in ["包装", "礼盒", "送礼", "开箱", "好物"]):
+                        trends.append(f"[小红书] {title}")
+                print(f"   -> 小红书获取到 {len(hot_list)} 个热门话题")
+    except Exception as e:
+        print(f"   ⚠️ 小红书抓取失败: {e}")
     
     # 备用：基于种子词构造消费场景话题
     consumption_scenes = [
         "开箱体验", "送礼推荐", "高级感包装", "拆快递", 
         "好物分享", "颜值包装", "精致生活"
     ]
-    for seed in target_seeds[:3]:
+    for seed in random.sample(seed_words, min(3, len(seed_words))):
         for scene in random.sample(consumption_scenes, 2):
             trends.append(f"[小红书] {seed}{scene}")
     
-    trends = list(set(trends))
-    print(f"   -> 总计获取 {len(trends)} 个小红书趋势")
-    return trends
+    return list(set(trends))
+
+# 包装行业海外关键词 (谷歌趋势取前 5 个)
+GOOGLE_OVERSEAS_KEYWORDS = [
+    "custom packaging", "gift box wholesale", "mailer box",
+    "packaging design trends", "sustainable packaging",
+    "luxury packaging", "eco friendly packaging",
+    "packaging supplier", "corrugated box manufacturer"
+]
 
-def fetch_google_trends(seed_words):
+# 谷歌趋势备用：预设海外热门话题
+GOOGLE_PRESET_TRENDS = [
+    "[谷歌趋势] sustainable packaging solutions 2026",
+    "[谷歌趋势] custom mailer boxes for small business",
+    "[谷歌趋势] eco friendly packaging alternatives",
+    "[谷歌趋势] luxury gift box packaging design",
+    "[谷歌趋势] corrugated shipping boxes wholesale"
+]
+
+def fetch_google_autocomplete(kw):
     """获取谷歌趋势数据 (海外市场洞察，跨境电商需求)"""
-    if not seed_words:
-        return []
-        
-    print(f"🌍 开始获取谷歌全球趋势...")
+    # Google Trends 建议 API (简化版)
+    url = f"https://trends.google.com/trends/api/autocomplete/{kw.replace(' ', '%20')}?hl=en-US"
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+    }
     trends = []
-    
-    # 包装行业海外关键词
-    overseas_keywords = [
-        "custom packaging", "gift box wholesale", "mailer box",
-        "packaging design trends", "sustainable packaging",
-        "luxury packaging", "eco friendly packaging",
-        "packaging supplier", "corrugated box manufacturer"
-    ]
-    
-    for kw in overseas_keywords[:5]:
-        try:
-            # Google Trends 建议 API (简化版)
-            url = f"https://trends.google.com/trends/api/autocomplete/{kw.replace(' ', '%20')}?hl=en-US"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-            }
-            resp = requests.get(url, headers=headers, timeout=8)
-            
-            if resp.status_code == 200:
-                # Google Trends 返回需要处理前缀
-                text = resp.text
-                if text.startswith(")]}'"):
-                    text = text[5:]
-                try:
-                    data = json.loads(text)
-                    if "default" in data and "topics" in data["default"]:
-                        for topic in data["default"]["topics"][:3]:
-                            title = topic.get("title", "")
-                            if title:
-                                trends.append(f"[谷歌趋势] {title}")
-                except:
-                    pass
-            
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"   ⚠️ 谷歌趋势 '{kw}' 获取失败: {e}")
-    
-    # 备用：预设海外热门话题
-    preset_trends = [
-        "[谷歌趋势] sustainable packaging solutions 2026",
-        "[谷歌趋势] custom mailer boxes for small business",
-        "[谷歌趋势] eco friendly packaging alternatives",
-        "[谷歌趋势] luxury gift box packaging design",
-        "[谷歌趋势] corrugated shipping boxes wholesale"
-    ]
-    trends.extend(preset_trends)
-    
-    trends = list(set(trends))
-    print(f"   -> 总计获取 {len(trends)} 个海外趋势")
+    resp = get_crawler().get(url, headers=headers, timeout=8)
+    if resp.status_code == 200:
+        # Google Trends 返回需要处理前缀
+        text = resp.text
+        if text.startswith(")]}'"):
+            text = text[5:]
+        data = json.loads(text)
+        if "default" in data and "topics" in data["default"]:
+            for topic in data["default"]["topics"][:3]:
+                title = topic.get("title", "")
+                if title:
+                    trends.append(f"[谷歌趋势] {title}")
     return trends
 
-def fetch_baidu_suggestions(seed_words):
+def fetch_baidu_suggestion(seed):
     """挖掘百度下拉推荐词 (精准搜索需求)"""
-    if not seed_words:
+    # Baidu Suggest API: window.bdsug.sug({q:"...",s:["..."]})
+    url = f"http://suggestion.baidu.com/su?wd={seed}&p=3&cb=window.bdsug.sug"
+    resp = get_crawler().get(url, headers=HEADERS, timeout=5)
+    # 简单的正则提取 s:[...] 内容
+    match = re.search(r's:(\[.*?\])', resp.text)
+    if not match:
         return []
-        
-    print(f"⛏️  开始挖掘 {len(seed_words)} 个种子词的长尾需求...")
-    suggestions = []
-    
-    for seed in seed_words:
-        try:
-            # Baidu Suggest API: window.bdsug.sug({q:"...",s:["..."]})
-            url = f"http://suggestion.baidu.com/su?wd={seed}&p=3&cb=window.bdsug.sug"
-            resp = requests.get(url, headers=HEADERS, timeout=5)
-            # 简单的正则提取 s:[...] 内容
-            match = re.search(r's:(\[.*?\])', resp.text)
-            if match:
-                # 转换类似 JSON 的数组字符串 (虽然它是 JS 数组，但 python json 也能解大部分)
-                # 注意：Baidu 有时返回单引号，py json 需要双引号
-                raw_list = match.group(1).replace("'", '"')
-                try:
-                    words = json.loads(raw_list)
-                    # 选取前 5 个最相关的
-                    top_words = words[:5]
-                    for w in top_words:
-                        suggestions.append(f"[搜索需求] {w}")
-                    print(f"   -> '{seed}' 挖到: {len(top_words)} 个")
-                except:
-                    pass
-            time.sleep(0.5) 
-        except Exception as e:
-            print(f"   ❌ 挖掘 '{seed}' 失败: {e}")
-            
-    print(f"   -> 总计获取 {len(suggestions)} 个百度长尾需求")
-    return suggestions
+    # 转换类似 JSON 的数组字符串 (虽然它是 JS 数组，但 python json 也能解大部分)
+    # 注意：Baidu 有时返回单引号，py json 需要双引号
+    words = json.loads(match.group(1).replace("'", '"'))
+    # 选取前 5 个最相关的
+    top_words = words[:5]
+    print(f"   -> 百度 '{seed}' 挖到: {len(top_words)} 个")
+    return [f"[搜索需求] {w}" for w in top_words]
 
-def fetch_1688_suggestions(seed_words):
+def fetch_1688_suggestion(seed):
     """挖掘1688下拉推荐词 (B2B源头采购需求)"""
-    if not seed_words:
-        return []
-        
-    print(f"🏭 开始挖掘 1688 (B2B) 长尾需求...")
-    suggestions = []
-    import random
-    # 随机选取 10 个词进行挖掘，防止请求过多
-    target_seeds = random.sample(seed_words, min(10, len(seed_words)))
-    
-    for seed in target_seeds:
-        try:
-            # 1688 Suggest API
-            url = f"https://suggest.1688.com/bin/suggest?code=utf-8&q={seed}"
-            resp = requests.get(url, headers=HEADERS, timeout=5)
-            data = resp.json()
-            if "result" in data:
-                top_words = [item['q'] for item in data['result'][:5]]
-                for w in top_words:
-                    suggestions.append(f"[1688采购] {w}")
-                print(f"   -> '{seed}' 挖到: {len(top_words)} 个")
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"   ❌ 1688挖掘 '{seed}' 失败: {e}")
-            
-    print(f"   -> 总计获取 {len(suggestions)} 个1688长尾需求")
-    return suggestions
+    # 1688 Suggest API
+    url = f"https://suggest.1688.com/bin/suggest?code=utf-8&q={seed}"
+    data = get_crawler().get(url, headers=HEADERS, timeout=5).json()
+    top_words = [item['q'] for item in data.get('result', [])[:5]]
+    print(f"   -> 1688 '{seed}' 挖到: {len(top_words)} 个")
+    return [f"[1688采购] {w}" for w in top_words]
 
-def fetch_taobao_suggestions(seed_words):
+def fetch_taobao_suggestion(seed):
     """挖掘淘宝下拉推荐词 (C端消费趋势)"""
-    if not seed_words:
-        return []
+    # Taobao Suggest API
+    url = f"https://suggest.taobao.com/sug?code=utf-8&q={seed}&k=1&area=c2c"
+    data = get_crawler().get(url, headers=HEADERS, timeout=5).json()
+    top_words = [item[0] for item in data.get('result', [])[:5]]
+    print(f"   -> 淘宝 '{seed}' 挖到: {len(top_words)} 个")
+    return [f"[淘宝热搜] {w}" for w in top_words]
 
-    print(f"🛍️  开始挖掘淘宝 (C端) 消费趋势...")
-    suggestions = []
-    import random
-    target_seeds = random.sample(seed_words, min(10, len(seed_words)))
+def _tagged(tag, fetch):
+    """热榜结果加上 [来源] 标记"""
+    return [f"[{tag}] {t}" for t in fetch() if t]
 
-    for seed in target_seeds:
-        try:
-            # Taobao Suggest API
-            url = f"https://suggest.taobao.com/sug?code=utf-8&q={seed}&k=1&area=c2c"
-            resp = requests.get(url, headers=HEADERS, timeout=5)
-            data = resp.json()
-            if "result" in data:
-                top_words = [item[0] for item in data['result'][:5]]
-                for w in top_words:
-                    suggestions.append(f"[淘宝热搜] {w}")
-                print(f"   -> '{seed}' 挖到: {len(top_words)} 个")
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"   ❌ 淘宝挖掘 '{seed}' 失败: {e}")
-
-    print(f"   -> 总计获取 {len(suggestions)} 个淘宝长尾需求")
-    return suggestions
+def build_fetch_engine(seed_words):
+    """
+    注册所有抓取任务: 长尾需求每个种子词一个任务，热榜每个平台一个任务
+    
+    各来源并行执行，同一 host 的请求按 config.TREND_HOST_LIMITS 限制并发、按 config.CRAWLER_HOST_RPS 限速
+    """
+    import random
+    engine = TrendFetchEngine()
+    
+    # 挖掘长尾需求 (优先)
+    if seed_words:
+        print(f"⛏️  开始挖掘 {len(seed_words)} 个种子词的长尾需求...")
+        engine.add_each("搜索需求", "suggestion.baidu.com", fetch_baidu_suggestion, seed_words, cache=True)
+        # 1688 / 淘宝 / 知乎随机选取部分种子词，防止请求过多
+        engine.add_each("1688采购", "suggest.1688.com", fetch_1688_suggestion,
+                        random.sample(seed_words, min(10, len(seed_words))), cache=True)
+        engine.add_each("淘宝热搜", "suggest.taobao.com", fetch_taobao_suggestion,
+                        random.sample(seed_words, min(10, len(seed_words))), cache=True)
+        engine.add_each("知乎问答", "www.zhihu.com", fetch_zhihu_questions,    # 知乎高意图问答
+                        random.sample(seed_words, min(8, len(seed_words))), cache=True)
+        engine.add("小红书", "edith.xiaohongshu.com", fetch_xiaohongshu_trends, seed_words)  # 小红书消费趋势
+        engine.add_each("谷歌趋势", "trends.google.com", fetch_google_autocomplete,        # 谷歌海外趋势
+                        GOOGLE_OVERSEAS_KEYWORDS[:5], cache=True)
+    
+    # 手动标记来源
+    engine.add("百度", "top.baidu.com", _tagged, "百度", fetch_baidu_hot, cache_key="hot")
+    engine.add("微博", "s.weibo.com", _tagged, "微博", fetch_weibo_hot, cache_key="hot")
+    engine.add("头条", "www.toutiao.com", _tagged, "头条", fetch_toutiao_hot, cache_key="hot")
+    # B站反爬严重暂跳过
+    # engine.add("B站", "api.bilibili.com", _tagged, "B站", fetch_bilibili_hot)
+    engine.add("36氪", "36kr.com", _tagged, "36氪", fetch_36kr_hot, cache_key="hot")
+    return engine
 
 def analyze_trends_with_ai(trends):
     """使用 DeepSeek 分析热搜与包装行业的关联"""
@@ -535,46 +441,33 @@ def main():
             cfg = json.load(f)
             mining_seeds = cfg.get("mining_seeds", [])
 
-    # 1. 多源抓取
+    # 1. 多源并发抓取 (超过总时限时保留已完成的结果)
     all_trends = []
-    
-    # 挖掘长尾需求 (优先)
-    all_trends.extend(fetch_baidu_suggestions(mining_seeds))
-    all_trends.extend(fetch_1688_suggestions(mining_seeds))
-    all_trends.extend(fetch_taobao_suggestions(mining_seeds))
-    all_trends.extend(fetch_zhihu_hot_questions(mining_seeds))  # 知乎高意图问答
-    all_trends.extend(fetch_xiaohongshu_trends(mining_seeds))   # 小红书消费趋势
-    all_trends.extend(fetch_google_trends(mining_seeds))        # 谷歌海外趋势
-    
-    # 手动标记来源
-    for t in fetch_baidu_hot():
-        all_trends.append(f"[百度] {t}")
-        
-    for t in fetch_weibo_hot():
-        all_trends.append(f"[微博] {t}")
-        
-    for t in fetch_toutiao_hot():
-        all_trends.append(f"[头条] {t}")
-        
-    # B站反爬严重暂跳过
-    # for t in fetch_bilibili_hot():
-    #     all_trends.append(f"[B站] {t}")
-        
-    for t in fetch_36kr_hot():
-        all_trends.append(f"[36氪] {t}")
+    engine = build_fetch_engine(mining_seeds)
+    for trends in engine.run().values():
+        all_trends.extend(trends)
+    engine.print_stats()
+    get_crawler().print_stats()
+    if mining_seeds:
+        all_trends.extend(GOOGLE_PRESET_TRENDS)
     
     # 去重
     unique_trends = list(set(all_trends))
     print(f"📊 共收集到 {len(unique_trends)} 个唯一热点话题")
 
-    # 2. 分析
-    analyzed_data = analyze_trends_with_ai(unique_trends)
+    # 2. 分析 (只分析新出现 / 重新上榜的热点)
+    history = get_trend_history()
+    fresh_trends = history.select_fresh(unique_trends)
+    analyzed_data = analyze_trends_with_ai(fresh_trends)
+    if analyzed_data:
+        history.mark_analyzed(fresh_trends)
     
     # 3. 存储
     output = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "raw_trends_count": len(unique_trends),
         "all_trends_list": unique_trends,  # 保存所有原始热点
+        "new_trends_count": len(fresh_trends),
         "analyzed_trends": analyzed_data
     }
     
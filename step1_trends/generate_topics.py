@@ -4,12 +4,16 @@ SEO 标题生成模块
 """
 import json
 import os
-import requests
+import sys
 import time
 import re
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import config, llm_transport, llm_utils
+from shared.title_index import TitleIndex, get_title_index, STAGE_TOPIC
+
 # 加载 .env 环境变量
 load_dotenv()
 
@@ -21,7 +25,69 @@ OUTPUT_FILE = os.path.join(BASE_DIR, 'generated_seo_data.json')
 
 # 复用环境变量
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-your-key-here")
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_URL = os.getenv("LLM_API_URL") or "https://api.deepseek.com/v1/chat/completions"
+
+# 标题生成规则 (单个 / 批量 Prompt 共用)
+TITLE_RULES = """        【核心要求】
+        1. **品牌植入规则（重要调整）**：
+           - **绝大部分标题（7-8 个）不要提及"盒艺家"**，应该是纯 SEO 内容标题，自然吸引搜索流量。
+           - **最多只能有 1 个标题植入"盒艺家"**，且仅限于以下场景：
+             - 明确的找厂需求（如"哪家好"、"推荐厂家"）
+           - 如果话题与找厂无关，则 8 个标题全部为纯内容标题，不植入任何品牌。
+           - 原则：**内容为王，品牌隐身**，通过优质内容吸引流量而非硬推品牌。
+        2. **竞品屏蔽（非常重要）**：绝对**不要**出现除"盒艺家"以外的任何其他包装厂、印刷厂或竞品平台的名称。
+        3. **字数限制（重要）**：建议控制在 **8-25 个字**之间。
+           - 允许适当放宽，以包含更多 SEO 长尾词（地域+产品+痛点）。
+           - 严禁低于 8 个字（太短无论是 SEO 还是点击率都很差）。
+           - 示例："广州飞机盒定制厂家：3天出货、1个起订、免费设计" (21字 - 完美)
+           - 错误示例："广州飞机盒定制哪家好？深入解析材质工艺与成本控制指南" (26字 - 太长！)
+        4. **关键词**：必须包含我们的核心产品词（如飞机盒、礼盒等）。
+        5. **风格**：标题风格要"说人话"，可带"避坑"、"价格揭秘"、"源头"、"拿货"等吸引精准客户的词。
+        6. **分类**：每个标题只能归属于一个分类，绝对不要出现多个分类。
+        7. **可选分类**：【专业知识】、【行业资讯】、【产品介绍】。
+        8. **年份要求（重要）**：如果标题涉及年份，必须使用当前年份 **2026年**，绝对不要使用 2025、2024 等过时年份。
+        
+        【GEO 可引用性优化（2026新要求）】
+        9. **搜索意图适配**：标题需匹配以下搜索意图之一：
+           - **信息型**：如"XX是什么"、"XX有哪些类型"、"XX怎么选"
+           - **商业型**：如"XX多少钱"、"XX哪家好"、"XX厂家推荐"
+           - **导航型**：如"XX定制流程"、"XX在线报价"
+        10. **疑问句式优先**：至少 2 个标题使用疑问句（如"？"结尾），更易被 AI 搜索引擎摘录为答案。
+        11. **数字型标题**：至少 1 个标题包含具体数字（如"5种"、"3个步骤"、"10元起"）。
+        12. **长尾关键词**：必须包含地域词或场景词（如"广州"、"电商专用"、"春节礼盒"）。
+        13. **跨行业转化策略**：
+           - 遇到下游行业展会（如"糖酒会"），必须转化为**包装解决方案**视角。
+           - 错误："2026糖酒会开幕"
+           - 正确："2026糖酒会新趋势：食品礼盒如何设计更吸睛？"
+        
+        【竞品词黑名单（严禁出现）】
+        包你好、派派盒子、包装宝、一呼百盒、吉印通、万印网、阿里巴巴1688、天猫、京东、拼多多
+        
+        【高质量标题示例（Few-shot）】
+        热点："春节年货消费趋势"
+        示例输出：
+        [
+            {"title": "2026年春节礼盒定制避坑指南", "category": "专业知识", "intent": "信息型"},
+            {"title": "广州年货礼盒多少钱一个？", "category": "行业资讯", "intent": "商业型"},
+            {"title": "找盒艺家定制年货礼盒3天出货", "category": "产品介绍", "intent": "导航型"}
+        ]
+        
+        热点："电商包装破损投诉"
+        示例输出：
+        [
+            {"title": "电商飞机盒防破损的5个技巧", "category": "专业知识", "intent": "信息型"},
+            {"title": "抗压飞机盒怎么选不踩坑？", "category": "行业资讯", "intent": "商业型"},
+            {"title": "江浙沪抗压飞机盒源头厂批发", "category": "产品介绍", "intent": "导航型"}
+        ]
+"""
+
+TITLE_DISTRIBUTION = """        【数量分布要求（非常重要）】
+        请务必保证生成的 8 个标题覆盖以下分类，分布如下：
+        - 3 个【专业知识】（硬核干货、工艺解析）
+        - 3 个【行业资讯】（市场趋势、价格行情、**所有展会/活动/峰会**）
+        - 2 个【产品介绍】（特定盒型优势、应用场景）
+"""
+
 
 class SEOGenerator:
     def __init__(self):
@@ -29,10 +95,11 @@ class SEOGenerator:
         self.db = self.config.get('database', {})
         self.generated_titles = set()
         # 加载历史标题用于去重
-        self.history_titles = self._load_history_titles()
+        self.title_index = get_title_index()
+        self._load_history_titles()
         
     def _load_history_titles(self):
-        """加载历史生成的标题，用于去重"""
+        """加载历史生成的标题，用于去重 (仅在标题索引为空时导入)"""
         history = set()
         # 从输出文件加载
         if os.path.exists(OUTPUT_FILE):
@@ -44,17 +111,12 @@ class SEOGenerator:
                             history.add(item['Topic'])
             except:
                 pass
-        print(f"   📚 加载 {len(history)} 条历史标题用于去重")
-        return history
+        imported = self.title_index.bootstrap(history, STAGE_TOPIC)
+        print(f"   📚 加载 {len(history)} 条历史标题用于去重 (新导入索引 {imported} 条，索引共 {len(self.title_index)} 条)")
     
-    def _is_similar_title(self, new_title, threshold=0.7):
-        """检查标题是否与历史标题过于相似"""
-        new_words = set(new_title)
-        for old_title in self.history_titles:
-            old_words = set(old_title)
-            if len(new_words & old_words) / max(len(new_words | old_words), 1) > threshold:
-                return True
-        return False
+    def _is_similar_title(self, new_title):
+        """检查标题是否与历史标题过于相似 (返回近似的历史标题)"""
+        return self.title_index.find_similar(new_title)
 
     def _load_json(self, path):
         if not os.path.exists(path):
@@ -62,16 +124,10 @@ class SEOGenerator:
         with open(path, 'r', encoding='utf-8') as f:
             return json.load(f)
 
-    def call_deepseek_generate(self, trend_info):
-        """调用 DeepSeek 生成标题"""
-        topic = trend_info.get('topic')
-        angle = trend_info.get('angle')
-        
+    def _brand_context(self):
+        """品牌背景说明 (单个 / 批量 Prompt 共用)"""
         products = ",".join(self.db.get('products', [])[:5])
         users = ",".join(self.db.get('target_users', [])[:3])
-        
-        # 清洗 topic 中的 [来源] 标记，以免影响标题生成 (e.g. "[微博] 某某" -> "某某")
-        clean_topic = re.sub(r'\[.*?\]', '', topic).strip()
 
         # 获取品牌信息
         brand = self.config.get('brand', {})
@@ -81,69 +137,31 @@ class SEOGenerator:
         selling_points = self.config.get('selling_points', [])
         sp_text = '、'.join(selling_points[:5]) if selling_points else '3秒智能报价、1个起订、最快1天交付'
 
-        prompt = f"""
+        return f"""
         背景：我们是【{brand_name}】（{website}），定位于全品类包装在线定制电商。
         品牌口号：{tagline}
         核心卖点：{sp_text}
         主营产品：{products}
         目标客户：{users}
-        
+        """
+
+    @staticmethod
+    def _clean_topic(topic):
+        # 清洗 topic 中的 [来源] 标记，以免影响标题生成 (e.g. "[微博] 某某" -> "某某")
+        return re.sub(r'\[.*?\]', '', topic or '').strip()
+
+    def call_deepseek_generate(self, trend_info):
+        """调用 DeepSeek 生成标题"""
+        topic = trend_info.get('topic')
+        angle = trend_info.get('angle')
+        clean_topic = self._clean_topic(topic)
+
+        prompt = f"""{self._brand_context()}
         任务：请结合热点话题"{clean_topic}"和我们的包装业务，生成 8 个吸引人的 SEO 标题。
         
         结合角度参考：{angle}
         
-        【核心要求】
-        1. **品牌植入规则（重要调整）**：
-           - **绝大部分标题（7-8 个）不要提及"盒艺家"**，应该是纯 SEO 内容标题，自然吸引搜索流量。
-           - **最多只能有 1 个标题植入"盒艺家"**，且仅限于以下场景：
-             - 明确的找厂需求（如"哪家好"、"推荐厂家"）
-           - 如果话题与找厂无关，则 8 个标题全部为纯内容标题，不植入任何品牌。
-           - 原则：**内容为王，品牌隐身**，通过优质内容吸引流量而非硬推品牌。
-        2. **竞品屏蔽（非常重要）**：绝对**不要**出现除"盒艺家"以外的任何其他包装厂、印刷厂或竞品平台的名称。
-        3. **字数限制（重要）**：建议控制在 **8-25 个字**之间。
-           - 允许适当放宽，以包含更多 SEO 长尾词（地域+产品+痛点）。
-           - 严禁低于 8 个字（太短无论是 SEO 还是点击率都很差）。
-           - 示例："广州飞机盒定制厂家：3天出货、1个起订、免费设计" (21字 - 完美)
-           - 错误示例："广州飞机盒定制哪家好？深入解析材质工艺与成本控制指南" (26字 - 太长！)
-        4. **关键词**：必须包含我们的核心产品词（如飞机盒、礼盒等）。
-        5. **风格**：标题风格要"说人话"，可带"避坑"、"价格揭秘"、"源头"、"拿货"等吸引精准客户的词。
-        6. **分类**：每个标题只能归属于一个分类，绝对不要出现多个分类。
-        7. **可选分类**：【专业知识】、【行业资讯】、【产品介绍】。
-        8. **年份要求（重要）**：如果标题涉及年份，必须使用当前年份 **2026年**，绝对不要使用 2025、2024 等过时年份。
-        
-        【GEO 可引用性优化（2026新要求）】
-        9. **搜索意图适配**：标题需匹配以下搜索意图之一：
-           - **信息型**：如"XX是什么"、"XX有哪些类型"、"XX怎么选"
-           - **商业型**：如"XX多少钱"、"XX哪家好"、"XX厂家推荐"
-           - **导航型**：如"XX定制流程"、"XX在线报价"
-        10. **疑问句式优先**：至少 2 个标题使用疑问句（如"？"结尾），更易被 AI 搜索引擎摘录为答案。
-        11. **数字型标题**：至少 1 个标题包含具体数字（如"5种"、"3个步骤"、"10元起"）。
-        12. **长尾关键词**：必须包含地域词或场景词（如"广州"、"电商专用"、"春节礼盒"）。
-        13. **跨行业转化策略**：
-           - 遇到下游行业展会（如"糖酒会"），必须转化为**包装解决方案**视角。
-           - 错误："2026糖酒会开幕"
-           - 正确："2026糖酒会新趋势：食品礼盒如何设计更吸睛？"
-        
-        【竞品词黑名单（严禁出现）】
-        包你好、派派盒子、包装宝、一呼百盒、吉印通、万印网、阿里巴巴1688、天猫、京东、拼多多
-        
-        【高质量标题示例（Few-shot）】
-        热点："春节年货消费趋势"
-        示例输出：
-        [
-            {{"title": "2026年春节礼盒定制避坑指南", "category": "专业知识", "intent": "信息型"}},
-            {{"title": "广州年货礼盒多少钱一个？", "category": "行业资讯", "intent": "商业型"}},
-            {{"title": "找盒艺家定制年货礼盒3天出货", "category": "产品介绍", "intent": "导航型"}}
-        ]
-        
-        热点："电商包装破损投诉"
-        示例输出：
-        [
-            {{"title": "电商飞机盒防破损的5个技巧", "category": "专业知识", "intent": "信息型"}},
-            {{"title": "抗压飞机盒怎么选不踩坑？", "category": "行业资讯", "intent": "商业型"}},
-            {{"title": "江浙沪抗压飞机盒源头厂批发", "category": "产品介绍", "intent": "导航型"}}
-        ]
-        
+{TITLE_RULES}
         请严格返回 JSON 格式列表：
         [
             {{"title": "标题1", "category": "专业知识", "intent": "信息型"}},
@@ -152,32 +170,78 @@ class SEOGenerator:
             ...
         ]
         
-        【数量分布要求（非常重要）】
-        请务必保证生成的 8 个标题覆盖以下分类，分布如下：
-        - 3 个【专业知识】（硬核干货、工艺解析）
-        - 3 个【行业资讯】（市场趋势、价格行情、**所有展会/活动/峰会**）
-        - 2 个【产品介绍】（特定盒型优势、应用场景）
+{TITLE_DISTRIBUTION}        """
+
+        content = self._chat(prompt)
+        if content is None:
+            return []
+        try:
+            content = content.replace("```json", "").replace("```", "").strip()
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"   ⚠️ JSON 解析失败: {e}")
+            return []
+
+    def call_deepseek_generate_batch(self, trends):
         """
-        
+        一次请求为多个热点生成标题 (共用品牌背景与规则说明)
+
+        Returns:
+            与 trends 对齐的标题列表，缺失或格式错误的热点为 None
+        """
+        trend_lines = "\n".join(
+            f"        [{n}] {self._clean_topic(t.get('topic'))} (结合角度参考: {t.get('angle')})"
+            for n, t in enumerate(trends, 1)
+        )
+
+        prompt = f"""{self._brand_context()}
+        任务：请结合以下 {len(trends)} 个热点话题和我们的包装业务，为**每个热点分别**生成 8 个吸引人的 SEO 标题。
+
+        热点列表：
+{trend_lines}
+
+{TITLE_RULES}
+{TITLE_DISTRIBUTION}
+        请严格返回 JSON 对象，键为热点编号 (必须包含全部 {len(trends)} 个编号)，值为该热点的标题列表：
+        {{
+            "1": [{{"title": "标题1", "category": "专业知识", "intent": "信息型"}}, ...],
+            "2": [...]
+        }}
+        """
+
+        data = llm_utils.extract_json(self._chat(prompt) or "")
+        if not isinstance(data, dict):
+            print("   ⚠️ 批量响应 JSON 解析失败")
+            return None
+
+        results = []
+        for n in range(1, len(trends) + 1):
+            titles = data.get(str(n))
+            valid = isinstance(titles, list) and any(isinstance(t, dict) and t.get('title') for t in titles)
+            results.append([t for t in titles if isinstance(t, dict)] if valid else None)
+        return results
+
+    def _chat(self, prompt):
+        """发送请求并返回文本内容，失败返回 None (用量 / 耗时写入 shared/llm_metrics.py)"""
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
         }
+        payload = {
+            "model": "deepseek-chat",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.8
+        }
         
+        started = time.monotonic()
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                resp = requests.post(DEEPSEEK_API_URL, headers=headers, json={
-                    "model": "deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.8
-                }, timeout=60)
+                resp = llm_transport.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=60)
                 
-                # 限流处理
+                # 限流处理: 等待时长由限流器按 Retry-After 在下次发送前自动完成
                 if resp.status_code == 429:
-                    wait_time = (attempt + 1) * 5
-                    print(f"   ⏳ API 限流，等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
+                    print(f"   ⏳ API 限流，降速后重试...")
                     continue
                 
                 if resp.status_code != 200:
@@ -185,21 +249,20 @@ class SEOGenerator:
                     if attempt < max_retries - 1:
                         time.sleep(3)
                         continue
-                    return []
+                    break
                 
-                content = resp.json()["choices"][0]["message"]["content"]
-                content = content.replace("```json", "").replace("```", "").strip()
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"   ⚠️ JSON 解析失败: {e}")
-                return []
+                data = resp.json()
+                content = data["choices"][0]["message"]["content"]
+                llm_utils._record_call(payload, started, attempt, "ok", data.get("usage"))
+                return content
             except Exception as e:
                 print(f"   ⚠️ 生成失败 (尝试 {attempt + 1}/{max_retries}): {e}")
                 if attempt < max_retries - 1:
                     time.sleep(3)
                     continue
-                return []
-        return []
+                break
+        llm_utils._record_call(payload, started, max_retries - 1, "failed")
+        return None
 
     def generate(self):
         print("⚙️  开始基于热点生成内容...")
@@ -212,12 +275,26 @@ class SEOGenerator:
             return
 
         results = []
-        
-        for idx, trend in enumerate(analyzed_trends):
-            print(f"   Running ({idx+1}/{len(analyzed_trends)}): {trend['topic']}...")
-            titles = self.call_deepseek_generate(trend)
-            
-            for item in titles:
+        # 与历史标题只查重不写入 (上传成功后由 runner 写入)；本轮标题之间另用内存索引查重
+        run_index = TitleIndex(":memory:")
+
+        # 每 batch_size 个热点合并为一次请求；单个热点解析失败时拆分重试，最终退回单独请求
+        batch_size = self.config.get('trend_settings', {}).get('title_batch_size', config.TITLE_BATCH_SIZE)
+
+        def run_batches(groups):
+            outputs = []
+            for group in groups:
+                print(f"   Running ({len(group)} 个热点): {', '.join(t['topic'] for t in group)}...")
+                if len(group) == 1:
+                    outputs.append([self.call_deepseek_generate(group[0]) or None])
+                else:
+                    outputs.append(self.call_deepseek_generate_batch(group))
+            return outputs
+
+        all_titles = llm_utils.map_in_batches(analyzed_trends, batch_size, run_batches)
+
+        for trend, titles in zip(analyzed_trends, all_titles):
+            for item in titles or []:
                 title = item.get('title')
                 cat = item.get('category', '行业资讯')
                 
@@ -260,6 +337,10 @@ class SEOGenerator:
 
                 if title and title not in self.generated_titles:
                     self.generated_titles.add(title)
+                    similar = self.title_index.find_similar(title) or run_index.check_and_add(title)
+                    if similar:
+                        print(f"   🗑️ [Dedupe] 丢弃高相似度标题: {title} (≈ {similar})")
+                        continue
                     results.append({
                         "Topic": title,
                         "大项分类": cat, # 经过清洗的单一分类
@@ -267,8 +348,8 @@ class SEOGenerator:
                         "Source_Trend": trend['topic'],
                         "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     })
-            
-            time.sleep(1)
+
+        run_index.close()
 
         with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
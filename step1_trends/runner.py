@@ -10,6 +10,7 @@ from . import fetch_trends
 from . import generate_topics
 from shared.google_client import GoogleSheetClient
 from shared import config
+from shared.title_index import get_title_index, STAGE_TOPIC
 import json
 
 
@@ -59,7 +60,10 @@ def run():
     batch_size = 50
     for i in range(0, len(feishu_records), batch_size):
         batch = feishu_records[i:i + batch_size]
-        client.batch_create_records(batch)
+        if client.batch_create_records(batch):
+            # 上传成功后才写入查重索引，失败的标题下轮仍可生成
+            for record in batch:
+                get_title_index().add(record["Topic"], STAGE_TOPIC)
     
     print(f"\n✅ 节点1完成！共上传 {len(feishu_records)} 条标题 (Status=Ready)")
 
@@ -1,12 +1,15 @@
 import sys
 import os
 import json
-import time
+from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.chief_editor import ChiefEditorAgent
+from skills.deep_writer import DeepWriteSkill
 from shared.google_client import GoogleSheetClient
-from shared import config
+from shared.sheet_mirror import with_mirror
+from shared import config, llm_cache, llm_metrics, sheets_quota
+from shared.title_index import TitleIndex, get_title_index, STAGE_ARTICLE
 
 def run():
     print("\n" + "=" * 50)
@@ -15,7 +18,7 @@ def run():
     
     # Init
     editor = ChiefEditorAgent()
-    client = GoogleSheetClient()
+    client = with_mirror(GoogleSheetClient())
     
     # Load Topics (From Feishu for Persistence)
     print("☁️ 正在从飞书拉取 Ready 状态的选题...")
@@ -24,7 +27,10 @@ def run():
     # Use pagination loop if needed, but for now we fetch up to MAX_GENERATE_PER_CATEGORY * 3 to be safe
     # We fetch by status 'Ready'
     
-    pending_topics = client.fetch_records_by_status(config.STATUS_READY, limit=500)
+    # 只需要选题相关的列，不拉取文章内容
+    pending_topics = client.fetch_records_by_status(
+        config.STATUS_READY, limit=500, columns=["Topic", "大项分类", "Source_Trend", "Status"]
+    )
     
     if not pending_topics:
         print("❌ 飞书中没有找到 Ready 状态的选题，请先运行 Step 1")
@@ -36,6 +42,9 @@ def run():
     max_limit = config.MAX_GENERATE_PER_CATEGORY
     print(f"⚙️  每分类处理上限: {max_limit}")
 
+    # [Deduplication] 写作前查重 (在每分类上限之前，避免重复选题占用名额)
+    pending_topics = _dedupe_topics(client, pending_topics)
+
     # 3. 分组与 Round-Robin 排序
     # Group by Category
     from collections import defaultdict
@@ -70,69 +79,121 @@ def run():
                 sorted_topics.append(item)
                 
     print(f"🔄 均衡排序后共 {len(sorted_topics)} 条任务")
+
+    # 4. Execute (按批并发生成，批大小 config.ARTICLE_BATCH_SIZE)
+    title_index = get_title_index()
+    batch_size = max(1, config.ARTICLE_BATCH_SIZE)
+    for start in range(0, len(sorted_topics), batch_size):
+        batch = sorted_topics[start:start + batch_size]
+        for offset, item in enumerate(batch):
+            print(f"\n--- [{start + offset + 1}/{len(sorted_topics)}] {item['大项分类']} | {item['Topic'][:30]}... ---")
+            # [Newsjacking] Try to get source trend for context injection
+            if item.get('Source_Trend'):
+                print(f"   🔥 [Newsjacking] 关联热点: {item['Source_Trend']}")
+
+        articles = editor.write_articles([{
+            "topic": item['Topic'],
+            "category": item['大项分类'],
+            "source_trend": item.get('Source_Trend', '')
+        } for item in batch])
+
+        for item, article in zip(batch, articles):
+            if article and _save_article(client, item, article):
+                # 保存成功后才记为已写作: 生成失败的选题不拦截后续的近似选题
+                title_index.add(item['Topic'], STAGE_ARTICLE)
+        # 批次间不再固定等待: 请求节奏由 shared/rate_limiter.py 按服务商限流信号自适应控制
+
+    client.flush_updates()
+    llm_cache.get_cache().print_stats()
+    sheets_quota.get_sheets_quota().print_stats()
+    llm_metrics.finish_run()
+
+
+def _dedupe_topics(client, topics):
+    """
+    写作前查重
+
+    - 与已写作文章近似的选题标记为 Duplicate (终态，之后不再被拉取)
+    - 与本轮更靠前的选题近似的跳过本轮 (保持 Ready: 前一个生成失败时下轮仍可写作)
+
+    Returns:
+        本轮需要写作的选题
+    """
+    title_index = get_title_index()
+    run_index = TitleIndex(":memory:", prefix_chars=0)
+    unique, duplicates, deferred = [], 0, 0
+    for item in topics:
+        topic = item.get('Topic') or item.get('topic', '')
+        similar = title_index.find_similar(topic, stage=STAGE_ARTICLE, exclude_self=True, match_prefix=False)
+        if similar:
+            print(f"   🗑️ [Dedupe] 与已写作文章近似，标记为 {config.STATUS_DUPLICATE}: {topic[:30]} (≈ {similar[:30]})")
+            if item.get('record_id'):
+                client.queue_update(item['record_id'], {"Status": config.STATUS_DUPLICATE})
+            duplicates += 1
+            continue
+        similar = run_index.check_and_add(topic)
+        if similar:
+            print(f"   ⏭️ [Dedupe] 与本轮选题近似，下轮再处理: {topic[:30]} (≈ {similar[:30]})")
+            deferred += 1
+            continue
+        unique.append(item)
+    run_index.close()
+
+    if duplicates or deferred:
+        print(f"🧹 写作前查重: {duplicates} 条标记为重复，{deferred} 条推迟，剩余 {len(unique)} 条")
+    return unique
+
+
+def _save_article(client, item, article) -> bool:
+    """
+    校验生成结果并回写记录 (Status: Ready -> Pending)
+
+    Returns:
+        是否已保存
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    import random
-    from datetime import datetime
+    # [Data Integrity] 强校验：确保生成的内容有效
+    title = article.get('title', '').strip()
+    content = article.get('html_content', '').strip()
     
-    # 4. Execute
-    for idx, item in enumerate(sorted_topics):
-        print(f"\n--- [{idx + 1}/{len(sorted_topics)}] {item['大项分类']} | {item['Topic'][:30]}... ---")
-        
-        # [Newsjacking] Try to get source trend for context injection
-        source_trend = item.get('Source_Trend', '')
-        if source_trend:
-            print(f"   🔥 [Newsjacking] 关联热点: {source_trend}")
-            
-        article = editor.write_article(item['Topic'], item['大项分类'], source_trend=source_trend)
-        
-        if article:
-            # Update Feishu Record (Status: Ready -> Pending)
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # [Data Integrity] 强校验：确保生成的内容有效
-            title = article.get('title', '').strip()
-            content = article.get('html_content', '').strip()
-            
-            if not title or len(content) < 50:
-                print(f"   ⚠️ [Error] 生成内容无效 (Title len: {len(title)}, Content len: {len(content)})")
-                print(f"   🛑 跳过保存，保持 Ready 状态等待重试")
-                continue
-                
-            # Fields to update
-            fields = {
-                "Title": title,
-                "HTML_Content": content,
-                "Status": config.STATUS_PENDING,
-                "关键词": article.get('keywords'),
-                "摘要": article.get('summary'),
-                "描述": article.get('description'),
-                "Tags": article.get('tags'),
-                "生成时间": current_time,
-                # [Fix Zombie State] 重生成时必须清除旧的发布信息
-                "URL": "",
-                "发布时间": "", 
-                # "选题生成时间": item.get('created_at', ''), # Retain original value
-                "One_Line_Summary": article.get('one_line_summary', ''),
-                "Schema_FAQ": json.dumps(article.get('schema_faq', []), ensure_ascii=False),
-                "Key_Points": json.dumps(article.get('key_points', []), ensure_ascii=False)
-            }
-            
-            # Check if we have record_id (From Feishu Fetch)
-            record_id = item.get('record_id')
-            if record_id:
-                success = client.update_record(record_id, fields)
-                if success:
-                    print(f"   💾 已在飞书更新记录 (ID: {record_id}, Status: Pending)")
-            else:
-                # Fallback: Create new (Should not happen in new flow)
-                client.create_record(fields)
-                print("   ⚠️ 未找到 record_id，创建了新记录")
+    if not DeepWriteSkill.is_valid_article(article):
+        print(f"   ⚠️ [Error] 生成内容无效 (Title len: {len(title)}, Content len: {len(content)}) | {item['Topic'][:30]}")
+        print(f"   🛑 跳过保存，保持 Ready 状态等待重试")
+        return False
         
-        # Random Interval
-        # Optimization: 3-5s interval (DeepSeek rate limit is generous)
-        wait_time = random.uniform(3, 5)
-        print(f"   ⏳ 等待 {wait_time:.1f} 秒...")
-        time.sleep(wait_time)
+    # Fields to update
+    fields = {
+        "Title": title,
+        "HTML_Content": content,
+        "Status": config.STATUS_PENDING,
+        "关键词": article.get('keywords'),
+        "摘要": article.get('summary'),
+        "描述": article.get('description'),
+        "Tags": article.get('tags'),
+        "生成时间": current_time,
+        # [Fix Zombie State] 重生成时必须清除旧的发布信息
+        "URL": "",
+        "发布时间": "", 
+        # "选题生成时间": item.get('created_at', ''), # Retain original value
+        "One_Line_Summary": article.get('one_line_summary', ''),
+        "Schema_FAQ": json.dumps(article.get('schema_faq', []), ensure_ascii=False),
+        "Key_Points": json.dumps(article.get('key_points', []), ensure_ascii=False)
+    }
+    
+    # Check if we have record_id (From Feishu Fetch)
+    record_id = item.get('record_id')
+    if record_id:
+        # 写回队列: 多篇文章的更新合并为一次批量写入，不阻塞下一批生成
+        success = client.queue_update(record_id, fields)
+        if success:
+            print(f"   💾 已加入写回队列 (ID: {record_id}, Status: Pending)")
+        return bool(success)
+    else:
+        # Fallback: Create new (Should not happen in new flow)
+        client.create_record(fields)
+        print("   ⚠️ 未找到 record_id，创建了新记录")
+        return True
 
 if __name__ == "__main__":
     run()
@@ -8,6 +8,7 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agents.publisher import PublisherAgent
 from shared.google_client import GoogleSheetClient
+from shared.sheet_mirror import with_mirror
 from shared import config
 from shared import stats
 
@@ -60,7 +61,7 @@ def run():
         else:
              print("⚠️ 未找到任何账号配置")
 
-    client = GoogleSheetClient()
+    client = with_mirror(GoogleSheetClient())
     
     total_success = 0
     total_fail = 0
@@ -81,13 +82,20 @@ def run():
     num_accounts = len(active_accounts) if active_accounts else 1
     print(f"⚙️  [Target Mode] 账号数: {num_accounts} | 本次锁定发布: {limit} 篇")
     
-    pending_records = client.fetch_records_by_status(status=config.STATUS_PENDING, limit=limit)
-    
-    print(f"📋 发现 {len(pending_records)} 篇待发布文章")
-    
+    # 分页拉取 (每页 5 篇): 第一页到达即开始发布，后续页在发布期间后台加载
+    pending_records = client.iter_records_by_status(status=config.STATUS_PENDING, page_size=5, limit=limit)
     
+    attempted = False
     for idx, record in enumerate(pending_records):
-        print(f"\n--- [{idx + 1}/{len(pending_records)}] 发布: {record.get('Title', '')[:30]}... ---")
+        # Random Interval (上一篇实际发起了发布才等待)
+        if attempted:
+            # Optimized: faster interval (0.5-1.5s)
+            wait_time = random.uniform(0.5, 1.5)
+            print(f"   ⏳ 等待 {wait_time:.1f} 秒...")
+            time.sleep(wait_time)
+            attempted = False
+
+        print(f"\n--- [{idx + 1}/{limit}] 发布: {record.get('Title', '')[:30]}... ---")
         
         # [Idempotency Check] 防止重复发布
         # 如果状态是 Pending 但已经有 URL，说明上次发布成功但状态更新失败
@@ -122,7 +130,7 @@ def run():
                 print(f"   🔄 正在修复状态为 Published...")
                 
                 # 修复状态
-                client.update_record(record['record_id'], {
+                client.queue_update(record['record_id'], {
                     "Status": config.STATUS_PUBLISHED
                 })
                 
@@ -146,7 +154,7 @@ def run():
         if not title_chk or len(content_chk) < 50:
             print(f"   🛑 检测到无效内容 (Title: {bool(title_chk)}, Content Len: {len(content_chk)})")
             print(f"   🔄 正在将状态重置为 Ready 以便重新生成...")
-            client.update_record(record['record_id'], {"Status": config.STATUS_READY})
+            client.queue_update(record['record_id'], {"Status": config.STATUS_READY})
             continue
 
         # 转换为 Skill 需要的格式
@@ -173,6 +181,7 @@ def run():
         cur_pass = current_account.get("password")
         
         print(f"   👤 [Account] 本次使用账号 ({idx + 1}): {cur_user}")
+        attempted = True
         
         try:
             # 实例化 Agent (每次独立实例化以确保 Session 隔离)
@@ -181,7 +190,7 @@ def run():
             
             if published_url:
                 # 3. System Update Feishu
-                client.update_record(record['record_id'], {
+                client.queue_update(record['record_id'], {
                     "Status": config.STATUS_PUBLISHED,
                     "URL": published_url,
                     "发布时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -203,13 +212,9 @@ def run():
             print(f"   ❌ [Error] 发布过程中发生异常: {e}")
             import traceback
             traceback.print_exc()
-        
-        # Random Interval
-        if idx < len(pending_records) - 1:
-            # Optimized: faster interval (0.5-1.5s)
-            wait_time = random.uniform(0.5, 1.5)
-            print(f"   ⏳ 等待 {wait_time:.1f} 秒...")
-            time.sleep(wait_time)
+
+    # 写回剩余的状态更新 (通知前确保表格已是最新状态)
+    client.flush_updates()
 
     # 发送飞书通知
     if total_success > 0 or total_fail > 0:
@@ -1,12 +1,13 @@
 import sys
 import os
-import time
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared import config
-from shared.google_client import GoogleSheetClient
+from shared import config, llm_metrics, sheets_quota
+from shared.google_client import GoogleSheetClient, RECORD_ID_COLUMN
+from shared.write_behind import AppendSpool
+from shared.sheet_mirror import with_mirror
 from agents.social_manager import SocialManagerAgent
 
 def run():
@@ -15,7 +16,7 @@ def run():
     print("=" * 50 + "\n")
 
     # 1. 初始化
-    client = GoogleSheetClient()
+    client = with_mirror(GoogleSheetClient())
     agent = SocialManagerAgent()
     base_time = datetime.now()
     
@@ -23,7 +24,9 @@ def run():
     # 注意：为了支持多平台分发，我们需要足够的素材。
     # 这里我们获取最近 100 篇 Published 文章。
     print("🔍 [System] 正在加载素材库 (Published Articles)...")
-    source_records = client.fetch_records_by_status(status=config.STATUS_PUBLISHED, limit=300)
+    source_records = client.fetch_records_by_status(
+        status=config.STATUS_PUBLISHED, limit=300, columns=["Title", "HTML_Content"]
+    )
     print(f"📚 素材库就绪: {len(source_records)} 篇")
     
     if not source_records:
@@ -38,22 +41,18 @@ def run():
         
         print(f"\n🌊 [Platform] 开始处理平台: {p_name} (目标: {p_target}/天)")
         
-        # 3.1 检查今日已生成数量
-        # 获取该平台对应的 Sheet 数据
-        sheet_obj = client._get_sheet(p_sheet)
-        if not sheet_obj:
-            print(f"   ❌ 无法获取工作表 {p_sheet}，跳过")
-            continue
-            
-        all_rows = sheet_obj.get_all_records()
+        # 生成的帖子先写入本地缓冲 (落盘)，攒满一批再一次 append_rows；
+        # 上次异常退出遗留的帖子先补写，使下面的今日计数包含它们
+        spool = AppendSpool(
+            f"social_{p_sheet}",
+            flush_func=lambda rows, sheet=p_sheet: client.batch_create_records(rows, table_id=sheet, skip_existing=True),
+            id_field=RECORD_ID_COLUMN
+        )
+        spool.flush()
+
+        # 3.1 检查今日已生成数量 (本地镜像计数，不再拉取整张平台表)
         today_str = base_time.strftime("%Y-%m-%d")
-        
-        today_count = 0
-        for r in all_rows:
-            # 假设有一个 '生成时间' 列
-            gen_time = str(r.get('生成时间', ''))
-            if today_str in gen_time:
-                today_count += 1
+        today_count = client.count_by_date(p_sheet, today_str)
                 
         # 运行模式判断
         run_mode = os.getenv("SOCIAL_RUN_MODE", "accumulate")
@@ -70,6 +69,7 @@ def run():
         
         if remaining_quota <= 0:
             print(f"   ✅ 今日配额已满，跳过。")
+            spool.close()
             continue
             
         # 3.2 生成内容
@@ -119,16 +119,17 @@ def run():
                     "生成时间": post_time_str
                 }
                 
-                client.create_record(new_record, table_id=p_sheet)
-                print(f"   💾 [System] 已保存至 {p_sheet}")
+                spool.put(new_record)
+                print(f"   💾 [System] 已加入 {p_sheet} 写入缓冲 ({len(spool)} 条待写入)")
                 
                 success_count += 1
                 
-                # 随机间隔防止风控
-                time.sleep(2)
-                
+        spool.close()
         print(f"   🎉 {p_name} 任务完成，本次生成: {success_count} 篇")
 
+    sheets_quota.get_sheets_quota().print_stats()
+    llm_metrics.finish_run()
+
 
 if __name__ == "__main__":
     run()
@@ -3,9 +3,10 @@ import json
 import requests
 import sys
 import os
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared import config
+from shared import config, llm_transport, llm_router, llm_metrics, llm_utils
 
 class XHSGenerator:
     """小红书内容生成器 (The Creator)"""
@@ -41,35 +42,38 @@ class XHSGenerator:
 
     def _call_llm(self, prompt: str, system_prompt: str) -> str:
         """调用 LLM"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        if "openrouter" in self.api_url:
-            headers["HTTP-Referer"] = "https://github.com/jememouse/deepseek-feisu-cms"
-            headers["X-Title"] = "DeepSeek CMS"
+        headers = llm_transport.build_headers(self.api_url, self.api_key)
 
         payload = {
             "model": self.model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": llm_transport.build_messages(prompt, system_prompt),
             "temperature": 1.3  # 高创造性
         }
         
+        started = time.monotonic()
+        served, provider = payload, None  # 路由 / 对冲后实际响应的模型与服务商 (用于计费)
         try:
-            resp = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
+            resp = llm_router.get_router().post(self.api_url, headers, payload, timeout=60)
+            served, provider = llm_utils._served_by(resp, payload)
             if resp.status_code == 200:
-                content = resp.json()['choices'][0]['message']['content']
+                data = resp.json()
+                llm_metrics.get_metrics().record_call(
+                    caller="xhs_generator", model=served["model"], provider=provider,
+                    usage=data.get('usage'), latency=time.monotonic() - started
+                )
+                content = data['choices'][0]['message']['content']
                 if not content: return ""
                 return content
             else:
                 print(f"❌ LLM Error: {resp.status_code} - {resp.text}")
-                return ""
         except Exception as e:
             print(f"❌ Request Error: {e}")
-            return ""
+
+        llm_metrics.get_metrics().record_call(
+            caller="xhs_generator", model=served["model"], provider=provider,
+            latency=time.monotonic() - started, status="failed"
+        )
+        return ""
 
     def generate_note(self, title: str, content: str) -> dict:
         """生成小红书笔记"""
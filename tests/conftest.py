@@ -0,0 +1,27 @@
+"""
+pytest 公共 fixture: 测试期间的全局单例指向临时目录，不读写项目 .cache
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import llm_cache, title_index
+
+
+@pytest.fixture(autouse=True)
+def isolated_title_index(tmp_path):
+    """全局标题索引使用临时 SQLite 文件 (测试可自行 set_title_index 覆盖)"""
+    title_index.set_title_index(title_index.TitleIndex(str(tmp_path / "title_index.sqlite3")))
+    yield
+    title_index.set_title_index(None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(tmp_path):
+    """全局 LLM 响应缓存使用临时 SQLite 文件 (测试可自行 set_cache 覆盖)"""
+    llm_cache.set_cache(llm_cache.LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite3")))
+    yield
+    llm_cache.set_cache(None)
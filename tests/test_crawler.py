@@ -0,0 +1,116 @@
+"""
+测试爬虫请求调度 (替换 requests.Session，不访问网络)
+"""
+import sys
+import os
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.crawler import CrawlScheduler, CrawlDeadlineExceeded, crawl_deadline
+
+
+def response(status, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    return resp
+
+
+class CrawlerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sessions = {}
+        patcher = patch("shared.crawler.requests.Session", side_effect=self._make_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _make_session(self):
+        session = MagicMock()
+        session.request.return_value = response(200)
+        self.sessions[len(self.sessions)] = session
+        return session
+
+
+class TestCrawlScheduler(CrawlerTestCase):
+
+    def test_session_per_host(self):
+        crawler = CrawlScheduler(default_rps=100)
+        crawler.get("https://a.com/1")
+        crawler.get("https://a.com/2")
+        crawler.get("https://b.com/1")
+        self.assertEqual(len(self.sessions), 2)
+        self.assertEqual(self.sessions[0].request.call_count, 2)
+
+    def test_rps_budget_is_per_host(self):
+        crawler = CrawlScheduler(host_rps={"slow.com": 10}, default_rps=1000, burst=1)
+        started = time.monotonic()
+        for _ in range(4):
+            crawler.get("https://slow.com/")
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+        started = time.monotonic()
+        for _ in range(4):
+            crawler.get("https://fast.com/")
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    def test_throttle_backs_off_and_retries(self):
+        crawler = CrawlScheduler(host_rps={"h.com": 4}, max_retries=2)
+        crawler.get("https://h.com/")  # 创建 session
+        self.sessions[0].request.side_effect = [response(429, {"Retry-After": "0.1"}), response(200)]
+
+        started = time.monotonic()
+        self.assertEqual(crawler.get("https://h.com/").status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        stats = crawler.get_stats()["h.com"]
+        self.assertEqual((stats["requests"], stats["ok"], stats["throttled"]), (3, 2, 1))
+        self.assertLess(stats["rate"], 4)
+
+    def test_retries_exhausted_returns_last_response(self):
+        crawler = CrawlScheduler(host_rps={"h.com": 100}, max_retries=1)
+        with patch.object(CrawlScheduler, "backoff_delay", return_value=0.01):
+            crawler.get("https://h.com/")
+            self.sessions[0].request.return_value = response(403)
+            self.assertEqual(crawler.get("https://h.com/").status_code, 403)
+        self.assertEqual(self.sessions[0].request.call_count, 3)
+
+    def test_backoff_delay_has_jitter(self):
+        delays = {round(CrawlScheduler.backoff_delay(2), 4) for _ in range(20)}
+        self.assertGreater(len(delays), 1)
+
+    def test_deadline(self):
+        crawler = CrawlScheduler(host_rps={"h.com": 1}, burst=1)
+        with crawl_deadline(time.monotonic() + 0.2):
+            crawler.get("https://h.com/")
+            with self.assertRaises(CrawlDeadlineExceeded):
+                crawler.get("https://h.com/")
+        self.assertEqual(self.sessions[0].request.call_count, 1)
+
+    def test_deadline_skip_does_not_consume_token(self):
+        crawler = CrawlScheduler(host_rps={"h.com": 2}, burst=1)
+        crawler.get("https://h.com/")
+        bucket = crawler._buckets["h.com"]
+        tokens = bucket.tokens
+        with crawl_deadline(time.monotonic() + 0.1):
+            for _ in range(3):
+                with self.assertRaises(CrawlDeadlineExceeded):
+                    crawler.get("https://h.com/")
+        # 被跳过的请求不消耗令牌 (只随时间恢复)
+        self.assertGreaterEqual(bucket.tokens, tokens)
+        self.assertLess(bucket.tokens, 1)
+
+    def test_recovery_step_independent_of_llm_limiter(self):
+        with patch("shared.crawler.config.CRAWLER_RATE_INCREASE", 0.5), \
+                patch("shared.rate_limiter.config.LLM_RATE_LIMIT_INCREASE", 100):
+            crawler = CrawlScheduler(host_rps={"h.com": 100})
+            crawler.get("https://h.com/")
+            bucket = crawler._buckets["h.com"]
+            bucket.rate = 10
+            crawler.get("https://h.com/")
+        self.assertEqual(bucket.rate, 10.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+测试 FeishuClient 的分页与批量接口 (替换共享 Session，不访问网络)
+"""
+import sys
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.feishu_client import FeishuClient
+
+
+def response(data):
+    resp = MagicMock()
+    resp.json.return_value = data
+    return resp
+
+
+def search_response(items, page_token=None):
+    return response({"code": 0, "data": {
+        "items": [{"record_id": r, "fields": {"Topic": r}} for r in items],
+        "has_more": page_token is not None, "page_token": page_token, "total": 5,
+    }})
+
+
+class FeishuTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FeishuClient.__new__(FeishuClient)
+        self.client.base_id, self.client.table_id = "app", "tbl"
+        self.client.token, self.client.token_expires_at = "t", float("inf")
+        self.session = MagicMock()
+        patcher = patch.object(FeishuClient, "_http", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestPagination(FeishuTestCase):
+
+    def test_page_token_pagination(self):
+        self.session.post.side_effect = [
+            search_response(["r1", "r2"], "p2"), search_response(["r3", "r4"], "p3"), search_response(["r5"])
+        ]
+        records = list(self.client.iter_records_by_status("Ready", page_size=2, prefetch=False))
+        self.assertEqual([r["record_id"] for r in records], ["r1", "r2", "r3", "r4", "r5"])
+        calls = self.session.post.call_args_list
+        self.assertEqual([c.kwargs["params"].get("page_token") for c in calls], [None, "p2", "p3"])
+        self.assertEqual(calls[0].kwargs["params"]["page_size"], 2)
+
+    def test_fetch_respects_limit_across_pages(self):
+        self.session.post.side_effect = [search_response(["r1", "r2"], "p2"), search_response(["r3", "r4"], "p3")]
+        records = self.client.fetch_records_by_status("Ready", limit=3)
+        self.assertEqual([r["topic"] for r in records], ["r1", "r2", "r3"])
+
+
+class TestBatchOperations(FeishuTestCase):
+
+    def test_batch_create_chunks(self):
+        self.session.post.return_value = response({"code": 0})
+        records = [{"Topic": f"t{i}"} for i in range(1201)]
+        self.assertTrue(self.client.batch_create_records(records))
+        sizes = [len(c.kwargs["json"]["records"]) for c in self.session.post.call_args_list]
+        self.assertEqual(sizes, [500, 500, 201])
+
+    def test_batch_create_partial_failure(self):
+        self.session.post.side_effect = [response({"code": 0}), response({"code": 1254001, "msg": "bad"})]
+        self.assertFalse(self.client.batch_create_records([{"Topic": "t"}] * 600))
+
+    def test_batch_create_partial_returns_failed_chunks(self):
+        # 只返回失败批次的记录，调用方重试时不会重复创建已成功的批次
+        self.session.post.side_effect = [response({"code": 0}), response({"code": 1254001, "msg": "bad"})]
+        records = [{"Topic": f"t{i}"} for i in range(600)]
+        self.assertEqual(self.client.batch_create_partial(records), records[500:])
+
+    def test_batch_create_refreshes_expired_token(self):
+        self.client.token_expires_at = 0
+        self.session.post.return_value = response({"code": 0})
+        with patch.object(self.client, "_load_token", return_value=True) as load:
+            self.assertTrue(self.client.batch_create_records([{"Topic": "t"}]))
+        load.assert_called_once()
+
+    def test_batch_update_falls_back_per_record(self):
+        self.session.post.return_value = response({"code": 1254060, "msg": "TextFieldConvFail"})
+        self.session.put.side_effect = [response({"code": 0}), response({"code": 1254060, "msg": "TextFieldConvFail"})]
+        failed = self.client.batch_update_records({"r1": {"Status": "Ready"}, "r2": {"Status": 1}})
+        self.assertEqual(failed, ["r2"])
+        payload = self.session.post.call_args.kwargs["json"]
+        self.assertEqual(payload["records"][0], {"record_id": "r1", "fields": {"Status": "Ready"}})
+
+    def test_token_refresh_retry(self):
+        self.session.post.side_effect = [
+            response({"code": 99991663, "msg": "Invalid access token"}),
+            response({"code": 0}),
+        ]
+        with patch.object(self.client, "_refresh_token", return_value=True) as refresh:
+            self.assertEqual(self.client.batch_update_records({"r1": {"Status": "Ready"}}), [])
+        refresh.assert_called_once()
+
+
+class TestWriteBehindReplay(FeishuTestCase):
+
+    @staticmethod
+    def _fake_token(client, stale_token=None):
+        client.token, client.token_expires_at = "t", float("inf")
+        return True
+
+    def test_constructor_flushes_journal_before_reads(self):
+        # 上次进程已发布但未写回 "Published" 就退出
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with open(os.path.join(tmp.name, "feishu_tbl.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"id": "r1", "fields": {"Status": "Published"}}) + "\n")
+        self.session.post.return_value = response({"code": 0})
+
+        with patch("shared.feishu_client.config.FEISHU_TABLE_ID", "tbl"), \
+                patch("shared.write_behind.config.SHEET_WRITE_BEHIND_DIR", tmp.name), \
+                patch("shared.feishu_client.config.SHEET_WRITE_BEHIND_ENABLED", True), \
+                patch.object(FeishuClient, "_load_token", new=TestWriteBehindReplay._fake_token):
+            client = FeishuClient()
+
+        self.session.post.assert_called_once()
+        payload = self.session.post.call_args.kwargs["json"]
+        self.assertEqual(payload["records"], [{"record_id": "r1", "fields": {"Status": "Published"}}])
+        self.assertEqual(len(client._write_queue), 0)
+        client._write_queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
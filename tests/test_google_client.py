@@ -0,0 +1,283 @@
+"""
+测试 GoogleSheetClient (使用内存中的假工作表，不访问网络)
+"""
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gspread
+from gspread.utils import a1_range_to_grid_range
+from shared.google_client import GoogleSheetClient
+from shared.sheets_quota import SheetsQuotaGovernor, set_sheets_quota
+
+
+class FakeWorksheet:
+    """按 A1 区间返回数据的内存工作表 (行为对齐 Sheets API: 省略末尾空行/空单元格)"""
+
+    def __init__(self, rows):
+        self.title = "cms"
+        self.rows = rows
+        self.requested_ranges = []
+        self.row_value_calls = 0
+        self.batch_updates = []
+
+    def row_values(self, row):
+        self.row_value_calls += 1
+        return list(self.rows[row - 1])
+
+    def update_cells(self, cells):
+        for cell in cells:
+            row = self.rows[cell.row - 1]
+            row.extend([""] * (cell.col - len(row)))
+            row[cell.col - 1] = cell.value
+
+    def find(self, query):
+        for r, row in enumerate(self.rows):
+            if query in row:
+                return gspread.Cell(r + 1, row.index(query) + 1, query)
+        return None
+
+    def batch_update(self, data):
+        self.batch_updates.append(data)
+        for item in data:
+            grid = a1_range_to_grid_range(item["range"])
+            for r_offset, values in enumerate(item["values"]):
+                row = self.rows[grid["startRowIndex"] + r_offset]
+                for offset, value in enumerate(values):
+                    col = grid["startColumnIndex"] + offset
+                    row.extend([""] * (col + 1 - len(row)))
+                    row[col] = value
+
+    def append_row(self, values):
+        return self.append_rows([values])
+
+    def append_rows(self, rows):
+        start = len(self.rows) + 1
+        self.rows.extend(list(r) for r in rows)
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:Z{len(self.rows)}"}}
+
+    def _cell(self, r, c):
+        if r < len(self.rows) and c < len(self.rows[r]):
+            return self.rows[r][c]
+        return ""
+
+    def batch_get(self, ranges, major_dimension=None, **kwargs):
+        results = []
+        for a1 in ranges:
+            self.requested_ranges.append(a1)
+            grid = a1_range_to_grid_range(a1)
+            r1, r2 = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(self.rows))
+            c1, c2 = grid.get("startColumnIndex", 0), grid["endColumnIndex"]
+            matrix = [[self._cell(r, c) for c in range(c1, c2)] for r in range(r1, min(r2, len(self.rows)))]
+            if major_dimension == "COLUMNS":
+                matrix = [list(col) for col in zip(*matrix)] if matrix else []
+            # 去掉末尾空单元格与空行
+            matrix = [self._trim(line) for line in matrix]
+            while matrix and not matrix[-1]:
+                matrix.pop()
+            results.append(matrix)
+        return results
+
+    @staticmethod
+    def _trim(line):
+        line = list(line)
+        while line and line[-1] == "":
+            line.pop()
+        return line
+
+    def get_all_records(self):
+        raise AssertionError("不应再读取整张表")
+
+
+HEADERS = ["Topic", "Status", "大项分类", "Title", "HTML_Content"]
+
+
+def make_client(rows):
+    # 假工作表不受 Sheets 配额限制
+    set_sheets_quota(SheetsQuotaGovernor(enabled=False))
+    client = GoogleSheetClient.__new__(GoogleSheetClient)
+    client.refresh_schema()
+    sheet = FakeWorksheet([list(HEADERS)] + rows)
+    client.spreadsheet = MagicMock()
+    client.spreadsheet.worksheet.return_value = sheet
+    return client, sheet
+
+
+class TestFetchRecordsByStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.sheet = make_client([
+            ["t1", "Pending", "行业资讯", "T1", "<p>1</p>"],
+            ["t2", "Published", "行业资讯", "T2", "<p>2</p>"],
+            ["t3", "Pending", "专业知识", "T3", ""],
+            ["t4", "Pending", "行业资讯", "T4", "<p>4</p>"],
+            ["t5", "Ready", "行业资讯"],
+        ])
+
+    def test_filters_by_status_and_category(self):
+        records = self.client.fetch_records_by_status("Pending", category="行业资讯")
+        self.assertEqual([r["Topic"] for r in records], ["t1", "t4"])
+        self.assertEqual([r["record_id"] for r in records], ["row:2", "row:5"])
+        self.assertEqual(records[1]["HTML_Content"], "<p>4</p>")
+
+    def test_count_by_date_returns_zero_on_error(self):
+        # 重试耗尽后返回 0 (而不是 fetch_* 的 [])，调用方可直接参与数值计算
+        with patch.object(self.client, "_get_sheet", side_effect=ValueError("boom")):
+            self.assertEqual(self.client.count_by_date("xhs", "2024-05-01"), 0)
+
+    def test_limit_and_blank_cells(self):
+        records = self.client.fetch_records_by_status("Pending", limit=2)
+        self.assertEqual([r["Topic"] for r in records], ["t1", "t3"])
+        self.assertEqual(records[1]["HTML_Content"], "")
+
+    def test_column_projection_skips_content(self):
+        records = self.client.fetch_records_by_status("Pending", columns=["Topic", "大项分类"])
+        self.assertEqual(records[0], {"Topic": "t1", "大项分类": "行业资讯", "record_id": "row:2"})
+        # 只读取了 Status 列与投影列，没有请求 HTML_Content (E 列)
+        self.assertFalse(any("E" in r for r in self.sheet.requested_ranges))
+
+    def test_contiguous_rows_merged(self):
+        self.client.fetch_records_by_status("Pending", category="行业资讯", columns=["Topic"])
+        self.assertEqual(self.sheet.requested_ranges, ["B2:B", "C2:C", "A2:A2", "A5:A5"])
+
+    def test_no_match(self):
+        self.assertEqual(self.client.fetch_records_by_status("Missing"), [])
+
+    def test_iter_records_paged(self):
+        pages = self.client.iter_records_by_status("Pending", page_size=2, columns=["Topic"], prefetch=False)
+        self.assertEqual([r["Topic"] for r in pages], ["t1", "t3", "t4"])
+        # 1 次筛选列读取 + 每页 1 次 batch_get (第 1 页 2、4 行，第 2 页 5 行)
+        self.assertEqual(self.sheet.requested_ranges, ["B2:B", "A2:A2", "A4:A4", "A5:A5"])
+        limited = self.client.iter_records_by_status("Pending", page_size=2, limit=1)
+        self.assertEqual([r["Topic"] for r in limited], ["t1"])
+
+    def test_requests_counted_against_quota(self):
+        governor = SheetsQuotaGovernor(enabled=True)
+        set_sheets_quota(governor)
+        self.client.fetch_records_by_status("Pending", columns=["Topic"])
+        self.client.update_record("row:2", {"Status": "Ready"})
+        stats = governor.get_stats()
+        self.assertEqual(stats["default/read"]["requests"], 4)  # worksheet + 表头 + 筛选列 + 命中行
+        self.assertEqual(stats["default/write"]["requests"], 1)
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.sheet = make_client([["t1", "Pending", "行业资讯", "T1", ""]])
+
+    def test_update_reuses_sheet_and_headers(self):
+        self.client.update_record("row:2", {"Status": "Published"})
+        self.client.update_record("row:2", {"Title": "New"})
+        self.assertEqual(self.sheet.rows[1][1:4], ["Published", "行业资讯", "New"])
+        self.assertEqual(self.sheet.row_value_calls, 1)
+        self.assertEqual(self.client.spreadsheet.worksheet.call_count, 1)
+
+    def test_unknown_field_rechecked_once(self):
+        """新增的列能被发现；本就不存在的字段只复查一次"""
+        self.client.update_record("row:2", {"Status": "Published"})
+        self.sheet.rows[0].append("URL")
+        self.client.update_record("row:2", {"URL": "https://a"})
+        self.assertEqual(self.sheet.rows[1][-1], "https://a")
+        self.client.create_record({"Topic": "t2"})
+        self.client.create_record({"Topic": "t3"})
+        self.assertEqual(self.sheet.row_value_calls, 3)  # 首次 + URL + created_at
+
+    def test_refresh_schema(self):
+        self.client.update_record("row:2", {"Status": "Published"})
+        self.client.refresh_schema()
+        self.client.update_record("row:2", {"Status": "Ready"})
+        self.assertEqual(self.sheet.row_value_calls, 2)
+        self.assertEqual(self.client.spreadsheet.worksheet.call_count, 2)
+
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.sheet = make_client([
+            ["t1", "Ready", "行业资讯", "", ""],
+            ["t2", "Ready", "行业资讯", "", ""],
+        ])
+
+    def test_flush_updates_single_batch(self):
+        failed = self.client._flush_updates({
+            "row:2": {"Status": "Pending", "Title": "T1", "HTML_Content": ["a"]},
+            "row:3": {"Status": "Pending", "created_at": "x"},
+            "row:x": {"Status": "Pending"},
+        })
+        self.assertEqual(failed, ["row:x"])
+        self.assertEqual(len(self.sheet.batch_updates), 1)
+        # 每行按连续列合并区间
+        self.assertEqual([d["range"] for d in self.sheet.batch_updates[0]], ["B2:B2", "D2:E2", "B3:B3"])
+        self.assertEqual(self.sheet.rows[1], ["t1", "Pending", "行业资讯", "T1", '["a"]'])
+        self.assertEqual(self.sheet.rows[2][1], "Pending")
+
+    def test_queue_update_coalesces(self):
+        from shared.write_behind import WriteBehindQueue
+        self.client._write_queue = WriteBehindQueue(
+            "google_test", flush_func=self.client._flush_updates, max_records=10, interval=0, journal_dir=""
+        )
+        self.client.queue_update("row:2", {"Status": "Pending"})
+        self.client.queue_update("row:2", {"Title": "T1"})
+        self.assertEqual(self.sheet.batch_updates, [])
+        self.assertEqual(self.client.flush_updates(), 1)
+        self.assertEqual(len(self.sheet.batch_updates), 1)
+        self.assertEqual(self.sheet.rows[1][1:4], ["Pending", "行业资讯", "T1"])
+
+
+class TestRecordIds(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.sheet = make_client([
+            ["t1", "Pending", "行业资讯", "T1", ""],
+            ["t2", "Pending", "行业资讯", "T2", ""],
+        ])
+
+    def test_backfill_and_update_by_id(self):
+        self.assertEqual(self.client.ensure_record_ids(), 2)
+        self.assertEqual(self.sheet.rows[0][-1], "Record_ID")
+        self.assertEqual(self.client.ensure_record_ids(), 0)
+
+        records = self.client.fetch_records_by_status("Pending", columns=["Topic"])
+        self.assertEqual(records[1]["record_id"], self.sheet.rows[2][5])
+        self.assertNotIn("Record_ID", records[1])
+
+        # 上方插入一行后按 ID 仍能定位 (索引未命中时重建)
+        self.sheet.rows.insert(1, ["t0", "Ready", "", "", "", "id-0"])
+        self.client.refresh_schema()
+        self.assertTrue(self.client.update_record(records[1]["record_id"], {"Status": "Published"}))
+        self.assertEqual(self.sheet.rows[3][:2], ["t2", "Published"])
+
+    def test_create_returns_indexed_id(self):
+        self.client.ensure_record_ids()
+        self.client._get_record_index(self.sheet)
+        reads = len(self.sheet.requested_ranges)
+
+        record_id = self.client.create_record({"Topic": "t3", "Status": "Ready"})
+        self.assertEqual(self.sheet.rows[-1][5], record_id)
+        self.client.update_record(record_id, {"Status": "Pending"})
+        self.assertEqual(self.sheet.rows[-1][1], "Pending")
+        # 追加时已写入索引，更新无需再读取 ID 列
+        self.assertEqual(len(self.sheet.requested_ranges), reads)
+
+    def test_batch_create_skip_existing(self):
+        self.client.ensure_record_ids()
+        existing_id = self.sheet.rows[1][5]
+        ok = self.client.batch_create_records([
+            {"Topic": "t1", "Record_ID": existing_id},
+            {"Topic": "t3", "Record_ID": "id-3"},
+        ], table_id="cms", skip_existing=True)
+        self.assertTrue(ok)
+        self.assertEqual([r[0] for r in self.sheet.rows[1:]], ["t1", "t2", "t3"])
+        self.assertEqual(self.client._resolve_row(self.sheet, "id-3"), 4)
+
+    def test_unknown_id(self):
+        self.client.ensure_record_ids()
+        self.assertFalse(self.client.update_record("missing", {"Status": "Ready"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
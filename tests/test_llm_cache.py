@@ -0,0 +1,107 @@
+"""
+测试 LLM 响应缓存
+"""
+import sys
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.llm_cache import LLMResponseCache, make_key
+
+
+class TestMakeKey(unittest.TestCase):
+    """测试缓存键计算"""
+
+    def test_same_payload_same_key(self):
+        """测试相同参数得到相同键 (与字段顺序无关)"""
+        p1 = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7, "max_tokens": 10}
+        p2 = {"max_tokens": 10, "temperature": 0.7, "messages": [{"role": "user", "content": "hi"}], "model": "m"}
+        self.assertEqual(make_key(p1), make_key(p2))
+
+    def test_different_payload_different_key(self):
+        """测试任一参数变化都会改变键"""
+        base = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7, "max_tokens": 10}
+        for field, value in [("model", "m2"), ("temperature", 0.8), ("max_tokens", 20),
+                             ("messages", [{"role": "user", "content": "hello"}])]:
+            changed = dict(base, **{field: value})
+            self.assertNotEqual(make_key(base), make_key(changed), field)
+
+    def test_different_endpoint_different_key(self):
+        """测试不同接口地址 (如 mock 服务端) 的响应互不复用"""
+        base = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7, "max_tokens": 10}
+        self.assertNotEqual(make_key(base, "https://api.deepseek.com/v1/chat/completions"),
+                            make_key(base, "http://127.0.0.1:8765/v1/chat/completions"))
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """LLMResponseCache 测试套件"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _cache(self, **kwargs):
+        cache = LLMResponseCache(path=self.path, enabled=True, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hit_and_miss(self):
+        """测试命中/未命中统计"""
+        cache = self._cache()
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", "value")
+        self.assertEqual(cache.get("k"), "value")
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_persisted_across_instances(self):
+        """测试缓存落盘，新实例可读取"""
+        self._cache().set("k", "value")
+        self.assertEqual(self._cache().get("k"), "value")
+
+    def test_ttl_expiry(self):
+        """测试过期条目不再命中"""
+        cache = self._cache(ttl_seconds=60)
+        cache.set("k", "value")
+
+        with patch("shared.llm_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("k"))
+
+    def test_lru_eviction(self):
+        """测试超过体积上限时淘汰最久未访问的条目"""
+        cache = self._cache(max_bytes=25)
+        now = time.time()
+
+        with patch("shared.llm_cache.time.time", return_value=now):
+            cache.set("a", "x" * 10)
+        with patch("shared.llm_cache.time.time", return_value=now + 1):
+            cache.set("b", "x" * 10)
+        with patch("shared.llm_cache.time.time", return_value=now + 2):
+            cache.get("a")  # a 变为最近访问
+        with patch("shared.llm_cache.time.time", return_value=now + 3):
+            cache.set("c", "x" * 10)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_disabled(self):
+        """测试禁用缓存时不读写"""
+        cache = LLMResponseCache(path=self.path, enabled=False)
+        cache.set("k", "value")
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+测试 LLM 调用计量
+"""
+import sys
+import os
+import csv
+import json
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import llm_metrics, llm_utils, llm_router
+from shared.llm_metrics import LLMMetrics, caller_scope
+
+
+class FakeSkill:
+    """模拟 Skill: 调用栈上带 name / execute 的 self"""
+    name = "fake_skill"
+
+    def execute(self, prompt):
+        return llm_utils.call_llm_with_retry(prompt, use_cache=False)
+
+
+class TestLLMMetrics(unittest.TestCase):
+    """测试计量记录、汇总与导出"""
+
+    def test_summary_by_caller_and_model(self):
+        metrics = LLMMetrics()
+        metrics.record_call(caller="deep_write", model="deepseek-chat",
+                            usage={"prompt_tokens": 1000, "completion_tokens": 500}, latency=2.0)
+        metrics.record_call(caller="deep_write", model="deepseek-chat", latency=1.0, retries=2, status="failed")
+        metrics.record_call(caller="social_writing", model="other", status="cache", cached=True)
+
+        by_caller = metrics.summary()
+        self.assertEqual(by_caller["deep_write"]["calls"], 2)
+        self.assertEqual(by_caller["deep_write"]["failed"], 1)
+        self.assertEqual(by_caller["deep_write"]["retries"], 2)
+        self.assertEqual(by_caller["deep_write"]["prompt_tokens"], 1000)
+        self.assertEqual(by_caller["deep_write"]["avg_latency"], 1.5)
+        self.assertGreater(by_caller["deep_write"]["cost"], 0)
+        self.assertEqual(by_caller["social_writing"]["cache_hits"], 1)
+        self.assertEqual(set(metrics.summary("model")), {"deepseek-chat", "other"})
+
+    def test_export_json_and_csv(self):
+        metrics = LLMMetrics()
+        metrics.record_call(caller="a", model="m", usage={"prompt_tokens": 1, "completion_tokens": 2})
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = metrics.export_json(os.path.join(tmp, "m.json"))
+            csv_path = metrics.export_csv(os.path.join(tmp, "m.csv"))
+
+            with open(json_path, encoding="utf-8") as f:
+                data = json.load(f)
+            with open(csv_path, encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+
+        self.assertEqual(data["by_caller"]["a"]["completion_tokens"], 2)
+        self.assertEqual(len(data["records"]), 1)
+        self.assertEqual(rows[0]["total_tokens"], "3")
+
+    def test_caller_scope_overrides_inference(self):
+        with caller_scope("explicit"):
+            self.assertEqual(llm_metrics.current_caller(), "explicit")
+
+
+class TestCallRecording(unittest.TestCase):
+    """测试 call_llm_with_retry 写入计量"""
+
+    def setUp(self):
+        self.metrics = LLMMetrics()
+        patcher = patch("shared.llm_metrics._global_metrics", self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("shared.llm_utils.time.sleep")
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_usage_retries_and_skill_name(self, mock_config, mock_post, mock_sleep):
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+
+        failed = MagicMock(status_code=500, text="error")
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {
+            "choices": [{"message": {"content": "hello"}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+        }
+        mock_post.side_effect = [failed, ok]
+
+        self.assertEqual(FakeSkill().execute("Prompt"), "hello")
+
+        record = self.metrics.records[-1]
+        self.assertEqual(record["caller"], "fake_skill")
+        self.assertEqual(record["model"], "test-model")
+        self.assertEqual(record["total_tokens"], 15)
+        self.assertEqual(record["retries"], 1)
+        self.assertEqual(record["status"], "ok")
+
+    def _route_to_backup(self, mock_post):
+        """主服务商不健康: 请求路由到模型名不同的备用服务商"""
+        router = llm_router.LLMRouter(providers=[
+            {"name": "primary", "api_url": "https://api.example.com", "api_key": "k1", "model": "test-model"},
+            {"name": "backup", "api_url": "https://backup.example.com", "api_key": "k2", "model": "vendor/test-model"},
+        ], hedge=False, min_samples=1)
+        router.health["primary"].record(5.0, False)
+        router.health["backup"].record(0.1, True)
+        llm_router.set_router(router)
+        self.addCleanup(llm_router.set_router, None)
+
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {"choices": [{"message": {"content": "hello"}}], "usage": {"prompt_tokens": 1}}
+        mock_post.return_value = ok
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_records_routed_model_and_provider(self, mock_config, mock_post):
+        """路由到模型名不同的服务商时，按实际响应的模型 / 服务商计量"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        self._route_to_backup(mock_post)
+
+        self.assertEqual(llm_utils.call_llm_with_retry("Prompt", use_cache=False), "hello")
+        self.assertEqual(mock_post.call_args.args[0], "https://backup.example.com")
+        record = self.metrics.records[-1]
+        self.assertEqual((record["model"], record["provider"]), ("vendor/test-model", "backup"))
+
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.utils.config")
+    def test_shared_call_llm_records_routed_model(self, mock_config, mock_post):
+        """Step 4 使用的 shared.utils.call_llm 同样按实际响应的模型 / 服务商计量"""
+        from shared.utils import call_llm
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        self._route_to_backup(mock_post)
+
+        self.assertEqual(call_llm("Prompt"), "hello")
+        record = self.metrics.records[-1]
+        self.assertEqual((record["model"], record["provider"]), ("vendor/test-model", "backup"))
+
+    @patch("step1_trends.generate_topics.llm_transport.post")
+    def test_seo_generator_chat_recorded(self, mock_post):
+        """Step 1 SEOGenerator 直接请求 DeepSeek 的调用同样写入计量"""
+        from step1_trends.generate_topics import SEOGenerator
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = {"choices": [{"message": {"content": "[]"}}], "usage": {"prompt_tokens": 7}}
+        mock_post.return_value = ok
+
+        self.assertEqual(SEOGenerator.__new__(SEOGenerator)._chat("Prompt"), "[]")
+        record = self.metrics.records[-1]
+        self.assertEqual((record["caller"], record["model"], record["status"]), ("SEOGenerator", "deepseek-chat", "ok"))
+        self.assertEqual(record["prompt_tokens"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+测试 LLM 多服务商路由
+"""
+import sys
+import os
+import time
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import config
+from shared.llm_router import LLMRouter
+
+PROVIDERS = [
+    {"name": "primary", "api_url": "https://primary.example.com/v1/chat/completions", "api_key": "k1", "model": "m-primary"},
+    {"name": "backup", "api_url": "https://backup.example.com/v1/chat/completions", "api_key": "k2", "model": "m-backup"},
+]
+PRIMARY_URL = PROVIDERS[0]["api_url"]
+BACKUP_URL = PROVIDERS[1]["api_url"]
+
+
+def _response(status_code=200, content="ok"):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return resp
+
+
+def _payload(model="m-primary"):
+    return {"model": model, "messages": [{"role": "user", "content": "hi"}]}
+
+
+class TestRouting(unittest.TestCase):
+    """测试服务商选择"""
+
+    def test_unknown_endpoint_passes_through(self):
+        router = LLMRouter(providers=PROVIDERS)
+        with patch("shared.llm_router.llm_transport.post", return_value=_response()) as mock_post:
+            router.post("https://custom.example.com", {}, _payload("any"))
+        self.assertEqual(mock_post.call_args[0][0], "https://custom.example.com")
+
+    def test_prefers_lower_latency_and_rewrites_request(self):
+        router = LLMRouter(providers=PROVIDERS, min_samples=3)
+        for _ in range(3):
+            router.record(router.providers[0], 5.0, True)
+            router.record(router.providers[1], 1.0, True)
+
+        provider, url, headers, payload = router.route(PRIMARY_URL, {"Authorization": "Bearer k1"}, _payload())
+
+        self.assertEqual(provider.name, "backup")
+        self.assertEqual(url, BACKUP_URL)
+        self.assertEqual(headers["Authorization"], "Bearer k2")
+        self.assertEqual(payload["model"], "m-backup")
+
+    def test_errors_shift_traffic(self):
+        router = LLMRouter(providers=PROVIDERS, min_samples=3)
+        for _ in range(3):
+            router.record(router.providers[1], 2.0, True)
+
+        calls = []
+
+        def fake_post(url, headers=None, json=None, timeout=90):
+            calls.append(url)
+            return _response(500 if url == PRIMARY_URL else 200)
+
+        with patch("shared.llm_router.llm_transport.post", side_effect=fake_post):
+            for _ in range(6):
+                router.post(PRIMARY_URL, {}, _payload())
+
+        # 主服务商连续失败后，请求转向备用服务商
+        self.assertEqual(calls[-1], BACKUP_URL)
+        self.assertEqual(router.get_stats()["primary"]["error_rate"], 1.0)
+
+    def test_explicit_model_is_not_rerouted(self):
+        router = LLMRouter(providers=PROVIDERS)
+        self.assertEqual([p.name for p in router.candidates(PRIMARY_URL, "some-other-model")], ["primary"])
+
+
+class TestHedging(unittest.TestCase):
+    """测试对冲请求"""
+
+    def _warm_router(self):
+        router = LLMRouter(providers=PROVIDERS, hedge=True, min_samples=3)
+        for _ in range(3):
+            router.record(router.providers[0], 0.05, True)
+            router.record(router.providers[1], 0.5, True)
+        return router
+
+    def test_sync_hedge_returns_first_success(self):
+        router = self._warm_router()
+
+        def fake_post(url, headers=None, json=None, timeout=90):
+            if url == PRIMARY_URL:
+                time.sleep(0.5)
+                return _response(content="slow")
+            return _response(content="fast")
+
+        with patch("shared.llm_router.llm_transport.post", side_effect=fake_post):
+            resp = router.post(PRIMARY_URL, {}, _payload())
+
+        self.assertEqual(resp.json()["choices"][0]["message"]["content"], "fast")
+        self.assertEqual(router.hedged_count, 1)
+
+    def test_async_hedge_cancels_loser(self):
+        router = self._warm_router()
+        cancelled = []
+
+        async def fake_apost(url, headers=None, json=None, timeout=90):
+            if url == PRIMARY_URL:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(url)
+                    raise
+                return _response(content="slow")
+            return _response(content="fast")
+
+        with patch("shared.llm_router.llm_transport.apost", side_effect=fake_apost):
+            resp = asyncio.run(router.apost(PRIMARY_URL, {}, _payload()))
+
+        self.assertEqual(resp.json()["choices"][0]["message"]["content"], "fast")
+        self.assertEqual(cancelled, [PRIMARY_URL])
+
+    def test_no_hedge_without_samples(self):
+        router = LLMRouter(providers=PROVIDERS, hedge=True, min_samples=3)
+        self.assertIsNone(router._hedge_deadline(router.candidates(PRIMARY_URL, "m-primary")))
+
+
+class TestEnvJson(unittest.TestCase):
+    """LLM_EXTRA_PROVIDERS 等 JSON 环境变量解析"""
+
+    def test_valid_value(self):
+        with patch.dict(os.environ, {"LLM_EXTRA_PROVIDERS": '[{"name": "gw"}]'}):
+            self.assertEqual(config._env_json("LLM_EXTRA_PROVIDERS", []), [{"name": "gw"}])
+
+    def test_malformed_or_wrong_type_falls_back(self):
+        for raw in ("[{'name': 'gw'}]", '{"name": "gw"}', ""):
+            with patch.dict(os.environ, {"LLM_EXTRA_PROVIDERS": raw}):
+                self.assertEqual(config._env_json("LLM_EXTRA_PROVIDERS", []), [], raw)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+"""
+测试 LLM 流式响应处理
+"""
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from contextlib import contextmanager
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import llm_utils, llm_cache, llm_stream
+from shared.llm_stream import IncrementalJsonParser, StreamAccumulator, StreamAborted, parse_sse_line
+
+
+def _sse(content):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": content}}]}, ensure_ascii=False)
+
+
+def _fake_stream(lines, status_code=200):
+    """构造 llm_transport.stream_post 的替身"""
+    @contextmanager
+    def _stream_post(*args, **kwargs):
+        resp = MagicMock()
+        resp.status_code = status_code
+        resp.text = "error"
+        resp.iter_lines.return_value = iter(lines)
+        yield resp
+    return _stream_post
+
+
+_tmp_dir = None
+
+
+def setUpModule():
+    global _tmp_dir
+    _tmp_dir = tempfile.TemporaryDirectory()
+    llm_cache.set_cache(llm_cache.LLMResponseCache(path=os.path.join(_tmp_dir.name, "llm_cache.sqlite3"), enabled=True))
+
+
+def tearDownModule():
+    llm_cache.set_cache(None)
+    _tmp_dir.cleanup()
+
+
+class TestParseSseLine(unittest.TestCase):
+    """测试 SSE 行解析"""
+
+    def test_content_delta(self):
+        self.assertEqual(parse_sse_line(_sse("你好")), ("你好", False))
+
+    def test_done_and_comments(self):
+        self.assertEqual(parse_sse_line("data: [DONE]"), (None, True))
+        self.assertEqual(parse_sse_line(": OPENROUTER PROCESSING"), (None, False))
+        self.assertEqual(parse_sse_line(""), (None, False))
+
+    def test_error_event(self):
+        with self.assertRaises(StreamAborted):
+            parse_sse_line('data: {"error": {"message": "overloaded"}}')
+
+
+class TestIncrementalJsonParser(unittest.TestCase):
+    """测试增量 JSON 字段追踪"""
+
+    def test_fields_complete_as_they_arrive(self):
+        parser = IncrementalJsonParser()
+        parser.feed('```json\n{"title": "纸箱')
+        self.assertEqual(parser.completed_fields, [])
+
+        parser.feed('选购指南", "html_content": "<p>a\\"b')
+        self.assertEqual(parser.completed_fields, ["title"])
+        self.assertEqual(parser.field_sizes["title"], 6)
+        self.assertFalse(parser.has_fields(["title", "html_content"]))
+
+        parser.feed('</p>", "tags": ["a", "b"], "score": 9}\n```')
+        self.assertEqual(parser.completed_fields, ["title", "html_content", "tags", "score"])
+        self.assertTrue(parser.done)
+
+    def test_nested_keys_are_ignored(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"meta": {"title": "x"}, "title": "y"}')
+        self.assertEqual(parser.completed_fields, ["meta", "title"])
+
+
+class TestStreamAccumulator(unittest.TestCase):
+    """测试流式累加与中止条件"""
+
+    def test_accumulate_and_stats(self):
+        acc = StreamAccumulator()
+        for line in [_sse('{"title": '), ": keep-alive", _sse('"T"}'), "data: [DONE]"]:
+            if acc.feed_line(line):
+                break
+        self.assertEqual(acc.finish(), '{"title": "T"}')
+        self.assertIsNotNone(acc.stats.ttfb)
+        self.assertEqual(acc.stats.chunks, 2)
+        self.assertEqual(acc.stats.completed_fields, ["title"])
+
+    def test_progress_callback_can_abort(self):
+        acc = StreamAccumulator(on_progress=lambda stats: stats.chars < 5)
+        acc.feed_line(_sse("abc"))
+        with self.assertRaises(StreamAborted):
+            acc.feed_line(_sse("defgh"))
+        self.assertEqual(acc.stats.aborted, "调用方中止")
+
+    @patch("shared.llm_stream.time.monotonic")
+    def test_idle_timeout(self, mock_time):
+        mock_time.return_value = 0
+        acc = StreamAccumulator(idle_timeout=5)
+        acc.feed_line(_sse("abc"))
+        mock_time.return_value = 10
+        with self.assertRaises(StreamAborted):
+            acc.feed_line(": keep-alive")
+
+    @patch("shared.llm_stream.time.monotonic")
+    def test_remaining_tracks_active_deadline(self, mock_time):
+        mock_time.return_value = 0
+        acc = StreamAccumulator(idle_timeout=5, max_ttfb=20)
+        mock_time.return_value = 3
+        self.assertEqual(acc.remaining(), 17)
+        acc.feed_line(_sse("abc"))
+        mock_time.return_value = 4
+        self.assertEqual(acc.remaining(), 4)
+        mock_time.return_value = 9
+        with self.assertRaises(StreamAborted):
+            acc.check_deadline()
+        self.assertEqual(acc.stats.aborted, "空闲超时 (>5s)")
+
+    def test_async_silent_stream_aborts_at_idle_timeout(self):
+        async def lines():
+            yield _sse("abc")
+            await asyncio.sleep(5)
+            yield _sse("never")
+
+        async def consume(acc):
+            async for line in llm_stream.aiter_lines_with_deadline(lines(), acc):
+                acc.feed_line(line)
+
+        acc = StreamAccumulator(idle_timeout=0.2, max_ttfb=5)
+        started = time.monotonic()
+        with self.assertRaises(StreamAborted):
+            asyncio.run(consume(acc))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(acc.content, "abc")
+
+
+class TestCallLlmStream(unittest.TestCase):
+    """测试流式 LLM 调用"""
+
+    def setUp(self):
+        llm_cache.get_cache().clear()
+        patcher = patch("shared.llm_utils.config")
+        mock_config = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        mock_config.LLM_STREAM_IDLE_TIMEOUT = 30
+        mock_config.LLM_STREAM_MAX_TTFB = 60
+        mock_config.LLM_STREAM_CONNECT_TIMEOUT = 10
+
+    def test_json_stream_with_required_fields(self):
+        lines = [_sse('{"title": "T", '), _sse('"html_content": "<p>x</p>"}'), "data: [DONE]"]
+        with patch("shared.llm_utils.llm_transport.stream_post", _fake_stream(lines)):
+            result = llm_utils.call_llm_json_stream("Prompt", required_fields=["title", "html_content"])
+        self.assertEqual(result, {"title": "T", "html_content": "<p>x</p>"})
+
+        # 第二次命中缓存，不再请求
+        with patch("shared.llm_utils.llm_transport.stream_post", side_effect=AssertionError):
+            self.assertEqual(llm_utils.call_llm_json_stream("Prompt", required_fields=["title", "html_content"]), result)
+
+    @patch("shared.llm_utils.time.sleep")
+    def test_missing_required_field_returns_none(self, mock_sleep):
+        lines = [_sse('{"title": "T"}'), "data: [DONE]"]
+        with patch("shared.llm_utils.llm_transport.stream_post", _fake_stream(lines)):
+            result = llm_utils.call_llm_json_stream("Prompt", required_fields=["title", "html_content"])
+        self.assertIsNone(result)
+        self.assertIsNone(llm_cache.get_cache().get(llm_cache.make_key({
+            "model": "test-model", "messages": [{"role": "user", "content": "Prompt"}],
+            "temperature": 1.0, "max_tokens": 8192
+        }, "https://api.example.com")))
+
+    @patch("shared.llm_utils.time.sleep")
+    def test_aborted_stream_retries(self, mock_sleep):
+        calls = []
+
+        @contextmanager
+        def _stream_post(*args, **kwargs):
+            calls.append(1)
+            resp = MagicMock(status_code=200)
+            if len(calls) == 1:
+                resp.iter_lines.return_value = iter([_sse('{"error_free": '), 'data: {"error": "overloaded"}'])
+            else:
+                resp.iter_lines.return_value = iter([_sse('{"ok": true}'), "data: [DONE]"])
+            yield resp
+
+        with patch("shared.llm_utils.llm_transport.stream_post", _stream_post):
+            self.assertEqual(llm_utils.call_llm_json_stream("Prompt", max_retries=1), {"ok": True})
+        self.assertEqual(len(calls), 2)
+        mock_sleep.assert_called_once()
+
+
+class _SilentAfterFirstChunk(BaseHTTPRequestHandler):
+    """输出一个内容增量后保持连接但不再发送任何数据"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = (_sse('{"title": ') + "\n\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.flush()
+        self.server.release.wait(5)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSilentStream(unittest.TestCase):
+    """服务端静默 (连 keep-alive 也不发) 时按空闲超时中止，而不是等首字节超时"""
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _SilentAfterFirstChunk)
+        self.server.release = threading.Event()
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.release.set)
+
+        llm_cache.get_cache().clear()
+        patcher = patch("shared.llm_utils.config")
+        mock_config = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = f"http://127.0.0.1:{self.server.server_port}/v1/chat/completions"
+        mock_config.LLM_MODEL = "test-model"
+        mock_config.LLM_STREAM_CONNECT_TIMEOUT = 2
+
+    def test_sync_idle_timeout_enforced_on_socket(self):
+        started = time.monotonic()
+        result = llm_utils.call_llm_stream("Prompt", max_retries=0, idle_timeout=0.3, max_ttfb=5)
+        self.assertEqual(result, "")
+        self.assertLess(time.monotonic() - started, 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,12 +3,29 @@
 """
 import sys
 import os
+import asyncio
+import tempfile
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared import llm_utils
+from shared import llm_utils, llm_transport, llm_cache
+
+
+_tmp_dir = None
+
+
+def setUpModule():
+    """使用临时目录中的 LLM 缓存，避免污染 .cache 或命中真实缓存"""
+    global _tmp_dir
+    _tmp_dir = tempfile.TemporaryDirectory()
+    llm_cache.set_cache(llm_cache.LLMResponseCache(path=os.path.join(_tmp_dir.name, "llm_cache.sqlite3"), enabled=True))
+
+
+def tearDownModule():
+    llm_cache.set_cache(None)
+    _tmp_dir.cleanup()
 
 
 class TestExtractJson(unittest.TestCase):
@@ -54,6 +71,35 @@ class TestExtractJson(unittest.TestCase):
         result = llm_utils.extract_json(None)
         self.assertIsNone(result)
 
+    def test_code_fence_stripped(self):
+        """测试直接处理 ```json 代码块"""
+        content = '```json\n{"key": "value"}\n```'
+        self.assertEqual(llm_utils.extract_json(content), {"key": "value"})
+
+    def test_braces_inside_strings(self):
+        """测试字符串内的 CSS / JSON-LD 括号不干扰配对"""
+        article = {
+            "title": "纸箱选购",
+            "html_content": '<style>.a{color:red}}</style><script type="application/ld+json">{"@type": "Article"}</script>',
+        }
+        import json as _json
+        content = "好的，文章如下：\n" + _json.dumps(article, ensure_ascii=False) + "\n备注: 格式为 {title}"
+        self.assertEqual(llm_utils.extract_json(content), article)
+
+    def test_skips_unparseable_candidate(self):
+        """测试跳过前面无法解析的片段"""
+        content = 'template {title} then {"key": "value"}'
+        self.assertEqual(llm_utils.extract_json(content), {"key": "value"})
+
+    def test_invalid_escape_in_prose_wrapped_json(self):
+        """测试带非法转义的 JSON 仍可解析"""
+        content = r'结果: {"path": "C:\Users\Docs"} 完'
+        self.assertEqual(llm_utils.extract_json(content), {"path": "C:\\Users\\Docs"})
+
+    def test_truncated_json(self):
+        """测试被截断的输出返回 None"""
+        self.assertIsNone(llm_utils.extract_json('{"title": "a", "html_content": "<p>unfinished'))
+
 
 class TestSanitizeJson(unittest.TestCase):
     """测试 JSON 清洗功能"""
@@ -98,6 +144,11 @@ class TestExtractJsonArray(unittest.TestCase):
         result = llm_utils.extract_json_array(content)
         self.assertEqual(result, [1, 2, 3])
 
+    def test_array_inside_object(self):
+        """测试从对象包裹中取出数组"""
+        content = '```json\n{"titles": [{"title": "a"}, {"title": "b"}]}\n```'
+        self.assertEqual(llm_utils.extract_json_array(content), [{"title": "a"}, {"title": "b"}])
+
     def test_not_array(self):
         """测试返回的不是数组"""
         content = '{"key": "value"}'
@@ -108,7 +159,10 @@ class TestExtractJsonArray(unittest.TestCase):
 class TestCallLlmWithRetry(unittest.TestCase):
     """测试带重试的 LLM 调用"""
 
-    @patch("shared.llm_utils.requests.post")
+    def setUp(self):
+        llm_cache.get_cache().clear()
+
+    @patch("shared.llm_utils.llm_transport.post")
     @patch("shared.llm_utils.config")
     def test_successful_call(self, mock_config, mock_post):
         """测试成功调用"""
@@ -132,7 +186,7 @@ class TestCallLlmWithRetry(unittest.TestCase):
         self.assertEqual(result, "Test response")
         mock_post.assert_called_once()
 
-    @patch("shared.llm_utils.requests.post")
+    @patch("shared.llm_utils.llm_transport.post")
     @patch("shared.llm_utils.config")
     @patch("shared.llm_utils.time.sleep")  # Mock sleep 加速测试
     def test_retry_on_failure(self, mock_sleep, mock_config, mock_post):
@@ -192,5 +246,221 @@ class TestCallLlmJson(unittest.TestCase):
         self.assertEqual(result[0]["a"], 1)
 
 
+class TestLlmTransport(unittest.TestCase):
+    """测试 LLM 传输层 (连接池)"""
+
+    def tearDown(self):
+        llm_transport.close_session()
+
+    def test_session_is_shared(self):
+        """测试 Session 进程内复用"""
+        session1 = llm_transport.get_session()
+        session2 = llm_transport.get_session()
+        self.assertIs(session1, session2)
+
+    @patch("shared.llm_transport.config")
+    def test_pool_size_from_config(self, mock_config):
+        """测试连接池大小可配置"""
+        mock_config.LLM_POOL_CONNECTIONS = 2
+        mock_config.LLM_POOL_MAXSIZE = 7
+        mock_config.LLM_POOL_BLOCK = False
+
+        adapter = llm_transport.get_session().get_adapter("https://api.example.com")
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 7)
+
+    def test_build_headers(self):
+        """测试 OpenRouter 特殊请求头"""
+        headers = llm_transport.build_headers("https://openrouter.ai/api/v1/chat/completions", "k")
+        self.assertEqual(headers["Authorization"], "Bearer k")
+        self.assertIn("HTTP-Referer", headers)
+
+        headers = llm_transport.build_headers("https://api.example.com", "k")
+        self.assertNotIn("HTTP-Referer", headers)
+
+
+class TestAsyncLlm(unittest.TestCase):
+    """测试异步 LLM 接口与并发调度"""
+
+    def setUp(self):
+        llm_cache.get_cache().clear()
+
+    def _make_fake_apost(self, tracker):
+        async def fake_apost(url, headers=None, json=None, timeout=90):
+            tracker["in_flight"] += 1
+            tracker["peak"] = max(tracker["peak"], tracker["in_flight"])
+            await asyncio.sleep(0.01)
+            tracker["in_flight"] -= 1
+
+            prompt = json["messages"][-1]["content"]
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {
+                "choices": [{"message": {"content": '{"echo": "%s"}' % prompt}}]
+            }
+            return response
+        return fake_apost
+
+    @patch("shared.llm_scheduler.config")
+    @patch("shared.llm_utils.config")
+    def test_batch_preserves_order_and_caps_concurrency(self, mock_config, mock_sched_config):
+        """测试批量调用结果有序且并发受限"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com/v1/chat/completions"
+        mock_config.LLM_MODEL = "test-model"
+        mock_sched_config.LLM_MAX_CONCURRENCY_PER_PROVIDER = 10
+        mock_sched_config.LLM_MAX_CONCURRENCY_PER_MODEL = 3
+
+        tracker = {"in_flight": 0, "peak": 0}
+        with patch("shared.llm_utils.llm_transport.apost", side_effect=self._make_fake_apost(tracker)):
+            results = llm_utils.call_llm_json_batch([{"prompt": f"p{i}"} for i in range(10)])
+
+        self.assertEqual([r["echo"] for r in results], [f"p{i}" for i in range(10)])
+        self.assertLessEqual(tracker["peak"], 3)
+        self.assertGreater(tracker["peak"], 1)
+
+    @patch("shared.llm_utils.asyncio.sleep")
+    @patch("shared.llm_utils.config")
+    def test_async_retry_then_fail(self, mock_config, mock_sleep):
+        """测试异步调用重试耗尽后返回空"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+
+        async def no_sleep(_):
+            return None
+        mock_sleep.side_effect = no_sleep
+
+        failed = MagicMock()
+        failed.status_code = 500
+        failed.text = "error"
+
+        async def fake_apost(*args, **kwargs):
+            return failed
+
+        with patch("shared.llm_utils.llm_transport.apost", side_effect=fake_apost) as mock_apost:
+            result = asyncio.run(llm_utils.acall_llm_with_retry("Test prompt", max_retries=1))
+
+        self.assertEqual(result, "")
+        self.assertEqual(mock_apost.call_count, 2)
+
+    def test_empty_batch(self):
+        """测试空批量"""
+        self.assertEqual(llm_utils.call_llm_json_batch([]), [])
+
+
+class TestLlmResponseCaching(unittest.TestCase):
+    """测试 LLM 调用接入响应缓存"""
+
+    def setUp(self):
+        llm_cache.get_cache().clear()
+
+    def _response(self, content):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"choices": [{"message": {"content": content}}]}
+        return response
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_repeat_call_hits_cache(self, mock_config, mock_post):
+        """测试相同 Prompt 第二次调用命中缓存"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        mock_post.return_value = self._response('{"key": "value"}')
+
+        first = llm_utils.call_llm_json("Same prompt", temperature=0.7)
+        second = llm_utils.call_llm_json("Same prompt", temperature=0.7)
+
+        self.assertEqual(first, second)
+        mock_post.assert_called_once()
+        self.assertEqual(llm_cache.get_cache().get_stats()["hits"], 1)
+
+        # 参数不同 -> 不同缓存键
+        llm_utils.call_llm_json("Same prompt", temperature=0.9)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_opt_out(self, mock_config, mock_post):
+        """测试 use_cache=False 跳过缓存"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        mock_post.return_value = self._response("creative")
+
+        llm_utils.call_llm_with_retry("Creative prompt", use_cache=False)
+        llm_utils.call_llm_with_retry("Creative prompt", use_cache=False)
+
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_invalid_json_not_cached(self, mock_config, mock_post):
+        """测试无法解析的响应不写入缓存"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        mock_post.side_effect = [self._response("not json"), self._response('{"ok": true}')]
+
+        self.assertIsNone(llm_utils.call_llm_json("Prompt"))
+        self.assertEqual(llm_utils.call_llm_json("Prompt"), {"ok": True})
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("shared.llm_utils.llm_transport.post")
+    @patch("shared.llm_utils.config")
+    def test_rejected_by_validator_not_cached(self, mock_config, mock_post):
+        """测试未通过业务校验的 JSON 不写入缓存 (重跑时重新生成)"""
+        mock_config.LLM_API_KEY = "test_key"
+        mock_config.LLM_API_URL = "https://api.example.com"
+        mock_config.LLM_MODEL = "test-model"
+        article = '{"title": "T", "html_content": "%s"}'
+        mock_post.side_effect = [self._response(article % "short"), self._response(article % ("x" * 60))]
+        valid = lambda data: len(data.get("html_content", "")) >= 50
+
+        self.assertEqual(llm_utils.call_llm_json("Prompt", validator=valid)["html_content"], "short")
+        self.assertEqual(len(llm_utils.call_llm_json("Prompt", validator=valid)["html_content"]), 60)
+        self.assertEqual(len(llm_utils.call_llm_json("Prompt", validator=valid)["html_content"]), 60)
+        self.assertEqual(mock_post.call_count, 2)
+
+
+class TestMapInBatches(unittest.TestCase):
+    """测试多项打包调用与拆分重试"""
+
+    def test_groups_by_batch_size(self):
+        """测试按 batch_size 分组，结果与输入对齐"""
+        seen = []
+
+        def run_batches(groups):
+            seen.append([len(g) for g in groups])
+            return [[x * 10 for x in g] for g in groups]
+
+        results = llm_utils.map_in_batches([1, 2, 3, 4, 5], 2, run_batches)
+        self.assertEqual(results, [10, 20, 30, 40, 50])
+        self.assertEqual(seen, [[2, 2, 1]])
+
+    def test_split_retry_on_failed_item(self):
+        """测试组内单项失败时拆分重试，其余项不重复请求"""
+        rounds = []
+
+        def run_batches(groups):
+            rounds.append(groups)
+            # 打包请求中 "bad" 总是解析失败，单独请求时成功
+            return [[None if x == "bad" and len(g) > 1 else x.upper() for x in g] for g in groups]
+
+        results = llm_utils.map_in_batches(["a", "bad", "c"], 3, run_batches)
+        self.assertEqual(results, ["A", "BAD", "C"])
+        self.assertEqual(rounds, [[["a", "bad", "c"]], [["bad"]]])
+
+    def test_whole_batch_failure_splits_to_singles(self):
+        """测试整组失败时逐级拆分，单项仍失败则放弃"""
+        def run_batches(groups):
+            return [None if len(g) > 1 else [g[0] if g[0] != "x" else None] for g in groups]
+
+        results = llm_utils.map_in_batches(["a", "b", "x", "d"], 4, run_batches)
+        self.assertEqual(results, ["a", "b", None, "d"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,97 @@
+"""
+测试本地 Mock LLM 服务
+"""
+import sys
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import config, llm_utils, llm_transport, llm_cache, rate_limiter
+from shared.mock_llm_server import MockLLMServer, parse_latency, render_response
+
+
+ARTICLE_PROMPT = '直接使用输入的 "纸箱选购指南" 作为 H1 标题。\n{"title": "...", "html_content": "...", "category_id": "3"}'
+
+
+class TestRenderResponse(unittest.TestCase):
+    """测试按 Prompt 识别调用方"""
+
+    def test_title_batch(self):
+        prompt = "[1] 春节礼盒 (角度: a)\n[2] 冷链包装 (角度: b)\n为每个热点分别生成 3 个标题\n键为热点编号"
+        skill, content = render_response(prompt, random.Random(0))
+        data = llm_utils.extract_json(content)
+        self.assertEqual(skill, "title_batch")
+        self.assertEqual(sorted(data), ["1", "2"])
+        self.assertEqual(len(data["1"]), 3)
+
+    def test_compress_title(self):
+        prompt = "你是一个标题压缩专家。请将以下标题压缩到 5 字以内\n【原标题】：很长很长的包装标题（9字）"
+        skill, content = render_response(prompt, random.Random(0))
+        self.assertEqual(skill, "compress_title")
+        self.assertLessEqual(len(content), 5)
+
+    def test_parse_latency(self):
+        self.assertEqual(parse_latency("fixed:0.5")(random.Random(0)), 0.5)
+        self.assertEqual(parse_latency("0.2")(random.Random(0)), 0.2)
+        value = parse_latency("uniform:1,2")(random.Random(0))
+        self.assertTrue(1 <= value <= 2)
+        with self.assertRaises(ValueError):
+            parse_latency("poisson:1")
+
+
+class TestMockLLMServer(unittest.TestCase):
+    """测试经 llm_utils 调用 Mock 服务"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        llm_cache.set_cache(llm_cache.LLMResponseCache(path=os.path.join(self._tmp.name, "cache.sqlite3")))
+        rate_limiter.set_rate_limiter(rate_limiter.AdaptiveRateLimiter(enabled=False))
+
+    def tearDown(self):
+        llm_cache.get_cache().close()
+        llm_cache.set_cache(None)
+        rate_limiter.set_rate_limiter(None)
+        self._tmp.cleanup()
+
+    def test_article_json(self):
+        with MockLLMServer(port=0, latency="fixed:0") as server, \
+                patch.object(config, "LLM_API_URL", server.url):
+            data = llm_utils.call_llm_json(ARTICLE_PROMPT, use_cache=False)
+            stats = server.get_stats()
+        self.assertEqual(data["title"], "纸箱选购指南")
+        self.assertEqual(data["category_id"], "3")
+        self.assertEqual(stats["by_skill"], {"deep_write": 1})
+
+    def test_stream(self):
+        with MockLLMServer(port=0, latency="fixed:0", chunk_chars=64, chunk_delay=0) as server, \
+                patch.object(config, "LLM_API_URL", server.url):
+            data = llm_utils.call_llm_json_stream(ARTICLE_PROMPT, required_fields=("title", "html_content"),
+                                                  use_cache=False)
+            stats = server.get_stats()
+        self.assertEqual(data["title"], "纸箱选购指南")
+        self.assertEqual(stats["stream"], 1)
+
+    def test_429_injection(self):
+        with MockLLMServer(port=0, latency="fixed:0", rate_429=1.0, retry_after=2) as server:
+            resp = llm_transport.post(server.url, headers={}, json={"messages": [{"role": "user", "content": "hi"}]})
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "2")
+
+    def test_deterministic(self):
+        """相同种子 + 相同请求序列得到相同内容"""
+        contents = []
+        for _ in range(2):
+            with MockLLMServer(port=0, latency="fixed:0", seed=7) as server:
+                resp = llm_transport.post(server.url, headers={}, json={
+                    "messages": [{"role": "user", "content": ARTICLE_PROMPT}]
+                })
+                contents.append(resp.json()["choices"][0]["message"]["content"])
+        self.assertEqual(contents[0], contents[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
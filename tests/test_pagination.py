@@ -0,0 +1,44 @@
+"""
+测试分页迭代 (shared/pagination.py)
+"""
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.pagination import iter_pages
+
+
+def make_pages(pages):
+    calls = []
+
+    def fetch_page(i):
+        calls.append(i)
+        return pages[i], (i + 1 if i + 1 < len(pages) else None)
+    return fetch_page, calls
+
+
+class TestIterPages(unittest.TestCase):
+
+    def test_yields_all_records(self):
+        for prefetch in (True, False):
+            fetch_page, _ = make_pages([[1, 2], [3], [4, 5]])
+            self.assertEqual(list(iter_pages(fetch_page, 0, prefetch=prefetch)), [1, 2, 3, 4, 5])
+
+    def test_prefetches_next_page_only(self):
+        fetch_page, calls = make_pages([[1, 2], [3, 4], [5, 6]])
+        it = iter_pages(fetch_page, 0)
+        self.assertEqual(next(it), 1)
+        it.close()
+        # 处理第 1 页时最多预取第 2 页，不会继续往后拉
+        self.assertLessEqual(len(calls), 2)
+
+    def test_lazy(self):
+        fetch_page, calls = make_pages([[1]])
+        iter_pages(fetch_page, 0, prefetch=False)
+        self.assertEqual(calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
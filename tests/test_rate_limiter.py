@@ -0,0 +1,108 @@
+"""
+测试自适应限流器
+"""
+import sys
+import os
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import rate_limiter, llm_transport
+from shared.rate_limiter import AdaptiveRateLimiter, parse_reset, parse_retry_after
+
+API_URL = "https://api.example.com/v1/chat/completions"
+
+
+class TestHeaderParsing(unittest.TestCase):
+    """测试限流响应头解析"""
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(parse_retry_after("30"), 30.0)
+
+    def test_retry_after_http_date(self):
+        now = 1445412480.0  # Wed, 21 Oct 2015 07:28:00 GMT
+        self.assertAlmostEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=now), 30.0)
+
+    def test_retry_after_invalid(self):
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_reset_duration(self):
+        self.assertAlmostEqual(parse_reset("6m0s"), 360.0)
+        self.assertAlmostEqual(parse_reset("20ms"), 0.02)
+        self.assertAlmostEqual(parse_reset("1.5s"), 1.5)
+
+    def test_reset_epoch_millis(self):
+        now = 1_700_000_000.0
+        self.assertAlmostEqual(parse_reset(str(int((now + 5) * 1000)), now=now), 5.0)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    """测试令牌桶与 429 自适应"""
+
+    def test_burst_then_wait(self):
+        limiter = AdaptiveRateLimiter(rate=10, burst=2, enabled=True)
+        bucket = limiter.bucket_for(API_URL, "k")
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertGreater(bucket.reserve(), 0)
+
+    def test_buckets_per_api_key(self):
+        limiter = AdaptiveRateLimiter(enabled=True)
+        self.assertIsNot(limiter.bucket_for(API_URL, "a"), limiter.bucket_for(API_URL, "b"))
+        self.assertIs(limiter.bucket_for(API_URL, "a"), limiter.bucket_for(API_URL, "a"))
+
+    def test_429_halves_rate_and_honours_retry_after(self):
+        limiter = AdaptiveRateLimiter(rate=4, burst=4, min_rate=0.1, enabled=True)
+        retry_after = limiter.update_from_response(API_URL, "k", 429, {"Retry-After": "3"})
+
+        bucket = limiter.bucket_for(API_URL, "k")
+        self.assertEqual(retry_after, 3.0)
+        self.assertEqual(bucket.rate, 2)
+        self.assertGreater(bucket.reserve(), 2.5)
+
+    def test_success_increases_rate_up_to_max(self):
+        limiter = AdaptiveRateLimiter(rate=1, max_rate=1.25, enabled=True)
+        for _ in range(5):
+            limiter.update_from_response(API_URL, "k", 200, {})
+        self.assertEqual(limiter.bucket_for(API_URL, "k").rate, 1.25)
+
+    def test_remaining_zero_blocks_until_reset(self):
+        limiter = AdaptiveRateLimiter(rate=10, burst=10, enabled=True)
+        limiter.update_from_response(API_URL, "k", 200, {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+        })
+        self.assertGreater(limiter.bucket_for(API_URL, "k").reserve(), 1.5)
+
+    def test_disabled_never_waits(self):
+        limiter = AdaptiveRateLimiter(rate=0.1, burst=1, enabled=False)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire(API_URL, "k")
+        self.assertLess(time.monotonic() - start, 0.1)
+
+
+class TestTransportIntegration(unittest.TestCase):
+    """测试 llm_transport.post 向限流器反馈响应"""
+
+    def tearDown(self):
+        rate_limiter.set_rate_limiter(None)
+
+    @patch("shared.llm_transport.get_session")
+    def test_post_reports_429(self, mock_get_session):
+        limiter = AdaptiveRateLimiter(rate=2, burst=2, enabled=True)
+        rate_limiter.set_rate_limiter(limiter)
+
+        resp = MagicMock(status_code=429, headers={"Retry-After": "1"})
+        mock_get_session.return_value.post.return_value = resp
+
+        llm_transport.post(API_URL, headers={"Authorization": "Bearer secret"}, json={})
+
+        self.assertEqual(limiter.bucket_for(API_URL, "secret").throttled_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
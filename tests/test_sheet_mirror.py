@@ -0,0 +1,95 @@
+"""
+测试 Google Sheets 本地镜像 (使用 tests/test_google_client.py 中的假工作表)
+"""
+import sys
+import os
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.google_client import RECORD_ID_COLUMN
+from shared.sheet_mirror import SheetMirror
+from tests.test_google_client import make_client
+
+
+class TestSheetMirror(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.client, self.sheet = make_client([
+            ["t1", "Pending", "行业资讯", "T1", "<p>1</p>"],
+            ["t2", "Published", "行业资讯", "T2", "<p>2</p>"],
+            ["t3", "Pending", "专业知识", "T3", "<p>3</p>"],
+        ])
+        self.client.spreadsheet.get_lastUpdateTime.return_value = "v1"
+        self.mirror = SheetMirror(self.client, path=os.path.join(self._tmp.name, "mirror.sqlite3"))
+
+    def tearDown(self):
+        self.mirror.close()
+        self._tmp.cleanup()
+
+    def test_query_matches_client(self):
+        expected = self.client.fetch_records_by_status("Pending", category="行业资讯")
+        self.assertEqual(self.mirror.fetch_records_by_status("Pending", category="行业资讯"), expected)
+        records = self.mirror.fetch_records_by_status("Pending", columns=["Topic"], limit=1)
+        self.assertEqual(records, [{"Topic": "t1", "record_id": "row:2"}])
+
+    def test_iter_records_keyset_pages(self):
+        self.sheet.rows.append(["t4", "Pending", "行业资讯", "T4", ""])
+        topics = [r["Topic"] for r in self.mirror.iter_records_by_status("Pending", page_size=1)]
+        self.assertEqual(topics, ["t1", "t3", "t4"])
+        limited = self.mirror.iter_records_by_status("Pending", page_size=2, limit=2, columns=["Topic"])
+        self.assertEqual(list(limited), [{"Topic": "t1", "record_id": "row:2"}, {"Topic": "t3", "record_id": "row:4"}])
+
+    def test_unchanged_watermark_skips_reads(self):
+        self.mirror.sync()
+        self.sheet.requested_ranges.clear()
+        self.assertEqual(self.mirror.sync(), 0)
+        self.assertEqual(self.sheet.requested_ranges, [])
+
+    def test_incremental_sync_fetches_changed_rows(self):
+        self.mirror.sync()
+        self.sheet.rows[2][1] = "Ready"                                  # 修改 row:3
+        self.sheet.rows.append(["t4", "Pending", "行业资讯", "T4", ""])   # 新增 row:5
+        self.client.spreadsheet.get_lastUpdateTime.return_value = "v2"
+        self.sheet.requested_ranges.clear()
+
+        self.assertEqual(self.mirror.sync(), 2)
+        # 只读取指纹列 + 变化的行
+        self.assertEqual(self.sheet.requested_ranges, ["A2:A", "B2:B", "A3:E3", "A5:E5"])
+        topics = [r["Topic"] for r in self.mirror.fetch_records_by_status("Pending")]
+        self.assertEqual(topics, ["t1", "t3", "t4"])
+
+    def test_backfilled_record_id_resynced(self):
+        self.sheet.rows[0].append(RECORD_ID_COLUMN)
+        self.mirror.sync()
+        self.sheet.rows[1].append("rec-1")                               # 只补写 Record_ID，其余列不变
+        self.client.spreadsheet.get_lastUpdateTime.return_value = "v2"
+
+        self.assertEqual(self.mirror.sync(), 1)
+        records = self.mirror.fetch_records_by_status("Pending", columns=["Topic"])
+        self.assertEqual(records[0], {"Topic": "t1", "record_id": "rec-1"})
+
+    def test_deleted_rows_removed(self):
+        self.mirror.sync()
+        del self.sheet.rows[3]
+        self.client.spreadsheet.get_lastUpdateTime.return_value = "v2"
+        self.assertEqual([r["Topic"] for r in self.mirror.fetch_records_by_status("Pending")], ["t1"])
+
+    def test_queue_update_applies_locally(self):
+        self.client.queue_update = lambda record_id, fields: True
+        self.mirror.sync()
+        self.mirror.queue_update("row:2", {"Status": "Published"})
+        self.assertEqual([r["Topic"] for r in self.mirror.fetch_records_by_status("Pending")], ["t3"])
+
+    def test_count_by_date(self):
+        self.sheet.rows[0].append("生成时间")
+        for row, ts in zip(self.sheet.rows[1:], ["2024-05-01 10:00:00", "2024-05-02 09:00:00", "2024-05-01 23:00:00"]):
+            row.append(ts)
+        self.assertEqual(self.mirror.count_by_date("cms", "2024-05-01"), 2)
+        self.assertEqual(self.client.count_by_date("cms", "2024-05-01"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
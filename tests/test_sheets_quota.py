@@ -0,0 +1,85 @@
+"""
+测试 Google Sheets API 配额调度
+"""
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import sheets_quota
+from shared.sheets_quota import SlidingWindowQuota, SheetsQuotaGovernor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestSlidingWindowQuota(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(sheets_quota.time, "monotonic", self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_within_limit(self):
+        quota = SlidingWindowQuota(limit=3, window=60)
+        self.assertEqual([quota.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(quota.utilization(), 1.0)
+
+    def test_over_limit_queued_in_order(self):
+        quota = SlidingWindowQuota(limit=2, window=60)
+        quota.reserve()
+        self.clock.now += 10
+        quota.reserve()
+        # 第 3、4 个请求分别等到前两个滑出窗口
+        self.assertEqual(quota.reserve(), 50)
+        self.assertEqual(quota.reserve(), 60)
+        self.assertEqual(quota.delayed, 2)
+
+        # 排队的请求也计入窗口: 两者都滑出后才恢复立即发送
+        self.clock.now += 130
+        self.assertEqual(quota.reserve(), 0)
+
+    def test_block_for(self):
+        quota = SlidingWindowQuota(limit=10, window=60)
+        quota.block_for(5)
+        self.assertEqual(quota.reserve(), 5)
+        self.assertEqual(quota.throttled, 1)
+
+
+class TestSheetsQuotaGovernor(unittest.TestCase):
+
+    def test_read_write_tracked_separately(self):
+        governor = SheetsQuotaGovernor(read_per_minute=2, write_per_minute=5, enabled=True)
+        with patch.object(sheets_quota.time, "sleep") as sleep:
+            governor.acquire("read", "a@x")
+            governor.acquire("read", "a@x")
+            governor.acquire("write", "a@x")
+            governor.acquire("read", "b@x")
+            sleep.assert_not_called()
+            governor.acquire("read", "a@x")
+            sleep.assert_called_once()
+
+        stats = governor.get_stats()
+        self.assertEqual(stats["a@x/read"]["requests"], 3)
+        self.assertEqual(stats["a@x/read"]["delayed"], 1)
+        self.assertEqual(stats["a@x/write"]["utilization"], 0.2)
+
+    def test_disabled(self):
+        governor = SheetsQuotaGovernor(read_per_minute=1, enabled=False)
+        with patch.object(sheets_quota.time, "sleep") as sleep:
+            for _ in range(3):
+                governor.acquire("read")
+        sleep.assert_not_called()
+        self.assertEqual(governor.get_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
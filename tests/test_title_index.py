@@ -0,0 +1,161 @@
+"""
+测试标题近似去重索引 (临时 SQLite 文件)
+"""
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import config, title_index
+from shared.title_index import TitleIndex, STAGE_TOPIC, STAGE_ARTICLE, normalize_title, shingles, jaccard
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize_title("广州 飞机盒，多少钱？"), "广州飞机盒多少钱")
+        self.assertEqual(normalize_title("ＡＩ 包装"), "ai包装")
+
+    def test_shingles_and_jaccard(self):
+        self.assertEqual(shingles("abc"), {"ab", "bc"})
+        self.assertEqual(shingles("a"), {"a"})
+        self.assertAlmostEqual(jaccard({"ab", "bc"}, {"ab", "cd"}), 1 / 3)
+
+
+class TestTitleIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "titles.sqlite3")
+        self.index = TitleIndex(self.path, threshold=0.5, prefix_chars=5, bands=16, rows=3)
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(self.index.close)
+
+    def test_near_duplicate_rejected(self):
+        self.assertIsNone(self.index.check_and_add("2026年春节礼盒定制避坑指南"))
+        self.assertEqual(self.index.check_and_add("2026年春节礼盒定制的避坑指南！"), "2026年春节礼盒定制避坑指南")
+        self.assertIsNone(self.index.check_and_add("电商飞机盒防破损的5个技巧"))
+        self.assertEqual(len(self.index), 2)
+
+    def test_same_prefix_is_duplicate_within_run(self):
+        self.index.add("广州飞机盒定制厂家推荐")
+        self.assertEqual(self.index.find_similar("广州飞机盒批发价格表"), "广州飞机盒定制厂家推荐")
+        self.assertIsNone(self.index.find_similar("广州飞机盒批发价格表", match_prefix=False))
+
+    def test_prefix_rule_ignores_earlier_runs(self):
+        self.index.bootstrap(["2026年飞机盒定制价格揭秘"])
+        self.assertIsNone(self.index.check_and_add("2026年春节礼盒设计趋势有哪些？"))
+        self.index.close()
+
+        next_run = TitleIndex(self.path, threshold=0.5, prefix_chars=5, bands=16, rows=3)
+        self.addCleanup(next_run.close)
+        self.assertIsNone(next_run.check_and_add("2026年电商包装新规解读"))
+
+    def test_exact_duplicate(self):
+        self.index.add("抗压飞机盒怎么选不踩坑？")
+        self.assertEqual(self.index.find_similar("抗压飞机盒怎么选不踩坑"), "抗压飞机盒怎么选不踩坑？")
+        self.assertIsNone(self.index.find_similar("抗压飞机盒怎么选不踩坑", exclude_self=True))
+
+    def test_stage_filter(self):
+        self.index.add("2026年春节礼盒定制避坑指南", STAGE_TOPIC)
+        self.assertIsNone(self.index.check_and_add(
+            "2026年春节礼盒定制的避坑指南", STAGE_ARTICLE, compare_stage=STAGE_ARTICLE, exclude_self=True
+        ))
+        # 同一选题重试: 只更新阶段，不视为重复
+        self.assertIsNone(self.index.check_and_add(
+            "2026年春节礼盒定制的避坑指南", STAGE_ARTICLE, compare_stage=STAGE_ARTICLE, exclude_self=True
+        ))
+        self.assertEqual(self.index.find_similar("2026年春节礼盒定制避坑指南", stage=STAGE_ARTICLE),
+                         "2026年春节礼盒定制的避坑指南")
+
+    def test_persistent_and_bootstrap_once(self):
+        self.assertEqual(self.index.bootstrap(["电商飞机盒防破损的5个技巧", "江浙沪抗压飞机盒源头厂批发"]), 2)
+        self.assertEqual(self.index.bootstrap(["广州年货礼盒多少钱一个？"]), 0)
+        self.index.close()
+
+        reopened = TitleIndex(self.path, threshold=0.5, prefix_chars=5, bands=16, rows=3)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.find_similar("电商飞机盒防破损的5个小技巧"), "电商飞机盒防破损的5个技巧")
+
+    def test_params_change_rebuilds_buckets(self):
+        self.index.add("电商飞机盒防破损的5个技巧")
+        self.index.close()
+
+        rebuilt = TitleIndex(self.path, threshold=0.5, prefix_chars=0, bands=8, rows=2)
+        self.addCleanup(rebuilt.close)
+        self.assertEqual(rebuilt.find_similar("电商飞机盒防破损的五个技巧"), "电商飞机盒防破损的5个技巧")
+
+    def test_dissimilar_titles_all_kept(self):
+        titles = [f"{city}{product}定制厂家" for city in ("东莞", "深圳", "上海", "义乌")
+                  for product in ("飞机盒", "礼品盒", "茶叶罐", "化妆品包装")]
+        index = TitleIndex(os.path.join(self.tmp, "other.sqlite3"), threshold=0.7, prefix_chars=0)
+        self.addCleanup(index.close)
+        kept = [t for t in titles if index.check_and_add(t) is None]
+        self.assertEqual(kept, titles)
+
+
+class TestArticleDedupe(unittest.TestCase):
+    """Step 2 写作前查重"""
+
+    def setUp(self):
+        from step2_article import agent_runner
+        self.runner = agent_runner
+        self.tmp = tempfile.mkdtemp()
+        title_index.set_title_index(TitleIndex(os.path.join(self.tmp, "titles.sqlite3")))
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(title_index.set_title_index, None)
+
+    def test_written_duplicates_marked_and_run_duplicates_deferred(self):
+        title_index.get_title_index().add("2026年春节礼盒定制避坑指南", STAGE_ARTICLE)
+        title_index.get_title_index().add("抗压飞机盒怎么选不踩坑", STAGE_TOPIC)
+        client = MagicMock()
+        topics = [
+            {"Topic": "2026年春节礼盒定制的避坑指南", "record_id": "a"},
+            {"Topic": "电商飞机盒防破损的5个技巧", "record_id": "b"},
+            {"Topic": "电商飞机盒防破损的5个小技巧", "record_id": "c"},
+            {"Topic": "2026年春节礼盒定制避坑指南", "record_id": "d"},    # 重置后重新生成
+            {"Topic": "抗压飞机盒怎么选不踩坑？", "record_id": "e"},      # 只是选题，尚未写作
+        ]
+        kept = self.runner._dedupe_topics(client, topics)
+        self.assertEqual([t["record_id"] for t in kept], ["b", "d", "e"])
+        client.queue_update.assert_called_once_with("a", {"Status": config.STATUS_DUPLICATE})
+
+
+class TestTopicDedupe(unittest.TestCase):
+    """Step 1 选题查重: 生成时只查重，上传成功后才写入索引"""
+
+    def setUp(self):
+        from skills.topic_analyst import TopicAnalysisSkill
+        self.tmp = tempfile.mkdtemp()
+        title_index.set_title_index(TitleIndex(os.path.join(self.tmp, "titles.sqlite3")))
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(title_index.set_title_index, None)
+
+        self.skill = TopicAnalysisSkill()
+        self.skill._analyze_trends = MagicMock(return_value=[{"topic": "春节"}])
+        titles = ["2026年春节礼盒定制的避坑指南", "电商飞机盒防破损的5个技巧", "电商飞机盒防破损的5个小技巧"]
+        self.skill._generate_titles_batch = MagicMock(
+            return_value=[[{"title": t, "category": "专业知识"} for t in titles]]
+        )
+
+    def test_generation_checks_without_indexing(self):
+        from step1_trends import agent_runner
+        title_index.get_title_index().add("2026年春节礼盒定制避坑指南", STAGE_TOPIC)
+
+        topics = self.skill.execute({"trends": ["春节"], "config": {}})
+        self.assertEqual([t["Topic"] for t in topics], ["电商飞机盒防破损的5个技巧"])
+        # 上传前未写入: 上传失败时下轮仍可生成
+        self.assertEqual(len(title_index.get_title_index()), 1)
+
+        agent_runner._index_uploaded(topics)
+        self.assertEqual(title_index.get_title_index().find_similar("电商飞机盒防破损的五个技巧"),
+                         "电商飞机盒防破损的5个技巧")
+
+
+if __name__ == "__main__":
+    unittest.main()
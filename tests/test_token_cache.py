@@ -0,0 +1,105 @@
+"""
+测试跨进程令牌缓存 (临时文件，不访问网络)
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.token_cache import TokenCache, set_token_cache
+from shared.feishu_client import FeishuClient
+
+
+class Fetcher:
+    """按顺序发放 token-1, token-2 ... 的假鉴权接口"""
+
+    def __init__(self, ttl=7200, delay=0.0):
+        self.ttl, self.delay, self.calls = ttl, delay, 0
+
+    def __call__(self):
+        time.sleep(self.delay)
+        self.calls += 1
+        return f"token-{self.calls}", self.ttl
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "token.json")
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def test_reused_across_instances(self):
+        fetch = Fetcher()
+        first = TokenCache(self.path, refresh_margin=60).get_or_fetch("k", fetch)
+        second = TokenCache(self.path, refresh_margin=60).get_or_fetch("k", fetch)
+        self.assertEqual(first, second)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_expired_token_fetched_synchronously(self):
+        with open(self.path, "w") as f:
+            json.dump({"k": {"token": "old", "expires_at": time.time() - 1}}, f)
+        token, _ = TokenCache(self.path, refresh_margin=60).get_or_fetch("k", Fetcher())
+        self.assertEqual(token, "token-1")
+
+    def test_refresh_window_does_not_block(self):
+        with open(self.path, "w") as f:
+            json.dump({"k": {"token": "old", "expires_at": time.time() + 30}}, f)
+        cache = TokenCache(self.path, refresh_margin=60)
+        fetch = Fetcher(delay=0.2)
+
+        started = time.monotonic()
+        token, _ = cache.get_or_fetch("k", fetch)
+        self.assertEqual(token, "old")
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        for thread in threading.enumerate():
+            if thread.name.startswith("token-refresh-"):
+                thread.join()
+        self.assertEqual(cache.get("k")[0], "token-1")
+        self.assertEqual(fetch.calls, 1)
+
+    def test_stale_token_forces_refresh_once(self):
+        cache = TokenCache(self.path, refresh_margin=60)
+        fetch = Fetcher()
+        token, _ = cache.get_or_fetch("k", fetch)
+        # 两个 worker 同时发现 token-1 失效，只换一次新 Token
+        self.assertEqual(cache.get_or_fetch("k", fetch, stale_token=token)[0], "token-2")
+        self.assertEqual(cache.get_or_fetch("k", fetch, stale_token=token)[0], "token-2")
+        self.assertEqual(fetch.calls, 2)
+
+    def test_concurrent_fetch_once(self):
+        fetch = Fetcher(delay=0.05)
+        caches = [TokenCache(self.path, refresh_margin=60) for _ in range(2)]
+        results = []
+        threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_fetch("k", fetch)[0]))
+                   for c in caches for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["token-1"] * 6)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_feishu_clients_share_token(self):
+        set_token_cache(TokenCache(self.path))
+        self.addCleanup(set_token_cache, None)
+        session = MagicMock()
+        session.post.return_value.json.return_value = {
+            "code": 0, "tenant_access_token": "t-abc", "expire": 7200
+        }
+        with patch.object(FeishuClient, "_http", return_value=session):
+            clients = [FeishuClient(), FeishuClient()]
+        self.assertEqual([c.token for c in clients], ["t-abc", "t-abc"])
+        self.assertEqual(session.post.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+测试热点抓取结果缓存 (临时 SQLite 文件)
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.trend_cache import TrendCache
+from shared.trend_fetch import TrendFetchEngine
+
+
+class TrendCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "trend_cache.sqlite3")
+        self.cache = TrendCache(self.path, ttl_hours={"suggest": 24, "hot": 0.5}, default_ttl_hours=4, enabled=True)
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(self.cache.close)
+
+
+class TestTrendCache(TrendCacheTestCase):
+
+    def test_roundtrip_keyed_by_source_and_seed(self):
+        self.cache.set("suggest", "礼盒", ["[搜索需求] 礼盒定制"])
+        self.assertEqual(self.cache.get("suggest", "礼盒"), ["[搜索需求] 礼盒定制"])
+        self.assertIsNone(self.cache.get("suggest", "纸箱"))
+        self.assertIsNone(self.cache.get("hot", "礼盒"))
+        self.assertEqual(self.cache.get_stats()["suggest"], {"hits": 1, "misses": 1})
+
+    def test_per_source_ttl(self):
+        self.assertEqual(self.cache.ttl_for("suggest"), 24 * 3600)
+        self.assertEqual(self.cache.ttl_for("hot"), 1800)
+        self.assertEqual(self.cache.ttl_for("other"), 4 * 3600)
+
+    def test_expired_entries_evicted(self):
+        self.cache.set("hot", "a", ["x"], ttl_seconds=0.05)
+        self.cache.set("hot", "b", ["y"], ttl_seconds=0.05)
+        self.cache.set("suggest", "c", ["z"])
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("hot", "a"))
+        self.assertEqual(self.cache.purge_expired(), 1)
+        self.assertEqual(self.cache.get("suggest", "c"), ["z"])
+
+    def test_persisted_across_instances(self):
+        self.cache.set("suggest", "礼盒", ["a"])
+        other = TrendCache(self.path, enabled=True)
+        self.addCleanup(other.close)
+        self.assertEqual(other.get("suggest", "礼盒"), ["a"])
+
+    def test_concurrent_writes_do_not_clobber(self):
+        caches = [TrendCache(self.path, enabled=True) for _ in range(4)]
+        threads = [
+            threading.Thread(target=lambda c=c, i=i: [c.set("suggest", f"{i}-{j}", [j]) for j in range(20)])
+            for i, c in enumerate(caches)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for c in caches:
+            c.close()
+        self.assertTrue(all(self.cache.get("suggest", f"{i}-{j}") == [j] for i in range(4) for j in range(20)))
+
+
+class TestEngineCache(TrendCacheTestCase):
+
+    def test_second_run_uses_cache(self):
+        calls = []
+
+        def fetch(seed):
+            calls.append(seed)
+            return [f"{seed}!"] if seed != "empty" else []
+
+        for _ in range(2):
+            engine = TrendFetchEngine(deadline=5, cache=self.cache)
+            engine.add_each("suggest", "h", fetch, ["a", "b", "empty"], cache=True)
+            results = engine.run()
+            self.assertEqual(sorted(results["suggest"]), ["a!", "b!"])
+
+        # 空结果不缓存，第二次仍会请求
+        self.assertEqual(sorted(calls), ["a", "b", "empty", "empty"])
+        self.assertEqual(engine.get_stats()["suggest"]["cached"], 2)
+        self.assertEqual(engine.get_stats()["suggest"]["skipped"], 0)
+
+    def test_uncached_tasks_skip_cache(self):
+        engine = TrendFetchEngine(deadline=5, cache=self.cache)
+        engine.add("hot", "h", lambda: ["x"])
+        engine.run()
+        self.assertEqual(self.cache.get_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
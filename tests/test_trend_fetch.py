@@ -0,0 +1,111 @@
+"""
+测试热点多源并发抓取引擎 (假抓取函数，不访问网络)
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.crawler import CrawlDeadlineExceeded
+from shared.trend_cache import TrendCache
+from shared.trend_fetch import TrendFetchEngine
+
+
+def slow(result, seconds):
+    time.sleep(seconds)
+    return result
+
+
+class TestTrendFetchEngine(unittest.TestCase):
+
+    def test_hosts_run_in_parallel(self):
+        engine = TrendFetchEngine(deadline=10, host_limits={h: {"concurrency": 1} for h in "abc"})
+        for host in "abc":
+            engine.add(host, host, slow, [host], 0.2)
+        started = time.monotonic()
+        results = engine.run()
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(dict(results), {"a": ["a"], "b": ["b"], "c": ["c"]})
+
+    def test_host_concurrency_limit(self):
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+
+        def fetch(seed):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return [seed]
+
+        engine = TrendFetchEngine(deadline=10, host_limits={"h": {"concurrency": 2}})
+        engine.add_each("src", "h", fetch, range(6))
+        results = engine.run()
+        self.assertEqual(sorted(results["src"]), list(range(6)))
+        self.assertEqual(peak[0], 2)
+
+    def test_crawl_deadline_counts_as_skipped(self):
+        def fetch(seed):
+            raise CrawlDeadlineExceeded(seed)
+
+        engine = TrendFetchEngine(deadline=5)
+        engine.add_each("src", "h", fetch, [1, 2])
+        engine.run()
+        stats = engine.get_stats()["src"]
+        self.assertEqual((stats["failed"], stats["skipped"]), (0, 2))
+
+    def test_deadline_keeps_partial_results(self):
+        engine = TrendFetchEngine(deadline=0.3, host_limits={"h": {"concurrency": 1}})
+        engine.add("fast", "f", slow, ["ok"], 0)
+        engine.add_each("slow", "h", lambda seconds: slow([seconds], seconds), [0.1, 1, 1, 1])
+        started = time.monotonic()
+        results = engine.run()
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(results["fast"], ["ok"])
+        self.assertEqual(results["slow"], [0.1])
+        stats = engine.get_stats()["slow"]
+        self.assertEqual((stats["done"], stats["skipped"]), (1, 3))
+
+    def test_failures_are_isolated(self):
+        def boom(seed):
+            raise ValueError(seed)
+
+        engine = TrendFetchEngine(deadline=5)
+        engine.add_each("bad", "h", boom, [1, 2])
+        engine.add("good", "g", lambda: ["x"])
+        results = engine.run()
+        self.assertEqual(results, {"bad": [], "good": ["x"]})
+        self.assertEqual(engine.get_stats()["bad"]["failed"], 2)
+
+    def test_empty_engine(self):
+        self.assertEqual(TrendFetchEngine().run(), {})
+
+    def test_blocked_hot_list_counts_as_failed(self):
+        """热榜请求被拦截 (如 403) 时计入该来源的失败数，而不是 0 条的成功"""
+        from skills.trend_searcher import TrendSearchSkill
+
+        blocked = MagicMock(status_code=403, text="")
+        blocked.raise_for_status.side_effect = Exception("403 Forbidden")
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch("shared.trend_fetch.get_trend_cache", return_value=TrendCache(os.path.join(tmp, "t.sqlite3"))), \
+                patch("skills.trend_searcher.get_crawler") as mock_crawler:
+            mock_crawler.return_value.get.return_value = blocked
+            engine = TrendSearchSkill()._build_fetch_engine([])
+            results = engine.run()
+            engine.cache.close()
+
+        self.assertEqual(results["百度"], [])
+        stats = engine.get_stats()
+        self.assertEqual({source: stats[source]["failed"] for source in stats},
+                         {"百度": 1, "微博": 1, "头条": 1, "36氪": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+测试热点历史与增量筛选 (临时 SQLite 文件)
+"""
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import trend_history
+from shared.trend_history import TrendHistory, normalize_trend
+
+HOUR = 3600
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_strips_source_tags_and_punctuation(self):
+        self.assertEqual(normalize_trend("[百度] 春节礼盒 定制！"), "春节礼盒定制")
+        self.assertEqual(normalize_trend("[微博]春节礼盒定制"), "春节礼盒定制")
+        self.assertEqual(normalize_trend("[谷歌趋势] Custom  Packaging"), "custompackaging")
+        self.assertEqual(normalize_trend("ＡＩ包装"), "ai包装")
+        self.assertEqual(normalize_trend("[36氪]"), "")
+
+
+class TestTrendHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.history = TrendHistory(
+            os.path.join(self.tmp, "history.sqlite3"),
+            resurge_hours=24, reanalyze_hours=168, retention_days=30, enabled=True
+        )
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(self.history.close)
+        self.t0 = 1_700_000_000.0
+
+    def test_only_new_trends_after_analysis(self):
+        first = self.history.select_fresh(["[百度] 春节礼盒", "[微博] 春节礼盒", "[头条] 冷链包装"], now=self.t0)
+        self.assertEqual(first, ["[百度] 春节礼盒", "[头条] 冷链包装"])
+        self.history.mark_analyzed(first, now=self.t0)
+
+        second = self.history.select_fresh(["[微博] 春节礼盒!", "[头条] 冷链包装", "[36氪] 出海包装"], now=self.t0 + HOUR)
+        self.assertEqual(second, ["[36氪] 出海包装"])
+
+    def test_unanalyzed_trends_stay_fresh(self):
+        self.history.select_fresh(["a"], now=self.t0)
+        # 上一轮分析失败 (未 mark_analyzed)，下一轮仍需分析
+        self.assertEqual(self.history.select_fresh(["a"], now=self.t0 + HOUR), ["a"])
+
+    def test_resurging_trend(self):
+        self.history.mark_analyzed(self.history.select_fresh(["a", "b"], now=self.t0), now=self.t0)
+        self.history.select_fresh(["b"], now=self.t0 + 30 * HOUR)
+        # a 消失 48 小时后重新上榜；b 18 小时前仍在榜
+        self.assertEqual(self.history.select_fresh(["a", "b"], now=self.t0 + 48 * HOUR), ["a"])
+
+    def test_long_running_trend_reanalyzed(self):
+        self.history.mark_analyzed(self.history.select_fresh(["a"], now=self.t0), now=self.t0)
+        for hours in range(12, 168, 12):
+            self.assertEqual(self.history.select_fresh(["a"], now=self.t0 + hours * HOUR), [])
+        self.assertEqual(self.history.select_fresh(["a"], now=self.t0 + 170 * HOUR), ["a"])
+
+    def test_disabled_returns_all_unique(self):
+        history = TrendHistory(os.path.join(self.tmp, "off.sqlite3"), enabled=False)
+        self.assertEqual(history.select_fresh(["[百度] a", "[微博] a", "b"]), ["[百度] a", "b"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "off.sqlite3")))
+
+
+class TestTrendHunterMarking(unittest.TestCase):
+    """热点筛选 LLM 调用失败 (随机补全) 时不记为已分析"""
+
+    def setUp(self):
+        from agents.trend_hunter import TrendHunterAgent
+        self.tmp = tempfile.mkdtemp()
+        self.history = TrendHistory(os.path.join(self.tmp, "history.sqlite3"), enabled=True)
+        trend_history.set_trend_history(self.history)
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.addCleanup(self.history.close)
+        self.addCleanup(trend_history.set_trend_history, None)
+
+        self.agent = TrendHunterAgent()
+        self.agent.skills["trend_search"] = MagicMock(execute=MagicMock(return_value=["a", "b"]))
+        self.analysis = MagicMock(execute=MagicMock(return_value=[{"Topic": "t"}]))
+        self.agent.skills["topic_analysis"] = self.analysis
+
+    def test_fallback_analysis_not_marked(self):
+        self.analysis.analysis_succeeded = False
+        self.assertEqual(self.agent.hunt_and_analyze({}), [{"Topic": "t"}])
+        self.assertEqual(self.history.select_fresh(["a", "b"]), ["a", "b"])
+
+    def test_successful_analysis_marked(self):
+        self.analysis.analysis_succeeded = True
+        self.agent.hunt_and_analyze({})
+        self.assertEqual(self.history.select_fresh(["a", "b"]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
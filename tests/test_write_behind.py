@@ -0,0 +1,170 @@
+"""
+测试 Write-Behind 写回队列
+"""
+import sys
+import os
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.write_behind import WriteBehindQueue, AppendSpool, MAX_FLUSH_ATTEMPTS
+
+
+class RecordingSink:
+    """记录每次写回的批次，可指定失败的记录 / 抛出异常"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail_ids = set()
+        self.error = None
+
+    def __call__(self, updates):
+        if self.error:
+            raise self.error
+        self.batches.append(updates)
+        return [rid for rid in updates if rid in self.fail_ids]
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.sink = RecordingSink()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def make_queue(self, **kwargs):
+        kwargs.setdefault("max_records", 10)
+        kwargs.setdefault("interval", 0)
+        kwargs.setdefault("journal_dir", self._tmp.name)
+        return WriteBehindQueue("test", flush_func=self.sink, **kwargs)
+
+    def test_coalesce_fields(self):
+        queue = self.make_queue()
+        queue.put("row:2", {"Status": "Pending", "URL": ""})
+        queue.put("row:2", {"Status": "Published", "URL": "https://a"})
+        queue.put("row:3", {"Status": "Ready"})
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.sink.batches, [{
+            "row:2": {"Status": "Published", "URL": "https://a"},
+            "row:3": {"Status": "Ready"},
+        }])
+
+    def test_flush_on_max_records(self):
+        queue = self.make_queue(max_records=2)
+        queue.put("row:2", {"Status": "Pending"})
+        self.assertEqual(self.sink.batches, [])
+        queue.put("row:3", {"Status": "Pending"})
+        self.assertEqual(len(self.sink.batches), 1)
+        self.assertEqual(len(queue), 0)
+
+    def test_failed_records_requeued(self):
+        queue = self.make_queue()
+        self.sink.fail_ids = {"row:3"}
+        queue.put("row:2", {"Status": "Pending"})
+        queue.put("row:3", {"Status": "Pending"})
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(len(queue), 1)
+
+        # 无效记录达到上限后丢弃
+        for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+            queue.flush()
+        self.assertEqual(len(queue), 0)
+
+    def test_exception_keeps_batch(self):
+        """临时错误不计入失败次数，整批保留"""
+        queue = self.make_queue()
+        queue.put("row:2", {"Status": "Pending"})
+        self.sink.error = ConnectionError("reset")
+        for _ in range(MAX_FLUSH_ATTEMPTS + 1):
+            self.assertEqual(queue.flush(), 0)
+        self.assertEqual(len(queue), 1)
+
+        self.sink.error = None
+        self.assertEqual(queue.flush(), 1)
+
+    def test_journal_replay(self):
+        """未写回的更新在新进程 (新队列实例) 中重放"""
+        queue = self.make_queue()
+        queue.put("row:2", {"Status": "Pending"})
+        queue.put("row:2", {"URL": "https://a"})
+        journal = queue.journal_path
+        self.assertTrue(os.path.exists(journal))
+        with open(journal, "a", encoding="utf-8") as f:
+            f.write('{"id": "row:9", "fie')  # 崩溃时写了一半的行
+
+        replayed = self.make_queue()
+        self.assertEqual(replayed.flush(), 1)
+        self.assertEqual(self.sink.batches[-1], {"row:2": {"Status": "Pending", "URL": "https://a"}})
+        self.assertFalse(os.path.exists(journal))
+
+    def test_close_flushes(self):
+        queue = self.make_queue()
+        queue.put("row:2", {"Status": "Pending"})
+        queue.close()
+        self.assertEqual(len(self.sink.batches), 1)
+        with self.assertRaises(RuntimeError):
+            queue.put("row:3", {"Status": "Pending"})
+
+
+class TestAppendSpool(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.batches = []
+        self.ok = True
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def sink(self, rows):
+        if self.ok:
+            self.batches.append([r["Title"] for r in rows])
+        return self.ok
+
+    def make_spool(self, **kwargs):
+        kwargs.setdefault("max_records", 3)
+        return AppendSpool("social_xhs", flush_func=self.sink, id_field="Record_ID",
+                           journal_dir=self._tmp.name, **kwargs)
+
+    def test_batches_by_size_and_close(self):
+        spool = self.make_spool()
+        for i in range(4):
+            spool.put({"Title": f"p{i}"})
+        self.assertEqual(self.batches, [["p0", "p1", "p2"]])
+        spool.close()
+        self.assertEqual(self.batches, [["p0", "p1", "p2"], ["p3"]])
+        self.assertFalse(os.path.exists(spool.journal_path))
+
+    def test_failed_flush_kept_and_replayed(self):
+        self.ok = False
+        spool = self.make_spool(max_records=10)
+        spool.put({"Title": "p0"})
+        record_id = spool._pending[0]["Record_ID"]
+        spool.close()
+        self.assertEqual(len(spool), 1)
+
+        # 模拟重启: 新实例从日志恢复，ID 不变 (由 flush_func 去重)
+        self.ok = True
+        replayed = self.make_spool()
+        self.assertEqual(replayed._pending[0]["Record_ID"], record_id)
+        self.assertEqual(replayed.flush(), 1)
+        self.assertEqual(self.batches, [["p0"]])
+
+    def test_partial_failure_keeps_only_failed_records(self):
+        # flush_func 返回失败记录列表 (如 FeishuClient.batch_create_partial)
+        spool = AppendSpool("social_xhs", flush_func=lambda rows: rows[1:], max_records=10,
+                            journal_dir=self._tmp.name)
+        for i in range(3):
+            spool.put({"Title": f"p{i}"})
+        self.assertEqual(spool.flush(), 1)
+        self.assertEqual([r["Title"] for r in spool._pending], ["p1", "p2"])
+        self.assertEqual(AppendSpool("social_xhs", flush_func=self.sink, journal_dir=self._tmp.name)._pending,
+                         spool._pending)
+
+
+if __name__ == "__main__":
+    unittest.main()